@@ -0,0 +1,369 @@
+"""
+紧凑提示词编码器
+把提示词拆成 稳定静态前缀（规则 + 输出格式 + 字段缩写说明）与 每次调用的紧凑载荷:
+- 静态前缀只依赖配置，按配置构建一次并复用；前缀在前、载荷在后，
+  服务端的前缀缓存（DeepSeek 上下文缓存 / 本地推理 KV 复用）可以命中
+- 载荷使用缩写键 + 量化数值（有效数字）+ 紧凑 JSON，空值 / 缺失字段不输出
+- 时间戳移入载荷，不破坏前缀
+- 每次构建记录前缀 / 载荷字节数与估算 token 数
+
+字段与原文本提示词一一对应，只改变编码，不改变决策所依据的信息：
+多币种提示词中原文本的派生标记（趋势 / RSI 超买超卖 / MACD 柱正负）编码为 tr / rs / mg，
+缺失周期输出 NA（原文本的“数据缺失”）。
+"""
+
+import hashlib
+import json
+import math
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from src.fund_flow.local_weight_provider import estimate_tokens
+
+# 载荷缩写键（说明写入静态前缀，模型据此解读）
+KEY_LEGEND = {
+    "t": "时间",
+    "s": "交易对",
+    "px": "当前价格",
+    "c24": "24h涨跌%",
+    "c15": "15m涨跌%",
+    "fr": "资金费率",
+    "oi": "持仓量",
+    "tf": "各周期指标",
+    "k": "最近3根K线[收盘价,涨跌%]",
+    "rsi": "RSI(14)",
+    "m": "MACD",
+    "ms": "MACD Signal",
+    "mh": "MACD柱",
+    "e20": "EMA20",
+    "e50": "EMA50",
+    "atr": "ATR(14)",
+    "vr": "成交量比%",
+    "tr": "趋势(U上升/D下降/F横盘，EMA20对EMA50)",
+    "rs": "RSI状态(OB超买>70/OS超卖<30/N中性)",
+    "mg": "MACD柱(+转正/-转负)",
+    "NA": "该周期数据缺失",
+    "pos": "持仓{sd方向,q数量,ep开仓价,mp当前价,lv杠杆,up未实现盈亏USDT,pp盈亏%}",
+    "hist": "历史决策[时间,动作,信心,理由]",
+    "acct": "账户{eq余额,av可用,up未实现盈亏}",
+}
+
+SINGLE_TIMEFRAME_FIELDS = [
+    ("rsi", "rsi"),
+    ("macd", "m"),
+    ("macd_signal", "ms"),
+    ("macd_histogram", "mh"),
+    ("ema_20", "e20"),
+    ("ema_50", "e50"),
+    ("atr_14", "atr"),
+    ("volume_ratio", "vr"),
+]
+
+MULTI_TIMEFRAME_FIELDS = [
+    ("rsi", "rsi"),
+    ("macd", "m"),
+    ("macd_histogram", "mh"),
+    ("ema_20", "e20"),
+    ("ema_50", "e50"),
+]
+
+MULTI_KEY_INTERVALS = ["1d", "4h", "1h", "15m"]
+MISSING_MARKER = "NA"
+
+
+def derived_flags(ind: Dict[str, Any]) -> Dict[str, str]:
+    """多币种原文本提示词中的派生标记（缺失值按 0 计，与原文本一致）"""
+    rsi = ind.get("rsi") or 0
+    macd_hist = ind.get("macd_histogram") or 0
+    ema20 = ind.get("ema_20") or 0
+    ema50 = ind.get("ema_50") or 0
+    return {
+        "tr": "U" if ema20 > ema50 else "D" if ema20 < ema50 else "F",
+        "rs": "OB" if rsi > 70 else "OS" if rsi < 30 else "N",
+        "mg": "+" if macd_hist > 0 else "-",
+    }
+
+
+def quantize(value: Any, sig: int = 5) -> Any:
+    """数值保留 sig 位有效数字（整数原样）；非数值原样返回，NaN/Inf 返回 None"""
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, int):
+        return value
+    try:
+        v = float(value)
+    except (TypeError, ValueError):
+        return value
+    if math.isnan(v) or math.isinf(v):
+        return None
+    if v == 0:
+        return 0
+    digits = sig - int(math.floor(math.log10(abs(v)))) - 1
+    q = round(v, digits)
+    if digits <= 0 or q == int(q):
+        return int(q)
+    return q
+
+
+def _compact(obj: Dict[str, Any]) -> Dict[str, Any]:
+    """去掉值为 None / 空容器的键"""
+    return {k: v for k, v in obj.items() if v is not None and v != {} and v != []}
+
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+@dataclass(frozen=True)
+class PromptParts:
+    """静态前缀 + 紧凑载荷"""
+
+    prefix: str
+    payload: str
+
+    @property
+    def text(self) -> str:
+        return f"{self.prefix}\n\n## 输入\n{self.payload}"
+
+    @property
+    def prefix_hash(self) -> str:
+        return hashlib.md5(self.prefix.encode("utf-8")).hexdigest()[:12]
+
+
+class CompactPromptBuilder:
+    """静态前缀复用 + 紧凑载荷的提示词构建器"""
+
+    def __init__(self, config: Dict[str, Any], sig_digits: int = 5):
+        """
+        Args:
+            config: 交易配置（前缀中的仓位/风控参数取自 trading / risk 段）
+            sig_digits: 数值量化的有效数字位数
+        """
+        self.config = config
+        self.sig_digits = max(3, int(sig_digits))
+        self._prefixes: Dict[str, str] = {}
+        self._last_prefix_hash: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Any] = {
+            "calls": 0,
+            "prefix_reuse": 0,
+            "prefix_bytes": 0,
+            "payload_bytes_total": 0,
+            "last_payload_bytes": 0,
+            "last_prompt_tokens": 0,
+            "prompt_tokens_total": 0,
+        }
+
+    # ------------------------------------------------------------- prefixes
+    def _legend(self) -> str:
+        return "字段缩写: " + "; ".join(f"{k}={v}" for k, v in KEY_LEGEND.items())
+
+    def single_prefix(self) -> str:
+        """单币种分析的静态前缀（按配置构建一次）"""
+        cached = self._prefixes.get("single")
+        if cached is not None:
+            return cached
+        trading = self.config.get("trading", {})
+        risk = self.config.get("risk", {})
+        prefix = f"""# 加密货币期货交易分析
+
+## 交易规则
+- 资金类型: 永续期货合约；支持双向交易: 可以做多(买入)或做空(卖出)
+- 杠杆范围: 1-100倍（建议3-10倍）
+- 请基于技术指标和市场数据进行理性分析，给出最优交易决策；考虑趋势、动量、波动率等因素，合理设置止盈止损
+- 仓位: 最小{trading.get("min_position_percent", 10)}% | 最大{trading.get("max_position_percent", 30)}% | 预留资金{trading.get("reserve_percent", 20)}%
+- 风控: 最大每日亏损{risk.get("max_daily_loss_percent", 10)}% | 最大连续亏损{risk.get("max_consecutive_losses", 5)}次 | 建议止损-{risk.get("stop_loss_default_percent", 2) * 100}% | 建议止盈+{risk.get("take_profit_default_percent", 5) * 100}%
+
+## 输出格式（纯JSON，无额外文本）
+{{"action":"BUY_OPEN|SELL_OPEN|CLOSE|HOLD","confidence":0.0-1.0,"leverage":1-100,"position_percent":10-30,"take_profit_percent":5.0,"stop_loss_percent":-2.0,"reason":"1-2句话，包含关键指标和值"}}
+- action: BUY_OPEN(开多)/SELL_OPEN(开空)/CLOSE(平仓)/HOLD(持有)
+- take_profit_percent / stop_loss_percent: 相对于开仓价的百分比
+
+## 输入说明
+输入为紧凑JSON；无 pos 表示无持仓，无 hist 表示无历史记录。
+{self._legend()}"""
+        self._prefixes["single"] = prefix
+        return prefix
+
+    def multi_prefix(self) -> str:
+        """多币种统一分析的静态前缀（按配置构建一次）"""
+        cached = self._prefixes.get("multi")
+        if cached is not None:
+            return cached
+        trading = self.config.get("trading", {})
+        prefix = f"""# 高胜率交易决策系统 (目标: 80%+)
+
+## 优化策略
+1. 只交易BTC/ETH/SOL主流币（高流动性、低噪音）
+2. 成交量放大确认（15m成交量比>150%）
+3. 移动止损保护（盈利>5%后止损上移到成本价）
+4. 避开低波动时段（UTC 00:00-08:00）
+
+仓位: 单币最大{trading.get("max_position_percent", 30)}% | 杠杆: 3-10x | 止损: 严格-0.6% | 止盈: 趋势反转时
+
+## 决策规则 (严格执行)
+BUY_OPEN (做多，必须全部满足): 1d EMA20>EMA50 且 4h EMA20>EMA50；1h/4h RSI均<70 且15m RSI在30-50；4h MACD柱转正或持续为正；15m成交量比>150%；confidence: HIGH
+SELL_OPEN (做空，必须全部满足): 1d EMA20<EMA50 且 4h EMA20<EMA50；1h/4h RSI均>30 且15m RSI在50-70；4h MACD柱转负或持续为负；15m成交量比>150%；confidence: HIGH
+CLOSE (平仓): 持仓浮亏接近-0.6%（-0.48%时）；4h EMA20穿越EMA50反向；4h MACD柱颜色反转（多单转负/空单转正）；禁止在盈利<5%时因小幅回调平仓；盈利>5%自动启动移动止损
+HOLD (观望): 任一入场条件不满足；信号矛盾（如1d上升但4h下降）；RSI在45-55震荡；15m成交量比<=150%
+
+## 输出格式 (纯JSON,无任何额外文本)
+{{"BTCUSDT":{{"action":"BUY_OPEN","reason":"1d/4h上升趋势,4h MACD转正,15m RSI 42回调到位,成交量比180%放量","confidence":"HIGH","leverage":8,"position_percent":25,"take_profit_percent":14.0,"stop_loss_percent":-0.6}},"ETHUSDT":{{"action":"HOLD","reason":"1d上升但4h下降,信号矛盾","confidence":"LOW","leverage":0,"position_percent":0,"take_profit_percent":0,"stop_loss_percent":0}}}}
+- JSON键: 完整交易对名称；reason 简洁说明周期趋势+关键指标+成交量比
+- 条件不满足=HOLD；止损统一-0.6%，止盈建议+14.0%
+
+## 输入说明
+输入为紧凑JSON：{{"t":时间,"sym":{{交易对:{{...}}}},"acct":{{...}}}}；无 pos 表示无持仓；tf 中值为 NA 的周期表示数据缺失。
+{self._legend()}"""
+        self._prefixes["multi"] = prefix
+        return prefix
+
+    # ------------------------------------------------------------- payloads
+    def _q(self, value: Any) -> Any:
+        return quantize(value, self.sig_digits)
+
+    def _encode_position(self, position: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if not position:
+            return None
+        return _compact(
+            {
+                "sd": position.get("side"),
+                "q": self._q(position.get("amount")),
+                "ep": self._q(position.get("entry_price")),
+                "mp": self._q(position.get("mark_price")),
+                "lv": self._q(position.get("leverage")),
+                "up": quantize(position.get("unrealized_pnl"), 4),
+                "pp": quantize(position.get("pnl_percent"), 3),
+            }
+        )
+
+    def _encode_indicators(self, ind: Dict[str, Any], fields: List[Any]) -> Dict[str, Any]:
+        return _compact({abbr: self._q(ind.get(name)) for name, abbr in fields})
+
+    def _encode_candles(self, df: Any) -> Optional[List[List[Any]]]:
+        if df is None or len(df) < 3:
+            return None
+        candles = []
+        for _, row in df.tail(3).iterrows():
+            open_ = float(row["open"])
+            change = (float(row["close"]) - open_) / open_ * 100 if open_ else 0.0
+            candles.append([self._q(row["close"]), round(change, 2)])
+        return candles
+
+    def _encode_history(self, history: Optional[List[Dict[str, Any]]]) -> Optional[List[List[Any]]]:
+        if not history:
+            return None
+        return [
+            [h.get("timestamp"), h.get("action"), quantize(h.get("confidence"), 2), h.get("reason")]
+            for h in history[-3:]
+        ]
+
+    def build_single(
+        self,
+        symbol: str,
+        market_data: Dict[str, Any],
+        position: Optional[Dict[str, Any]] = None,
+        history: Optional[List[Dict[str, Any]]] = None,
+        now: Optional[datetime] = None,
+    ) -> PromptParts:
+        realtime = market_data.get("realtime", {}) or {}
+        timeframes: Dict[str, Any] = {}
+        for interval, data in (market_data.get("multi_timeframe", {}) or {}).items():
+            if "indicators" not in data:
+                continue
+            entry = self._encode_indicators(data["indicators"] or {}, SINGLE_TIMEFRAME_FIELDS)
+            candles = self._encode_candles(data.get("dataframe"))
+            if candles:
+                entry["k"] = candles
+            timeframes[interval] = entry
+        payload = _compact(
+            {
+                "t": (now or datetime.now()).strftime("%Y-%m-%d %H:%M:%S"),
+                "s": symbol,
+                "px": self._q(realtime.get("price")),
+                "c24": quantize(realtime.get("change_24h"), 3),
+                "c15": quantize(realtime.get("change_15m"), 3),
+                "fr": quantize(realtime.get("funding_rate"), 3),
+                "oi": self._q(realtime.get("open_interest")),
+                "tf": timeframes,
+                "pos": self._encode_position(position),
+                "hist": self._encode_history(history),
+            }
+        )
+        return self._record("single", PromptParts(self.single_prefix(), _dumps(payload)))
+
+    def build_multi(
+        self,
+        all_symbols_data: Dict[str, Any],
+        account_summary: Optional[Dict[str, Any]] = None,
+        now: Optional[datetime] = None,
+    ) -> PromptParts:
+        symbols: Dict[str, Any] = {}
+        for symbol, symbol_data in all_symbols_data.items():
+            market_data = symbol_data.get("market_data", {}) or {}
+            realtime = market_data.get("realtime", {}) or {}
+            multi_data = market_data.get("multi_timeframe", {}) or {}
+            timeframes: Dict[str, Any] = {}
+            for interval in MULTI_KEY_INTERVALS:
+                ind = (multi_data.get(interval) or {}).get("indicators") or {}
+                if not ind:
+                    timeframes[interval] = MISSING_MARKER
+                    continue
+                timeframes[interval] = {
+                    **derived_flags(ind),
+                    **self._encode_indicators(ind, MULTI_TIMEFRAME_FIELDS),
+                }
+            symbols[symbol] = _compact(
+                {
+                    "px": self._q(realtime.get("price")),
+                    "c24": quantize(realtime.get("change_24h"), 3),
+                    "pos": self._encode_position(symbol_data.get("position")),
+                    "tf": timeframes,
+                }
+            )
+        acct = None
+        if account_summary:
+            acct = _compact(
+                {
+                    "eq": quantize(account_summary.get("equity"), 6),
+                    "av": quantize(account_summary.get("available_balance"), 6),
+                    "up": quantize(account_summary.get("total_unrealized_pnl"), 4),
+                }
+            )
+        payload = _compact(
+            {
+                "t": (now or datetime.now()).strftime("%Y-%m-%d %H:%M:%S"),
+                "sym": symbols,
+                "acct": acct,
+            }
+        )
+        return self._record("multi", PromptParts(self.multi_prefix(), _dumps(payload)))
+
+    # --------------------------------------------------------------- metrics
+    def _record(self, kind: str, parts: PromptParts) -> PromptParts:
+        payload_bytes = len(parts.payload.encode("utf-8"))
+        tokens = estimate_tokens(parts.text)
+        prefix_hash = parts.prefix_hash
+        with self._lock:
+            self._stats["calls"] += 1
+            if self._last_prefix_hash.get(kind) == prefix_hash:
+                self._stats["prefix_reuse"] += 1
+            self._last_prefix_hash[kind] = prefix_hash
+            self._stats["prefix_bytes"] = len(parts.prefix.encode("utf-8"))
+            self._stats["last_payload_bytes"] = payload_bytes
+            self._stats["payload_bytes_total"] += payload_bytes
+            self._stats["last_prompt_tokens"] = tokens
+            self._stats["prompt_tokens_total"] += tokens
+        return parts
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        calls = stats["calls"]
+        stats["avg_prompt_tokens"] = round(stats["prompt_tokens_total"] / calls, 1) if calls else 0.0
+        return stats
+
+
+__all__ = ["CompactPromptBuilder", "PromptParts", "derived_flags", "quantize"]
@@ -1,11 +1,16 @@
 """
 提示词构建器
 负责构建AI提示词
+
+ai.compact_prompt=true（默认）时输出 静态前缀 + 紧凑载荷 格式（见 compact_prompt.py），
+false 时输出原文本格式。
 """
 
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
+from src.ai.compact_prompt import CompactPromptBuilder
+
 
 class PromptBuilder:
     """提示词构建器"""
@@ -19,6 +24,12 @@ class PromptBuilder:
         """
         self.config = config
         self.ai_config = config.get("ai", {})
+        self.compact = bool(self.ai_config.get("compact_prompt", True))
+        self.compact_builder = CompactPromptBuilder(config)
+
+    def get_prompt_stats(self) -> Dict[str, Any]:
+        """紧凑提示词的字节 / token 统计"""
+        return self.compact_builder.get_stats()
 
     def build_analysis_prompt(
         self,
@@ -39,6 +50,9 @@ class PromptBuilder:
         Returns:
             完整的提示词字符串
         """
+        if self.compact:
+            return self.compact_builder.build_single(symbol, market_data, position, history).text
+
         prompt = f"""
 # 加密货币期货交易分析
 
@@ -210,6 +224,9 @@ class PromptBuilder:
         Returns:
             完整的多币种提示词
         """
+        if self.compact:
+            return self.compact_builder.build_multi(all_symbols_data, account_summary).text
+
         prompt = f"""
 # 高胜率交易决策系统 (目标: 80%+)
 
@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import requests  # type: ignore
 
@@ -20,6 +20,9 @@ from src.trading.order_gateway import OrderGateway
 
 from src.trading.tp_sl import PapiTpSlManager, TpSlConfig
 
+from src.utils.concurrency import map_bounded
+from src.utils.profiler import get_profiler, profiled
+
 import hashlib
 import hmac
 import os
@@ -66,6 +69,10 @@ class BinanceBroker:
         self.market: Optional[MarketGateway] = None
 
         self._hedge_mode_cache: Optional[Tuple[bool, float]] = None
+        # 签名写请求（下单/撤单/改杠杆等）完成后的回调，供账户快照等缓存失效使用
+        self._write_listeners: List[Callable[[str, str, Dict[str, Any]], None]] = [self.order.pretrade.on_write]
+        # 可选请求闸门（分片模式下由协调客户端注入：共享权重预算 + 账户级下单锁）
+        self._request_gate: Optional[Any] = None
         self._HEDGE_MODE_CACHE_TTL = 10.0
         self._time_offset_ms: int = 0
         self._time_offset_updated_at: float = 0.0
@@ -364,6 +371,32 @@ class BinanceBroker:
             return False
         return False
 
+    def add_write_listener(self, listener: Callable[[str, str, Dict[str, Any]], None]) -> None:
+        """注册签名写请求回调 listener(method, url, params)；无论请求成功与否都会触发"""
+        if listener not in self._write_listeners:
+            self._write_listeners.append(listener)
+
+    def remove_write_listener(self, listener: Callable[[str, str, Dict[str, Any]], None]) -> None:
+        try:
+            self._write_listeners.remove(listener)
+        except ValueError:
+            pass
+
+    def set_request_gate(self, gate: Optional[Any]) -> None:
+        """
+        注册请求闸门：每次请求前调用 gate.before_request(method, url, params, is_write)，
+        结束后（无论成功与否）调用 gate.after_request(method, url, is_write, headers)
+        """
+        self._request_gate = gate
+
+    def _notify_write(self, method: str, url: str, params: Dict[str, Any]) -> None:
+        for listener in list(self._write_listeners):
+            try:
+                listener(method, url, params)
+            except Exception as e:
+                print(f"⚠️ 写请求回调异常: {e}")
+
+    @profiled("rest.request")
     def request(
         self,
         method: str,
@@ -372,6 +405,37 @@ class BinanceBroker:
         signed: bool = False,
         allow_error: bool = False,
         close_request: bool = False,
+    ) -> requests.Response:
+        is_write = signed and str(method).upper() != "GET"
+        gate = self._request_gate
+        if gate is not None:
+            gate.before_request(str(method).upper(), url, params or {}, is_write)
+        resp: Optional[requests.Response] = None
+        try:
+            resp = self._send_request(
+                method,
+                url,
+                params=params,
+                signed=signed,
+                allow_error=allow_error,
+                close_request=close_request,
+            )
+            return resp
+        finally:
+            if gate is not None:
+                gate.after_request(str(method).upper(), url, is_write, resp.headers if resp is not None else None)
+            # 超时/报错的写请求也可能已在交易所生效，一律通知失效
+            if is_write and self._write_listeners:
+                self._notify_write(str(method).upper(), url, dict(params or {}))
+
+    def _send_request(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        signed: bool = False,
+        allow_error: bool = False,
+        close_request: bool = False,
     ) -> requests.Response:
         input_params = dict(params or {})
 
@@ -479,6 +543,7 @@ class BinanceBroker:
                             print(f"❌ Binance Error ({resp.status_code}) [{method_name} {req_url}]:")
                             self._print_http_error_body(resp)
                     resp.raise_for_status()
+                get_profiler().record_rest(resp.headers)
                 return resp
             except (
                 requests.exceptions.ConnectionError,
@@ -527,6 +592,7 @@ class BinanceBroker:
                         # 直连成功后固定直连（后续请求不再使用代理）
                         self._force_direct = True
                         print("✅ 直连成功，后续请求固定直连")
+                        get_profiler().record_rest(resp.headers)
                         return resp
                     except Exception as fallback_error:
                         # 直连失败，恢复代理配置继续重试
@@ -839,6 +905,9 @@ class BinanceClient:
     def get_order_book(self, *args, **kwargs):
         return self.market.get_order_book(*args, **kwargs)
 
+    def get_agg_trades(self, *args, **kwargs):
+        return self.market.get_agg_trades(*args, **kwargs)
+
     def format_quantity(self, symbol: str, qty: float) -> float:
         return self.market.format_quantity(symbol, qty)
 
@@ -1090,10 +1159,8 @@ class BinanceClient:
                 "failed": 0,
             }
 
-        checked = 0
-        cancelled = 0
-        failed = 0
         is_papi = "papi" in self.broker.um_base()
+        targets: List[Dict[str, Any]] = []
         for order in self._collect_open_protection_orders(symbol, side):
             otype = self._order_type_upper(order)
             is_tp = "TAKE_PROFIT" in otype
@@ -1102,8 +1169,9 @@ class BinanceClient:
                 continue
             if is_sl and not cancel_sl:
                 continue
+            targets.append(order)
 
-            checked += 1
+        def _cancel(order: Dict[str, Any]) -> bool:
             ok = False
             try:
                 if is_papi:
@@ -1115,11 +1183,13 @@ class BinanceClient:
                         ok = True
             except Exception:
                 ok = False
+            return ok
 
-            if ok:
-                cancelled += 1
-            else:
-                failed += 1
+        # 各保护单撤销互不依赖：有界并发执行（每单内部仍保留 PAPI→普通撤单回退）
+        outcomes = map_bounded(_cancel, targets)
+        checked = len(targets)
+        cancelled = sum(1 for ok in outcomes if ok)
+        failed = checked - cancelled
 
         return {
             "status": "success" if failed == 0 else "partial",
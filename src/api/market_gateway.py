@@ -93,6 +93,28 @@ class MarketGateway:
             return data
         return None
 
+    def get_agg_trades(
+        self,
+        symbol: str,
+        from_id: Optional[int] = None,
+        start_time: Optional[int] = None,
+        end_time: Optional[int] = None,
+        limit: int = 500,
+    ) -> List[Dict[str, Any]]:
+        """归集成交：传 from_id 时按成交 ID 增量拉取（交易所不允许与时间范围同时使用）"""
+        url = f"{self.broker.MARKET_BASE}/fapi/v1/aggTrades"
+        params: Dict[str, Any] = {"symbol": symbol, "limit": max(1, min(int(limit or 500), 1000))}
+        if from_id is not None:
+            params["fromId"] = int(from_id)
+        else:
+            if start_time is not None:
+                params["startTime"] = int(start_time)
+            if end_time is not None:
+                params["endTime"] = int(end_time)
+        response = self.broker.request("GET", url, params=params)
+        data = response.json()
+        return data if isinstance(data, list) else []
+
     def get_exchange_info(self) -> Optional[Dict[str, Any]]:
         url = f"{self.broker.MARKET_BASE}/fapi/v1/exchangeInfo"
         response = self.broker.request("GET", url)
@@ -108,37 +130,55 @@ class MarketGateway:
 
         for s in info.get("symbols", []):
             if s["symbol"] == symbol:
-                quantity_precision = 3
-                price_precision = 2
-                step_size = 0.001
-                min_qty = 0.001
-                tick_size = 0.01
-                min_notional = 5.0
-
-                for f in s.get("filters", []):
-                    if f["filterType"] == "LOT_SIZE":
-                        step_size = float(f["stepSize"])
-                        min_qty = float(f.get("minQty") or step_size)
-                        quantity_precision = self._get_precision(step_size)
-                    elif f["filterType"] == "PRICE_FILTER":
-                        tick_size = float(f["tickSize"])
-                        price_precision = self._get_precision(tick_size)
-                    elif f["filterType"] in ["MIN_NOTIONAL", "NOTIONAL"]:
-                        min_notional = float(f.get("minNotional") or f.get("notional") or 5.0)
-
-                res = {
-                    "symbol": symbol,
-                    "quantity_precision": quantity_precision,
-                    "price_precision": price_precision,
-                    "step_size": step_size,
-                    "min_qty": min_qty,
-                    "tick_size": tick_size,
-                    "min_notional": min_notional,
-                }
+                res = self._parse_symbol_info(s)
                 self._symbol_info_cache[symbol] = res
                 return res
         return None
 
+    def warm_symbol_info(self, symbols: List[str]) -> int:
+        """一次 exchangeInfo 请求预热多个交易对的过滤器缓存，返回新缓存数量"""
+        wanted = {str(s).upper() for s in symbols if s} - set(self._symbol_info_cache)
+        if not wanted:
+            return 0
+        info = self.get_exchange_info()
+        if not info:
+            return 0
+        warmed = 0
+        for s in info.get("symbols", []):
+            if s.get("symbol") in wanted:
+                self._symbol_info_cache[s["symbol"]] = self._parse_symbol_info(s)
+                warmed += 1
+        return warmed
+
+    def _parse_symbol_info(self, s: Dict[str, Any]) -> Dict[str, Any]:
+        quantity_precision = 3
+        price_precision = 2
+        step_size = 0.001
+        min_qty = 0.001
+        tick_size = 0.01
+        min_notional = 5.0
+
+        for f in s.get("filters", []):
+            if f["filterType"] == "LOT_SIZE":
+                step_size = float(f["stepSize"])
+                min_qty = float(f.get("minQty") or step_size)
+                quantity_precision = self._get_precision(step_size)
+            elif f["filterType"] == "PRICE_FILTER":
+                tick_size = float(f["tickSize"])
+                price_precision = self._get_precision(tick_size)
+            elif f["filterType"] in ["MIN_NOTIONAL", "NOTIONAL"]:
+                min_notional = float(f.get("minNotional") or f.get("notional") or 5.0)
+
+        return {
+            "symbol": s["symbol"],
+            "quantity_precision": quantity_precision,
+            "price_precision": price_precision,
+            "step_size": step_size,
+            "min_qty": min_qty,
+            "tick_size": tick_size,
+            "min_notional": min_notional,
+        }
+
     def format_quantity(self, symbol: str, quantity: float) -> float:
         info = self.get_symbol_info(symbol)
         if not info:
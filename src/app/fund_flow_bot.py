@@ -7,6 +7,7 @@ Legacy DCA/threshold branches are intentionally removed.
 from __future__ import annotations
 
 from collections import deque
+from collections.abc import Mapping
 import atexit
 import argparse
 import csv
@@ -16,17 +17,31 @@ import math
 import os
 import shutil
 import sys
+import threading
 import time
 from datetime import datetime, timedelta, timezone
 from typing import Any, Deque, Dict, List, Optional, Tuple
 from zoneinfo import ZoneInfo
 
 from src.api.binance_client import BinanceClient
+from src.app.sharding import CoordinatorClient, ShardSpec, run_sharded, shard_symbols
 from src.config.config_loader import ConfigLoader
+from src.config.config_watcher import ConfigWatcher
 from src.config.env_manager import EnvManager
+from src.config.snapshots import (
+    BotConfigSnapshots,
+    DcaConfigSnapshot,
+    Ma10MacdConfluenceConfigSnapshot,
+    PretradeRiskGateConfigSnapshot,
+    ProtectionSlaConfigSnapshot,
+    RiskConfigSnapshot,
+)
 from src.data.account_data import AccountDataManager
 from src.data.market_data import MarketDataManager
+from src.data.account_snapshot import AccountSnapshotService
+from src.data.fill_ingestor import FillIngestor, FillStore
 from src.data.position_data import PositionDataManager
+from src.trading.kill_switch import KillSwitchExecutor
 from src.fund_flow import (
     FundFlowDecision,
     FundFlowAttributionEngine,
@@ -73,6 +88,7 @@ def gate_trade_decision(state_dict: Dict[str, Any], *args: Any, **kwargs: Any) -
     return {"action": action, "enter": action == "ENTER", "exit": False, "score": 0.0, "details": {"fallback": True}}
 from src.trading.intents import PositionSide as IntentPositionSide
 from src.trading.risk_manager import RiskManager
+from src.utils.profiler import get_profiler, profiled
 
 
 class _DualWriter:
@@ -210,7 +226,16 @@ def _configure_console_encoding() -> None:
 class TradingBot:
     """Lightweight bot that only runs the FUND_FLOW strategy path."""
 
-    def __init__(self, config_path: Optional[str] = None):
+    # 分片模式：只处理本分片的交易对，账户级资源经协调进程共享
+    shard: Optional[ShardSpec] = None
+    shard_client: Optional[CoordinatorClient] = None
+    _config_watcher: Optional[ConfigWatcher] = None
+    # 成交增量入库（未启用时回退为按订单查询 userTrades）
+    fill_ingestor: Optional[FillIngestor] = None
+    _trade_fill_log_lock = threading.Lock()
+
+    def __init__(self, config_path: Optional[str] = None, shard: Optional[ShardSpec] = None):
+        self.shard = shard
         self.project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         self.config_path = self._resolve_config_path(config_path)
         self.config = ConfigLoader.load_trading_config(self.config_path)
@@ -227,21 +252,41 @@ class TradingBot:
         self._runtime_out_fp: Optional[_SixHourBucketFile] = None
         self._runtime_err_fp: Optional[_SixHourBucketFile] = None
         self._configure_runtime_log_sink()
+        self.profiler = get_profiler()
+        self.profiler.configure(self.config.get("profiling"), default_dir=self.logs_dir)
+        # 热路径配置段在加载期解析为不可变快照（校验失败直接报错，不带病启动）
+        self._config_snapshots = self._build_config_snapshots()
+        self._dca_override_snapshots: Dict[Tuple[Any, ...], DcaConfigSnapshot] = {}
+        self._config_watcher = self._start_config_watcher()
 
         self.client = BinanceClient()
+        if shard is not None:
+            self.shard_client = CoordinatorClient(shard)
+            self.client.broker.set_request_gate(self.shard_client)
         self.account_data = AccountDataManager(self.client, config_path=self.config_path)
         self.market_data = MarketDataManager(self.client)
-        self.position_data = PositionDataManager(self.client)
+        # 持仓/挂单/条件单按周期共享一次整账户拉取，写请求后自动失效
+        self.account_snapshot = AccountSnapshotService(self.client, self.config.get("account_snapshot"))
+        self.position_data = PositionDataManager(self.client, snapshot=self.account_snapshot)
+        # 下单前 L2 重复开仓检查复用周期账户快照，不再另建一份持仓缓存
+        pretrade = self._pretrade_cache()
+        if pretrade is not None:
+            pretrade.attach_position_source(self.account_snapshot.positions)
+        # 紧急平仓通道独立于决策循环（持仓模式/交易对过滤器在 _init_fund_flow_modules 中预热）
+        self.kill_switch = KillSwitchExecutor(self.client, self.config.get("kill_switch"))
+        self._kill_switch_tripped_until: Optional[datetime] = None
         self.risk_manager = RiskManager(self.config)
 
         self.trade_count = 0
         self._prev_open_interest: Dict[str, float] = {}
         self._startup_trend_filter_cache: Dict[str, Dict[str, float]] = {}
         self._liquidity_ema_notional: Dict[str, float] = {}
-        self._risk_state_path = os.path.join(self.logs_dir, "fund_flow_risk_state.json")
+        risk_state_name = "fund_flow_risk_state.json" if shard is None else f"fund_flow_risk_state.{shard.worker_id}.json"
+        self._risk_state_path = os.path.join(self.logs_dir, risk_state_name)
         self._protection_alert_path = os.path.join(self.logs_dir, "protection_sla_alerts.log")
         self._trade_fill_log_name = "trade_fills_utc.csv"
         self._trade_fill_logged_keys: set[str] = set()
+        self.fill_ingestor = self._init_fill_ingestor()
         self._consecutive_losses: int = 0
         self._cooldown_expires: Optional[datetime] = None
         self._cooldown_reason: Optional[str] = None
@@ -265,12 +310,17 @@ class TradingBot:
         self._signal_registry_version: str = ""
         self._signal_pool_configs: Dict[str, Dict[str, Any]] = {}
         self._signal_pool_configs_runtime_cache: Dict[str, Dict[str, Any]] = {}
+        self._range_dynamic_pool_cfgs: Dict[Tuple[str, int], Dict[str, Any]] = {}
         self._symbol_rotation_offset: int = 0
         self._last_entry_bucket_id: Optional[int] = None
         self._analysis_bucket_state: Dict[str, int] = {}
         self.fund_flow_storage = None
         self._load_risk_state()
         self._init_fund_flow_modules()
+        atexit.register(self._close_attribution_log)
+        if self.fill_ingestor is not None:
+            self.fill_ingestor.start(self._trading_symbols)
+            atexit.register(self.fill_ingestor.stop)
         self._preload_market_history_on_startup()
 
         self._print_startup_summary()
@@ -282,8 +332,9 @@ class TradingBot:
     def _configure_runtime_log_sink(self) -> None:
         if isinstance(sys.stdout, _DualWriter) and isinstance(sys.stderr, _DualWriter):
             return
-        out_mirror = _SixHourBucketFile(self.log_root_dir, "runtime.out.log")
-        err_mirror = _SixHourBucketFile(self.log_root_dir, "runtime.err.log")
+        suffix = "" if self.shard is None else f".{self.shard.worker_id}"
+        out_mirror = _SixHourBucketFile(self.log_root_dir, f"runtime.out{suffix}.log")
+        err_mirror = _SixHourBucketFile(self.log_root_dir, f"runtime.err{suffix}.log")
         try:
             self._runtime_out_fp = out_mirror
             self._runtime_err_fp = err_mirror
@@ -297,6 +348,11 @@ class TradingBot:
         except Exception as e:
             print(f"⚠️ 启用Runtime日志落盘失败: {e}")
 
+    def _close_attribution_log(self) -> None:
+        engine = getattr(self, "fund_flow_attribution_engine", None)
+        if engine is not None:
+            engine.close()
+
     def _close_runtime_log_sink(self) -> None:
         for fp in (self._runtime_out_fp, self._runtime_err_fp):
             try:
@@ -311,32 +367,62 @@ class TradingBot:
         except Exception:
             return 0.0
 
-    def _reload_config_if_changed(self) -> bool:
-        current_mtime = self._get_config_mtime()
-        if current_mtime <= 0:
-            return False
-        if current_mtime <= self._config_mtime:
-            return False
-
-        old_config = self.config
-        old_symbols = ConfigLoader.get_trading_symbols(old_config)
+    def _start_config_watcher(self) -> Optional[ConfigWatcher]:
+        """后台监听配置文件：读取/校验/构建快照都在监听线程完成，周期边界只做替换"""
+        reload_cfg = self.config.get("config_reload", {}) if isinstance(self.config.get("config_reload"), dict) else {}
+        backend = str(reload_cfg.get("backend", "auto") or "auto").strip().lower()
         try:
-            new_config = ConfigLoader.load_trading_config(self.config_path)
+            watcher = ConfigWatcher(
+                self.config_path,
+                loader=ConfigLoader.load_trading_config,
+                prepare=self._prepare_config_reload,
+                poll_interval_seconds=self._to_float(reload_cfg.get("poll_interval_seconds"), 1.0),
+                debounce_seconds=self._to_float(reload_cfg.get("debounce_seconds"), 0.2),
+                use_inotify=False if backend == "poll" else None,
+                name="交易",
+            ).start()
         except Exception as e:
-            # 文件时间已经变化，避免每轮重复刷屏；等待下一次配置文件再次修改后重试
-            self._config_mtime = current_mtime
-            print(f"⚠️ 检测到配置变更，但重载失败，继续使用旧配置: {e}")
+            print(f"⚠️ 配置监听启动失败，配置热更新不可用: {e}")
+            return None
+        print(f"👀 配置监听已启动: backend={watcher.backend}")
+        return watcher
+
+    def _prepare_config_reload(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        监听线程中执行：校验并派生新配置的快照，并构建资金流模块（失败抛异常，旧配置保持不变）
+
+        模块构建包含 SQLite 入库与 kill switch 预热请求，放在这里避免占用交易周期。
+        """
+        snapshots = self._build_config_snapshots(config)
+        return {
+            "snapshots": snapshots,
+            "symbols": list(ConfigLoader.get_trading_symbols(config)),
+            "modules": self._build_fund_flow_modules(config),
+        }
+
+    @profiled("config_reload")
+    def _reload_config_if_changed(self) -> bool:
+        watcher = self._config_watcher
+        if watcher is None:
+            return False
+        prepared = watcher.take()
+        if prepared is None:
             return False
 
+        old_symbols = ConfigLoader.get_trading_symbols(self.config)
+        new_config = prepared.config
+        new_symbols = prepared.derived["symbols"]
         self.config = new_config
-        self._config_mtime = current_mtime
+        self._config_snapshots = prepared.derived["snapshots"]
+        self._dca_override_snapshots = {}
+        self._config_mtime = prepared.mtime
         self._apply_network_env_from_config()
-        self._init_fund_flow_modules()
+        self.profiler.configure(self.config.get("profiling"), default_dir=self.logs_dir)
+        self._install_fund_flow_modules(prepared.derived["modules"])
 
-        new_symbols = ConfigLoader.get_trading_symbols(new_config)
-        ts = datetime.fromtimestamp(current_mtime).strftime("%Y-%m-%d %H:%M:%S")
+        ts = datetime.fromtimestamp(prepared.mtime).strftime("%Y-%m-%d %H:%M:%S")
         print("\n" + "=" * 66)
-        print(f"♻️ 配置热更新生效 @ {ts}")
+        print(f"♻️ 配置热更新生效 @ {ts} (后台准备 {prepared.prepare_ms:.1f}ms)")
         print(f"📄 配置文件: {self.config_path}")
         if set(old_symbols) != set(new_symbols):
             removed = [s for s in old_symbols if s not in new_symbols]
@@ -507,6 +593,29 @@ class TradingBot:
         except Exception:
             return default
 
+    def _init_fill_ingestor(self) -> Optional[FillIngestor]:
+        cfg = self.config.get("fill_ingestion")
+        cfg = cfg if isinstance(cfg, dict) else {}
+        if not bool(cfg.get("enabled", True)):
+            return None
+        db_name = "trade_fills.db" if self.shard is None else f"trade_fills.{self.shard.worker_id}.db"
+        try:
+            store = FillStore(os.path.join(self.logs_dir, db_name))
+        except Exception as e:
+            print(f"⚠️ 成交库初始化失败，回退为按订单查询 userTrades: {e}")
+            return None
+        return FillIngestor(self.client, store, cfg, on_new_fills=self._on_ingested_fills)
+
+    def _on_ingested_fills(self, symbol: str, fills: List[Dict[str, Any]]) -> None:
+        """后台同步到的新成交（含非本程序跟踪订单）写入成交回报日志"""
+        self._append_trade_fill_rows(self._trade_fill_rows(symbol, fills, order=None))
+
+    def _order_trade_fills(self, symbol: str, order_id: int) -> List[Dict[str, Any]]:
+        """订单成交：优先查本地成交库（未命中时按 orderId 补拉一次），未启用增量入库时直接发 REST 请求"""
+        if self.fill_ingestor is not None:
+            return self.fill_ingestor.fills_for_order(symbol, order_id)
+        return self._fetch_order_trade_fills(symbol=symbol, order_id=order_id)
+
     def _fetch_order_trade_fills(self, symbol: str, order_id: Optional[int]) -> List[Dict[str, Any]]:
         if not symbol:
             return []
@@ -567,26 +676,76 @@ class TradingBot:
             "成交ID",
             "来源",
         ]
-        # 同一轮重复触发时避免重复写同一笔成交
-        dedup_rows: List[Dict[str, Any]] = []
-        for row in rows:
-            dedup_key = str(row.get("_dedup_key") or "")
-            if dedup_key and dedup_key in self._trade_fill_logged_keys:
-                continue
-            if dedup_key:
-                self._trade_fill_logged_keys.add(dedup_key)
-            dedup_rows.append(row)
-        if not dedup_rows:
-            return
+        # 主线程（下单回报）与成交同步线程都会写入，去重与追加需串行
+        with self._trade_fill_log_lock:
+            # 同一轮重复触发时避免重复写同一笔成交
+            dedup_rows: List[Dict[str, Any]] = []
+            for row in rows:
+                dedup_key = str(row.get("_dedup_key") or "")
+                if dedup_key and dedup_key in self._trade_fill_logged_keys:
+                    continue
+                if dedup_key:
+                    self._trade_fill_logged_keys.add(dedup_key)
+                dedup_rows.append(row)
+            if not dedup_rows:
+                return
+
+            log_path = self._resolve_trade_fill_log_path_utc()
+            file_exists = os.path.exists(log_path) and os.path.getsize(log_path) > 0
+            with open(log_path, "a", encoding="utf-8-sig", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=headers, extrasaction="ignore")
+                if not file_exists:
+                    writer.writeheader()
+                for row in dedup_rows:
+                    writer.writerow(row)
 
-        log_path = self._resolve_trade_fill_log_path_utc()
-        file_exists = os.path.exists(log_path) and os.path.getsize(log_path) > 0
-        with open(log_path, "a", encoding="utf-8-sig", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=headers, extrasaction="ignore")
-            if not file_exists:
-                writer.writeheader()
-            for row in dedup_rows:
-                writer.writerow(row)
+    def _trade_fill_rows(
+        self,
+        symbol: str,
+        fills: List[Dict[str, Any]],
+        order: Optional[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        order = order if isinstance(order, dict) else {}
+        rows: List[Dict[str, Any]] = []
+        for fill in fills:
+            if not isinstance(fill, dict):
+                continue
+            order_id = self._to_int(fill.get("orderId"), self._to_int(order.get("orderId"), -1))
+            ts_ms = self._to_int(fill.get("time"), 0)
+            if ts_ms > 0:
+                ts_utc = datetime.fromtimestamp(ts_ms / 1000.0, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+            else:
+                ts_utc = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+            side = str(fill.get("side") or order.get("side") or "").upper()
+            qty = self._to_float(fill.get("qty"), self._to_float(fill.get("executedQty"), 0.0))
+            price = self._to_float(
+                fill.get("price"),
+                self._to_float(order.get("avgPrice"), self._to_float(order.get("price"), 0.0)),
+            )
+            quote_qty = self._to_float(fill.get("quoteQty"), qty * price)
+            fee = self._to_float(fill.get("commission"), 0.0)
+            fee_asset = str(fill.get("commissionAsset") or "USDT")
+            realized = self._to_float(fill.get("realizedPnl"), 0.0)
+            trade_id = str(fill.get("id") or fill.get("tradeId") or "")
+            rows.append(
+                {
+                    "_dedup_key": f"{symbol}|{order_id}|{trade_id or ts_ms}|{qty}|{price}",
+                    "时间(UTC)": ts_utc,
+                    "合约": symbol,
+                    "方向": self._normalize_fill_side(side),
+                    "价格": price,
+                    "数量": qty,
+                    "成交额": quote_qty,
+                    "手续费": fee,
+                    "手续费结算币种": fee_asset,
+                    "已实现盈亏": realized,
+                    "计价资产": "USDT",
+                    "订单ID": str(order_id),
+                    "成交ID": trade_id,
+                    "来源": "user_trades",
+                }
+            )
+        return rows
 
     def _write_trade_fill_log(
         self,
@@ -605,45 +764,13 @@ class TradingBot:
         if order_id <= 0:
             return
 
-        fills = self._fetch_order_trade_fills(symbol=symbol, order_id=order_id)
-        rows: List[Dict[str, Any]] = []
-        if fills:
-            for fill in fills:
-                ts_ms = self._to_int(fill.get("time"), 0)
-                if ts_ms > 0:
-                    ts_utc = datetime.fromtimestamp(ts_ms / 1000.0, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
-                else:
-                    ts_utc = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
-                side = str(fill.get("side") or order.get("side") or "").upper()
-                qty = self._to_float(fill.get("qty"), self._to_float(fill.get("executedQty"), 0.0))
-                price = self._to_float(
-                    fill.get("price"),
-                    self._to_float(order.get("avgPrice"), self._to_float(order.get("price"), 0.0)),
-                )
-                quote_qty = self._to_float(fill.get("quoteQty"), qty * price)
-                fee = self._to_float(fill.get("commission"), 0.0)
-                fee_asset = str(fill.get("commissionAsset") or "USDT")
-                realized = self._to_float(fill.get("realizedPnl"), 0.0)
-                trade_id = str(fill.get("id") or fill.get("tradeId") or "")
-                rows.append(
-                    {
-                        "_dedup_key": f"{symbol}|{order_id}|{trade_id or ts_ms}|{qty}|{price}",
-                        "时间(UTC)": ts_utc,
-                        "合约": symbol,
-                        "方向": self._normalize_fill_side(side),
-                        "价格": price,
-                        "数量": qty,
-                        "成交额": quote_qty,
-                        "手续费": fee,
-                        "手续费结算币种": fee_asset,
-                        "已实现盈亏": realized,
-                        "计价资产": "USDT",
-                        "订单ID": str(order_id),
-                        "成交ID": trade_id,
-                        "来源": "user_trades",
-                    }
-                )
-        else:
+        if self.fill_ingestor is not None and self.fill_ingestor.running:
+            # 后台增量同步按相同去重键写入本单及后续成交（TP/SL 等），这里只标记活跃，不阻塞拉取
+            self.fill_ingestor.mark_active(symbol)
+            return
+        fills = self._order_trade_fills(symbol=symbol, order_id=order_id)
+        rows = self._trade_fill_rows(symbol, fills, order)
+        if not rows:
             # 若 userTrades 临时不可用，回退记录订单回报，避免完全丢单据。
             exec_qty = self._to_float(order.get("executedQty"), 0.0)
             if exec_qty > 0:
@@ -677,7 +804,7 @@ class TradingBot:
 
     def _print_startup_summary(self) -> None:
         ff_cfg = self.config.get("fund_flow", {}) or {}
-        symbols = ConfigLoader.get_trading_symbols(self.config)
+        symbols = self._trading_symbols()
         startup_cfg = self._startup_market_preload_config()
         print("=" * 66)
         print("🚀 资金流策略机器人启动")
@@ -685,6 +812,13 @@ class TradingBot:
         print(f"📁 日志目录: {self.logs_dir}")
         print(f"🗂️ 分桶日志根目录(6H): {self.log_root_dir}")
         print(f"🧾 成交回报日志(UTC): {self._resolve_trade_fill_log_path_utc()}")
+        if self.fill_ingestor is not None:
+            print(
+                "🧾 成交增量入库: "
+                f"db={self.fill_ingestor.store.db_path}, "
+                f"interval={self.fill_ingestor.interval_seconds:.0f}s, "
+                f"idle_max={self.fill_ingestor.idle_max_interval_seconds:.0f}s"
+            )
         print(f"📊 交易对: {', '.join(symbols)}")
         print(
             "⚙️ 杠杆配置: "
@@ -814,11 +948,12 @@ class TradingBot:
                     )
         print("=" * 66)
 
+    @profiled("positions_snapshot")
     def _position_snapshot_by_symbol(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
         target = {str(s).upper() for s in symbols}
         grouped: Dict[str, List[Dict[str, Any]]] = {}
         try:
-            positions = self.client.get_all_positions() if hasattr(self.client, "get_all_positions") else []
+            positions = self.account_snapshot.positions()
         except Exception:
             positions = []
         for pos in positions or []:
@@ -900,6 +1035,16 @@ class TradingBot:
             out[symbol] = snapshot
         return out
 
+    def _trading_symbols(self) -> List[str]:
+        """配置中的交易对；分片模式下只返回本分片负责的部分"""
+        return self._symbols_from_config(self.config)
+
+    def _symbols_from_config(self, config: Dict[str, Any]) -> List[str]:
+        symbols = ConfigLoader.get_trading_symbols(config)
+        if self.shard is None:
+            return symbols
+        return shard_symbols(symbols, self.shard.index, self.shard.count)
+
     def _symbols_for_current_cycle(
         self,
         symbols: List[str],
@@ -1204,9 +1349,62 @@ class TradingBot:
             return dt.replace(tzinfo=ZoneInfo("UTC"))
         return dt
 
-    def _risk_config(self) -> Dict[str, Any]:
-        risk_cfg = self.config.get("risk", {}) or {}
-        ff_cfg = self.config.get("fund_flow", {}) or {}
+    def _build_config_snapshots(self, config: Optional[Dict[str, Any]] = None) -> BotConfigSnapshots:
+        """按 config（默认 self.config）构建全部配置快照；字段缺失/类型不符抛 ConfigSnapshotError。
+        只读 config，不修改实例状态，可在配置监听线程中调用。"""
+        return BotConfigSnapshots(
+            risk=RiskConfigSnapshot.from_mapping(self._build_risk_config(config)),
+            protection_sla=ProtectionSlaConfigSnapshot.from_mapping(self._build_protection_sla_config(config)),
+            pretrade_risk_gate=PretradeRiskGateConfigSnapshot.from_mapping(self._build_pretrade_risk_gate_config(config)),
+            dca=DcaConfigSnapshot.from_mapping(self._build_dca_config(config=config)),
+            ma10_macd_confluence=Ma10MacdConfluenceConfigSnapshot.from_mapping(
+                self._build_ma10_macd_confluence_config(config)
+            ),
+        )
+
+    def _snapshots(self) -> BotConfigSnapshots:
+        snapshots = getattr(self, "_config_snapshots", None)
+        if snapshots is None:
+            snapshots = self._build_config_snapshots()
+            self._config_snapshots = snapshots
+        return snapshots
+
+    def _risk_config(self) -> RiskConfigSnapshot:
+        return self._snapshots().risk
+
+    def _protection_sla_config(self) -> ProtectionSlaConfigSnapshot:
+        return self._snapshots().protection_sla
+
+    def _pretrade_risk_gate_config(self) -> PretradeRiskGateConfigSnapshot:
+        return self._snapshots().pretrade_risk_gate
+
+    def _ma10_macd_confluence_config(self) -> Ma10MacdConfluenceConfigSnapshot:
+        return self._snapshots().ma10_macd_confluence
+
+    def _dca_config(self, engine_override: Optional[Mapping] = None) -> DcaConfigSnapshot:
+        """无 engine 覆盖时返回加载期快照；有覆盖时按覆盖值缓存（重载配置后清空）"""
+        override = engine_override if isinstance(engine_override, Mapping) else {}
+        override_key = tuple(
+            (k, tuple(v) if isinstance(v, list) else v)
+            for k, v in sorted(override.items())
+            if k in ("dca_max_additions", "add_position_portion", "dca_drawdown_thresholds", "dca_multipliers")
+        )
+        if not override_key:
+            return self._snapshots().dca
+        cache = getattr(self, "_dca_override_snapshots", None)
+        if cache is None:
+            cache = {}
+            self._dca_override_snapshots = cache
+        snapshot = cache.get(override_key)
+        if snapshot is None:
+            snapshot = DcaConfigSnapshot.from_mapping(self._build_dca_config(dict(override)))
+            cache[override_key] = snapshot
+        return snapshot
+
+    def _build_risk_config(self, config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        config = self.config if config is None else config
+        risk_cfg = config.get("risk", {}) or {}
+        ff_cfg = config.get("fund_flow", {}) or {}
         max_daily_loss_pct = self._normalize_percent_to_ratio(
             risk_cfg.get("daily_cooldown_pct", risk_cfg.get("max_daily_loss_percent", 0.1)),
             0.1,
@@ -1238,8 +1436,8 @@ class TradingBot:
             "daily_reset_timezone": str(risk_cfg.get("daily_reset_timezone", "Asia/Tokyo")),
         }
 
-    def _protection_sla_config(self) -> Dict[str, Any]:
-        ff_cfg = self.config.get("fund_flow", {}) or {}
+    def _build_protection_sla_config(self, config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        ff_cfg = (self.config if config is None else config).get("fund_flow", {}) or {}
         enabled = bool(ff_cfg.get("protection_sla_enabled", True))
         timeout_seconds = max(1, int(ff_cfg.get("protection_sla_seconds", 60) or 60))
         force_flatten = bool(ff_cfg.get("protection_sla_force_flatten", True))
@@ -1256,8 +1454,8 @@ class TradingBot:
             "repair_fail_reduce_ratio": reduce_ratio,
         }
 
-    def _pretrade_risk_gate_config(self) -> Dict[str, Any]:
-        ff_cfg = self.config.get("fund_flow", {}) or {}
+    def _build_pretrade_risk_gate_config(self, config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        ff_cfg = (self.config if config is None else config).get("fund_flow", {}) or {}
         gate_cfg = ff_cfg.get("pretrade_risk_gate", {}) if isinstance(ff_cfg.get("pretrade_risk_gate"), dict) else {}
         defaults = RiskConfig()
         volatility_cap = max(1e-6, self._normalize_percent_to_ratio(gate_cfg.get("volatility_cap", 0.01), 0.01))
@@ -1339,8 +1537,12 @@ class TradingBot:
         delay_seconds = max(0, int(ff_cfg.get("stale_protection_cleanup_delay_seconds", 3) or 3))
         return {"enabled": enabled, "delay_seconds": delay_seconds}
 
-    def _dca_config(self, engine_override: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        ff_cfg = self.config.get("fund_flow", {}) or {}
+    def _build_dca_config(
+        self,
+        engine_override: Optional[Dict[str, Any]] = None,
+        config: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        ff_cfg = (self.config if config is None else config).get("fund_flow", {}) or {}
         override = engine_override if isinstance(engine_override, dict) else {}
         enabled = bool(ff_cfg.get("dca_martingale_enabled", ff_cfg.get("dca_enabled", False)))
         if "dca_max_additions" in override:
@@ -1414,8 +1616,8 @@ class TradingBot:
             ),
         }
 
-    def _ma10_macd_confluence_config(self) -> Dict[str, Any]:
-        ff_cfg = self.config.get("fund_flow", {}) or {}
+    def _build_ma10_macd_confluence_config(self, config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        ff_cfg = (self.config if config is None else config).get("fund_flow", {}) or {}
         raw = ff_cfg.get("ma10_macd_confluence", {}) if isinstance(ff_cfg.get("ma10_macd_confluence"), dict) else {}
         tf_exec = str(raw.get("tf_exec", raw.get("exec_tf", "5m")) or "5m").strip().lower()
         tf_anchor = str(raw.get("tf_anchor", raw.get("anchor_tf", "1h")) or "1h").strip().lower()
@@ -1750,7 +1952,8 @@ class TradingBot:
             "squeeze": squeeze,
         }
 
-    def _compute_ma10_macd_confluence(self, symbol: str, cfg: Dict[str, Any]) -> Dict[str, Any]:
+    @profiled("klines.confluence")
+    def _compute_ma10_macd_confluence(self, symbol: str, cfg: Mapping[str, Any]) -> Dict[str, Any]:
         tf_exec = str(cfg.get("tf_exec", "5m"))
         tf_anchor = str(cfg.get("tf_anchor", "1h"))
         limit_exec = int(cfg.get("kline_limit_exec", 160))
@@ -1886,7 +2089,7 @@ class TradingBot:
         self,
         flow_context: Dict[str, Any],
         confluence: Dict[str, Any],
-        cfg: Dict[str, Any],
+        cfg: Mapping[str, Any],
     ) -> None:
         if not isinstance(flow_context, dict) or not isinstance(confluence, dict):
             return
@@ -2195,7 +2398,7 @@ class TradingBot:
                 block_actions_cfg = cfg.get("entry_block_actions", ["EXIT", "BLOCK", "AVOID"])
                 block_actions = {
                     str(x).upper()
-                    for x in (block_actions_cfg if isinstance(block_actions_cfg, list) else ["EXIT", "BLOCK", "AVOID"])
+                    for x in (block_actions_cfg if isinstance(block_actions_cfg, (list, tuple)) else ["EXIT", "BLOCK", "AVOID"])
                     if str(x).strip()
                 }
                 if gate_action in block_actions:
@@ -2395,7 +2598,7 @@ class TradingBot:
         trigger_context: Dict[str, Any],
         dca_cfg: Optional[Dict[str, Any]] = None,
     ) -> Optional[FundFlowDecision]:
-        cfg = dca_cfg if isinstance(dca_cfg, dict) else self._dca_config()
+        cfg = dca_cfg if isinstance(dca_cfg, Mapping) else self._dca_config()
         if not bool(cfg.get("enabled")):
             return None
 
@@ -2520,6 +2723,9 @@ class TradingBot:
     def _activate_cooldown(self, reason: str, seconds: int) -> None:
         if seconds <= 0:
             return
+        if self.shard_client is not None:
+            self._apply_shard_risk_guard(self.shard_client.call("activate_cooldown", reason, int(seconds)))
+            return
         now = datetime.now()
         new_expires = now + timedelta(seconds=int(seconds))
         current_expires: Optional[datetime] = self._cooldown_expires if isinstance(self._cooldown_expires, datetime) else None
@@ -2534,6 +2740,14 @@ class TradingBot:
         print(f"⚠️ 触发账户级冷却: reason={reason}, expires={self._cooldown_expires.isoformat()}")
         self._save_risk_state()
 
+    def _apply_shard_risk_guard(self, guard: Dict[str, Any]) -> Dict[str, Any]:
+        """本地冷却状态跟随协调进程（开仓拦截等本地判断仍读这两个字段）"""
+        self._cooldown_reason = guard.get("reason")
+        self._cooldown_expires = self._parse_iso_datetime(guard.get("cooldown_expires"))
+        if "consecutive_losses" in guard:
+            self._consecutive_losses = int(guard.get("consecutive_losses") or 0)
+        return guard
+
     def _cooldown_remaining_seconds(self) -> int:
         if not isinstance(self._cooldown_expires, datetime):
             return 0
@@ -2549,8 +2763,26 @@ class TradingBot:
     def _is_cooldown_active(self) -> bool:
         return self._cooldown_remaining_seconds() > 0
 
+    def _maybe_trip_kill_switch(self, risk_guard: Dict[str, Any]) -> None:
+        """日内亏损熔断触发时（每次冷却只触发一次）按配置并发强平全部持仓"""
+        ks_cfg = self.config.get("kill_switch", {}) or {}
+        if not bool(ks_cfg.get("flatten_on_daily_loss", False)):
+            return
+        if not risk_guard.get("blocked") or risk_guard.get("reason") != "daily_loss":
+            return
+        if not risk_guard.get("kill_switch_owner", True):
+            # 分片模式：全账户强平只由协调进程指定的一个 worker 执行
+            return
+        if self._kill_switch_tripped_until is not None and self._kill_switch_tripped_until == self._cooldown_expires:
+            return
+        self._kill_switch_tripped_until = self._cooldown_expires
+        self._kill_switch_flatten_all("daily_loss")
+
     def _refresh_account_risk_guard(self, account_summary: Dict[str, Any]) -> Dict[str, Any]:
         cfg = self._risk_config()
+        if self.shard_client is not None:
+            equity = self._to_float(account_summary.get("equity"), 0.0)
+            return self._apply_shard_risk_guard(self.shard_client.call("risk_guard", equity, dict(cfg)))
         if not cfg["enabled"]:
             if self._cooldown_expires is not None or self._cooldown_reason is not None:
                 self._cooldown_expires = None
@@ -2628,7 +2860,7 @@ class TradingBot:
         order_id = self._to_int((order_info or {}).get("orderId"), -1) if isinstance(order_info, dict) else -1
         if order_id <= 0:
             return None
-        fills = self._fetch_order_trade_fills(symbol=symbol, order_id=order_id)
+        fills = self._order_trade_fills(symbol, order_id)
         if not fills:
             return None
 
@@ -2657,6 +2889,10 @@ class TradingBot:
             return
         execution_result["realized_pnl"] = realized_pnl
 
+        if self.shard_client is not None:
+            self._apply_shard_risk_guard(self.shard_client.call("record_close", float(realized_pnl), dict(self._risk_config())))
+            return
+
         if realized_pnl < 0:
             self._consecutive_losses = int(self._consecutive_losses or 0) + 1
         else:
@@ -2672,37 +2908,53 @@ class TradingBot:
             self._save_risk_state()
 
     def _init_fund_flow_modules(self) -> None:
-        symbol_whitelist = ConfigLoader.get_trading_symbols(self.config)
-        ff_cfg = self.config.get("fund_flow", {}) or {}
-        self._signal_pool_configs = self._build_signal_pool_configs_from_config(ff_cfg)
-        self._signal_pool_configs_runtime_cache = {}
-        self.fund_flow_attribution_engine = FundFlowAttributionEngine(
-            self.logs_dir,
-            bucket_root_dir=self.log_root_dir,
-        )
-        self.fund_flow_risk_engine = FundFlowRiskEngine(self.config, symbol_whitelist=symbol_whitelist)
-        self.fund_flow_decision_engine = FundFlowDecisionEngine(self.config)
-        self.fund_flow_execution_router = FundFlowExecutionRouter(
+        self._install_fund_flow_modules(self._build_fund_flow_modules(self.config))
+
+    def _build_fund_flow_modules(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        按给定配置构建资金流模块（不修改 self 上的引用）
+
+        热更新时在配置监听线程中执行（SQLite 入库、kill switch 预热请求都在这里完成），
+        交易线程在周期边界只调用 _install_fund_flow_modules 替换引用。
+        """
+        symbol_whitelist = self._symbols_from_config(config)
+        ff_cfg = config.get("fund_flow", {}) or {}
+        signal_pool_configs = self._build_signal_pool_configs_from_config(ff_cfg)
+        # 归因日志与配置无关，热更新沿用同一实例（文件句柄与偏移保持连续）
+        attribution_engine = getattr(self, "fund_flow_attribution_engine", None)
+        if attribution_engine is None:
+            attribution_engine = FundFlowAttributionEngine(
+                self.logs_dir,
+                bucket_root_dir=self.log_root_dir,
+            )
+        risk_engine = FundFlowRiskEngine(config, symbol_whitelist=symbol_whitelist)
+        decision_engine = FundFlowDecisionEngine(config)
+        kill_switch = getattr(self, "kill_switch", None)
+        if kill_switch is not None:
+            warm = kill_switch.warm(symbol_whitelist)
+            print(f"🧯 Kill switch 已预热: hedge_mode={warm.get('hedge_mode')} symbols={warm.get('symbols_warmed')}")
+        execution_router = FundFlowExecutionRouter(
             client=self.client,
-            risk_engine=self.fund_flow_risk_engine,
-            attribution_engine=self.fund_flow_attribution_engine,
+            risk_engine=risk_engine,
+            attribution_engine=attribution_engine,
+            kill_switch=kill_switch,
         )
         metric_timeframes = ff_cfg.get("metric_timeframes")
         if not isinstance(metric_timeframes, list):
             metric_timeframes = ["1m", "3m", "5m", "15m", "30m", "1h", "2h", "4h"]
-        self.fund_flow_ingestion_service = MarketIngestionService(
+        ingestion_service = MarketIngestionService(
             window_seconds=int(ff_cfg.get("aggregation_window_seconds", 15) or 15),
             exchange="binance",
             timeframes=metric_timeframes,
             max_history_seconds=int(ff_cfg.get("max_indicator_history_seconds", 4 * 3600) or 4 * 3600),
             range_quantile_config=ff_cfg.get("range_quantile", {}) if isinstance(ff_cfg.get("range_quantile", {}), dict) else {},
         )
-        self.fund_flow_storage = None
+        storage: Optional[MarketStorage] = None
+        registry_version = ""
         sync_result: Dict[str, int] = {"definitions": 0, "pools": 0}
         runtime_pool_cfg = ff_cfg.get("signal_pool", {}) if isinstance(ff_cfg.get("signal_pool"), dict) else {}
         try:
             storage = MarketStorage(db_path=os.path.join(self.logs_dir, "fund_flow_strategy.db"))
-            self.fund_flow_storage = storage
             sync_result = storage.upsert_signal_registry_from_config(ff_cfg)
             active_pool_id = ff_cfg.get("active_signal_pool_id")
             runtime_pool_cfg_db = storage.get_active_signal_pool_config(
@@ -2710,24 +2962,63 @@ class TradingBot:
             )
             if runtime_pool_cfg_db:
                 runtime_pool_cfg = runtime_pool_cfg_db
-            self._signal_registry_version = storage.get_signal_registry_version()
+            registry_version = storage.get_signal_registry_version()
         except Exception as e:
-            self.fund_flow_storage = None
-            self._signal_registry_version = ""
+            storage = None
+            registry_version = ""
             print(f"⚠️ MarketStorage 初始化失败，已降级无DB模式: {e}")
 
-        self.fund_flow_trigger_engine = TriggerEngine(
+        trigger_engine = TriggerEngine(
             dedupe_window_seconds=int(ff_cfg.get("trigger_dedupe_seconds", 10) or 10),
             signal_pool_config=runtime_pool_cfg,
         )
         runtime_pool_id = str(runtime_pool_cfg.get("pool_id") or runtime_pool_cfg.get("id") or "").strip()
         if runtime_pool_id:
-            self._signal_pool_configs[runtime_pool_id] = runtime_pool_cfg
+            signal_pool_configs[runtime_pool_id] = runtime_pool_cfg
         if int(sync_result.get("definitions", 0)) > 0 or int(sync_result.get("pools", 0)) > 0:
             print(
                 f"🗂️ signal registry入库完成: definitions={int(sync_result.get('definitions', 0))}, "
-                f"pools={int(sync_result.get('pools', 0))}, version={self._signal_registry_version}"
+                f"pools={int(sync_result.get('pools', 0))}, version={registry_version}"
             )
+        return {
+            "signal_pool_configs": signal_pool_configs,
+            "attribution_engine": attribution_engine,
+            "risk_engine": risk_engine,
+            "decision_engine": decision_engine,
+            "execution_router": execution_router,
+            "ingestion_service": ingestion_service,
+            "storage": storage,
+            "registry_version": registry_version,
+            "trigger_engine": trigger_engine,
+        }
+
+    def _install_fund_flow_modules(self, modules: Dict[str, Any]) -> None:
+        """只替换引用；旧决策引擎的 AI 调度器/权重缓存在后台线程关闭"""
+        previous_engine = getattr(self, "fund_flow_decision_engine", None)
+        self._signal_pool_configs = modules["signal_pool_configs"]
+        self._signal_pool_configs_runtime_cache = {}
+        self.fund_flow_attribution_engine = modules["attribution_engine"]
+        self.fund_flow_risk_engine = modules["risk_engine"]
+        self.fund_flow_decision_engine = modules["decision_engine"]
+        self.fund_flow_execution_router = modules["execution_router"]
+        self.fund_flow_ingestion_service = modules["ingestion_service"]
+        self.fund_flow_storage = modules["storage"]
+        self._signal_registry_version = modules["registry_version"]
+        self.fund_flow_trigger_engine = modules["trigger_engine"]
+        if previous_engine is not None and previous_engine is not modules["decision_engine"]:
+            threading.Thread(
+                target=self._shutdown_decision_engine,
+                args=(previous_engine,),
+                name="ff-engine-retire",
+                daemon=True,
+            ).start()
+
+    @staticmethod
+    def _shutdown_decision_engine(engine: Any) -> None:
+        try:
+            engine.deepseek_router.shutdown()
+        except Exception:
+            pass
 
     def _build_signal_pool_configs_from_config(self, ff_cfg: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
         out: Dict[str, Dict[str, Any]] = {}
@@ -2843,6 +3134,46 @@ class TradingBot:
         self._signal_pool_configs_runtime_cache[pool_key] = runtime_cfg
         return runtime_cfg
 
+    def _range_dynamic_pool_config(self, pool_id: str, edge_cd: int) -> Dict[str, Any]:
+        """RANGE 动态池配置按 (pool_id, edge_cd) 复用同一对象，TriggerEngine 只需编译一次"""
+        cache = getattr(self, "_range_dynamic_pool_cfgs", None)
+        if cache is None:
+            cache = self._range_dynamic_pool_cfgs = {}
+        key = (pool_id, int(edge_cd))
+        cfg = cache.get(key)
+        if cfg is None:
+            cfg = {
+                "enabled": True,
+                "pool_id": pool_id,
+                "id": pool_id,
+                "logic": "OR",
+                "min_pass_count": 1,
+                "min_long_score": 0.0,
+                "min_short_score": 0.0,
+                "scheduled_trigger_bypass": False,
+                "apply_when_position_exists": False,
+                "edge_trigger_enabled": True,
+                "edge_cooldown_seconds": edge_cd,
+                "rules": [
+                    {
+                        "name": "range_dynamic_long_gate",
+                        "side": "LONG",
+                        "metric": "long_score",
+                        "operator": ">=",
+                        "threshold": 0.0,
+                    },
+                    {
+                        "name": "range_dynamic_short_gate",
+                        "side": "SHORT",
+                        "metric": "short_score",
+                        "operator": ">=",
+                        "threshold": 0.0,
+                    },
+                ],
+            }
+            cache[key] = cfg
+        return cfg
+
     def _safe_storage_call(self, method_name: str, *args: Any, **kwargs: Any) -> Any:
         storage = self.fund_flow_storage
         if storage is None:
@@ -2999,7 +3330,7 @@ class TradingBot:
         if getattr(self, "fund_flow_ingestion_service", None) is None:
             return
 
-        symbols = ConfigLoader.get_trading_symbols(self.config)
+        symbols = self._trading_symbols()
         if not symbols:
             return
 
@@ -3162,6 +3493,7 @@ class TradingBot:
             out["active_timeframe"] = "raw"
         return out
 
+    @profiled("orderbook")
     def _extract_orderbook_flow(self, symbol: str) -> Dict[str, float]:
         try:
             ob = self.client.get_order_book(symbol, limit=20) or {}
@@ -3285,13 +3617,15 @@ class TradingBot:
             return -clip
         return norm
 
+    @profiled("market_data")
     def get_market_data_for_symbol(self, symbol: str) -> Dict[str, Any]:
         realtime = self.market_data.get_realtime_market_data(symbol) or {}
         # 从配置获取 regime timeframe，动态获取对应的 trend filter 数据
         ff_cfg = self.config.get("fund_flow", {}) or {}
         regime_cfg = ff_cfg.get("regime", {}) if isinstance(ff_cfg.get("regime"), dict) else {}
         regime_timeframe = str(regime_cfg.get("timeframe", "15m") or "15m").strip().lower()
-        trend_filter = self.market_data.get_trend_filter_metrics(symbol, interval=regime_timeframe, limit=120) or {}
+        with self.profiler.span("klines.trend_filter"):
+            trend_filter = self.market_data.get_trend_filter_metrics(symbol, interval=regime_timeframe, limit=120) or {}
         if not trend_filter:
             trend_filter = dict(self._startup_trend_filter_cache.get(symbol.upper(), {}))
         ob_flow = self._extract_orderbook_flow(symbol)
@@ -3341,7 +3675,7 @@ class TradingBot:
     def _has_pending_entry_order(self, symbol: str) -> bool:
         """Return True when there is an unfilled opening order for symbol."""
         try:
-            orders = self.client.get_open_orders(symbol) or []
+            orders = self.account_snapshot.open_orders(symbol)
         except Exception:
             return False
         if not isinstance(orders, list):
@@ -3367,7 +3701,7 @@ class TradingBot:
     def _has_pending_close_order(self, symbol: str) -> bool:
         """Return True when there is an unfilled reduce-only close order for symbol."""
         try:
-            orders = self.client.get_open_orders(symbol) or []
+            orders = self.account_snapshot.open_orders(symbol)
         except Exception:
             return False
         if not isinstance(orders, list):
@@ -3464,13 +3798,13 @@ class TradingBot:
     def _open_protection_orders(self, symbol: str, side: Optional[str] = None) -> List[Dict[str, Any]]:
         orders: List[Dict[str, Any]] = []
         try:
-            raw_open = self.client.get_open_orders(symbol) or []
+            raw_open = self.account_snapshot.open_orders(symbol)
             if isinstance(raw_open, list):
                 orders.extend([x for x in raw_open if isinstance(x, dict)])
         except Exception:
             pass
         try:
-            raw_cond = self.client.get_open_conditional_orders(symbol) or []
+            raw_cond = self.account_snapshot.conditional_orders(symbol)
             if isinstance(raw_cond, list):
                 orders.extend([x for x in raw_cond if isinstance(x, dict)])
         except Exception:
@@ -3853,99 +4187,82 @@ class TradingBot:
         except Exception:
             return
 
+    @profiled("emergency_flatten")
     def _emergency_flatten_unprotected(
         self,
         symbol: str,
         position: Dict[str, Any],
         reduce_ratio: float = 1.0,
     ) -> Dict[str, Any]:
-        side = str(position.get("side", "")).upper()
-        qty_total = self._to_float(position.get("amount"), 0.0)
-        if side not in ("LONG", "SHORT") or qty_total <= 0:
-            return {"status": "error", "message": f"invalid close input side={side}, qty={qty_total}"}
+        return self.kill_switch.flatten_position(
+            symbol,
+            str(position.get("side", "")).upper(),
+            self._to_float(position.get("amount"), 0.0),
+            reduce_ratio=reduce_ratio,
+            confirm_closed=self._position_closed,
+        )
 
-        try:
-            ratio = float(reduce_ratio)
-        except Exception:
-            ratio = 1.0
-        ratio = min(1.0, max(0.1, ratio))
-        qty_target = qty_total * ratio
+    def _pretrade_cache(self) -> Optional[Any]:
+        """OrderGateway 的下单前校验缓存（客户端未提供时为 None）"""
+        return getattr(getattr(getattr(self.client, "broker", None), "order", None), "pretrade", None)
 
-        try:
-            qty_target = float(self.client.format_quantity(symbol, qty_target))
-        except Exception:
-            pass
-        if qty_target <= 0:
-            return {"status": "error", "message": f"invalid close qty after format: {qty_target}"}
+    def _position_closed(self, symbol: str) -> bool:
+        return not isinstance(self.position_data.get_current_position(symbol), dict)
 
-        close_side = "SELL" if side == "LONG" else "BUY"
-
-        base_params: Dict[str, Any] = {
-            "symbol": symbol,
-            "type": "MARKET",
-            "quantity": qty_target,
-        }
+    def _dispatch_emergency_flatten(
+        self,
+        symbol: str,
+        side: str,
+        position: Dict[str, Any],
+        reduce_ratio: float,
+        label: str,
+        detail: str,
+        extra: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """把强平交给 kill switch 异步执行，决策循环不等待；结果在工作线程中打印并告警"""
 
-        hedge_mode = False
-        try:
-            hedge_mode = bool(self.client.broker.get_hedge_mode())
-        except Exception:
-            hedge_mode = False
+        def _on_done(close_res: Dict[str, Any]) -> None:
+            print(
+                f"   🧯 {symbol}({side}) {label}: status={close_res.get('status')} "
+                f"latency={close_res.get('latency_ms')}ms "
+                f"detail={close_res.get('message') or close_res.get('order')}"
+            )
+            self._emit_protection_sla_alert(
+                symbol=symbol,
+                side=side,
+                detail=detail,
+                extra={**(extra or {}), "flatten": close_res},
+            )
 
-        candidates: List[Tuple[str, Dict[str, Any], bool]] = []
-        if ratio >= 0.999:
-            p_close = dict(base_params)
-            p_close["closePosition"] = True
-            if hedge_mode:
-                p_close["positionSide"] = side
-            candidates.append(("close_position", p_close, True))
-
-        p_reduce = dict(base_params)
-        if hedge_mode:
-            p_reduce["positionSide"] = side
-        candidates.append(("reduce_only_market", p_reduce, True))
-
-        if hedge_mode:
-            # 兜底：部分账户/模式下 positionSide 可能导致拒单，提供无 positionSide 变体
-            if ratio >= 0.999:
-                p_close_no_ps = dict(base_params)
-                p_close_no_ps["closePosition"] = True
-                candidates.append(("close_position_no_ps", p_close_no_ps, True))
-            p_reduce_no_ps = dict(base_params)
-            candidates.append(("reduce_only_market_no_ps", p_reduce_no_ps, True))
-
-        errors: List[str] = []
-        for mode, params, reduce_only in candidates:
-            try:
-                order = self.client._execute_order_v2(
-                    params=params,
-                    side=close_side,
-                    reduce_only=reduce_only,
-                )
-                if isinstance(order, dict):
-                    code = order.get("code")
-                    if isinstance(code, (int, float)) and float(code) < 0:
-                        errors.append(f"{mode}: code={code}, msg={order.get('msg')}")
-                        continue
-                    if order.get("orderId") is not None:
-                        return {"status": "success", "order": order, "mode": mode}
-                    if str(order.get("status", "")).lower() == "success":
-                        return {"status": "success", "order": order, "mode": mode}
-
-                # 若返回结构不标准，二次确认仓位是否已消失，避免误判。
-                latest_pos = self.position_data.get_current_position(symbol)
-                if not isinstance(latest_pos, dict):
-                    return {
-                        "status": "success",
-                        "order": order,
-                        "mode": mode,
-                        "message": "position closed after emergency request",
-                    }
-                errors.append(f"{mode}: unexpected response={order}")
-            except Exception as e:
-                errors.append(f"{mode}: {e}")
+        self.kill_switch.submit(
+            symbol,
+            str(position.get("side", "")).upper(),
+            self._to_float(position.get("amount"), 0.0),
+            reduce_ratio=reduce_ratio,
+            confirm_closed=self._position_closed,
+            callback=_on_done,
+        )
 
-        return {"status": "error", "message": " | ".join(errors)[:1200]}
+    def _kill_switch_flatten_all(self, reason: str) -> Dict[str, Any]:
+        """账户级熔断：并发强平全部持仓并撤销其挂单"""
+        try:
+            self.account_snapshot.invalidate()
+            positions = self.position_data.get_all_positions()
+        except Exception as e:
+            print(f"⚠️ Kill switch 获取持仓失败: {e}")
+            return {"reason": reason, "closed": 0, "failed": 0, "results": {}}
+        targets: List[Dict[str, Any]] = []
+        for symbol, pos in positions.items():
+            legs = pos.get("legs") if isinstance(pos.get("legs"), list) else None
+            if legs:
+                for leg in legs:
+                    targets.append({"symbol": symbol, "side": leg.get("side"), "amount": leg.get("amount")})
+            else:
+                targets.append({"symbol": symbol, "side": pos.get("side"), "amount": pos.get("amount")})
+        if not targets:
+            return {"reason": reason, "closed": 0, "failed": 0, "results": {}}
+        print(f"🚨 Kill switch 触发 reason={reason}: 并发强平 {len(targets)} 个持仓腿")
+        return self.kill_switch.flatten_all(targets, reason=reason, confirm_closed=self._position_closed)
 
     def _decision_signal_score(self, decision: Any) -> float:
         md = decision.metadata if isinstance(getattr(decision, "metadata", None), dict) else {}
@@ -3995,6 +4312,7 @@ class TradingBot:
             self._dca_stage_by_pos[pos_key] = stage
             self._save_risk_state()
 
+    @profiled("stale_protection_cleanup")
     def _cleanup_stale_protection_orders(self, symbols: List[str]) -> None:
         cfg = self._stale_protection_cleanup_config()
         if not bool(cfg.get("enabled", True)):
@@ -4043,6 +4361,7 @@ class TradingBot:
         if cleaned_symbols > 0:
             print(f"🧹 无持仓保护单清理完成: symbols={cleaned_symbols}, orders~={cleaned_orders}")
 
+    @profiled("order_execution")
     def _execute_and_log_decision(
         self,
         *,
@@ -4074,6 +4393,10 @@ class TradingBot:
             print(f"⏭️ {symbol} 存在待成交平仓单，跳过重复平仓下发")
             return
 
+        pretrade = self._pretrade_cache()
+        if pretrade is not None:
+            # 决策 -> 下单提交 延迟起点；决策价格作为下单前校验的标记价格候选
+            pretrade.mark_decision(symbol, price=current_price)
         execution_result = self.fund_flow_execution_router.execute_decision(
             decision=decision,
             account_state=account_summary,
@@ -4562,9 +4885,41 @@ class TradingBot:
         self._run_cycle_impl(allow_new_entries=allow_new_entries, ai_review_mode=ai_review_mode)
 
     def _run_cycle_impl(self, allow_new_entries: bool = True, ai_review_mode: str = "disabled") -> None:
-        context = self._prepare_cycle_context(allow_new_entries=allow_new_entries, ai_review_mode=ai_review_mode)
+        self.profiler.begin_cycle(label=str(ai_review_mode or "disabled"))
+        self.account_snapshot.begin_cycle()
+        cycle_stats: Dict[str, Any] = {"allow_new_entries": bool(allow_new_entries)}
+        try:
+            self._run_cycle_phases(
+                allow_new_entries=allow_new_entries,
+                ai_review_mode=ai_review_mode,
+                cycle_stats=cycle_stats,
+            )
+        finally:
+            flattened = self.kill_switch.drain()
+            if flattened:
+                cycle_stats["kill_switch"] = [
+                    {"symbol": r.get("symbol"), "status": r.get("status"), "latency_ms": r.get("latency_ms")}
+                    for r in flattened
+                ]
+            self.account_snapshot.end_cycle()
+            cycle_stats["account_snapshot"] = self.account_snapshot.get_stats()
+            pretrade = self._pretrade_cache()
+            if pretrade is not None:
+                cycle_stats["pretrade"] = pretrade.get_stats()
+            self.fund_flow_attribution_engine.flush()
+            self.profiler.end_cycle(extra=cycle_stats)
+
+    def _run_cycle_phases(
+        self,
+        allow_new_entries: bool,
+        ai_review_mode: str,
+        cycle_stats: Dict[str, Any],
+    ) -> None:
+        with self.profiler.span("prepare_context"):
+            context = self._prepare_cycle_context(allow_new_entries=allow_new_entries, ai_review_mode=ai_review_mode)
         if context is None:
             return
+        self._prefetch_cycle_ai_weights(context)
 
         symbols_raw = context.get("symbols")
         symbols = symbols_raw if isinstance(symbols_raw, list) else []
@@ -4581,8 +4936,11 @@ class TradingBot:
                         f"processed={idx}/{len(symbols)}"
                     )
                     break
-            self._process_symbol(symbol=symbol, idx=idx, context=context)
+            with self.profiler.span("symbol"):
+                self._process_symbol(symbol=symbol, idx=idx, context=context)
+            cycle_stats["symbols_processed"] = idx + 1
 
+        cycle_stats["symbols_total"] = len(symbols)
         self._finalize_entries(context=context)
 
     def _prepare_cycle_context(
@@ -4623,7 +4981,7 @@ class TradingBot:
         protection_gap_symbols: List[str] = []
         repair_fail_reduce_ratio = 1.0
         immediate_close_on_repair_fail = bool(sla_cfg.get("immediate_close_on_repair_fail", False))
-        all_symbols = ConfigLoader.get_trading_symbols(self.config)
+        all_symbols = self._trading_symbols()
         position_snapshot = self._position_snapshot_by_symbol(all_symbols)
         if allow_new_entries:
             symbols = self._symbols_for_current_cycle(all_symbols, set(position_snapshot.keys()))
@@ -4641,12 +4999,19 @@ class TradingBot:
                 print("⏭️ 非开仓窗口且当前无持仓，跳过本轮。")
                 return
             print(f"📌 非开仓窗口仅检查持仓: {', '.join(symbols)}")
-        account_summary = self.account_data.get_account_summary()
+            # 持仓复核窗口：按上次上下文提前刷新持仓标的的 AI 权重（stale-while-revalidate）
+            try:
+                self.fund_flow_decision_engine.deepseek_router.refresh_ahead(symbols)
+            except Exception as e:
+                print(f"⚠️ AI权重提前刷新失败: {e}")
+        with self.profiler.span("account_fetch"):
+            account_summary = self.account_data.get_account_summary()
         if not account_summary:
             print("⚠️ 账户信息不可用，跳过本轮")
             return
         risk_guard = self._refresh_account_risk_guard(account_summary)
         risk_guard_enabled = bool(risk_guard.get("enabled", True))
+        self._maybe_trip_kill_switch(risk_guard)
         if risk_guard.get("blocked"):
             print(
                 "⏳ 账户级风控冷却中："
@@ -4688,7 +5053,7 @@ class TradingBot:
         symbol_stagger_seconds = max(0.0, self._to_float(context.get("symbol_stagger_seconds"), 0.0))
         now_ts = self._to_float(context.get("now_ts"), time.time())
         sla_cfg_raw = context.get("sla_cfg")
-        sla_cfg = sla_cfg_raw if isinstance(sla_cfg_raw, dict) else {}
+        sla_cfg = sla_cfg_raw if isinstance(sla_cfg_raw, Mapping) else {}
         ff_cfg_raw = context.get("ff_cfg")
         ff_cfg = ff_cfg_raw if isinstance(ff_cfg_raw, dict) else {}
         ai_review_cfg_raw = context.get("ai_review_cfg")
@@ -4722,8 +5087,10 @@ class TradingBot:
         block_new_entries_due_to_protection_gap = bool(
             context.get("block_new_entries_due_to_protection_gap", False)
         )
+        prebuilt_inputs = context.get("prebuilt_inputs")
 
         return {
+            "prebuilt_inputs": prebuilt_inputs if isinstance(prebuilt_inputs, dict) else {},
             "symbols": symbols,
             "symbol_stagger_seconds": symbol_stagger_seconds,
             "now_ts": now_ts,
@@ -4746,13 +5113,14 @@ class TradingBot:
         }
 
 
+    @profiled("protection_sla")
     def _handle_symbol_protection_and_sla(
         self,
         symbol: str,
         position: Any,
         current_price: float,
         now_ts: float,
-        sla_cfg: Dict[str, Any],
+        sla_cfg: Mapping[str, Any],
         repair_fail_reduce_ratio: float,
         immediate_close_on_repair_fail: bool,
         block_new_entries_due_to_protection_gap: bool,
@@ -4828,20 +5196,14 @@ class TradingBot:
             
                     if str(repair.get("status", "")).lower() != "success":
                         if immediate_close_on_repair_fail:
-                            close_res = self._emergency_flatten_unprotected(
+                            self._dispatch_emergency_flatten(
                                 symbol,
+                                side,
                                 leg_position,
                                 reduce_ratio=repair_fail_reduce_ratio,
-                            )
-                            print(
-                                f"   🧯 ({side}) 保护单补挂失败，触发强制减仓/平仓(ratio={repair_fail_reduce_ratio:.2f}): "
-                                f"status={close_res.get('status')} detail={close_res.get('message') or close_res.get('order')}"
-                            )
-                            self._emit_protection_sla_alert(
-                                symbol=symbol,
-                                side=side,
+                                label=f"保护单补挂失败，触发强制减仓/平仓(ratio={repair_fail_reduce_ratio:.2f})",
                                 detail="protection_repair_failed_immediate_flatten",
-                                extra={"repair": repair, "flatten": close_res},
+                                extra={"repair": repair},
                             )
                             continue
                         print(f"   ⚠️ ({side}) 保护单补挂失败，已按配置跳过立即强平，继续SLA监控")
@@ -4886,20 +5248,13 @@ class TradingBot:
                             )
             
                         if bool(sla_cfg.get("force_flatten_on_breach", True)):
-                            close_res = self._emergency_flatten_unprotected(
+                            self._dispatch_emergency_flatten(
                                 symbol,
+                                side,
                                 leg_position,
                                 reduce_ratio=repair_fail_reduce_ratio,
-                            )
-                            print(
-                                f"   🧯 ({side}) SLA超时强平: status={close_res.get('status')} "
-                                f"detail={close_res.get('message') or close_res.get('order')}"
-                            )
-                            self._emit_protection_sla_alert(
-                                symbol=symbol,
-                                side=side,
+                                label="SLA超时强平",
                                 detail="protection_sla_force_flatten",
-                                extra={"flatten": close_res},
                             )
                 continue
             
@@ -4945,20 +5300,14 @@ class TradingBot:
             
                 if str(repair.get("status", "")).lower() != "success":
                     if immediate_close_on_repair_fail:
-                        close_res = self._emergency_flatten_unprotected(
+                        self._dispatch_emergency_flatten(
                             symbol,
+                            side,
                             position,
                             reduce_ratio=repair_fail_reduce_ratio,
-                        )
-                        print(
-                            f"   🧯 保护单补挂失败，触发强制减仓/平仓(ratio={repair_fail_reduce_ratio:.2f}): "
-                            f"status={close_res.get('status')} detail={close_res.get('message') or close_res.get('order')}"
-                        )
-                        self._emit_protection_sla_alert(
-                            symbol=symbol,
-                            side=side,
+                            label=f"保护单补挂失败，触发强制减仓/平仓(ratio={repair_fail_reduce_ratio:.2f})",
                             detail="protection_repair_failed_immediate_flatten",
-                            extra={"repair": repair, "flatten": close_res},
+                            extra={"repair": repair},
                         )
                         continue
                     print("   ⚠️ 保护单补挂失败，已按配置跳过立即强平，继续SLA监控")
@@ -5003,20 +5352,13 @@ class TradingBot:
                         )
             
                     if bool(sla_cfg.get("force_flatten_on_breach", True)):
-                        close_res = self._emergency_flatten_unprotected(
+                        self._dispatch_emergency_flatten(
                             symbol,
+                            side,
                             position,
                             reduce_ratio=repair_fail_reduce_ratio,
-                        )
-                        print(
-                            f"   🧯 SLA超时强平: status={close_res.get('status')} "
-                            f"detail={close_res.get('message') or close_res.get('order')}"
-                        )
-                        self._emit_protection_sla_alert(
-                            symbol=symbol,
-                            side=side,
+                            label="SLA超时强平",
                             detail="protection_sla_force_flatten",
-                            extra={"flatten": close_res},
                         )
                 # 风险修复优先，本轮不再对该 symbol 发起新决策
                 continue
@@ -5024,6 +5366,83 @@ class TradingBot:
 
         return (not completed_without_skip), block_new_entries_due_to_protection_gap
 
+    def _inject_symbol_confluence(self, symbol: str, flow_context: Dict[str, Any]) -> Dict[str, Any]:
+        """计算并注入 MA10+MACD/KDJ/布林 帧内特征，返回特征（未启用或失败时为空）"""
+        confluence_cfg = self._ma10_macd_confluence_config()
+        confluence: Dict[str, Any] = {}
+        if not bool(confluence_cfg.get("enabled", True)):
+            return confluence
+        try:
+            confluence = self._compute_ma10_macd_confluence(symbol, confluence_cfg)
+            self._inject_confluence_into_flow_context(flow_context, confluence, confluence_cfg)
+        except Exception as e:
+            print(f"⚠️ {symbol} MA10+MACD/KDJ/布林 帧内特征注入失败: {e}")
+        return confluence
+
+    def _build_symbol_flow_inputs(
+        self,
+        symbol: str,
+        market_data: Dict[str, Any],
+        with_confluence: bool,
+    ) -> Dict[str, Any]:
+        """单个标的的资金流上下文（决策输入）；with_confluence=True 时同时注入帧内特征"""
+        raw_flow_context = self._build_fund_flow_context(symbol, market_data)
+        flow_snapshot = self.fund_flow_ingestion_service.aggregate_from_metrics(symbol=symbol, metrics=raw_flow_context)
+        flow_context = self._apply_timeframe_context(raw_flow_context, flow_snapshot)
+        return {
+            "market_data": market_data,
+            "flow_snapshot": flow_snapshot,
+            "flow_context": flow_context,
+            "confluence": self._inject_symbol_confluence(symbol, flow_context) if with_confluence else None,
+        }
+
+    @profiled("ai_prefetch")
+    def _prefetch_cycle_ai_weights(self, context: Dict[str, Any]) -> None:
+        """
+        周期开始时为本轮需要 AI 权重的全部候选构建决策上下文并并发预取权重
+
+        持仓复核窗口（positions）预取持仓标的，空仓候选窗口（flat_candidates）预取全部本轮标的；
+        其余窗口不请求 AI 权重，不预取。构建好的上下文放入 context["prebuilt_inputs"]，
+        逐个标的处理时直接复用，保证预取与决策使用同一份上下文（调度 key 一致）。
+        """
+        mode = str(context.get("ai_review_mode") or "disabled").lower()
+        if mode not in ("positions", "flat_candidates") or not bool(context.get("ai_gate_enabled", False)):
+            return
+        ai_review_cfg = context.get("ai_review_cfg") if isinstance(context.get("ai_review_cfg"), dict) else {}
+        if mode == "positions" and not bool(ai_review_cfg.get("enabled", True)):
+            return
+        engine = self.fund_flow_decision_engine
+        router = getattr(engine, "deepseek_router", None)
+        if router is None or not (router.enabled and router.ai_enabled):
+            return
+        symbols = context.get("symbols") if isinstance(context.get("symbols"), list) else []
+        position_snapshot = context.get("position_snapshot") if isinstance(context.get("position_snapshot"), dict) else {}
+        if mode == "positions":
+            symbols = [s for s in symbols if s in position_snapshot]
+        prebuilt_inputs: Dict[str, Dict[str, Any]] = context.setdefault("prebuilt_inputs", {})
+        items: List[Dict[str, Any]] = []
+        for symbol in symbols:
+            try:
+                market_data = self.get_market_data_for_symbol(symbol)
+                if self._to_float((market_data.get("realtime") or {}).get("price"), 0.0) <= 0:
+                    continue
+                inputs = self._build_symbol_flow_inputs(symbol, market_data, with_confluence=True)
+            except Exception as e:
+                print(f"⚠️ {symbol} 预取上下文构建失败: {e}")
+                continue
+            prebuilt_inputs[symbol] = inputs
+            items.append({"symbol": symbol, "market_flow_context": inputs["flow_context"]})
+        if not items:
+            return
+        try:
+            gate = "position_review" if mode == "positions" else "final"
+            prefetched = engine.prefetch_ai_weights(items, ai_gate=gate)
+            if prefetched:
+                print(f"🤖 AI权重并发预取({mode}): {prefetched} 个标的")
+        except Exception as e:
+            print(f"⚠️ AI权重预取失败: {e}")
+
+    @profiled("signal_decision")
     def _execute_symbol_signal_decision(
         self,
         symbol: str,
@@ -5042,11 +5461,13 @@ class TradingBot:
         risk_guard_enabled: bool,
         ai_review_mode: str = "disabled",
         ai_review_cfg: Optional[Dict[str, Any]] = None,
+        prebuilt: Optional[Dict[str, Any]] = None,
     ) -> None:
         for _ in (0,):
-            raw_flow_context = self._build_fund_flow_context(symbol, market_data)
-            flow_snapshot = self.fund_flow_ingestion_service.aggregate_from_metrics(symbol=symbol, metrics=raw_flow_context)
-            flow_context = self._apply_timeframe_context(raw_flow_context, flow_snapshot)
+            if prebuilt is None:
+                prebuilt = self._build_symbol_flow_inputs(symbol, market_data, with_confluence=False)
+            flow_snapshot = prebuilt["flow_snapshot"]
+            flow_context = prebuilt["flow_context"]
             volatility_guard = self._update_extreme_volatility_state(symbol, flow_context)
             
             self._safe_storage_call(
@@ -5090,14 +5511,9 @@ class TradingBot:
             }
             trigger_context = {"trigger_type": trigger_type, "signal_pool_id": None}
 
-            confluence_cfg = self._ma10_macd_confluence_config()
-            confluence: Dict[str, Any] = {}
-            if bool(confluence_cfg.get("enabled", True)):
-                try:
-                    confluence = self._compute_ma10_macd_confluence(symbol, confluence_cfg)
-                    self._inject_confluence_into_flow_context(flow_context, confluence, confluence_cfg)
-                except Exception as e:
-                    print(f"⚠️ {symbol} MA10+MACD/KDJ/布林 帧内特征注入失败: {e}")
+            confluence = prebuilt.get("confluence")
+            if confluence is None:
+                confluence = self._inject_symbol_confluence(symbol, flow_context)
             
             decision = self.fund_flow_decision_engine.decide(
                 symbol=symbol,
@@ -5226,35 +5642,7 @@ class TradingBot:
                 dynamic_pool_id = selected_pool_id or "range_quantile_pool"
                 trigger_context["signal_pool_id"] = dynamic_pool_id
                 # RANGE 开仓由 DecisionEngine 分位数门控决定；这里仅保留冷却去抖。
-                selected_pool_cfg = {
-                    "enabled": True,
-                    "pool_id": dynamic_pool_id,
-                    "id": dynamic_pool_id,
-                    "logic": "OR",
-                    "min_pass_count": 1,
-                    "min_long_score": 0.0,
-                    "min_short_score": 0.0,
-                    "scheduled_trigger_bypass": False,
-                    "apply_when_position_exists": False,
-                    "edge_trigger_enabled": True,
-                    "edge_cooldown_seconds": edge_cd,
-                    "rules": [
-                        {
-                            "name": "range_dynamic_long_gate",
-                            "side": "LONG",
-                            "metric": "long_score",
-                            "operator": ">=",
-                            "threshold": 0.0,
-                        },
-                        {
-                            "name": "range_dynamic_short_gate",
-                            "side": "SHORT",
-                            "metric": "short_score",
-                            "operator": ">=",
-                            "threshold": 0.0,
-                        },
-                    ],
-                }
+                selected_pool_cfg = self._range_dynamic_pool_config(dynamic_pool_id, edge_cd)
             else:
                 selected_pool_cfg = runtime_pool_cfg if isinstance(runtime_pool_cfg, dict) else {}
                 if isinstance(selected_pool_cfg, dict) and selected_pool_cfg:
@@ -5970,7 +6358,7 @@ class TradingBot:
         symbol_stagger_seconds = max(0.0, self._to_float(symbol_ctx.get("symbol_stagger_seconds"), 0.0))
         now_ts = self._to_float(symbol_ctx.get("now_ts"), time.time())
         sla_cfg_raw = symbol_ctx.get("sla_cfg")
-        sla_cfg = sla_cfg_raw if isinstance(sla_cfg_raw, dict) else {}
+        sla_cfg = sla_cfg_raw if isinstance(sla_cfg_raw, Mapping) else {}
         ff_cfg_raw = symbol_ctx.get("ff_cfg")
         ff_cfg = ff_cfg_raw if isinstance(ff_cfg_raw, dict) else {}
         ai_review_cfg_raw = symbol_ctx.get("ai_review_cfg")
@@ -5999,9 +6387,11 @@ class TradingBot:
             symbol_ctx.get("block_new_entries_due_to_protection_gap", False)
         )
 
+        prebuilt_inputs = symbol_ctx.get("prebuilt_inputs") if isinstance(symbol_ctx.get("prebuilt_inputs"), dict) else {}
+        prebuilt = prebuilt_inputs.pop(symbol, None)
         for _ in (0,):
             try:
-                market_data = self.get_market_data_for_symbol(symbol)
+                market_data = prebuilt["market_data"] if prebuilt else self.get_market_data_for_symbol(symbol)
                 realtime = market_data.get("realtime", {})
                 current_price = self._to_float(realtime.get("price"), 0.0)
                 if current_price <= 0:
@@ -6047,6 +6437,7 @@ class TradingBot:
                     risk_guard_enabled=risk_guard_enabled,
                     ai_review_mode=ai_review_mode,
                     ai_review_cfg=ai_review_cfg,
+                    prebuilt=prebuilt,
                 )
             except Exception as e:
                 print(f"❌ {symbol} 处理异常: {e}")
@@ -6074,6 +6465,7 @@ class TradingBot:
         self._process_symbol_core(symbol, idx, symbol_ctx)
         self._finalize_symbol_context(context, symbol_ctx)
 
+    @profiled("finalize_entries")
     def _finalize_entries(self, context: Dict[str, Any]) -> None:
         pending_new_entries_raw = context.get("pending_new_entries")
         pending_new_entries = pending_new_entries_raw if isinstance(pending_new_entries_raw, list) else []
@@ -6128,6 +6520,28 @@ class TradingBot:
                         f"🤖 空仓AI入围Top{len(shortlist_parts)}: "
                         + " | ".join(shortlist_parts)
                     )
+                # 入围候选并发预取 AI 权重，逐个复核时直接取结果
+                prefetch_items: List[Dict[str, Any]] = []
+                for item in pending_new_entries:
+                    decision_i_raw = item.get("decision")
+                    regime_i = (
+                        decision_i_raw.metadata.get("regime")
+                        if isinstance(decision_i_raw, FundFlowDecision) and isinstance(decision_i_raw.metadata, dict)
+                        else None
+                    )
+                    prefetch_items.append(
+                        {
+                            "symbol": item.get("symbol"),
+                            "regime": regime_i,
+                            "market_flow_context": item.get("flow_context") if isinstance(item.get("flow_context"), dict) else {},
+                        }
+                    )
+                try:
+                    prefetched = self.fund_flow_decision_engine.prefetch_ai_weights(prefetch_items, ai_gate="final")
+                    if prefetched:
+                        print(f"🤖 AI权重并发预取: {prefetched} 个标的")
+                except Exception as e:
+                    print(f"⚠️ AI权重预取失败: {e}")
             active_symbols_estimate: set[str] = set()
             try:
                 active_positions = self.position_data.get_all_positions()
@@ -6136,6 +6550,9 @@ class TradingBot:
             except Exception:
                 active_symbols_estimate = set()
             active_symbols_estimate.update(str(s).upper() for s in self._opened_symbols_this_cycle)
+            if self.shard_client is not None:
+                # 持仓列表是全账户的，同步给协调进程作为名额占用基线
+                self.shard_client.call("sync_positions", sorted(active_symbols_estimate))
             for rank, item in enumerate(pending_new_entries, start=1):
                 active_count = len(active_symbols_estimate)
                 item_max_active_symbols = max(
@@ -6227,6 +6644,16 @@ class TradingBot:
                             f"🤖 {symbol_i} 未进入AI终审: rank={rank} "
                             f"local={decision_i.operation.value.upper()} score={local_score:.3f}"
                         )
+                slot_symbol = str(item.get("symbol") or "").upper()
+                if self.shard_client is not None and not self.shard_client.call(
+                    "reserve_slot", slot_symbol, item_max_active_symbols
+                ):
+                    print(
+                        f"⏭️ {item.get('symbol')} 候选开仓被跳过："
+                        f"账户名额已被其他分片占满(max={item_max_active_symbols})，"
+                        f"候选排名={rank}, score={float(item.get('score', 0.0)):.3f}"
+                    )
+                    continue
                 self._execute_and_log_decision(
                     symbol=symbol_i,
                     decision=decision_i,
@@ -6242,6 +6669,8 @@ class TradingBot:
                 item_symbol = str(item.get("symbol") or "").upper()
                 if item_symbol and item_symbol in {str(s).upper() for s in self._opened_symbols_this_cycle}:
                     active_symbols_estimate.add(item_symbol)
+                elif self.shard_client is not None:
+                    self.shard_client.call("release_slot", slot_symbol)
 
 
         context["pending_new_entries"] = pending_new_entries
@@ -6253,104 +6682,113 @@ class TradingBot:
             start = time.time()
             alignment_active = self._is_kline_alignment_active()
             tf_seconds = self._decision_timeframe_seconds() or 0
-            symbols_all = ConfigLoader.get_trading_symbols(self.config)
-            has_position = bool(self._position_snapshot_by_symbol(symbols_all))
-            ai_review_cfg = self._ai_review_config()
-            position_tf_seconds = int(ai_review_cfg.get("position_timeframe_seconds", 300))
-            flat_tf_seconds = int(ai_review_cfg.get("flat_timeframe_seconds", tf_seconds or 900))
-            now_utc = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
-            if has_position:
-                position_review_due = self._should_allow_aligned_cycle(
-                    bucket_key="position_review",
-                    timeframe_seconds=position_tf_seconds,
-                    now_ts=start,
-                )
-                if position_review_due:
-                    print(
-                        f"\n=== FUND_FLOW cycle {cycles + 1} @ {now_utc} UTC === "
-                        f"[mode=POSITION_AI_REVIEW, kline_align={'ON' if alignment_active else 'OFF'}"
-                        f", tf={int(position_tf_seconds)}s]"
-                    )
-                    try:
-                        self.run_cycle(allow_new_entries=False, ai_review_mode="positions")
-                    except Exception as e:
-                        print(f"❌ run_cycle 异常: {e}")
-                else:
-                    print(
-                        f"\n=== FUND_FLOW cycle {cycles + 1} @ {now_utc} UTC === "
-                        f"[mode=WAIT_POSITION_AI, kline_align={'ON' if alignment_active else 'OFF'}"
-                        f", tf={int(position_tf_seconds)}s]"
-                    )
-                    next_fire = datetime.now(timezone.utc) + timedelta(
-                        seconds=self._aligned_sleep_seconds_for(position_tf_seconds)
-                    )
-                    print(
-                        "⏭️ 当前有持仓，等待下一次 5m AI 持仓复核窗口。"
-                        f" 下次复核(UTC)≈{next_fire.strftime('%Y-%m-%d %H:%M:%S')}"
-                    )
-            else:
-                allow_new_entries = self._should_allow_entries_this_cycle(start)
-                flat_review_due = self._should_allow_aligned_cycle(
-                    bucket_key="flat_ai_review",
-                    timeframe_seconds=flat_tf_seconds,
-                    now_ts=start,
-                )
-                if allow_new_entries and flat_review_due:
-                    print(
-                        f"\n=== FUND_FLOW cycle {cycles + 1} @ {now_utc} UTC === "
-                        f"[mode=OPEN_WINDOW_AI_TOP2, kline_align={'ON' if alignment_active else 'OFF'}"
-                        f"{', tf=' + str(int(tf_seconds)) + 's' if alignment_active else ''}]"
-                    )
-                    try:
-                        self.run_cycle(allow_new_entries=True, ai_review_mode="flat_candidates")
-                    except Exception as e:
-                        print(f"❌ run_cycle 异常: {e}")
-                else:
-                    print(
-                        f"\n=== FUND_FLOW cycle {cycles + 1} @ {now_utc} UTC === "
-                        f"[mode=WAIT_OPEN_AI, kline_align={'ON' if alignment_active else 'OFF'}"
-                        f"{', tf=' + str(int(flat_tf_seconds)) + 's' if alignment_active else ''}]"
-                    )
-                    next_fire = datetime.now(timezone.utc) + timedelta(
-                        seconds=self._aligned_sleep_seconds_for(flat_tf_seconds)
-                    )
-                    print(
-                        "⏭️ 当前无持仓，等待下一次 15m AI 开仓复核窗口。"
-                        f" 下次开仓窗口(UTC)≈{next_fire.strftime('%Y-%m-%d %H:%M:%S')}"
-                    )
-            cycles += 1
-            schedule_cfg = self.config.get("schedule", {}) or {}
-            interval_seconds = max(1, int(schedule_cfg.get("interval_seconds", 60) or 60))
-            max_cycles = int(schedule_cfg.get("max_cycles", 0) or 0)
-            if max_cycles > 0 and cycles >= max_cycles:
-                print("✅ 达到 max_cycles，退出。")
-                return
-
-            elapsed = time.time() - start
-            base_sleep_seconds = max(0.0, interval_seconds - elapsed)
-            sleep_seconds = base_sleep_seconds
-            if alignment_active:
-                post_has_position = bool(self._position_snapshot_by_symbol(symbols_all))
-                if post_has_position:
-                    sleep_seconds = self._aligned_sleep_seconds_for(position_tf_seconds)
-                    now_utc = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
-                    print(
-                        f"⏳ 调度等待(持仓AI): utc_now={now_utc}, sleep={sleep_seconds:.2f}s "
-                        f"(next_5m_review)"
+            symbols_all = self._trading_symbols()
+            # 调度判断与本轮 run_cycle 共用同一账户快照（run_cycle 内层周期不清空），避免空闲直通重复拉 positionRisk
+            self.account_snapshot.begin_cycle()
+            try:
+                positions_now = self._position_snapshot_by_symbol(symbols_all)
+                has_position = bool(positions_now)
+                if self.fill_ingestor is not None:
+                    # 持仓中的 symbol 可能被 TP/SL 条件单成交，成交同步按常规间隔轮询
+                    self.fill_ingestor.set_held_symbols(positions_now.keys())
+                ai_review_cfg = self._ai_review_config()
+                position_tf_seconds = int(ai_review_cfg.get("position_timeframe_seconds", 300))
+                flat_tf_seconds = int(ai_review_cfg.get("flat_timeframe_seconds", tf_seconds or 900))
+                now_utc = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+                if has_position:
+                    position_review_due = self._should_allow_aligned_cycle(
+                        bucket_key="position_review",
+                        timeframe_seconds=position_tf_seconds,
+                        now_ts=start,
                     )
+                    if position_review_due:
+                        print(
+                            f"\n=== FUND_FLOW cycle {cycles + 1} @ {now_utc} UTC === "
+                            f"[mode=POSITION_AI_REVIEW, kline_align={'ON' if alignment_active else 'OFF'}"
+                            f", tf={int(position_tf_seconds)}s]"
+                        )
+                        try:
+                            self.run_cycle(allow_new_entries=False, ai_review_mode="positions")
+                        except Exception as e:
+                            print(f"❌ run_cycle 异常: {e}")
+                    else:
+                        print(
+                            f"\n=== FUND_FLOW cycle {cycles + 1} @ {now_utc} UTC === "
+                            f"[mode=WAIT_POSITION_AI, kline_align={'ON' if alignment_active else 'OFF'}"
+                            f", tf={int(position_tf_seconds)}s]"
+                        )
+                        next_fire = datetime.now(timezone.utc) + timedelta(
+                            seconds=self._aligned_sleep_seconds_for(position_tf_seconds)
+                        )
+                        print(
+                            "⏭️ 当前有持仓，等待下一次 5m AI 持仓复核窗口。"
+                            f" 下次复核(UTC)≈{next_fire.strftime('%Y-%m-%d %H:%M:%S')}"
+                        )
                 else:
-                    sleep_seconds = self._aligned_sleep_seconds_for(flat_tf_seconds)
-                    now_utc = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
-                    print(
-                        f"⏳ 调度等待(空仓AI): utc_now={now_utc}, sleep={sleep_seconds:.2f}s "
-                        f"(next_15m_review)"
-                    )
-                    next_fire = datetime.now(timezone.utc) + timedelta(seconds=sleep_seconds)
-                    print(
-                        "⏳ 调度等待(无持仓): "
-                        f"next_open_window(UTC)={next_fire.strftime('%Y-%m-%d %H:%M:%S')}, "
-                        f"sleep={sleep_seconds:.2f}s"
+                    allow_new_entries = self._should_allow_entries_this_cycle(start)
+                    flat_review_due = self._should_allow_aligned_cycle(
+                        bucket_key="flat_ai_review",
+                        timeframe_seconds=flat_tf_seconds,
+                        now_ts=start,
                     )
+                    if allow_new_entries and flat_review_due:
+                        print(
+                            f"\n=== FUND_FLOW cycle {cycles + 1} @ {now_utc} UTC === "
+                            f"[mode=OPEN_WINDOW_AI_TOP2, kline_align={'ON' if alignment_active else 'OFF'}"
+                            f"{', tf=' + str(int(tf_seconds)) + 's' if alignment_active else ''}]"
+                        )
+                        try:
+                            self.run_cycle(allow_new_entries=True, ai_review_mode="flat_candidates")
+                        except Exception as e:
+                            print(f"❌ run_cycle 异常: {e}")
+                    else:
+                        print(
+                            f"\n=== FUND_FLOW cycle {cycles + 1} @ {now_utc} UTC === "
+                            f"[mode=WAIT_OPEN_AI, kline_align={'ON' if alignment_active else 'OFF'}"
+                            f"{', tf=' + str(int(flat_tf_seconds)) + 's' if alignment_active else ''}]"
+                        )
+                        next_fire = datetime.now(timezone.utc) + timedelta(
+                            seconds=self._aligned_sleep_seconds_for(flat_tf_seconds)
+                        )
+                        print(
+                            "⏭️ 当前无持仓，等待下一次 15m AI 开仓复核窗口。"
+                            f" 下次开仓窗口(UTC)≈{next_fire.strftime('%Y-%m-%d %H:%M:%S')}"
+                        )
+                cycles += 1
+                schedule_cfg = self.config.get("schedule", {}) or {}
+                interval_seconds = max(1, int(schedule_cfg.get("interval_seconds", 60) or 60))
+                max_cycles = int(schedule_cfg.get("max_cycles", 0) or 0)
+                if max_cycles > 0 and cycles >= max_cycles:
+                    print("✅ 达到 max_cycles，退出。")
+                    return
+
+                elapsed = time.time() - start
+                base_sleep_seconds = max(0.0, interval_seconds - elapsed)
+                sleep_seconds = base_sleep_seconds
+                if alignment_active:
+                    post_has_position = bool(self._position_snapshot_by_symbol(symbols_all))
+                    if post_has_position:
+                        sleep_seconds = self._aligned_sleep_seconds_for(position_tf_seconds)
+                        now_utc = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+                        print(
+                            f"⏳ 调度等待(持仓AI): utc_now={now_utc}, sleep={sleep_seconds:.2f}s "
+                            f"(next_5m_review)"
+                        )
+                    else:
+                        sleep_seconds = self._aligned_sleep_seconds_for(flat_tf_seconds)
+                        now_utc = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+                        print(
+                            f"⏳ 调度等待(空仓AI): utc_now={now_utc}, sleep={sleep_seconds:.2f}s "
+                            f"(next_15m_review)"
+                        )
+                        next_fire = datetime.now(timezone.utc) + timedelta(seconds=sleep_seconds)
+                        print(
+                            "⏳ 调度等待(无持仓): "
+                            f"next_open_window(UTC)={next_fire.strftime('%Y-%m-%d %H:%M:%S')}, "
+                            f"sleep={sleep_seconds:.2f}s"
+                        )
+            finally:
+                self.account_snapshot.end_cycle()
             time.sleep(sleep_seconds)
 
 
@@ -6359,8 +6797,13 @@ def main() -> None:
     parser = argparse.ArgumentParser(description="Fund-flow trading bot")
     parser.add_argument("--config", type=str, default=None, help="配置文件路径")
     parser.add_argument("--once", action="store_true", help="仅执行一个周期")
+    parser.add_argument("--shards", type=int, default=0, help="分片 worker 进程数（>1 时以协调进程 + N 个 worker 运行）")
     args = parser.parse_args()
 
+    if args.shards > 1:
+        run_sharded(config_path=args.config, workers=args.shards)
+        return
+
     bot = TradingBot(config_path=args.config)
     if args.once:
         bot.run_cycle()
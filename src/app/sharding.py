@@ -0,0 +1,642 @@
+"""
+多进程分片运行 (Symbol Sharding)
+
+N 个 worker 进程各自持有一部分交易对，独立执行行情拉取与决策阶段；
+协调进程持有账户级共享资源，worker 通过本地 Unix socket (multiprocessing.connection) 访问:
+1. 交易所请求权重预算：所有 worker 的 REST 请求共用一个令牌桶，并按响应头已用权重退避
+2. 账户级风控：日内亏损/连续亏损冷却只在协调进程计算，熔断强平只分配给一个 worker 执行
+3. max_active_symbols 名额：开仓前向协调进程预占名额，避免多个 worker 同时开仓超限
+4. 下单串行：签名写请求（下单/撤单/改杠杆）持有账户级下单锁，同一账户同一时刻只有一个在途
+
+交易对按 crc32 稳定哈希分片，交易对列表增删时其余交易对不会迁移到别的 worker。
+
+示例:
+    python -m src.app.sharding --config config/trading_config_fund_flow.json --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from multiprocessing.connection import Client, Listener
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+from urllib.parse import urlparse
+from zoneinfo import ZoneInfo
+
+from src.data.bulk_klines import RequestWeightBudget, kline_request_weight
+
+# 交易所文档中的固定请求权重（未列出的按 1 计）
+PATH_WEIGHTS: Dict[str, int] = {
+    "/fapi/v2/account": 5,
+    "/fapi/v3/account": 5,
+    "/fapi/v2/balance": 5,
+    "/fapi/v3/balance": 5,
+    "/fapi/v2/positionRisk": 5,
+    "/fapi/v3/positionRisk": 5,
+    "/fapi/v1/allOrders": 5,
+    "/fapi/v1/userTrades": 5,
+    "/fapi/v1/income": 30,
+    "/papi/v1/account": 20,
+    "/papi/v1/balance": 20,
+    "/papi/v1/um/account": 5,
+    "/papi/v1/um/positionRisk": 5,
+    "/papi/v1/um/userTrades": 5,
+    "/papi/v1/um/allOrders": 5,
+}
+# 不带 symbol 时权重大幅上升的接口
+NO_SYMBOL_WEIGHTS: Dict[str, int] = {
+    "/fapi/v1/openOrders": 40,
+    "/papi/v1/um/openOrders": 40,
+    "/papi/v1/um/conditional/openOrders": 40,
+    "/fapi/v1/ticker/24hr": 40,
+    "/fapi/v1/ticker/price": 2,
+    "/fapi/v1/ticker/bookTicker": 5,
+    "/fapi/v1/premiumIndex": 10,
+}
+# 下单只计入订单频率限制，不占 IP 权重
+ORDER_PATHS = ("/fapi/v1/order", "/papi/v1/um/order", "/papi/v1/um/conditional/order")
+
+
+class CoordinatorError(RuntimeError):
+    """协调进程不可用或拒绝请求"""
+
+
+def shard_for_symbol(symbol: str, count: int) -> int:
+    return zlib.crc32(str(symbol).upper().encode("utf-8")) % max(1, int(count))
+
+
+def shard_symbols(symbols: Iterable[str], index: int, count: int) -> List[str]:
+    """保持原顺序，返回归属第 index 个分片的交易对"""
+    return [s for s in symbols if shard_for_symbol(s, count) == int(index)]
+
+
+def _to_int(value: Any, default: int) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def estimate_request_weight(method: str, url: str, params: Optional[Mapping[str, Any]] = None) -> int:
+    """按交易所文档估算单次 REST 请求的 IP 权重"""
+    params = params or {}
+    path = urlparse(str(url)).path
+    method = str(method).upper()
+    if path in ORDER_PATHS and method == "POST":
+        return 0
+    if path.endswith("/klines"):
+        return kline_request_weight("spot" if path.startswith("/api/") else "futures", _to_int(params.get("limit"), 500))
+    if path.endswith("/depth"):
+        limit = _to_int(params.get("limit"), 500)
+        if limit <= 50:
+            return 2
+        if limit <= 100:
+            return 5
+        if limit <= 500:
+            return 10
+        return 20
+    if path in NO_SYMBOL_WEIGHTS and not params.get("symbol"):
+        return NO_SYMBOL_WEIGHTS[path]
+    return PATH_WEIGHTS.get(path, 1)
+
+
+@dataclass(frozen=True)
+class ShardSpec:
+    """worker 进程的分片身份与协调进程地址"""
+
+    index: int
+    count: int
+    address: str
+    authkey: bytes
+
+    @property
+    def worker_id(self) -> str:
+        return f"shard-{self.index}"
+
+
+class ShardCoordinator:
+    """协调进程内的共享状态（线程安全，每个 worker 连接一个服务线程）"""
+
+    def __init__(
+        self,
+        weight_per_minute: float = 2000.0,
+        high_water_ratio: float = 0.9,
+        slot_ttl_seconds: float = 120.0,
+        order_lock_timeout_seconds: float = 30.0,
+        state_path: Optional[str] = None,
+    ):
+        """
+        Args:
+            weight_per_minute: 全部 worker 共用的每分钟请求权重
+            high_water_ratio: 响应头已用权重超过该比例时暂停发放到下一分钟
+            slot_ttl_seconds: 开仓名额预占的有效期（成交后由持仓同步转为占用）
+            order_lock_timeout_seconds: 等待下单锁的最长时间
+            state_path: 账户级风控状态文件
+        """
+        self.budget = RequestWeightBudget(weight_per_minute=weight_per_minute, high_water_ratio=high_water_ratio)
+        self.slot_ttl_seconds = max(1.0, float(slot_ttl_seconds))
+        self.order_lock_timeout_seconds = max(0.1, float(order_lock_timeout_seconds))
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        self._order_lock = threading.Lock()
+        self._order_owner: Optional[str] = None
+        self._workers: Dict[str, Dict[str, Any]] = {}
+        self._held: set = set()
+        self._reserved: Dict[str, Tuple[str, float]] = {}
+        self._risk: Dict[str, Any] = {
+            "consecutive_losses": 0,
+            "cooldown_reason": None,
+            "cooldown_expires": None,
+            "daily_open_equity": None,
+            "daily_open_date": None,
+            "peak_equity": None,
+        }
+        self._kill_switch_claimed = False
+        self.stats: Dict[str, Any] = {"weight_acquired": 0, "orders": 0, "slots_granted": 0, "slots_denied": 0}
+        self._load_state()
+
+    # ------------------------------------------------------------ workers
+    def hello(self, worker: str, pid: int = 0) -> Dict[str, Any]:
+        with self._lock:
+            self._workers[worker] = {"pid": int(pid), "connected_at": time.time()}
+        print(f"🔗 分片协调: {worker} 已连接 pid={pid}")
+        return {"held": sorted(self._held)}
+
+    def disconnect(self, worker: str) -> None:
+        """worker 断开：释放其下单锁与名额预占"""
+        with self._lock:
+            self._workers.pop(worker, None)
+            for symbol in [s for s, (w, _) in self._reserved.items() if w == worker]:
+                self._reserved.pop(symbol, None)
+        self.order_unlock(worker)
+        print(f"🔌 分片协调: {worker} 已断开")
+
+    # ------------------------------------------------------------- weight
+    def acquire_weight(self, worker: str, weight: float) -> None:
+        self.budget.acquire(weight)
+        with self._lock:
+            self.stats["weight_acquired"] += float(weight)
+
+    def observe_used_weight(self, worker: str, used: Optional[float]) -> None:
+        self.budget.observe_used_weight(used)
+
+    # -------------------------------------------------------------- slots
+    def _expire_reservations(self, now: float) -> None:
+        for symbol in [s for s, (_, exp) in self._reserved.items() if exp <= now]:
+            self._reserved.pop(symbol, None)
+
+    def sync_positions(self, worker: str, symbols: Iterable[str]) -> int:
+        """以账户实际持仓覆盖占用集合；已有持仓的预占转为占用"""
+        held = {str(s).upper() for s in symbols}
+        with self._lock:
+            self._held = held
+            for symbol in held:
+                self._reserved.pop(symbol, None)
+            self._expire_reservations(time.time())
+            return len(self._held) + len(self._reserved)
+
+    def reserve_slot(self, worker: str, symbol: str, max_active: int) -> bool:
+        symbol = str(symbol).upper()
+        now = time.time()
+        with self._lock:
+            self._expire_reservations(now)
+            owner = self._reserved.get(symbol)
+            if symbol in self._held or (owner is not None and owner[0] == worker):
+                return True
+            if owner is not None or len(self._held) + len(self._reserved) >= max(1, int(max_active)):
+                self.stats["slots_denied"] += 1
+                return False
+            self._reserved[symbol] = (worker, now + self.slot_ttl_seconds)
+            self.stats["slots_granted"] += 1
+            return True
+
+    def release_slot(self, worker: str, symbol: str) -> None:
+        symbol = str(symbol).upper()
+        with self._lock:
+            owner = self._reserved.get(symbol)
+            if owner is not None and owner[0] == worker:
+                self._reserved.pop(symbol, None)
+
+    # -------------------------------------------------------------- order
+    def order_lock(self, worker: str) -> bool:
+        if not self._order_lock.acquire(timeout=self.order_lock_timeout_seconds):
+            return False
+        with self._lock:
+            self._order_owner = worker
+            self.stats["orders"] += 1
+        return True
+
+    def order_unlock(self, worker: str) -> None:
+        with self._lock:
+            if self._order_owner != worker:
+                return
+            self._order_owner = None
+        self._order_lock.release()
+
+    # --------------------------------------------------------------- risk
+    def _load_state(self) -> None:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for key in self._risk:
+                if key in data:
+                    self._risk[key] = data[key]
+        except Exception:
+            # 状态文件损坏时忽略，避免启动失败。
+            pass
+
+    def _save_state(self) -> None:
+        if not self.state_path:
+            return
+        payload = dict(self._risk, updated_at=datetime.now().isoformat())
+        tmp = f"{self.state_path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.state_path)
+        except Exception:
+            pass
+
+    @staticmethod
+    def _date_label(cfg: Mapping[str, Any]) -> str:
+        try:
+            tz = ZoneInfo(str(cfg.get("daily_reset_timezone", "Asia/Tokyo")))
+        except Exception:
+            tz = ZoneInfo("UTC")
+        return datetime.now(tz).strftime("%Y-%m-%d")
+
+    def _activate(self, reason: str, seconds: int) -> None:
+        if seconds <= 0:
+            return
+        new_expires = datetime.now() + timedelta(seconds=int(seconds))
+        current = self._risk.get("cooldown_expires")
+        if current and datetime.fromisoformat(current) >= new_expires:
+            return
+        self._risk["cooldown_reason"] = reason
+        self._risk["cooldown_expires"] = new_expires.isoformat()
+        print(f"⚠️ 分片协调触发账户级冷却: reason={reason}, expires={self._risk['cooldown_expires']}")
+        self._save_state()
+
+    def _remaining_seconds(self) -> int:
+        expires = self._risk.get("cooldown_expires")
+        if not expires:
+            return 0
+        remain = int((datetime.fromisoformat(expires) - datetime.now()).total_seconds())
+        if remain > 0:
+            return remain
+        self._risk["cooldown_expires"] = None
+        self._risk["cooldown_reason"] = None
+        self._kill_switch_claimed = False
+        self._save_state()
+        return 0
+
+    def _guard_result(self, cfg: Mapping[str, Any], equity: Optional[float] = None) -> Dict[str, Any]:
+        remaining = self._remaining_seconds()
+        owner = False
+        expires = self._risk.get("cooldown_expires")
+        if remaining > 0 and self._risk.get("cooldown_reason") == "daily_loss" and not self._kill_switch_claimed:
+            # 每次冷却期的熔断强平只交给第一个观察到的 worker（它会拉全账户持仓）
+            self._kill_switch_claimed = True
+            owner = True
+        result = {
+            "enabled": bool(cfg.get("enabled", True)),
+            "blocked": remaining > 0,
+            "reason": self._risk.get("cooldown_reason"),
+            "remaining_seconds": remaining,
+            "cooldown_expires": expires,
+            "consecutive_losses": int(self._risk.get("consecutive_losses") or 0),
+            "kill_switch_owner": owner,
+        }
+        if equity is not None:
+            result["daily_open_equity"] = self._risk.get("daily_open_equity")
+            result["equity"] = equity
+        return result
+
+    def risk_guard(self, worker: str, equity: float, cfg: Mapping[str, Any]) -> Dict[str, Any]:
+        """账户级日内亏损熔断（与单进程 _refresh_account_risk_guard 规则一致）"""
+        with self._lock:
+            if not cfg.get("enabled", True):
+                if self._risk.get("cooldown_expires") or self._risk.get("cooldown_reason"):
+                    self._risk["cooldown_expires"] = None
+                    self._risk["cooldown_reason"] = None
+                    self._kill_switch_claimed = False
+                    self._save_state()
+                return {"enabled": False, "blocked": False, "reason": None, "remaining_seconds": 0, "kill_switch_owner": False}
+            equity = float(equity or 0.0)
+            if equity <= 0:
+                return self._guard_result(cfg)
+            today = self._date_label(cfg)
+            open_equity = float(self._risk.get("daily_open_equity") or 0.0)
+            if self._risk.get("daily_open_date") != today or open_equity <= 0:
+                self._risk.update(daily_open_date=today, daily_open_equity=equity, peak_equity=equity, consecutive_losses=0)
+                self._save_state()
+            elif not self._risk.get("peak_equity") or equity > float(self._risk["peak_equity"]):
+                self._risk["peak_equity"] = equity
+                self._save_state()
+            open_equity = float(self._risk["daily_open_equity"])
+            if open_equity > 0 and (open_equity - equity) / open_equity >= float(cfg.get("max_daily_loss_pct", 0.1)):
+                self._activate("daily_loss", int(cfg.get("daily_loss_cooldown_seconds", 8 * 3600)))
+            return self._guard_result(cfg, equity)
+
+    def activate_cooldown(self, worker: str, reason: str, seconds: int) -> Dict[str, Any]:
+        with self._lock:
+            self._activate(reason, int(seconds))
+            return self._guard_result({})
+
+    def record_close(self, worker: str, realized_pnl: float, cfg: Mapping[str, Any]) -> Dict[str, Any]:
+        """全账户的连续亏损计数（任一 worker 的平仓都计入）"""
+        with self._lock:
+            if float(realized_pnl) < 0:
+                self._risk["consecutive_losses"] = int(self._risk.get("consecutive_losses") or 0) + 1
+            else:
+                self._risk["consecutive_losses"] = 0
+            if int(self._risk["consecutive_losses"]) >= int(cfg.get("max_consecutive_losses", 3)):
+                self._activate("consecutive_losses", int(cfg.get("consecutive_loss_cooldown_seconds", 30 * 60)))
+            else:
+                self._save_state()
+            return self._guard_result(cfg)
+
+    def snapshot(self, worker: str = "") -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": sorted(self._workers),
+                "held": sorted(self._held),
+                "reserved": {s: w for s, (w, _) in self._reserved.items()},
+                "order_owner": self._order_owner,
+                "budget_waited_seconds": round(self.budget.waited_seconds, 3),
+                "risk": dict(self._risk),
+                **self.stats,
+            }
+
+
+RPC_METHODS = frozenset(
+    {
+        "hello",
+        "acquire_weight",
+        "observe_used_weight",
+        "sync_positions",
+        "reserve_slot",
+        "release_slot",
+        "order_lock",
+        "order_unlock",
+        "risk_guard",
+        "activate_cooldown",
+        "record_close",
+        "snapshot",
+    }
+)
+
+
+class CoordinatorServer:
+    """Unix socket 服务端：每个连接一个线程，请求为 (method, worker, args)"""
+
+    def __init__(self, coordinator: ShardCoordinator, address: str, authkey: bytes):
+        self.coordinator = coordinator
+        self.address = address
+        self.authkey = authkey
+        self._listener: Optional[Listener] = None
+        self._thread: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+
+    def start(self) -> "CoordinatorServer":
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        self._listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        self._thread = threading.Thread(target=self._accept_loop, name="shard-coordinator", daemon=True)
+        self._thread.start()
+        return self
+
+    def _accept_loop(self) -> None:
+        while not self._closed.is_set():
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                if self._closed.is_set():
+                    return
+                continue
+            except Exception as e:
+                print(f"⚠️ 分片协调拒绝连接: {e}")
+                continue
+            threading.Thread(target=self._serve, args=(conn,), name="shard-coordinator-conn", daemon=True).start()
+
+    def _serve(self, conn) -> None:
+        workers: set = set()
+        try:
+            while True:
+                try:
+                    method, worker, args = conn.recv()
+                except (EOFError, OSError):
+                    return
+                workers.add(worker)
+                if method not in RPC_METHODS:
+                    conn.send(("err", f"unknown method: {method}"))
+                    continue
+                try:
+                    conn.send(("ok", getattr(self.coordinator, method)(worker, *args)))
+                except Exception as e:
+                    conn.send(("err", f"{type(e).__name__}: {e}"))
+        finally:
+            conn.close()
+            for worker in workers:
+                self.coordinator.disconnect(worker)
+
+    def close(self) -> None:
+        self._closed.set()
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+        if os.path.exists(self.address):
+            try:
+                os.unlink(self.address)
+            except OSError:
+                pass
+
+
+class CoordinatorClient:
+    """
+    worker 侧协调客户端，同时作为 BinanceBroker 的请求闸门 (request gate)
+
+    下单锁使用独立连接：等待下单锁时不阻塞本进程其他线程的权重申请。
+    """
+
+    def __init__(self, spec: ShardSpec, connect_timeout_seconds: float = 10.0):
+        self.spec = spec
+        self.worker_id = spec.worker_id
+        self._conn = self._connect(connect_timeout_seconds)
+        self._order_conn = self._connect(connect_timeout_seconds)
+        self._call_lock = threading.Lock()
+        self._order_mutex = threading.Lock()
+        self.call("hello", os.getpid())
+
+    def _connect(self, timeout: float):
+        deadline = time.time() + max(0.0, timeout)
+        while True:
+            try:
+                return Client(self.spec.address, family="AF_UNIX", authkey=self.spec.authkey)
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.time() >= deadline:
+                    raise CoordinatorError(f"无法连接分片协调进程: {self.spec.address}")
+                time.sleep(0.1)
+
+    @staticmethod
+    def _roundtrip(conn, method: str, worker: str, args: Tuple[Any, ...]) -> Any:
+        try:
+            conn.send((method, worker, args))
+            status, result = conn.recv()
+        except (EOFError, OSError) as e:
+            raise CoordinatorError(f"分片协调连接中断: {e}") from e
+        if status != "ok":
+            raise CoordinatorError(str(result))
+        return result
+
+    def call(self, method: str, *args: Any) -> Any:
+        with self._call_lock:
+            return self._roundtrip(self._conn, method, self.worker_id, args)
+
+    def close(self) -> None:
+        for conn in (self._conn, self._order_conn):
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    # ------------------------------------------------------- request gate
+    def before_request(self, method: str, url: str, params: Mapping[str, Any], is_write: bool) -> None:
+        weight = estimate_request_weight(method, url, params)
+        if weight > 0:
+            self.call("acquire_weight", weight)
+        if is_write:
+            self._order_mutex.acquire()
+            try:
+                granted = self._roundtrip(self._order_conn, "order_lock", self.worker_id, ())
+            except Exception:
+                self._order_mutex.release()
+                raise
+            if not granted:
+                self._order_mutex.release()
+                raise CoordinatorError("等待账户下单锁超时")
+
+    def after_request(self, method: str, url: str, is_write: bool, headers: Optional[Mapping[str, Any]]) -> None:
+        if is_write:
+            try:
+                self._roundtrip(self._order_conn, "order_unlock", self.worker_id, ())
+            except Exception as e:
+                print(f"⚠️ 释放账户下单锁失败: {e}")
+            finally:
+                self._order_mutex.release()
+        used = headers.get("X-MBX-USED-WEIGHT-1M") if headers else None
+        if used is None:
+            return
+        try:
+            self.call("observe_used_weight", float(used))
+        except Exception as e:
+            print(f"⚠️ 上报已用权重失败: {e}")
+
+
+def _sharding_config(config: Mapping[str, Any]) -> Dict[str, Any]:
+    cfg = config.get("sharding", {}) if isinstance(config, Mapping) else {}
+    return cfg if isinstance(cfg, dict) else {}
+
+
+def _worker_main(config_path: Optional[str], spec: ShardSpec) -> None:
+    from src.app.fund_flow_bot import TradingBot
+
+    bot = TradingBot(config_path=config_path, shard=spec)
+    bot.run()
+
+
+def run_sharded(config_path: Optional[str] = None, workers: Optional[int] = None) -> None:
+    """启动协调进程（当前进程）与 N 个 worker 进程；worker 异常退出时自动重启"""
+    from src.app.fund_flow_bot import TradingBot
+    from src.config.config_loader import ConfigLoader
+
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    probe = TradingBot.__new__(TradingBot)
+    probe.project_root = project_root
+    resolved = probe._resolve_config_path(config_path)
+    config = ConfigLoader.load_trading_config(resolved)
+    cfg = _sharding_config(config)
+    count = max(1, int(workers or cfg.get("workers", 2) or 2))
+    logs_dir = os.path.join(project_root, "logs")
+    os.makedirs(logs_dir, exist_ok=True)
+    address = str(cfg.get("socket_path") or os.path.join(logs_dir, "shard_coordinator.sock"))
+    coordinator = ShardCoordinator(
+        weight_per_minute=float(cfg.get("weight_per_minute", 2000) or 2000),
+        high_water_ratio=float(cfg.get("high_water_ratio", 0.9) or 0.9),
+        slot_ttl_seconds=float(cfg.get("slot_ttl_seconds", 120) or 120),
+        order_lock_timeout_seconds=float(cfg.get("order_lock_timeout_seconds", 30) or 30),
+        state_path=os.path.join(logs_dir, "shard_coordinator_state.json"),
+    )
+    server = CoordinatorServer(coordinator, address, os.urandom(16)).start()
+    restart_delay = max(1.0, float(cfg.get("restart_delay_seconds", 5) or 5))
+    stats_interval = max(10.0, float(cfg.get("stats_interval_seconds", 300) or 300))
+    print(f"🧩 分片模式: workers={count}, socket={address}, weight/min={coordinator.budget.capacity:.0f}")
+
+    ctx = multiprocessing.get_context("spawn")
+    specs = [ShardSpec(i, count, address, server.authkey) for i in range(count)]
+    procs: Dict[int, Any] = {}
+
+    def _start(spec: ShardSpec) -> None:
+        proc = ctx.Process(target=_worker_main, args=(resolved, spec), name=spec.worker_id, daemon=False)
+        proc.start()
+        procs[spec.index] = proc
+
+    for spec in specs:
+        _start(spec)
+    last_stats = time.time()
+    try:
+        while True:
+            time.sleep(1.0)
+            for spec in specs:
+                proc = procs[spec.index]
+                if proc.is_alive():
+                    continue
+                print(f"⚠️ {spec.worker_id} 已退出 exitcode={proc.exitcode}，{restart_delay:.0f}s 后重启")
+                time.sleep(restart_delay)
+                _start(spec)
+            if time.time() - last_stats >= stats_interval:
+                last_stats = time.time()
+                print(f"🧩 分片协调统计: {json.dumps(coordinator.snapshot(), ensure_ascii=False, default=str)}")
+    except KeyboardInterrupt:
+        print("🛑 收到中断，停止全部 worker")
+    finally:
+        for proc in procs.values():
+            if proc.is_alive():
+                proc.terminate()
+        for proc in procs.values():
+            proc.join(timeout=10)
+        server.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fund-flow trading bot (sharded)")
+    parser.add_argument("--config", type=str, default=None, help="配置文件路径")
+    parser.add_argument("--workers", type=int, default=None, help="worker 进程数（默认 sharding.workers）")
+    args = parser.parse_args()
+    run_sharded(config_path=args.config, workers=args.workers)
+
+
+__all__ = [
+    "CoordinatorClient",
+    "CoordinatorError",
+    "CoordinatorServer",
+    "ShardCoordinator",
+    "ShardSpec",
+    "estimate_request_weight",
+    "run_sharded",
+    "shard_for_symbol",
+    "shard_symbols",
+]
+
+
+if __name__ == "__main__":
+    main()
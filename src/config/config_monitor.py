@@ -1,6 +1,9 @@
 """
 配置文件监控器
 监控trading_config_vps.json文件的变化，并处理交易对变更
+
+文件监听、读取与校验由后台 ConfigWatcher 完成；check_for_updates 只取走已准备好的新配置，
+不在交易周期内做文件 IO。
 """
 
 import json
@@ -8,21 +11,46 @@ import os
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
+from src.config.config_loader import ConfigLoader
+from src.config.config_watcher import ConfigWatcher
+
 
 class ConfigMonitor:
     """配置文件监控器"""
 
-    def __init__(self, config_path: str):
+    def __init__(
+        self,
+        config_path: str,
+        poll_interval_seconds: float = 1.0,
+        debounce_seconds: float = 0.2,
+        use_inotify: Optional[bool] = None,
+    ):
         """
         初始化配置监控器
 
         Args:
             config_path: 配置文件路径
+            poll_interval_seconds: 后台轮询间隔（inotify 模式下为兜底检查间隔）
+            debounce_seconds: 变更事件去抖时间
+            use_inotify: None=自动，False=强制轮询
         """
         self.config_path = config_path
         self.last_modified_time: Optional[float] = None
         self.current_config: Optional[Dict[str, Any]] = None
         self.current_symbols: List[str] = []
+        self.poll_interval_seconds = poll_interval_seconds
+        self.debounce_seconds = debounce_seconds
+        self.use_inotify = use_inotify
+
+        # 先建立监听基线再读取，读取之后的修改都会被捕获；后台线程在首次检查时启动
+        self.watcher = ConfigWatcher(
+            config_path,
+            loader=ConfigLoader.load_trading_config,
+            prepare=lambda config: list(config.get("trading", {}).get("symbols", [])),
+            poll_interval_seconds=poll_interval_seconds,
+            debounce_seconds=debounce_seconds,
+            use_inotify=use_inotify,
+        )
 
         # 初始化：记录当前配置和修改时间
         self._update_state()
@@ -61,7 +89,8 @@ class ConfigMonitor:
                 'old_symbols': List[str],  # 旧的交易对列表
                 'new_symbols': List[str],  # 新的交易对列表
                 'removed_symbols': List[str],  # 需要平仓的交易对
-                'new_config': Dict[str, Any]  # 新的配置
+                'new_config': Dict[str, Any],  # 新的配置（已通过校验）
+                'mtime': float  # 新配置文件的修改时间（仅 updated 时存在）
             }
         """
         result = {
@@ -74,22 +103,19 @@ class ConfigMonitor:
             "new_config": None,
         }
 
-        # 获取当前文件修改时间
-        current_mtime = self._get_file_modified_time()
-
-        # 检查文件是否被修改（需要处理None的情况）
-        if self.last_modified_time is None or current_mtime <= self.last_modified_time:
+        # 取走后台已加载并校验的新配置（无变更时不做任何 IO）
+        prepared = self.watcher.start().take()
+        if prepared is None:
             return result
 
         # 文件已更新
         result["updated"] = True
-
-        # 加载新配置
-        new_config = self._load_config()
-        new_symbols = new_config.get("trading", {}).get("symbols", [])
+        new_config = prepared.config
+        new_symbols = prepared.derived
 
         result["new_symbols"] = new_symbols
         result["new_config"] = new_config
+        result["mtime"] = prepared.mtime
 
         # 检查交易对是否变化
         if set(new_symbols) != set(self.current_symbols):
@@ -113,8 +139,13 @@ class ConfigMonitor:
         if not update_info["updated"]:
             return
 
-        # 更新状态
-        self._update_state()
+        # 更新状态（直接使用已加载的新配置，不再重新读取文件）
+        if update_info.get("new_config") is not None:
+            self.current_config = update_info["new_config"]
+            self.current_symbols = list(update_info.get("new_symbols") or [])
+            self.last_modified_time = update_info.get("mtime", self.last_modified_time)
+        else:
+            self._update_state()
 
         # 记录日志
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
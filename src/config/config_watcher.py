@@ -0,0 +1,264 @@
+"""
+配置文件后台监听 (Config Watcher)
+
+把配置热更新从交易周期中移出:
+1. 后台线程监听配置文件：Linux 下用 inotify（监听所在目录，兼容编辑器的 rename 原子替换），
+   其它平台或 inotify 不可用时退化为按 stat 签名轮询；inotify 模式下轮询仍作为兜底
+2. 文件变化后（去抖）在后台完成 读取 -> 解析 -> 校验 -> 派生（prepare 回调），
+   得到完整的 PreparedConfig；失败只打印告警，继续使用旧配置，直到文件再次变化
+3. 交易循环在周期边界调用 take() 取走已就绪的快照并整体替换，热路径上不再有文件 IO 与解析
+
+多次变更未被取走时只保留最新一份。
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# inotify 事件掩码（<sys/inotify.h>）
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+@dataclass(frozen=True)
+class PreparedConfig:
+    """后台准备好的配置快照（原始配置 + prepare 派生结果）"""
+
+    version: int
+    mtime: float
+    config: Dict[str, Any]
+    derived: Any
+    prepared_at: float
+    prepare_ms: float
+
+
+def _load_json(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"配置文件顶层必须是对象: {path}")
+    return data
+
+
+def _open_inotify(directory: str) -> Optional[int]:
+    """打开 inotify 并监听目录；不可用时返回 None（调用方退化为轮询）"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except Exception:
+        return None
+
+
+class ConfigWatcher:
+    """后台监听配置文件并预先准备新配置，交易循环在周期边界 take() 换入"""
+
+    def __init__(
+        self,
+        path: str,
+        loader: Optional[Callable[[str], Dict[str, Any]]] = None,
+        prepare: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        poll_interval_seconds: float = 1.0,
+        debounce_seconds: float = 0.2,
+        use_inotify: Optional[bool] = None,
+        name: str = "config",
+    ):
+        """
+        Args:
+            path: 配置文件路径
+            loader: 读取 + 校验配置（默认 json.load），在后台线程执行
+            prepare: 由新配置派生运行时对象（快照等），抛异常视为校验失败
+            poll_interval_seconds: 轮询间隔；inotify 模式下作为兜底检查间隔
+            debounce_seconds: 收到变更事件后的合并等待时间
+            use_inotify: None=自动（Linux 可用时启用），False=强制轮询
+            name: 日志中的名称
+        """
+        self.path = os.path.abspath(path)
+        self.loader = loader or _load_json
+        self.prepare = prepare
+        self.poll_interval_seconds = max(0.05, float(poll_interval_seconds))
+        self.debounce_seconds = max(0.0, float(debounce_seconds))
+        self.use_inotify = use_inotify
+        self.name = name
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._inotify_fd: Optional[int] = None
+        self._pending: Optional[PreparedConfig] = None
+        self._version = 0
+        # 以构建时的文件签名为基线，启动后不会把当前文件当作一次变更
+        self._seen_signature = self._signature()
+        self._metrics: Dict[str, Any] = {
+            "backend": "stopped",
+            "events": 0,
+            "prepared": 0,
+            "taken": 0,
+            "errors": 0,
+            "last_prepare_ms": None,
+            "last_error": None,
+        }
+
+    # ------------------------------------------------------------ lifecycle
+    def start(self) -> "ConfigWatcher":
+        if self._thread is not None:
+            return self
+        if self.use_inotify is not False:
+            self._inotify_fd = _open_inotify(os.path.dirname(self.path) or ".")
+        self._metrics["backend"] = "inotify" if self._inotify_fd is not None else "poll"
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=timeout)
+        self._thread = None
+        if self._inotify_fd is not None:
+            try:
+                os.close(self._inotify_fd)
+            except OSError:
+                pass
+            self._inotify_fd = None
+        self._metrics["backend"] = "stopped"
+
+    @property
+    def backend(self) -> str:
+        return str(self._metrics["backend"])
+
+    # -------------------------------------------------------------- consume
+    def take(self) -> Optional[PreparedConfig]:
+        """取走已准备好的新配置（无变更时返回 None，不做任何 IO）"""
+        if self._pending is None:
+            return None
+        with self._lock:
+            prepared, self._pending = self._pending, None
+            if prepared is not None:
+                self._metrics["taken"] += 1
+        return prepared
+
+    def check_now(self) -> bool:
+        """同步检查一次（测试 / 未启动后台线程时使用）；返回是否产生了新快照"""
+        return self._check()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._metrics)
+            stats["pending"] = self._pending is not None
+        return stats
+
+    # ------------------------------------------------------------- internal
+    def _signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _drain_events(self) -> bool:
+        """读空 inotify 队列；返回是否有目标文件相关事件"""
+        fd = self._inotify_fd
+        if fd is None:
+            return False
+        target = os.fsencode(os.path.basename(self.path))
+        relevant = False
+        while True:
+            try:
+                buf = os.read(fd, 64 * 1024)
+            except BlockingIOError:
+                return relevant
+            except OSError:
+                return relevant
+            if not buf:
+                return relevant
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(buf):
+                _, _, _, length = _EVENT_HEADER.unpack_from(buf, offset)
+                name = buf[offset + _EVENT_HEADER.size : offset + _EVENT_HEADER.size + length].rstrip(b"\0")
+                offset += _EVENT_HEADER.size + length
+                if name == target:
+                    relevant = True
+
+    def _wait_for_change(self) -> None:
+        fd = self._inotify_fd
+        if fd is None:
+            self._stop.wait(self.poll_interval_seconds)
+            return
+        try:
+            ready, _, _ = select.select([fd], [], [], self.poll_interval_seconds)
+        except (OSError, ValueError):
+            self._stop.wait(self.poll_interval_seconds)
+            return
+        if ready and self._drain_events():
+            self._metrics["events"] += 1
+            # 去抖：合并编辑器连续写入产生的多次事件
+            if self.debounce_seconds > 0:
+                self._stop.wait(self.debounce_seconds)
+            self._drain_events()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wait_for_change()
+            if self._stop.is_set():
+                break
+            try:
+                self._check()
+            except Exception as e:
+                print(f"⚠️ {self.name} 配置监听异常: {e}")
+
+    def _check(self) -> bool:
+        signature = self._signature()
+        if signature is None or signature == self._seen_signature:
+            return False
+        # 无论成功与否都记住该版本：坏文件不会每轮重复报错，等待下一次修改
+        self._seen_signature = signature
+        started = time.perf_counter()
+        try:
+            config = self.loader(self.path)
+            derived = self.prepare(config) if self.prepare is not None else None
+        except Exception as e:
+            with self._lock:
+                self._metrics["errors"] += 1
+                self._metrics["last_error"] = str(e)
+            print(f"⚠️ 检测到{self.name}配置变更，但加载/校验失败，继续使用旧配置: {e}")
+            return False
+        prepare_ms = (time.perf_counter() - started) * 1000.0
+        with self._lock:
+            self._version += 1
+            self._pending = PreparedConfig(
+                version=self._version,
+                mtime=signature[0] / 1e9,
+                config=config,
+                derived=derived,
+                prepared_at=time.time(),
+                prepare_ms=prepare_ms,
+            )
+            self._metrics["prepared"] += 1
+            self._metrics["last_prepare_ms"] = round(prepare_ms, 3)
+            self._metrics["last_error"] = None
+        return True
+
+
+__all__ = ["ConfigWatcher", "PreparedConfig"]
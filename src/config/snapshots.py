@@ -0,0 +1,256 @@
+"""
+配置快照 (Config Snapshots)
+
+把热路径上反复读取的配置段在加载时一次性解析为不可变对象:
+1. frozen + __slots__ dataclass，字段带类型，构建时校验（错误在加载期暴露，而不是周期中途）
+2. 兼容只读 Mapping 接口（cfg["key"] / cfg.get("key") / **cfg），调用方无需改写
+3. 列表字段统一转为 tuple，快照可安全地在周期内/跨线程共享
+"""
+
+from __future__ import annotations
+
+import math
+from collections.abc import Mapping
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Iterator, Tuple, get_type_hints
+
+
+class ConfigSnapshotError(ValueError):
+    """配置快照构建/校验失败"""
+
+
+def _coerce(owner: str, name: str, type_hint: Any, value: Any) -> Any:
+    origin = getattr(type_hint, "__origin__", None)
+    if origin is tuple:
+        if not isinstance(value, (list, tuple)):
+            raise ConfigSnapshotError(f"{owner}.{name}: 需要列表，实际为 {type(value).__name__}")
+        item_type = type_hint.__args__[0]
+        return tuple(_coerce(owner, f"{name}[{idx}]", item_type, item) for idx, item in enumerate(value))
+    if type_hint is bool:
+        if not isinstance(value, bool):
+            raise ConfigSnapshotError(f"{owner}.{name}: 需要 bool，实际为 {value!r}")
+        return value
+    if type_hint is int:
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ConfigSnapshotError(f"{owner}.{name}: 需要 int，实际为 {value!r}")
+        return value
+    if type_hint is float:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ConfigSnapshotError(f"{owner}.{name}: 需要数值，实际为 {value!r}")
+        value = float(value)
+        if not math.isfinite(value):
+            raise ConfigSnapshotError(f"{owner}.{name}: 数值非有限值 {value!r}")
+        return value
+    if type_hint is str:
+        if not isinstance(value, str):
+            raise ConfigSnapshotError(f"{owner}.{name}: 需要 str，实际为 {value!r}")
+        return value
+    return value
+
+
+class ConfigSnapshot(Mapping):
+    """配置快照基类：子类为 frozen/slots dataclass，同时表现为只读 Mapping"""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_mapping(cls, data: Mapping) -> "ConfigSnapshot":
+        """按字段类型校验并构建；缺字段/多字段/类型不符均抛 ConfigSnapshotError"""
+        hints = get_type_hints(cls)
+        names = [f.name for f in fields(cls)]
+        missing = [n for n in names if n not in data]
+        extra = [k for k in data if k not in hints]
+        if missing or extra:
+            raise ConfigSnapshotError(f"{cls.__name__}: 缺少字段={missing} 未知字段={extra}")
+        kwargs = {n: _coerce(cls.__name__, n, hints[n], data[n]) for n in names}
+        return cls(**kwargs)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__dataclass_fields__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__dataclass_fields__)
+
+    def __len__(self) -> int:
+        return len(self.__dataclass_fields__)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            name: list(value) if isinstance(value, tuple) else value
+            for name, value in ((n, getattr(self, n)) for n in self.__dataclass_fields__)
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class RiskConfigSnapshot(ConfigSnapshot):
+    """账户级熔断（risk 段）"""
+
+    enabled: bool
+    max_daily_loss_pct: float
+    max_consecutive_losses: int
+    daily_loss_cooldown_seconds: int
+    consecutive_loss_cooldown_seconds: int
+    daily_reset_timezone: str
+
+
+@dataclass(frozen=True, slots=True)
+class ProtectionSlaConfigSnapshot(ConfigSnapshot):
+    """保护单 SLA（fund_flow.protection_sla_*）"""
+
+    enabled: bool
+    timeout_seconds: int
+    force_flatten_on_breach: bool
+    immediate_close_on_repair_fail: bool
+    alert_cooldown_seconds: int
+    repair_fail_reduce_ratio: float
+
+
+@dataclass(frozen=True, slots=True)
+class PretradeRiskGateConfigSnapshot(ConfigSnapshot):
+    """开仓前风控闸门（fund_flow.pretrade_risk_gate）"""
+
+    enabled: bool
+    force_exit_on_gate: bool
+    entry_block_actions: Tuple[str, ...]
+    entry_hold_portion_scale: float
+    entry_hold_leverage_cap: float
+    exit_close_ratio: float
+    exit_score_threshold: float
+    exit_confirm_bars: int
+    exit_min_hold_seconds: int
+    exit_require_price_followthrough: bool
+    exit_price_change_min: float
+    exit_drawdown_override: float
+    momentum_scale: float
+    volatility_cap: float
+    volatility_cap_capture: float
+    max_drawdown: float
+    max_exposure_per_trade: float
+    entry_threshold: float
+    entry_threshold_capture: float
+    trend_weight: float
+    momentum_weight: float
+    volatility_weight: float
+    drawdown_weight: float
+
+
+@dataclass(frozen=True, slots=True)
+class DcaConfigSnapshot(ConfigSnapshot):
+    """DCA/马丁加仓（fund_flow.dca_*，可被 engine_params 覆盖）"""
+
+    enabled: bool
+    base_add_portion: float
+    drawdown_thresholds: Tuple[float, ...]
+    multipliers: Tuple[float, ...]
+    max_additions: int
+    min_trigger_interval_seconds: int
+
+
+@dataclass(frozen=True, slots=True)
+class Ma10MacdConfluenceConfigSnapshot(ConfigSnapshot):
+    """MA10+MACD 共振过滤（fund_flow.ma10_macd_confluence）"""
+
+    enabled: bool
+    tf_exec: str
+    tf_anchor: str
+    ma_period: int
+    macd_fast: int
+    macd_slow: int
+    macd_signal: int
+    kline_limit_exec: int
+    kline_limit_anchor: int
+    entry_hard_filter: bool
+    entry_require_macd_trigger: bool
+    entry_allow_macd_early: bool
+    entry_macd_early_hist_min: float
+    entry_macd_early_expand_bars: int
+    entry_soft_penalty_no_macd: float
+    entry_soft_penalty_no_kdj: float
+    entry_hard_block_against_ma10: bool
+    entry_hard_block_reverse_macd: bool
+    block_on_opposite_bias: bool
+    buy_cross: str
+    sell_cross: str
+    buy_block_zone: str
+    sell_block_zone: str
+    neutral_bias_mode: str
+    neutral_bias_portion_scale: float
+    neutral_bias_leverage_cap: int
+    bias_boost: float
+    bias_penalty: float
+    cross_boost: float
+    zone_boost: float
+    hist_boost: float
+    max_adjust: float
+    exit_anchor_enabled: bool
+    exit_anchor_require_hist_expand: bool
+    exit_anchor_skip_on_hard_block: bool
+
+
+@dataclass(frozen=True, slots=True)
+class TrendCaptureConfigSnapshot(ConfigSnapshot):
+    """决策引擎趋势捕获/regime 阈值（FundFlowDecisionEngine._trend_capture_config）"""
+
+    adx_trend_on: float
+    adx_range_on: float
+    adx_no_trade_low: float
+    adx_no_trade_high: float
+    atr_pct_min: float
+    atr_pct_max: float
+    long_open_threshold: float
+    short_open_threshold: float
+    score_15m_weight: float
+    score_5m_weight: float
+    tf_exec: str
+    tf_anchor: str
+    entry_hard_filter: bool
+    entry_require_macd_trigger: bool
+    entry_allow_macd_early: bool
+    entry_soft_penalty_macd_early: float
+    entry_soft_penalty_no_macd: float
+    entry_soft_penalty_no_kdj: float
+    trend_pending_adx_min: float
+    trend_pending_adx_slope_min: float
+    trend_pending_ema_expand_min: float
+    trend_pending_min_score: float
+    trend_capture_enabled: bool
+    trend_capture_min_score: float
+    trend_capture_min_gap: float
+    trend_capture_trial_position_mult: float
+    trend_capture_confirm_position_mult: float
+    trend_capture_trap_soft_max: float
+    trend_capture_phantom_soft_max: float
+    trend_capture_spread_soft_max: float
+    range_veto_by_trend_enabled: bool
+    range_veto_trend_pending_score: float
+    range_veto_trend_capture_score: float
+    pretrade_entry_threshold_std: float
+    pretrade_entry_threshold_capture: float
+    pretrade_volatility_cap_std: float
+    pretrade_volatility_cap_capture: float
+
+
+@dataclass(frozen=True, slots=True)
+class BotConfigSnapshots:
+    """TradingBot 每次（重新）加载配置时构建的一组快照"""
+
+    risk: RiskConfigSnapshot
+    protection_sla: ProtectionSlaConfigSnapshot
+    pretrade_risk_gate: PretradeRiskGateConfigSnapshot
+    dca: DcaConfigSnapshot
+    ma10_macd_confluence: Ma10MacdConfluenceConfigSnapshot
+
+
+__all__ = [
+    "BotConfigSnapshots",
+    "ConfigSnapshot",
+    "ConfigSnapshotError",
+    "DcaConfigSnapshot",
+    "Ma10MacdConfluenceConfigSnapshot",
+    "PretradeRiskGateConfigSnapshot",
+    "ProtectionSlaConfigSnapshot",
+    "RiskConfigSnapshot",
+    "TrendCaptureConfigSnapshot",
+]
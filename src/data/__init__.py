@@ -1,7 +1,8 @@
 """数据获取层"""
 
 from .account_data import AccountDataManager
+from .account_snapshot import AccountSnapshotService
 from .market_data import MarketDataManager
 from .position_data import PositionDataManager
 
-__all__ = ["MarketDataManager", "PositionDataManager", "AccountDataManager"]
+__all__ = ["MarketDataManager", "PositionDataManager", "AccountDataManager", "AccountSnapshotService"]
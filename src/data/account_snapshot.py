@@ -0,0 +1,236 @@
+"""
+账户快照服务
+按交易周期缓存 持仓 / 普通挂单 / 条件单，各类读取方共享一次签名 REST 拉取
+
+核心规则:
+1. 每类数据整账户拉取一次（不带 symbol），按 symbol / (symbol, side) 建索引
+2. 周期内（begin_cycle ~ end_cycle）复用快照，超过 cycle_max_age_seconds 自动重拉；
+   周期可嵌套（调度循环外层开启、run_cycle 内层开启），只有最外层 begin_cycle 清空快照
+3. 周期外默认直通（idle_max_age_seconds=0），保持原有实时语义
+4. 下单/撤单等签名写请求完成后（BinanceBroker 写回调）：
+   - 持仓：整体失效，下次读取重拉
+   - 挂单：仅标记该 symbol 脏，下次读取该 symbol 时单独拉取并补丁回索引
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+_KIND_POSITIONS = "positions"
+_KIND_OPEN_ORDERS = "open_orders"
+_KIND_CONDITIONAL = "conditional_orders"
+
+
+class AccountSnapshotService:
+    """周期级账户快照（持仓 / 挂单 / 条件单）"""
+
+    def __init__(self, client, config: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            client: Binance API客户端（需提供 get_all_positions / get_open_orders / get_open_conditional_orders）
+            config: account_snapshot 配置段
+        """
+        cfg = config if isinstance(config, dict) else {}
+        self.client = client
+        self.enabled = bool(cfg.get("enabled", True))
+        self.cycle_max_age_seconds = max(0.0, self._to_float(cfg.get("cycle_max_age_seconds"), 30.0))
+        self.idle_max_age_seconds = max(0.0, self._to_float(cfg.get("idle_max_age_seconds"), 0.0))
+        self._lock = threading.RLock()
+        self._in_cycle = False
+        self._cycle_depth = 0
+        # kind -> (fetched_at, 原始列表)
+        self._raw: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+        # kind -> symbol -> 列表
+        self._by_symbol: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        # kind -> 需单独重拉的 symbol
+        self._dirty: Dict[str, set] = {_KIND_OPEN_ORDERS: set(), _KIND_CONDITIONAL: set()}
+        self._metrics = {
+            "fetches": 0,
+            "symbol_fetches": 0,
+            "hits": 0,
+            "invalidations": 0,
+            "fetch_errors": 0,
+        }
+        broker = getattr(client, "broker", None)
+        if self.enabled and broker is not None and hasattr(broker, "add_write_listener"):
+            broker.add_write_listener(self.on_write)
+
+    @staticmethod
+    def _to_float(value: Any, default: float = 0.0) -> float:
+        try:
+            return float(value)
+        except Exception:
+            return default
+
+    # ------------------------------------------------------------ lifecycle
+    def begin_cycle(self) -> None:
+        """周期开始：最外层丢弃上一周期的快照与统计；嵌套调用沿用外层快照"""
+        with self._lock:
+            if self._cycle_depth == 0:
+                self._clear_locked()
+                for key in self._metrics:
+                    self._metrics[key] = 0
+            self._cycle_depth += 1
+            self._in_cycle = True
+
+    def end_cycle(self) -> None:
+        with self._lock:
+            self._cycle_depth = max(0, self._cycle_depth - 1)
+            self._in_cycle = self._cycle_depth > 0
+
+    def invalidate(self, symbol: Optional[str] = None) -> None:
+        """
+        失效快照
+
+        symbol 为空时全部失效；否则持仓整体失效（positionRisk 为整账户拉取），
+        挂单/条件单仅该 symbol 在下次读取时单独重拉。
+        """
+        with self._lock:
+            self._metrics["invalidations"] += 1
+            if not symbol:
+                self._clear_locked()
+                return
+            symbol_up = str(symbol).upper()
+            self._drop_locked(_KIND_POSITIONS)
+            for kind in (_KIND_OPEN_ORDERS, _KIND_CONDITIONAL):
+                if kind in self._raw:
+                    self._dirty[kind].add(symbol_up)
+
+    def on_write(self, method: str, url: str, params: Dict[str, Any]) -> None:
+        """BinanceBroker 写回调：按请求中的 symbol 失效（批量下单等无 symbol 时全部失效）"""
+        symbol = params.get("symbol") if isinstance(params, dict) else None
+        self.invalidate(str(symbol) if symbol else None)
+
+    def _clear_locked(self) -> None:
+        self._raw.clear()
+        self._by_symbol.clear()
+        for dirty in self._dirty.values():
+            dirty.clear()
+
+    def _drop_locked(self, kind: str) -> None:
+        self._raw.pop(kind, None)
+        self._by_symbol.pop(kind, None)
+        if kind in self._dirty:
+            self._dirty[kind].clear()
+
+    # --------------------------------------------------------------- fetch
+    def _max_age(self) -> float:
+        return self.cycle_max_age_seconds if self._in_cycle else self.idle_max_age_seconds
+
+    def _is_fresh_locked(self, kind: str) -> bool:
+        item = self._raw.get(kind)
+        if item is None:
+            return False
+        max_age = self._max_age()
+        return max_age > 0 and (time.time() - item[0]) <= max_age
+
+    def _fetch(self, kind: str, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        if kind == _KIND_POSITIONS:
+            if not hasattr(self.client, "get_all_positions"):
+                return []
+            raw = self.client.get_all_positions()
+        elif kind == _KIND_OPEN_ORDERS:
+            raw = self.client.get_open_orders(symbol)
+        else:
+            if not hasattr(self.client, "get_open_conditional_orders"):
+                return []
+            raw = self.client.get_open_conditional_orders(symbol)
+        if not isinstance(raw, list):
+            return []
+        return [x for x in raw if isinstance(x, dict)]
+
+    def _load(self, kind: str) -> Dict[str, List[Dict[str, Any]]]:
+        """返回 kind 的 symbol 索引，必要时整账户重拉（拉取失败向上抛出）"""
+        with self._lock:
+            if self._is_fresh_locked(kind):
+                self._metrics["hits"] += 1
+                return self._by_symbol.get(kind, {})
+        rows = self._fetch(kind)
+        index: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            symbol = str(row.get("symbol") or "").upper()
+            if symbol:
+                index.setdefault(symbol, []).append(row)
+        with self._lock:
+            self._metrics["fetches"] += 1
+            self._raw[kind] = (time.time(), rows)
+            self._by_symbol[kind] = index
+            if kind in self._dirty:
+                self._dirty[kind].clear()
+            return index
+
+    def _orders_for(self, kind: str, symbol: Optional[str]) -> List[Dict[str, Any]]:
+        if not self.enabled:
+            return self._fetch(kind, symbol)
+        try:
+            index = self._load(kind)
+        except Exception:
+            with self._lock:
+                self._metrics["fetch_errors"] += 1
+            raise
+        if not symbol:
+            with self._lock:
+                return [row for rows in index.values() for row in rows]
+        symbol_up = str(symbol).upper()
+        with self._lock:
+            dirty = symbol_up in self._dirty.get(kind, set())
+        if dirty:
+            rows = self._fetch(kind, symbol_up)
+            with self._lock:
+                self._metrics["symbol_fetches"] += 1
+                self._dirty[kind].discard(symbol_up)
+                if kind in self._by_symbol:
+                    self._by_symbol[kind][symbol_up] = rows
+            return list(rows)
+        with self._lock:
+            return list(index.get(symbol_up, []))
+
+    # -------------------------------------------------------------- reads
+    def positions(self) -> List[Dict[str, Any]]:
+        """整账户 positionRisk 原始列表（含零仓位行）"""
+        if not self.enabled:
+            return self._fetch(_KIND_POSITIONS)
+        index = self._load(_KIND_POSITIONS)
+        with self._lock:
+            return [row for rows in index.values() for row in rows]
+
+    def positions_for(self, symbol: str, side: Optional[str] = None) -> List[Dict[str, Any]]:
+        """某 symbol 的非零持仓腿；side 为 LONG/SHORT 时按方向过滤"""
+        symbol_up = str(symbol or "").upper()
+        side_up = str(side or "").upper()
+        if not self.enabled:
+            rows = [r for r in self._fetch(_KIND_POSITIONS) if str(r.get("symbol") or "").upper() == symbol_up]
+        else:
+            index = self._load(_KIND_POSITIONS)
+            with self._lock:
+                rows = list(index.get(symbol_up, []))
+        out: List[Dict[str, Any]] = []
+        for row in rows:
+            amount = self._to_float(row.get("positionAmt"), 0.0)
+            if abs(amount) <= 0:
+                continue
+            if side_up in ("LONG", "SHORT"):
+                raw_side = str(row.get("positionSide") or "").upper()
+                resolved = raw_side if raw_side in ("LONG", "SHORT") else ("LONG" if amount > 0 else "SHORT")
+                if resolved != side_up:
+                    continue
+            out.append(row)
+        return out
+
+    def open_orders(self, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self._orders_for(_KIND_OPEN_ORDERS, symbol)
+
+    def conditional_orders(self, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self._orders_for(_KIND_CONDITIONAL, symbol)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._metrics,
+                "enabled": self.enabled,
+                "in_cycle": self._in_cycle,
+                "cached": sorted(self._raw.keys()),
+            }
+
+
+__all__ = ["AccountSnapshotService"]
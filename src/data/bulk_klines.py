@@ -0,0 +1,310 @@
+"""
+批量K线下载器 (Bulk Kline Downloader)
+
+多 symbol / 多时间段并发拉取公共K线，直接写入 KlineStore:
+1. 交易所信息每个市场只拉一次，symbol 归属与上市时间(onboardDate)建索引
+2. 按存储中缺失的区间切分页面（每页 page_limit 根），页面任务在线程池中并发执行
+3. 所有请求共享同一个请求权重预算（令牌桶，按分钟权重上限匀速发放），
+   并根据响应头 X-MBX-USED-WEIGHT-1M 在接近上限时主动退避
+4. 每页拉取后立即追加到存储（manifest 原子更新），中断后重跑只补拉缺失页面
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import requests
+
+from src.data.kline_store import KlineStore, interval_ms
+from src.data.klines_downloader import _get_api_endpoints, _request_klines
+
+KLINE_PATHS = {"spot": "/api/v3/klines", "futures": "/fapi/v1/klines"}
+EXCHANGE_INFO_PATHS = {"spot": "/api/v3/exchangeInfo", "futures": "/fapi/v1/exchangeInfo"}
+
+
+def kline_request_weight(kind: str, limit: int) -> int:
+    """单次 klines 请求的权重（与交易所文档的分档一致）"""
+    if kind == "spot":
+        return 2
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+class RequestWeightBudget:
+    """线程安全的请求权重令牌桶"""
+
+    def __init__(self, weight_per_minute: float = 1200.0, high_water_ratio: float = 0.9):
+        self.capacity = max(1.0, float(weight_per_minute))
+        self.refill_per_second = self.capacity / 60.0
+        self.high_water_ratio = min(1.0, max(0.1, float(high_water_ratio)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    def acquire(self, weight: float = 1.0) -> None:
+        """阻塞直到预算中有足够权重"""
+        weight = min(float(weight), self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait_s = max(0.0, self._blocked_until - now)
+                if wait_s <= 0 and self._tokens >= weight:
+                    self._tokens -= weight
+                    return
+                if wait_s <= 0:
+                    wait_s = (weight - self._tokens) / self.refill_per_second
+                self.waited_seconds += wait_s
+            time.sleep(min(wait_s, 1.0))
+
+    def observe_used_weight(self, used: Optional[float]) -> None:
+        """交易所回报的已用权重接近上限时，暂停发放直到下一分钟窗口"""
+        if used is None:
+            return
+        if float(used) >= self.capacity * self.high_water_ratio:
+            now = time.time()
+            with self._lock:
+                self._tokens = 0.0
+                self._blocked_until = max(self._blocked_until, time.monotonic() + (60.0 - now % 60.0))
+
+
+class BulkKlineDownloader:
+    """共享权重预算的并发、可续传K线批量下载器"""
+
+    def __init__(
+        self,
+        store: KlineStore,
+        max_workers: int = 8,
+        page_limit: int = 1000,
+        budget: Optional[RequestWeightBudget] = None,
+        endpoints: Optional[Dict[str, List[str]]] = None,
+        max_retries: int = 3,
+    ):
+        """
+        Args:
+            store: K线存储（页面直接写入）
+            max_workers: 并发请求数
+            page_limit: 每页K线数（交易所上限 1000）
+            budget: 请求权重预算，默认 1200/分钟
+            endpoints: 覆盖 {"spot": [...], "futures": [...]} 接入点
+        """
+        self.store = store
+        self.max_workers = max(1, int(max_workers))
+        self.page_limit = min(1000, max(1, int(page_limit)))
+        self.budget = budget or RequestWeightBudget()
+        self.max_retries = max(1, int(max_retries))
+        self._endpoints = dict(endpoints or {})
+        self._local = threading.local()
+        self._series_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._symbol_index: Dict[str, Dict[str, Any]] = {}
+        self._index_loaded = False
+
+    # ------------------------------------------------------------- helpers
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+        return session
+
+    def _endpoints_for(self, kind: str) -> List[str]:
+        return self._endpoints.get(kind) or _get_api_endpoints(kind)
+
+    def _series_lock(self, symbol: str, interval: str) -> threading.Lock:
+        key = (symbol, interval)
+        with self._locks_guard:
+            lock = self._series_locks.get(key)
+            if lock is None:
+                lock = threading.Lock()
+                self._series_locks[key] = lock
+            return lock
+
+    def _get(self, kind: str, path: str, params: Dict[str, Any], weight: float) -> Optional[requests.Response]:
+        self.budget.acquire(weight)
+        resp = _request_klines(self._session(), self._endpoints_for(kind), path, params, self.max_retries)
+        if resp is not None:
+            try:
+                used = resp.headers.get("X-MBX-USED-WEIGHT-1M") or resp.headers.get("x-mbx-used-weight-1m")
+                self.budget.observe_used_weight(float(used) if used is not None else None)
+            except (TypeError, ValueError):
+                pass
+        return resp
+
+    # -------------------------------------------------------------- symbols
+    def load_symbol_index(self) -> Dict[str, Dict[str, Any]]:
+        """每个市场只拉一次 exchangeInfo，建立 symbol -> {kind, onboard_ms} 索引（现货优先）"""
+        if self._index_loaded:
+            return self._symbol_index
+        index: Dict[str, Dict[str, Any]] = {}
+        for kind in ("futures", "spot"):
+            resp = self._get(kind, EXCHANGE_INFO_PATHS[kind], {}, 10 if kind == "spot" else 1)
+            if resp is None or resp.status_code != 200:
+                print(f"[WARN] {kind} exchangeInfo 获取失败")
+                continue
+            for item in resp.json().get("symbols", []) or []:
+                if item.get("status") != "TRADING":
+                    continue
+                entry = {"kind": kind, "onboard_ms": None}
+                if kind == "futures" and item.get("onboardDate"):
+                    entry["onboard_ms"] = int(item["onboardDate"])
+                index[str(item.get("symbol"))] = entry
+        self._symbol_index = index
+        self._index_loaded = True
+        return index
+
+    # ----------------------------------------------------------------- plan
+    def plan_pages(
+        self,
+        symbol: str,
+        interval: str,
+        start_ms: int,
+        end_ms: int,
+    ) -> List[Tuple[int, int]]:
+        """把存储中缺失的区间切成页面 [(page_start, page_end)]"""
+        step = interval_ms(interval)
+        meta = self.load_symbol_index().get(symbol) or {}
+        onboard_ms = meta.get("onboard_ms")
+        if onboard_ms and onboard_ms > start_ms:
+            listed = (int(onboard_ms) // step) * step
+            if listed - step >= start_ms:
+                self.store.mark_empty(symbol, interval, (start_ms // step) * step, listed - step)
+            start_ms = listed
+        span = step * self.page_limit
+        pages: List[Tuple[int, int]] = []
+        for gap_start, gap_end in self.store.missing_ranges(symbol, interval, start_ms, end_ms):
+            cur = gap_start
+            while cur <= gap_end:
+                pages.append((cur, min(gap_end, cur + span - step)))
+                cur += span
+        return pages
+
+    # ---------------------------------------------------------------- fetch
+    def _fetch_page(self, symbol: str, interval: str, kind: str, page: Tuple[int, int], closed_before: int) -> int:
+        page_start, page_end = page
+        params = {
+            "symbol": symbol,
+            "interval": interval,
+            "startTime": int(page_start),
+            "endTime": int(page_end),
+            "limit": self.page_limit,
+        }
+        resp = self._get(kind, KLINE_PATHS[kind], params, kline_request_weight(kind, self.page_limit))
+        if resp is None or resp.status_code != 200:
+            status = None if resp is None else resp.status_code
+            raise RuntimeError(f"{symbol} {interval} page {page_start} failed: status={status}")
+        data = resp.json() or []
+        step = interval_ms(interval)
+        with self._series_lock(symbol, interval):
+            if not data:
+                if page_end < closed_before:
+                    self.store.mark_empty(symbol, interval, page_start, page_end)
+                return 0
+            block = np.asarray([[float(v) for v in row[:6]] for row in data], dtype=np.float64).T
+            added = self.store.append(symbol, interval, block)
+            first_ms, last_ms = int(block[0, 0]), int(block[0, -1])
+            if first_ms > page_start and page_start < closed_before:
+                self.store.mark_empty(symbol, interval, page_start, first_ms - step)
+            # 页内缺口（交易所停机）同样记为无数据，续传时不再补拉
+            for i in np.nonzero(np.diff(block[0]) > step)[0]:
+                self.store.mark_empty(symbol, interval, int(block[0, i]) + step, int(block[0, i + 1]) - step)
+            if last_ms + step <= page_end < closed_before and len(data) < self.page_limit:
+                self.store.mark_empty(symbol, interval, last_ms + step, page_end)
+            return added
+
+    def download(
+        self,
+        symbols: List[str],
+        interval: str,
+        start_ms: int,
+        end_ms: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        并发补齐 symbols 在 [start_ms, end_ms] 的K线，返回汇总报告
+
+        失败页面不会中断其它任务；重跑时根据存储的缺失区间自动续传。
+        """
+        started = time.perf_counter()
+        step = interval_ms(interval)
+        end_ms = int(end_ms if end_ms is not None else time.time() * 1000)
+        closed_before = end_ms - 2 * step
+        index = self.load_symbol_index()
+
+        tasks: List[Tuple[str, str, Tuple[int, int]]] = []
+        skipped: List[str] = []
+        for raw in symbols:
+            symbol = str(raw).upper()
+            meta = index.get(symbol)
+            if meta is None:
+                skipped.append(symbol)
+                continue
+            for page in self.plan_pages(symbol, interval, int(start_ms), end_ms):
+                tasks.append((symbol, meta["kind"], page))
+
+        rows: Dict[str, int] = {}
+        errors: List[str] = []
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="kline-bulk") as pool:
+            futures = {
+                pool.submit(self._fetch_page, symbol, interval, kind, page, closed_before): symbol
+                for symbol, kind, page in tasks
+            }
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    rows[symbol] = rows.get(symbol, 0) + int(future.result())
+                except Exception as e:
+                    errors.append(str(e))
+
+        report = {
+            "symbols": len(symbols) - len(skipped),
+            "skipped": skipped,
+            "pages": len(tasks),
+            "failed_pages": len(errors),
+            "rows_added": sum(rows.values()),
+            "rows_by_symbol": rows,
+            "errors": errors[:20],
+            "budget_wait_s": round(self.budget.waited_seconds, 2),
+            "elapsed_s": round(time.perf_counter() - started, 2),
+        }
+        print(
+            f"[OK] 批量K线下载 interval={interval}: symbols={report['symbols']} pages={report['pages']} "
+            f"failed={report['failed_pages']} rows=+{report['rows_added']} elapsed={report['elapsed_s']}s"
+        )
+        if skipped:
+            print(f"[WARN] 跳过不存在的交易对: {skipped}")
+        return report
+
+
+def bulk_download(
+    symbols: List[str],
+    interval: str,
+    days: int,
+    data_dir: str = "data",
+    max_workers: int = 8,
+    weight_per_minute: Optional[float] = None,
+) -> Dict[str, Any]:
+    """下载最近 days 天的K线到 <data_dir>/klines（可重复执行以续传）"""
+    store = KlineStore(os.path.join(data_dir, "klines"))
+    budget = RequestWeightBudget(
+        weight_per_minute if weight_per_minute is not None else float(os.getenv("BINANCE_KLINE_WEIGHT_PER_MINUTE", 1200))
+    )
+    downloader = BulkKlineDownloader(store, max_workers=max_workers, budget=budget)
+    end_ms = int(time.time() * 1000)
+    return downloader.download(symbols, interval, end_ms - int(days) * 86_400_000, end_ms)
+
+
+__all__ = ["BulkKlineDownloader", "RequestWeightBudget", "bulk_download", "kline_request_weight"]
@@ -0,0 +1,490 @@
+"""
+成交增量入库 (Fill Ingestor)
+
+平仓后按订单逐个查询 userTrades 会在关键路径上增加签名请求，且漏掉非本程序跟踪订单的成交。
+本模块改为后台增量同步:
+1. 每个 symbol 持久化 fromId 游标（SQLite），按批拉取 userTrades；首次按 bootstrap_lookback_seconds 时间窗口引导。
+   引导窗口内无成交时记录时间游标（last_trade_id=-1, updated_ms=已覆盖到的时间），之后按 startTime 续拉，不再重复引导
+2. 成交按 (symbol, 成交ID) 去重写入带索引的本地库（按订单 / 时间查询）
+3. 后台线程只按 interval_seconds 轮询活跃 symbol（持仓中 / 最近下单或 request_refresh / 最近有新成交）；
+   其余 symbol 每次无成交后轮询间隔翻倍，最长 idle_max_interval_seconds
+4. 平仓处理 / 盈亏归因通过 fills_for_order() 查本地库；未命中时只按 orderId 单独拉取该订单一次（不阻塞等待后台同步）
+
+配置（fill_ingestion）:
+    enabled                     默认 true
+    interval_seconds            活跃 symbol 的轮询间隔，默认 10
+    active_window_seconds       下单 / 新成交后保持活跃的时长，默认 300
+    idle_max_interval_seconds   空闲 symbol 的最长轮询间隔，默认 900
+    batch_limit                 单页条数（userTrades 上限 1000），默认 1000
+    max_pages                   单个 symbol 单次最多翻页数，默认 5
+    bootstrap_lookback_seconds  无游标时回溯的时间窗口，默认 86400（交易所上限 7 天）
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+USER_TRADES_MAX_LIMIT = 1000
+USER_TRADES_MAX_LOOKBACK_SECONDS = 7 * 24 * 3600
+# 时间游标续拉时向前重叠的时长（成交入库按成交 ID 去重）
+EMPTY_CURSOR_OVERLAP_MS = 60_000
+
+
+class FillStore:
+    """本地成交库：fills 按 (symbol, trade_id) 唯一，cursors 记录每个 symbol 已入库的最大成交 ID"""
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        parent = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(parent, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._init_schema()
+
+    def _init_schema(self) -> None:
+        with self._lock, self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS fills (
+                    symbol TEXT NOT NULL,
+                    trade_id INTEGER NOT NULL,
+                    order_id INTEGER NOT NULL,
+                    time_ms INTEGER NOT NULL,
+                    side TEXT,
+                    position_side TEXT,
+                    price REAL,
+                    qty REAL,
+                    quote_qty REAL,
+                    commission REAL,
+                    commission_asset TEXT,
+                    realized_pnl REAL,
+                    raw_json TEXT NOT NULL,
+                    PRIMARY KEY (symbol, trade_id)
+                );
+                CREATE INDEX IF NOT EXISTS idx_fills_order ON fills(symbol, order_id);
+                CREATE INDEX IF NOT EXISTS idx_fills_time ON fills(symbol, time_ms);
+                CREATE TABLE IF NOT EXISTS cursors (
+                    symbol TEXT PRIMARY KEY,
+                    last_trade_id INTEGER NOT NULL,
+                    updated_ms INTEGER NOT NULL
+                );
+                """
+            )
+
+    @staticmethod
+    def _to_float(value: Any, default: float = 0.0) -> float:
+        try:
+            return float(value)
+        except Exception:
+            return default
+
+    @staticmethod
+    def _to_int(value: Any, default: int = 0) -> int:
+        try:
+            return int(float(value))
+        except Exception:
+            return default
+
+    def get_cursor(self, symbol: str) -> Optional[int]:
+        """已入库的最大成交 ID；-1 表示已引导但尚无成交，None 表示从未同步"""
+        state = self.get_cursor_state(symbol)
+        return state[0] if state is not None else None
+
+    def get_cursor_state(self, symbol: str) -> Optional[Tuple[int, int]]:
+        """(last_trade_id, updated_ms)；last_trade_id=-1 时 updated_ms 为无成交已覆盖到的时间"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_trade_id, updated_ms FROM cursors WHERE symbol = ?", (symbol,)
+            ).fetchone()
+        return (int(row["last_trade_id"]), int(row["updated_ms"])) if row else None
+
+    def mark_empty(self, symbol: str, covered_ms: int) -> None:
+        """记录无成交的时间游标；已有成交游标时不改动"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO cursors (symbol, last_trade_id, updated_ms) VALUES (?, -1, ?)
+                ON CONFLICT(symbol) DO UPDATE SET updated_ms = MAX(cursors.updated_ms, excluded.updated_ms)
+                WHERE cursors.last_trade_id < 0
+                """,
+                (symbol, int(covered_ms)),
+            )
+
+    def insert_fills(self, symbol: str, fills: Iterable[Dict[str, Any]], advance_cursor: bool = True) -> List[Dict[str, Any]]:
+        """
+        写入成交并推进游标（同一事务）；返回新写入的成交（已存在的按成交 ID 去重跳过）
+
+        advance_cursor=False 用于按订单单独补拉：游标之前可能还有未入库的其他成交，不能跳过。
+        """
+        inserted: List[Dict[str, Any]] = []
+        max_id: Optional[int] = None
+        with self._lock, self._conn:
+            for fill in fills:
+                trade_id = self._to_int(fill.get("id"), -1)
+                if trade_id < 0:
+                    continue
+                max_id = trade_id if max_id is None else max(max_id, trade_id)
+                cur = self._conn.execute(
+                    """
+                    INSERT OR IGNORE INTO fills (
+                        symbol, trade_id, order_id, time_ms, side, position_side, price, qty,
+                        quote_qty, commission, commission_asset, realized_pnl, raw_json
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        symbol,
+                        trade_id,
+                        self._to_int(fill.get("orderId"), -1),
+                        self._to_int(fill.get("time"), 0),
+                        str(fill.get("side") or "").upper(),
+                        str(fill.get("positionSide") or "").upper(),
+                        self._to_float(fill.get("price")),
+                        self._to_float(fill.get("qty")),
+                        self._to_float(fill.get("quoteQty")),
+                        self._to_float(fill.get("commission")),
+                        str(fill.get("commissionAsset") or ""),
+                        self._to_float(fill.get("realizedPnl")),
+                        json.dumps(fill, ensure_ascii=False, separators=(",", ":")),
+                    ),
+                )
+                if cur.rowcount:
+                    inserted.append(fill)
+            if max_id is not None and advance_cursor:
+                self._conn.execute(
+                    """
+                    INSERT INTO cursors (symbol, last_trade_id, updated_ms) VALUES (?, ?, ?)
+                    ON CONFLICT(symbol) DO UPDATE SET
+                        last_trade_id = MAX(cursors.last_trade_id, excluded.last_trade_id),
+                        updated_ms = excluded.updated_ms
+                    """,
+                    (symbol, max_id, int(time.time() * 1000)),
+                )
+        return inserted
+
+    def _rows_to_fills(self, rows: List[sqlite3.Row]) -> List[Dict[str, Any]]:
+        out: List[Dict[str, Any]] = []
+        for row in rows:
+            try:
+                out.append(json.loads(row["raw_json"]))
+            except Exception:
+                continue
+        return out
+
+    def fills_for_order(self, symbol: str, order_id: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT raw_json FROM fills WHERE symbol = ? AND order_id = ? ORDER BY trade_id",
+                (symbol, int(order_id)),
+            ).fetchall()
+        return self._rows_to_fills(rows)
+
+    def fills_since(self, symbol: str, since_ms: int, limit: int = 1000) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT raw_json FROM fills WHERE symbol = ? AND time_ms >= ? ORDER BY trade_id LIMIT ?",
+                (symbol, int(since_ms), int(limit)),
+            ).fetchall()
+        return self._rows_to_fills(rows)
+
+    def count(self, symbol: Optional[str] = None) -> int:
+        with self._lock:
+            if symbol:
+                row = self._conn.execute("SELECT COUNT(*) AS n FROM fills WHERE symbol = ?", (symbol,)).fetchone()
+            else:
+                row = self._conn.execute("SELECT COUNT(*) AS n FROM fills").fetchone()
+        return int(row["n"]) if row else 0
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+
+
+class FillIngestor:
+    """userTrades 增量同步到 FillStore（后台线程 + 按需唤醒）"""
+
+    def __init__(
+        self,
+        client,
+        store: FillStore,
+        config: Optional[Dict[str, Any]] = None,
+        on_new_fills: Optional[Callable[[str, List[Dict[str, Any]]], None]] = None,
+    ) -> None:
+        """
+        Args:
+            client: Binance API客户端（需提供 broker.request / broker.um_base）
+            store: 本地成交库
+            config: fill_ingestion 配置段
+            on_new_fills: 拉取到新成交时的回调 (symbol, fills)；首次引导窗口中本进程启动前的历史成交不回调
+        """
+        cfg = config if isinstance(config, dict) else {}
+        self.client = client
+        self.store = store
+        self.on_new_fills = on_new_fills
+        self.enabled = bool(cfg.get("enabled", True))
+        self.interval_seconds = max(1.0, self._to_float(cfg.get("interval_seconds"), 10.0))
+        self.active_window_seconds = max(0.0, self._to_float(cfg.get("active_window_seconds"), 300.0))
+        self.idle_max_interval_seconds = max(
+            self.interval_seconds, self._to_float(cfg.get("idle_max_interval_seconds"), 900.0)
+        )
+        self.batch_limit = max(1, min(USER_TRADES_MAX_LIMIT, int(self._to_float(cfg.get("batch_limit"), USER_TRADES_MAX_LIMIT))))
+        self.max_pages = max(1, int(self._to_float(cfg.get("max_pages"), 5)))
+        self.bootstrap_lookback_seconds = max(
+            60.0, min(float(USER_TRADES_MAX_LOOKBACK_SECONDS), self._to_float(cfg.get("bootstrap_lookback_seconds"), 86400.0))
+        )
+        self._ingest_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._pending: set = set()
+        # 轮询调度（monotonic）：持仓中的 symbol、活跃截止时间、空闲退避间隔与下次到期时间
+        self._held: set = set()
+        self._active_until: Dict[str, float] = {}
+        self._idle_interval: Dict[str, float] = {}
+        self._next_due: Dict[str, float] = {}
+        self._created_ms = int(time.time() * 1000)
+        self._thread: Optional[threading.Thread] = None
+        self._symbols_provider: Optional[Callable[[], List[str]]] = None
+        self._stats: Dict[str, Any] = {
+            "requests": 0,
+            "fetch_errors": 0,
+            "ingested": 0,
+            "bootstraps": 0,
+            "lookups": 0,
+            "lookup_hits": 0,
+            "lookup_fetches": 0,
+            "passes": 0,
+            "idle_skips": 0,
+        }
+
+    @staticmethod
+    def _to_float(value: Any, default: float = 0.0) -> float:
+        try:
+            return float(value)
+        except Exception:
+            return default
+
+    def _bump(self, key: str, n: int = 1) -> None:
+        with self._state_lock:
+            self._stats[key] = self._stats.get(key, 0) + n
+
+    # ------------------------------------------------------------ fetch
+    def _fetch_page(self, symbol: str, params: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """拉取一页 userTrades；失败返回 None（区别于空页）"""
+        broker = self.client.broker
+        base = broker.um_base()
+        path = "/papi/v1/um/userTrades" if "papi" in base else "/fapi/v1/userTrades"
+        query = {"symbol": symbol, "limit": self.batch_limit, **params}
+        self._bump("requests")
+        try:
+            resp = broker.request("GET", f"{base}{path}", params=query, signed=True, allow_error=True)
+            if int(getattr(resp, "status_code", 500) or 500) >= 400:
+                self._bump("fetch_errors")
+                return None
+            data = resp.json()
+        except Exception:
+            self._bump("fetch_errors")
+            return None
+        if isinstance(data, dict):
+            for key in ("rows", "trades", "data"):
+                if isinstance(data.get(key), list):
+                    data = data[key]
+                    break
+        if not isinstance(data, list):
+            self._bump("fetch_errors")
+            return None
+        return [x for x in data if isinstance(x, dict)]
+
+    def ingest_symbol(self, symbol: str) -> List[Dict[str, Any]]:
+        """按游标增量拉取单个 symbol 的成交并入库，返回新成交"""
+        symbol = str(symbol or "").upper()
+        if not symbol:
+            return []
+        with self._ingest_lock:
+            pull_ms = int(time.time() * 1000)
+            state = self.store.get_cursor_state(symbol)
+            bootstrap = state is None
+            if bootstrap:
+                self._bump("bootstraps")
+                params: Dict[str, Any] = {"startTime": int((time.time() - self.bootstrap_lookback_seconds) * 1000)}
+            elif state[0] < 0:
+                params = {"startTime": max(0, state[1] - EMPTY_CURSOR_OVERLAP_MS)}
+            else:
+                params = {"fromId": state[0] + 1}
+            new_fills: List[Dict[str, Any]] = []
+            ok = True
+            for _ in range(self.max_pages):
+                page = self._fetch_page(symbol, params)
+                if page is None:
+                    ok = False
+                    break
+                if not page:
+                    break
+                new_fills.extend(self.store.insert_fills(symbol, page))
+                if len(page) < self.batch_limit:
+                    break
+                last_id = max(int(self._to_float(x.get("id"), 0)) for x in page)
+                params = {"fromId": last_id + 1}
+            if ok and "startTime" in params:
+                # 按时间拉取且无成交：记录时间游标，下次从这里续拉而不是重新引导
+                self.store.mark_empty(symbol, pull_ms)
+        if new_fills:
+            self._bump("ingested", len(new_fills))
+        # 引导窗口里本进程启动前的历史成交只入库，不回调
+        emitted = new_fills if not bootstrap else [f for f in new_fills if int(self._to_float(f.get("time"), 0)) >= self._created_ms]
+        self._emit(symbol, emitted)
+        return new_fills
+
+    def _emit(self, symbol: str, fills: List[Dict[str, Any]]) -> None:
+        if not fills or self.on_new_fills is None:
+            return
+        try:
+            self.on_new_fills(symbol, fills)
+        except Exception as e:
+            print(f"⚠️ {symbol} 成交回调异常: {e}")
+
+    def ingest(self, symbols: Iterable[str]) -> int:
+        total = 0
+        for symbol in symbols:
+            total += len(self.ingest_symbol(symbol))
+        return total
+
+    # ------------------------------------------------------------ background
+    def start(self, symbols_provider: Callable[[], List[str]]) -> None:
+        """启动后台同步线程；symbols_provider 每轮返回需要同步的交易对"""
+        if not self.enabled or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._symbols_provider = symbols_provider
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="fill-ingestor", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def request_refresh(self, symbol: Optional[str] = None) -> None:
+        """唤醒后台线程立即同步（symbol 不在轮询列表中时也会被拉取），并把 symbol 标为活跃"""
+        if symbol:
+            symbol = str(symbol).upper()
+            with self._state_lock:
+                self._pending.add(symbol)
+            self.mark_active(symbol)
+        self._wake.set()
+
+    def mark_active(self, symbol: str) -> None:
+        """下单 / 新成交后的 active_window_seconds 内按 interval_seconds 轮询"""
+        symbol = str(symbol or "").upper()
+        with self._state_lock:
+            self._active_until[symbol] = time.monotonic() + self.active_window_seconds
+            self._idle_interval.pop(symbol, None)
+            self._next_due.pop(symbol, None)
+
+    def set_held_symbols(self, symbols: Iterable[str]) -> None:
+        """持仓中的 symbol（可能被 TP/SL 等条件单成交）始终按 interval_seconds 轮询"""
+        held = {str(s).upper() for s in symbols if s}
+        with self._state_lock:
+            for symbol in held - self._held:
+                self._next_due.pop(symbol, None)
+                self._idle_interval.pop(symbol, None)
+            self._held = held
+
+    def _is_due(self, symbol: str, now: float) -> bool:
+        with self._state_lock:
+            return now >= self._next_due.get(symbol, 0.0)
+
+    def _schedule_next(self, symbol: str, got_fills: bool) -> None:
+        now = time.monotonic()
+        if got_fills:
+            self.mark_active(symbol)
+        with self._state_lock:
+            if symbol in self._held or now < self._active_until.get(symbol, 0.0):
+                interval = self.interval_seconds
+                self._idle_interval.pop(symbol, None)
+            else:
+                # 空闲：每次无成交后间隔翻倍
+                prev = self._idle_interval.get(symbol)
+                interval = self.interval_seconds if prev is None else min(self.idle_max_interval_seconds, prev * 2.0)
+                self._idle_interval[symbol] = interval
+            # 轮询唤醒有抖动，提前 10% 视为到期
+            self._next_due[symbol] = now + interval * 0.9
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.interval_seconds)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            with self._state_lock:
+                pending = set(self._pending)
+                self._pending.clear()
+            try:
+                provided = list(self._symbols_provider() or []) if self._symbols_provider else []
+            except Exception:
+                provided = []
+            # 被显式唤醒的 symbol 优先
+            ordered = list(dict.fromkeys([*sorted(pending), *(str(s).upper() for s in provided)]))
+            now = time.monotonic()
+            for symbol in ordered:
+                if self._stop.is_set():
+                    break
+                if symbol not in pending and not self._is_due(symbol, now):
+                    self._bump("idle_skips")
+                    continue
+                try:
+                    got_fills = bool(self.ingest_symbol(symbol))
+                except Exception as e:
+                    got_fills = False
+                    self._bump("fetch_errors")
+                    print(f"⚠️ {symbol} 成交同步失败: {e}")
+                self._schedule_next(symbol, got_fills)
+            self._bump("passes")
+
+    # ------------------------------------------------------------ lookup
+    def fills_for_order(self, symbol: str, order_id: int) -> List[Dict[str, Any]]:
+        """
+        查本地库中某订单的成交；未命中时按 orderId 单独拉取一次并入库（不推进游标、不等待后台同步）
+
+        单独拉到的成交会回调 on_new_fills：之后的增量同步会把它们当作已入库跳过。
+        拉取失败返回空列表，由调用方回退。
+        """
+        symbol = str(symbol or "").upper()
+        self._bump("lookups")
+        fills = self.store.fills_for_order(symbol, order_id)
+        if fills:
+            self._bump("lookup_hits")
+            return fills
+        self._bump("lookup_fetches")
+        page = self._fetch_page(symbol, {"orderId": int(order_id)})
+        if not page:
+            return []
+        inserted = self.store.insert_fills(symbol, page, advance_cursor=False)
+        if inserted:
+            self._bump("ingested", len(inserted))
+            self._emit(symbol, inserted)
+        return self.store.fills_for_order(symbol, order_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._state_lock:
+            stats = dict(self._stats)
+        stats["running"] = self.running
+        stats["stored"] = self.store.count()
+        return stats
+
+
+__all__ = ["FillIngestor", "FillStore"]
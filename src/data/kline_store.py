@@ -0,0 +1,285 @@
+"""
+历史K线分区存储 (Kline Store)
+
+布局:
+    <root>/<SYMBOL>/<interval>/<YYYY-MM>.npy   每月一个分区，float64 列式数组 shape=(6, N)
+    <root>/<SYMBOL>/<interval>/manifest.json   分区清单（行数/首尾时间）与已确认无数据的区间
+
+列顺序见 COLUMNS（open_time 为毫秒时间戳）。分区按 open_time 升序、去重；写入走临时文件 + os.replace。
+读取使用 np.load(mmap_mode="r")：单分区直接零拷贝映射，多分区只做一次拼接。
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ("open_time", "open", "high", "low", "close", "volume")
+PRICE_COLUMNS = COLUMNS[1:]
+MANIFEST_NAME = "manifest.json"
+
+INTERVAL_MS = {
+    "1m": 60_000,
+    "3m": 180_000,
+    "5m": 300_000,
+    "15m": 900_000,
+    "30m": 1_800_000,
+    "1h": 3_600_000,
+    "2h": 7_200_000,
+    "4h": 14_400_000,
+    "1d": 86_400_000,
+}
+
+
+def interval_ms(interval: str) -> int:
+    if interval in INTERVAL_MS:
+        return INTERVAL_MS[interval]
+    raise ValueError(f"unsupported interval: {interval}")
+
+
+def _month_key(ts_ms: int) -> str:
+    return datetime.fromtimestamp(ts_ms / 1000.0, tz=timezone.utc).strftime("%Y-%m")
+
+
+def _merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class KlineStore:
+    """按 symbol / interval / 月 分区的二进制K线存储"""
+
+    def __init__(self, root_dir: str = os.path.join("data", "klines")):
+        self.root_dir = root_dir
+
+    # ------------------------------------------------------------- paths
+    def series_dir(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root_dir, str(symbol).upper(), interval)
+
+    def _partition_path(self, symbol: str, interval: str, month: str) -> str:
+        return os.path.join(self.series_dir(symbol, interval), f"{month}.npy")
+
+    def read_manifest(self, symbol: str, interval: str) -> Dict[str, Any]:
+        path = os.path.join(self.series_dir(symbol, interval), MANIFEST_NAME)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                data.setdefault("partitions", {})
+                data.setdefault("empty_ranges", [])
+                return data
+        except (OSError, ValueError):
+            pass
+        return {
+            "symbol": str(symbol).upper(),
+            "interval": interval,
+            "columns": list(COLUMNS),
+            "partitions": {},
+            "empty_ranges": [],
+        }
+
+    def _write_manifest(self, symbol: str, interval: str, manifest: Dict[str, Any]) -> None:
+        series_dir = self.series_dir(symbol, interval)
+        os.makedirs(series_dir, exist_ok=True)
+        path = os.path.join(series_dir, MANIFEST_NAME)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp, path)
+
+    # ------------------------------------------------------------- write
+    def append(self, symbol: str, interval: str, block: np.ndarray) -> int:
+        """
+        合并写入一段K线（shape=(6, N)，列顺序同 COLUMNS），返回新增行数
+
+        与已有分区按 open_time 去重（新数据覆盖旧数据），只重写受影响的月份分区。
+        """
+        block = np.asarray(block, dtype=np.float64)
+        if block.ndim != 2 or block.shape[0] != len(COLUMNS):
+            raise ValueError(f"kline block must have shape ({len(COLUMNS)}, N), got {block.shape}")
+        if block.shape[1] == 0:
+            return 0
+        manifest = self.read_manifest(symbol, interval)
+        series_dir = self.series_dir(symbol, interval)
+        os.makedirs(series_dir, exist_ok=True)
+        months = np.array([_month_key(int(ts)) for ts in block[0]])
+        added = 0
+        for month in sorted(set(months.tolist())):
+            part = block[:, months == month]
+            path = self._partition_path(symbol, interval, month)
+            before = 0
+            if os.path.exists(path):
+                existing = np.load(path)
+                before = existing.shape[1]
+                part = np.concatenate([existing, part], axis=1)
+            # 稳定排序后保留每个 open_time 的最后一条（即新写入的数据）
+            order = np.argsort(part[0], kind="stable")
+            part = part[:, order]
+            keep = np.ones(part.shape[1], dtype=bool)
+            keep[:-1] = part[0, 1:] != part[0, :-1]
+            part = np.ascontiguousarray(part[:, keep])
+            tmp = path + ".tmp.npy"
+            np.save(tmp, part)
+            os.replace(tmp, path)
+            added += part.shape[1] - before
+            manifest["partitions"][month] = {
+                "rows": int(part.shape[1]),
+                "first_ms": int(part[0, 0]),
+                "last_ms": int(part[0, -1]),
+            }
+        self._write_manifest(symbol, interval, manifest)
+        return added
+
+    def mark_empty(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> None:
+        """记录交易所确认无数据的区间（上市前/停机），避免反复补拉"""
+        if end_ms <= start_ms:
+            return
+        manifest = self.read_manifest(symbol, interval)
+        ranges = [tuple(r) for r in manifest.get("empty_ranges", []) if isinstance(r, list) and len(r) == 2]
+        ranges.append((int(start_ms), int(end_ms)))
+        manifest["empty_ranges"] = [list(r) for r in _merge_ranges(ranges)]
+        self._write_manifest(symbol, interval, manifest)
+
+    # -------------------------------------------------------------- read
+    def coverage(self, symbol: str, interval: str) -> Optional[Tuple[int, int]]:
+        parts = self.read_manifest(symbol, interval)["partitions"]
+        if not parts:
+            return None
+        return (
+            min(int(p["first_ms"]) for p in parts.values()),
+            max(int(p["last_ms"]) for p in parts.values()),
+        )
+
+    def load_array(
+        self,
+        symbol: str,
+        interval: str,
+        start_ms: Optional[int] = None,
+        end_ms: Optional[int] = None,
+        mmap: bool = True,
+    ) -> np.ndarray:
+        """读取 [start_ms, end_ms] 范围的列式数组（单分区时为只读内存映射视图）"""
+        manifest = self.read_manifest(symbol, interval)
+        arrays: List[np.ndarray] = []
+        for month in sorted(manifest["partitions"]):
+            meta = manifest["partitions"][month]
+            if start_ms is not None and int(meta["last_ms"]) < start_ms:
+                continue
+            if end_ms is not None and int(meta["first_ms"]) > end_ms:
+                continue
+            path = self._partition_path(symbol, interval, month)
+            if not os.path.exists(path):
+                continue
+            arr = np.load(path, mmap_mode="r" if mmap else None)
+            lo = 0 if start_ms is None else int(np.searchsorted(arr[0], start_ms, side="left"))
+            hi = arr.shape[1] if end_ms is None else int(np.searchsorted(arr[0], end_ms, side="right"))
+            if hi > lo:
+                arrays.append(arr[:, lo:hi])
+        if not arrays:
+            return np.empty((len(COLUMNS), 0), dtype=np.float64)
+        if len(arrays) == 1:
+            return arrays[0]
+        return np.concatenate(arrays, axis=1)
+
+    def load_frame(
+        self,
+        symbol: str,
+        interval: str,
+        start_ms: Optional[int] = None,
+        end_ms: Optional[int] = None,
+    ) -> Optional[pd.DataFrame]:
+        """
+        读取为 DataFrame（index=timestamp，列 open/high/low/close/volume），与 CSV 缓存格式一致
+
+        价格列直接包装底层数组（不复制）；只有时间索引需要转换。
+        """
+        arr = self.load_array(symbol, interval, start_ms, end_ms)
+        if arr.shape[1] == 0:
+            return None
+        index = pd.DatetimeIndex(pd.to_datetime(np.asarray(arr[0], dtype=np.int64), unit="ms"), name="timestamp")
+        return pd.DataFrame(arr[1:].T, index=index, columns=list(PRICE_COLUMNS), copy=False)
+
+    # ------------------------------------------------------------- gaps
+    def find_gaps(
+        self,
+        symbol: str,
+        interval: str,
+        start_ms: Optional[int] = None,
+        end_ms: Optional[int] = None,
+    ) -> List[Tuple[int, int]]:
+        """已存储数据内部的缺口 [(缺失起点, 缺失终点)]（已标记为无数据的区间除外）"""
+        step = interval_ms(interval)
+        ts = np.asarray(self.load_array(symbol, interval, start_ms, end_ms)[0])
+        if ts.size < 2:
+            return []
+        jumps = np.nonzero(np.diff(ts) > step)[0]
+        gaps = [(int(ts[i]) + step, int(ts[i + 1]) - step) for i in jumps]
+        return self._subtract_empty(symbol, interval, gaps)
+
+    def missing_ranges(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> List[Tuple[int, int]]:
+        """
+        [start_ms, end_ms] 内需要补拉的区间：头部、尾部与内部缺口
+
+        尾部不足一根K线的区间视为已覆盖（当前K线尚未收盘）。
+        """
+        step = interval_ms(interval)
+        start_ms = (int(start_ms) // step) * step
+        cov = self.coverage(symbol, interval)
+        if cov is None:
+            return self._subtract_empty(symbol, interval, [(start_ms, int(end_ms))])
+        first_ms, last_ms = cov
+        ranges: List[Tuple[int, int]] = []
+        if start_ms < first_ms:
+            ranges.append((start_ms, first_ms - step))
+        ranges.extend(self.find_gaps(symbol, interval, start_ms, end_ms))
+        if end_ms - last_ms >= 2 * step:
+            ranges.append((last_ms + step, int(end_ms)))
+        return self._subtract_empty(symbol, interval, [r for r in ranges if r[1] >= r[0]])
+
+    def _subtract_empty(self, symbol: str, interval: str, ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        empty = [tuple(r) for r in self.read_manifest(symbol, interval).get("empty_ranges", [])]
+        if not empty:
+            return ranges
+        out: List[Tuple[int, int]] = []
+        for start, end in ranges:
+            pieces = [(start, end)]
+            for e_start, e_end in empty:
+                next_pieces: List[Tuple[int, int]] = []
+                for p_start, p_end in pieces:
+                    if e_end < p_start or e_start > p_end:
+                        next_pieces.append((p_start, p_end))
+                        continue
+                    if p_start < e_start:
+                        next_pieces.append((p_start, e_start - 1))
+                    if p_end > e_end:
+                        next_pieces.append((e_end + 1, p_end))
+                pieces = next_pieces
+            out.extend(pieces)
+        return out
+
+
+def frame_to_block(df: pd.DataFrame) -> np.ndarray:
+    """把 CSV 缓存格式的 DataFrame（timestamp 索引）转换为 KlineStore 列式数组"""
+    ts = pd.DatetimeIndex(df.index)
+    if ts.tz is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    open_time = ts.values.astype("datetime64[ms]").astype(np.int64)
+    cols = [np.asarray(df[c], dtype=np.float64) for c in PRICE_COLUMNS]
+    return np.vstack([open_time.astype(np.float64)] + cols)
+
+
+__all__ = [
+    "COLUMNS",
+    "INTERVAL_MS",
+    "KlineStore",
+    "frame_to_block",
+    "interval_ms",
+]
@@ -4,9 +4,12 @@ import csv
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 import requests
 
+from src.data.kline_store import KlineStore, frame_to_block, interval_ms
+
 SPOT_BASE_ENDPOINTS = [
     "https://api.binance.com",
     "https://api1.binance.com",
@@ -134,64 +137,53 @@ def _symbol_exists(session: requests.Session, symbol: str, kind: str) -> bool:
     return False
 
 
-def download_public_klines(
+def _resolve_market_kind(session: requests.Session, symbol: str) -> Optional[str]:
+    if _symbol_exists(session, symbol, "spot"):
+        return "spot"
+    if _symbol_exists(session, symbol, "futures"):
+        return "futures"
+    return None
+
+
+def fetch_kline_block(
     symbol: str,
     interval: str,
-    days: int,
-    out_file: str,
+    start_ms: int,
+    end_ms: int,
     max_retries: int = 3,
-) -> Optional[pd.DataFrame]:
-    os.makedirs(os.path.dirname(out_file), exist_ok=True)
-    end_dt = datetime.utcnow()
-    start_dt = end_dt - timedelta(days=days)
-    start_ms = int(start_dt.timestamp() * 1000)
-    end_ms = int(end_dt.timestamp() * 1000)
-
-    limit = 1000
-    cur_start = start_ms
-    all_rows = []
-
-    session = requests.Session()
-    spot_endpoints = _get_api_endpoints("spot")
-    futures_endpoints = _get_api_endpoints("futures")
-
-    use_spot = _symbol_exists(session, symbol, "spot")
-    use_futures = _symbol_exists(session, symbol, "futures") if not use_spot else False
-
-    if not use_spot and not use_futures:
+    session: Optional[requests.Session] = None,
+) -> Optional[np.ndarray]:
+    """
+    拉取 [start_ms, end_ms] 的K线，返回 KlineStore 列式数组 shape=(6, N)
+
+    交易对不存在或请求失败返回 None；区间内无数据返回空数组。
+    """
+    session = session or requests.Session()
+    kind = _resolve_market_kind(session, symbol)
+    if kind is None:
         return None
+    endpoints = _get_api_endpoints(kind)
+    path = "/api/v3/klines" if kind == "spot" else "/fapi/v1/klines"
 
+    limit = 1000
+    cur_start = int(start_ms)
+    rows: List[List[float]] = []
     while True:
         params = {
             "symbol": symbol,
             "interval": interval,
             "startTime": cur_start,
-            "endTime": end_ms,
+            "endTime": int(end_ms),
             "limit": limit,
         }
-        if use_spot:
-            resp = _request_klines(session, spot_endpoints, "/api/v3/klines", params, max_retries)
-        else:
-            resp = _request_klines(session, futures_endpoints, "/fapi/v1/klines", params, max_retries)
-        if resp is None:
-            return None
-        if resp.status_code != 200:
+        resp = _request_klines(session, endpoints, path, params, max_retries)
+        if resp is None or resp.status_code != 200:
             return None
         data = resp.json()
         if not data:
             break
-
         for item in data:
-            all_rows.append(
-                {
-                    "timestamp": datetime.utcfromtimestamp(item[0] / 1000).strftime("%Y-%m-%d %H:%M:%S"),
-                    "open": float(item[1]),
-                    "high": float(item[2]),
-                    "low": float(item[3]),
-                    "close": float(item[4]),
-                    "volume": float(item[5]),
-                }
-            )
+            rows.append([float(item[0]), float(item[1]), float(item[2]), float(item[3]), float(item[4]), float(item[5])])
 
         last_open = data[-1][0]
         minutes = _interval_to_minutes(interval)
@@ -200,6 +192,39 @@ def download_public_klines(
             break
         time.sleep(0.2)
 
+    if not rows:
+        return np.empty((6, 0), dtype=np.float64)
+    return np.asarray(rows, dtype=np.float64).T
+
+
+def download_public_klines(
+    symbol: str,
+    interval: str,
+    days: int,
+    out_file: str,
+    max_retries: int = 3,
+) -> Optional[pd.DataFrame]:
+    os.makedirs(os.path.dirname(out_file), exist_ok=True)
+    end_dt = datetime.utcnow()
+    start_dt = end_dt - timedelta(days=days)
+    start_ms = int(start_dt.timestamp() * 1000)
+    end_ms = int(end_dt.timestamp() * 1000)
+
+    block = fetch_kline_block(symbol, interval, start_ms, end_ms, max_retries=max_retries)
+    if block is None:
+        return None
+    all_rows = [
+        {
+            "timestamp": datetime.utcfromtimestamp(block[0, i] / 1000).strftime("%Y-%m-%d %H:%M:%S"),
+            "open": float(block[1, i]),
+            "high": float(block[2, i]),
+            "low": float(block[3, i]),
+            "close": float(block[4, i]),
+            "volume": float(block[5, i]),
+        }
+        for i in range(block.shape[1])
+    ]
+
     if not all_rows:
         return None
 
@@ -243,3 +268,73 @@ def load_or_download(
 
     df = download_public_klines(symbol, interval, days, file_path)
     return df, file_path
+
+
+def sync_kline_store(
+    store: KlineStore,
+    symbol: str,
+    interval: str,
+    start_ms: int,
+    end_ms: int,
+    max_retries: int = 3,
+) -> int:
+    """只补拉存储中缺失的区间（头部/尾部/内部缺口），返回新增K线数"""
+    missing = store.missing_ranges(symbol, interval, start_ms, end_ms)
+    if not missing:
+        return 0
+    session = requests.Session()
+    step = interval_ms(interval)
+    closed_before = end_ms - 2 * step
+    added = 0
+    for gap_start, gap_end in missing:
+        block = fetch_kline_block(symbol, interval, gap_start, gap_end, max_retries=max_retries, session=session)
+        if block is None:
+            break
+        if block.shape[1] == 0:
+            # 交易所在该区间无数据（上市前/停机）：已收盘的区间记为空，之后不再补拉
+            if gap_end < closed_before:
+                store.mark_empty(symbol, interval, gap_start, gap_end)
+            continue
+        added += store.append(symbol, interval, block)
+        got_first = int(block[0, 0])
+        if got_first > gap_start and gap_start < closed_before:
+            store.mark_empty(symbol, interval, gap_start, got_first - 1)
+    return added
+
+
+def load_from_store(
+    symbol: str,
+    interval: str,
+    days: int,
+    data_dir: str = "data",
+    store: Optional[KlineStore] = None,
+    offline: bool = False,
+) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+    """
+    从分区二进制存储加载最近 days 天K线，仅补拉缺失区间
+
+    首次使用时若存在旧的 CSV 缓存（<symbol>_<interval>_<days>d.csv）会先导入存储。
+    offline=True 时只读本地数据，不发网络请求。
+    """
+    store = store or KlineStore(os.path.join(data_dir, "klines"))
+    step = interval_ms(interval)
+    end_ms = int(time.time() * 1000)
+    start_ms = ((end_ms - int(days) * 86_400_000) // step) * step
+
+    if store.coverage(symbol, interval) is None:
+        legacy = os.path.join(data_dir, f"{symbol}_{interval}_{days}d.csv")
+        if os.path.exists(legacy):
+            try:
+                legacy_df = pd.read_csv(legacy, index_col="timestamp", parse_dates=True)
+                store.append(symbol, interval, frame_to_block(legacy_df))
+            except Exception as e:
+                print(f"[WARN] 旧 CSV 缓存导入失败 {legacy}: {e}")
+
+    if not offline:
+        try:
+            sync_kline_store(store, symbol, interval, start_ms, end_ms)
+        except Exception as e:
+            print(f"[WARN] {symbol} K线补拉失败，使用本地数据: {e}")
+
+    df = store.load_frame(symbol, interval, start_ms=start_ms)
+    return df, store.series_dir(symbol, interval)
@@ -0,0 +1,402 @@
+"""
+增量微结构引擎 (Microstructure Engine)
+
+DCA 资金流闸门的 15s 微结构采样原先每次按时间窗口重新下载 aggTrades，并在每次
+检查时遍历整个 ring 重算聚合 / 分位数阈值。本模块把这些改为增量维护:
+1. aggTrades 按 fromId 游标增量拉取（经注入的 fetch，即 BinanceBroker 共享连接池/重试/代理），
+   首次或游标过旧时按时间窗口引导；单次最多翻 max_pages 页。
+   翻满 max_pages 后最后一页的成交时间 T 仍落后 end_ms 超过一个采样间隔（成交过密追不上）时，
+   丢弃积压、改取最新一页并只统计本采样窗口内的成交（skip ahead），游标跳到最新
+2. 每个 symbol 按聚合周期（如 60s/300s）与自适应阈值周期各维护一个滚动窗口：
+   买卖成交额、phantom、trap 次数为滚动和；中位数/分位数用有序列表（bisect），最大值用单调队列
+3. 连续 trap 计数维护在 trap 连击时间戳队列上，查询只看最近 required 个（不再遍历 ring）
+
+窗口内容始终是 ring 的后缀：ring 因 maxlen 淘汰的旧条目同样会从窗口移除，结果与遍历 ring 一致。
+"""
+
+import bisect
+import math
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+AGG_TRADES_PAGE_LIMIT = 1000
+
+
+def _sorted_remove(values: List[float], value: float) -> None:
+    idx = bisect.bisect_left(values, value)
+    if idx < len(values) and values[idx] == value:
+        values.pop(idx)
+    else:
+        # NaN 等无法二分定位的值：线性回退
+        for i, v in enumerate(values):
+            if v == value or (v != v and value != value):
+                values.pop(i)
+                return
+
+
+def _median(values: List[float], default: float) -> float:
+    n = len(values)
+    if n == 0:
+        return default
+    mid = n // 2
+    if n % 2:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2.0
+
+
+def _quantile(values: List[float], q: float) -> float:
+    """有序列表的线性插值分位数（与 numpy.quantile 默认方法一致）"""
+    pos = (len(values) - 1) * q
+    lo = int(math.floor(pos))
+    hi = min(lo + 1, len(values) - 1)
+    frac = pos - lo
+    return values[lo] + (values[hi] - values[lo]) * frac
+
+
+class _MaxQueue:
+    """滑动窗口最大值（单调递减队列，按序号淘汰）"""
+
+    def __init__(self) -> None:
+        self._items: Deque[Tuple[int, float]] = deque()
+
+    def push(self, seq: int, value: float) -> None:
+        while self._items and self._items[-1][1] <= value:
+            self._items.pop()
+        self._items.append((seq, value))
+
+    def expire(self, oldest_seq: int) -> None:
+        while self._items and self._items[0][0] < oldest_seq:
+            self._items.popleft()
+
+    def max(self, default: float = 0.0) -> float:
+        return self._items[0][1] if self._items else default
+
+
+class _RollingWindow:
+    """单个 symbol、单个时间跨度的滚动聚合"""
+
+    def __init__(self, horizon_seconds: int) -> None:
+        self.horizon = int(horizon_seconds)
+        self.entries: Deque[Tuple[int, Dict[str, Any]]] = deque()
+        self.buy_sum = 0.0
+        self.sell_sum = 0.0
+        self.phantom_bid_sum = 0.0
+        self.phantom_ask_sum = 0.0
+        self.trap_hits = 0
+        self.book_imbs: List[float] = []
+        self.book_abs: List[float] = []
+        self.spreads: List[float] = []  # 仅非负点差（自适应阈值用）
+        self.micro_bias: List[float] = []
+        self.depth_ratios: List[float] = []
+        self.spread_max = _MaxQueue()
+        self.trap_score_max = _MaxQueue()
+        self.trap_reasons: Deque[Tuple[int, str]] = deque()
+
+    @staticmethod
+    def _micro_bias(entry: Dict[str, Any]) -> float:
+        mid = float(entry.get("mid", 0.0) or 0.0)
+        mp = float(entry.get("microprice", 0.0) or 0.0)
+        return (mp - mid) / mid if mid > 0 else 0.0
+
+    def push(self, seq: int, entry: Dict[str, Any]) -> None:
+        self.entries.append((seq, entry))
+        self.buy_sum += float(entry.get("buy_quote", 0.0) or 0.0)
+        self.sell_sum += float(entry.get("sell_quote", 0.0) or 0.0)
+        self.phantom_bid_sum += max(0.0, float(entry.get("phantom_bid", 0.0) or 0.0))
+        self.phantom_ask_sum += max(0.0, float(entry.get("phantom_ask", 0.0) or 0.0))
+        book_imb = float(entry.get("book_imb", 0.0) or 0.0)
+        spread = float(entry.get("spread", 0.0) or 0.0)
+        bisect.insort(self.book_imbs, book_imb)
+        bisect.insort(self.book_abs, abs(book_imb))
+        if spread >= 0:
+            bisect.insort(self.spreads, spread)
+        bisect.insort(self.micro_bias, self._micro_bias(entry))
+        bisect.insort(self.depth_ratios, float(entry.get("depth_ratio", 1.0) or 1.0))
+        self.spread_max.push(seq, spread)
+        self.trap_score_max.push(seq, float(entry.get("trap_score", 0.0) or 0.0))
+        if bool(entry.get("trap_flag", False)):
+            self.trap_hits += 1
+            self.trap_reasons.append((seq, str(entry.get("trap_reason", "-") or "-")))
+
+    def _pop_oldest(self) -> None:
+        _, entry = self.entries.popleft()
+        self.buy_sum -= float(entry.get("buy_quote", 0.0) or 0.0)
+        self.sell_sum -= float(entry.get("sell_quote", 0.0) or 0.0)
+        self.phantom_bid_sum -= max(0.0, float(entry.get("phantom_bid", 0.0) or 0.0))
+        self.phantom_ask_sum -= max(0.0, float(entry.get("phantom_ask", 0.0) or 0.0))
+        book_imb = float(entry.get("book_imb", 0.0) or 0.0)
+        spread = float(entry.get("spread", 0.0) or 0.0)
+        _sorted_remove(self.book_imbs, book_imb)
+        _sorted_remove(self.book_abs, abs(book_imb))
+        if spread >= 0:
+            _sorted_remove(self.spreads, spread)
+        _sorted_remove(self.micro_bias, self._micro_bias(entry))
+        _sorted_remove(self.depth_ratios, float(entry.get("depth_ratio", 1.0) or 1.0))
+        if bool(entry.get("trap_flag", False)):
+            self.trap_hits -= 1
+        if not self.entries:
+            # 窗口清空时归零，消除滚动和的浮点累积误差
+            self.buy_sum = self.sell_sum = self.phantom_bid_sum = self.phantom_ask_sum = 0.0
+            self.trap_hits = 0
+
+    def expire(self, now_ts: float, ring_len: int) -> None:
+        while self.entries and (
+            len(self.entries) > ring_len
+            or (now_ts - float(self.entries[0][1].get("ts", 0.0) or 0.0)) > self.horizon
+        ):
+            self._pop_oldest()
+        oldest = self.entries[0][0] if self.entries else math.inf
+        self.spread_max.expire(oldest)
+        self.trap_score_max.expire(oldest)
+        while self.trap_reasons and self.trap_reasons[0][0] < oldest:
+            self.trap_reasons.popleft()
+
+
+class _SymbolState:
+    def __init__(self, maxlen: int) -> None:
+        self.ring: Deque[Dict[str, Any]] = deque(maxlen=maxlen)
+        self.seq = 0
+        self.windows: Dict[int, _RollingWindow] = {}
+        self.trap_streak: Deque[float] = deque(maxlen=64)
+        self.cursor: Optional[int] = None
+        self.last_pull_ms = 0
+
+
+class MicrostructureEngine:
+    """按 symbol 维护 15s 微结构 ring、aggTrades 游标与滚动聚合"""
+
+    def __init__(
+        self,
+        fetch_agg_trades: Callable[..., List[Dict[str, Any]]],
+        max_pages: int = 5,
+        cursor_max_gap_seconds: float = 300.0,
+    ) -> None:
+        self._fetch = fetch_agg_trades
+        self.max_pages = max(1, int(max_pages))
+        self.cursor_max_gap_ms = int(max(1.0, float(cursor_max_gap_seconds)) * 1000)
+        self._symbols: Dict[str, _SymbolState] = {}
+        # 与旧接口兼容：sym -> ring(deque)
+        self.rings: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            "requests": 0,
+            "trades": 0,
+            "bootstraps": 0,
+            "incremental_pulls": 0,
+            "fetch_errors": 0,
+            "skip_aheads": 0,
+        }
+
+    def _state(self, sym: str, maxlen: int = 60) -> _SymbolState:
+        st = self._symbols.get(sym)
+        if st is None:
+            st = _SymbolState(maxlen)
+            self._symbols[sym] = st
+            self.rings[sym] = st.ring
+        return st
+
+    def ring(self, sym: str, maxlen: int) -> Deque[Dict[str, Any]]:
+        """取 symbol 的 ring；maxlen 变化时重建（deque 的 maxlen 不能动态修改）"""
+        st = self._state(sym, maxlen)
+        if st.ring.maxlen != maxlen:
+            st.ring = deque(list(st.ring)[-maxlen:], maxlen=maxlen)
+            self.rings[sym] = st.ring
+        return st.ring
+
+    # ---------- aggTrades 增量拉取 ----------
+
+    def pull_trades(self, sym: str, start_ms: int, end_ms: int) -> Dict[str, Any]:
+        """
+        拉取自上次游标以来的 aggTrades 并汇总买卖成交额
+
+        有游标且距上次拉取不超过 cursor_max_gap_seconds 时按 fromId 增量拉取；
+        否则按 [start_ms, end_ms] 时间窗口引导。增量翻满 max_pages 仍落后 end_ms 超过
+        一个采样间隔（end_ms - start_ms）时 skip ahead：只统计最新一页中不早于 start_ms 的成交。
+        拉取失败返回零成交，游标不变。
+        """
+        st = self._state(sym)
+        trades: List[Dict[str, Any]] = []
+        incremental = st.cursor is not None and (end_ms - st.last_pull_ms) <= self.cursor_max_gap_ms
+        skipped_ahead = False
+        try:
+            if incremental:
+                from_id = int(st.cursor) + 1
+                caught_up = False
+                last_trade_ms: Optional[int] = None
+                for _ in range(self.max_pages):
+                    page = self._fetch(sym, from_id=from_id, limit=AGG_TRADES_PAGE_LIMIT) or []
+                    self._bump("requests")
+                    trades.extend(page)
+                    if page:
+                        last_trade_ms = self._trade_ms(page[-1], last_trade_ms)
+                    if len(page) < AGG_TRADES_PAGE_LIMIT:
+                        caught_up = True
+                        break
+                    from_id = int(page[-1].get("a", from_id)) + 1
+                self._bump("incremental_pulls")
+                if not caught_up and last_trade_ms is not None and (end_ms - last_trade_ms) > max(1, end_ms - start_ms):
+                    # 积压超过一个采样间隔：游标追不上，改取最新一页
+                    trades = list(self._fetch(sym, limit=AGG_TRADES_PAGE_LIMIT) or [])
+                    self._bump("requests")
+                    self._bump("skip_aheads")
+                    skipped_ahead = True
+            else:
+                trades = list(self._fetch(sym, start_time=int(start_ms), end_time=int(end_ms), limit=AGG_TRADES_PAGE_LIMIT) or [])
+                self._bump("requests")
+                self._bump("bootstraps")
+        except Exception:
+            self._bump("fetch_errors")
+            return {"buy_quote": 0.0, "sell_quote": 0.0, "trade_count": 0, "last_trade_id": st.cursor}
+
+        buy_quote = 0.0
+        sell_quote = 0.0
+        trade_count = 0
+        last_trade_id = st.cursor
+        # aggTrades: p=price, q=qty, m=buyerIsMaker (True -> sell taker), a=aggTradeId
+        for t in trades:
+            if not isinstance(t, dict):
+                continue
+            try:
+                agg_id = int(t.get("a"))
+            except Exception:
+                agg_id = None
+            if agg_id is not None:
+                if st.cursor is not None and agg_id <= st.cursor:
+                    continue
+                last_trade_id = agg_id if last_trade_id is None else max(last_trade_id, agg_id)
+            if skipped_ahead and self._trade_ms(t, start_ms) < start_ms:
+                continue
+            try:
+                price = float(t.get("p", 0.0) or 0.0)
+                qty = float(t.get("q", 0.0) or 0.0)
+            except Exception:
+                continue
+            if price <= 0 or qty <= 0:
+                continue
+            if bool(t.get("m", False)):
+                sell_quote += price * qty
+            else:
+                buy_quote += price * qty
+            trade_count += 1
+
+        st.cursor = last_trade_id
+        st.last_pull_ms = int(end_ms)
+        self._bump("trades", trade_count)
+        return {
+            "buy_quote": float(buy_quote),
+            "sell_quote": float(sell_quote),
+            "trade_count": int(trade_count),
+            "last_trade_id": last_trade_id,
+            "skipped_ahead": skipped_ahead,
+        }
+
+    @staticmethod
+    def _trade_ms(trade: Dict[str, Any], default: Optional[int]) -> Optional[int]:
+        try:
+            return int(trade.get("T"))
+        except Exception:
+            return default
+
+    # ---------- ring 与滚动窗口 ----------
+
+    def record(self, sym: str, entry: Dict[str, Any], maxlen: int) -> None:
+        """追加一个 15s 条目，并增量更新所有滚动窗口与 trap 连击"""
+        st = self._state(sym, maxlen)
+        ring = self.ring(sym, maxlen)
+        ring.append(entry)
+        st.seq += 1
+        for window in st.windows.values():
+            window.push(st.seq, entry)
+            window.expire(float(entry.get("ts", 0.0) or 0.0), len(ring))
+
+        # 非 trap 条目打断连击；时间间隔的断开在查询时按当时的 interval 判断
+        if bool(entry.get("trap_flag", False)):
+            st.trap_streak.append(float(entry.get("ts", 0.0) or 0.0))
+        else:
+            st.trap_streak.clear()
+
+    def _window(self, sym: str, horizon: int, now_ts: float) -> Optional[_RollingWindow]:
+        st = self._symbols.get(sym)
+        if st is None or not st.ring:
+            return None
+        window = st.windows.get(horizon)
+        if window is None:
+            # 首次使用该时间跨度：从 ring 回填一次，之后增量维护
+            window = _RollingWindow(horizon)
+            ring = list(st.ring)
+            first_seq = st.seq - len(ring) + 1
+            for offset, entry in enumerate(ring):
+                window.push(first_seq + offset, entry)
+            st.windows[horizon] = window
+        window.expire(now_ts, len(st.ring))
+        return window
+
+    def adaptive_quantiles(
+        self, sym: str, horizon: int, q_spread: float, q_book: float, now_ts: float, min_samples: int = 8
+    ) -> Optional[Tuple[float, float]]:
+        """过去 horizon 秒内点差 / |盘口不平衡| 的分位数；样本不足返回 None"""
+        window = self._window(sym, int(horizon), now_ts)
+        if window is None or len(window.spreads) < min_samples or len(window.book_abs) < min_samples:
+            return None
+        return _quantile(window.spreads, q_spread), _quantile(window.book_abs, q_book)
+
+    def aggregate(self, sym: str, horizon: int, now_ts: float, trap_threshold: float) -> Optional[Dict[str, Any]]:
+        """把过去 horizon 秒的 15s 条目聚合成 1m/5m 视图"""
+        window = self._window(sym, int(horizon), now_ts)
+        if window is None or not window.entries:
+            return None
+        total = window.buy_sum + window.sell_sum
+        trade_imb = (window.buy_sum - window.sell_sum) / total if total > 1e-12 else 0.0
+        trap_score_max = window.trap_score_max.max(0.0)
+        count = len(window.entries)
+        trap_flag = trap_score_max >= trap_threshold or window.trap_hits >= max(2, int(count * 0.4))
+        return {
+            "horizon": int(horizon),
+            "trade_imb": float(trade_imb),
+            "book_imb": float(_median(window.book_imbs, 0.0)),
+            "spread_max": float(window.spread_max.max(0.0)),
+            "micro_bias": float(_median(window.micro_bias, 0.0)),
+            "depth_ratio": float(_median(window.depth_ratios, 1.0)),
+            "phantom_bid": float(max(0.0, window.phantom_bid_sum)),
+            "phantom_ask": float(max(0.0, window.phantom_ask_sum)),
+            "trap_score": float(trap_score_max),
+            "trap_hits": int(window.trap_hits),
+            "trap_flag": bool(trap_flag),
+            "trap_reason": window.trap_reasons[-1][1] if window.trap_reasons else "-",
+        }
+
+    def consecutive_trap(self, sym: str, required: int, interval: int, now_ts: float) -> Tuple[bool, int]:
+        """最近 required 个条目是否连续 trap（允许 required*interval*1.8 的时间漂移）"""
+        st = self._symbols.get(sym)
+        if st is None or not st.ring or not bool(st.ring[-1].get("trap_flag", False)):
+            return False, 0
+        max_age = float(required * interval) * 1.8
+        cnt = 0
+        last_ts = None
+        for ts in reversed(st.trap_streak):
+            if ts <= 0 or (now_ts - ts) > max_age:
+                break
+            if last_ts is not None and abs(last_ts - ts) > (interval * 2.2):
+                break
+            last_ts = ts
+            cnt += 1
+            if cnt >= required:
+                return True, cnt
+        return False, cnt
+
+    # ---------- 统计 ----------
+
+    def _bump(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[key] = self._stats.get(key, 0) + n
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+        stats["symbols"] = len(self._symbols)
+        stats["cursors"] = {sym: st.cursor for sym, st in self._symbols.items() if st.cursor is not None}
+        return stats
+
+
+__all__ = ["MicrostructureEngine", "AGG_TRADES_PAGE_LIMIT"]
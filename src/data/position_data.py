@@ -9,14 +9,21 @@ from typing import Any, Dict, List, Optional
 class PositionDataManager:
     """持仓数据管理器"""
 
-    def __init__(self, client):
+    def __init__(self, client, snapshot=None):
         """
         初始化持仓数据管理器
 
         Args:
             client: Binance API客户端
+            snapshot: 可选 AccountSnapshotService，提供时持仓从周期快照读取
         """
         self.client = client
+        self.snapshot = snapshot
+
+    def _raw_positions(self) -> List[Dict[str, Any]]:
+        if self.snapshot is not None:
+            return self.snapshot.positions()
+        return self.client.get_all_positions() if hasattr(self.client, "get_all_positions") else []
 
     @staticmethod
     def _to_float(value: Any, default: float = 0.0) -> float:
@@ -113,7 +120,7 @@ class PositionDataManager:
             symbol_up = str(symbol or "").upper()
             requested_side = str(side or "").upper()
 
-            raw_positions = self.client.get_all_positions() if hasattr(self.client, "get_all_positions") else []
+            raw_positions = self._raw_positions()
             candidates: List[Dict[str, Any]] = []
             for pos in raw_positions or []:
                 if not isinstance(pos, dict):
@@ -170,7 +177,7 @@ class PositionDataManager:
             }
         """
         try:
-            positions = self.client.get_all_positions() if hasattr(self.client, "get_all_positions") else []
+            positions = self._raw_positions()
             grouped: Dict[str, List[Dict[str, Any]]] = {}
             for pos in positions or []:
                 if not isinstance(pos, dict):
@@ -0,0 +1,269 @@
+"""
+AI Weight Scheduler - AI 权重并发预取 + stale-while-revalidate
+
+目的:
+- 周期开始时为全部候选标的并发发起 AI 权重请求，避免逐个 symbol 阻塞在 LLM 延迟上
+- 决策截止时间内新结果未就绪时，返回最近一次有效权重（标记 stale），后台请求继续完成
+- 完成的结果写入 latest 表，供下一次决策/下一个对齐窗口直接使用
+
+约束:
+- 只调度 fetch 函数（DeepSeekWeightRouter._try_ai_weights），不改变权重语义
+- fetch 返回 None 视为失败，不覆盖最近一次有效权重
+"""
+from __future__ import annotations
+
+import dataclasses
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from src.fund_flow.deepseek_weight_router import WeightMap
+
+logger = logging.getLogger(__name__)
+
+ScheduleKey = Tuple[str, str, str]
+
+
+class AIWeightScheduler:
+    """
+    AI 权重调度器
+
+    key = (symbol, regime, request_mode)；同一 key 同时最多一个在途请求。
+    """
+
+    DEFAULT_MAX_WORKERS = 4
+    DEFAULT_DEADLINE_SECONDS = 1.5
+    DEFAULT_MAX_STALE_SECONDS = 1800.0
+
+    def __init__(
+        self,
+        fetch_fn: Callable[..., Optional["WeightMap"]],
+        config: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        cfg = config if isinstance(config, dict) else {}
+        self._fetch_fn = fetch_fn
+        self.enabled = bool(cfg.get("enabled", False))
+        self.max_workers = max(1, int(cfg.get("max_workers", self.DEFAULT_MAX_WORKERS) or self.DEFAULT_MAX_WORKERS))
+        self.deadline_seconds = max(
+            0.0, float(cfg.get("decision_deadline_seconds", self.DEFAULT_DEADLINE_SECONDS))
+        )
+        self.max_stale_seconds = max(
+            0.0, float(cfg.get("max_stale_seconds", self.DEFAULT_MAX_STALE_SECONDS))
+        )
+        self.refresh_ahead = bool(cfg.get("refresh_ahead", True))
+
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._inflight: Dict[ScheduleKey, Future] = {}
+        self._latest: Dict[ScheduleKey, Tuple["WeightMap", float]] = {}
+        # 后台已完成但尚未被 resolve 消费的结果: (结果, 完成时间, 来源)
+        # 来源 refresh_ahead 表示按上一次决策的市场上下文请求，消费时按 stale 计
+        self._ready: Dict[ScheduleKey, Tuple["WeightMap", float, str]] = {}
+        # resolve 已直接取走结果的 future（避免完成回调再次放入 _ready）
+        self._consumed: Dict[ScheduleKey, Future] = {}
+        self._last_request: Dict[ScheduleKey, Dict[str, Any]] = {}
+        self._stats = {
+            "submitted": 0,
+            "fresh": 0,
+            "stale_served": 0,
+            "misses": 0,
+            "failures": 0,
+            "ready_expired": 0,
+        }
+
+    @staticmethod
+    def _key(symbol: str, regime: str, request_mode: str) -> ScheduleKey:
+        return (
+            str(symbol or "").upper(),
+            str(regime or "NO_TRADE").upper(),
+            str(request_mode or "generic").strip().lower(),
+        )
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="ai-weight",
+            )
+        return self._executor
+
+    def _on_done(self, key: ScheduleKey, fut: Future, origin: str = "current") -> None:
+        try:
+            result = fut.result()
+        except Exception as e:
+            logger.warning(f"AI weight prefetch failed for {key}: {e}")
+            result = None
+        with self._lock:
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+            if result is None:
+                self._stats["failures"] += 1
+                return
+            completed_at = time.time()
+            self._latest[key] = (result, completed_at)
+            if self._consumed.get(key) is not fut:
+                self._ready[key] = (result, completed_at, origin)
+
+    def submit(
+        self,
+        symbol: str,
+        regime: str,
+        market_flow_context: Dict[str, Any],
+        quantile_context: Optional[Dict[str, Any]] = None,
+        request_mode: str = "generic",
+        origin: str = "current",
+    ) -> Future:
+        """提交一次后台请求；同 key 已在途时复用在途 future（origin=refresh_ahead 表示沿用旧上下文）"""
+        key = self._key(symbol, regime, request_mode)
+        kwargs = {
+            "symbol": key[0],
+            "regime": key[1],
+            "market_flow_context": market_flow_context or {},
+            "quantile_context": quantile_context,
+            "request_mode": key[2],
+        }
+        with self._lock:
+            self._last_request[key] = kwargs
+            existing = self._inflight.get(key)
+            if existing is not None and not existing.done():
+                return existing
+            fut = self._get_executor().submit(self._fetch_fn, **kwargs)
+            self._inflight[key] = fut
+            self._stats["submitted"] += 1
+        fut.add_done_callback(lambda f, k=key, o=origin: self._on_done(k, f, o))
+        return fut
+
+    def prefetch(self, requests: Iterable[Dict[str, Any]]) -> int:
+        """批量并发预取；requests 每项包含 symbol/regime/market_flow_context 等字段"""
+        count = 0
+        for req in requests:
+            if not isinstance(req, dict):
+                continue
+            symbol = str(req.get("symbol") or "")
+            regime = str(req.get("regime") or "NO_TRADE").upper()
+            if not symbol or regime not in ("TREND", "RANGE"):
+                continue
+            self.submit(
+                symbol=symbol,
+                regime=regime,
+                market_flow_context=req.get("market_flow_context") or {},
+                quantile_context=req.get("quantile_context"),
+                request_mode=str(req.get("request_mode") or "generic"),
+            )
+            count += 1
+        return count
+
+    def refresh_known(self, symbols: Optional[Iterable[str]] = None, request_mode: Optional[str] = None) -> int:
+        """
+        按最近一次请求参数提前刷新（下一个对齐窗口前调用）。
+
+        使用的是上一次决策时的市场上下文，结果按 stale-while-revalidate 语义消费。
+        """
+        if not self.refresh_ahead:
+            return 0
+        wanted = {str(s).upper() for s in symbols} if symbols is not None else None
+        mode_norm = str(request_mode).strip().lower() if request_mode else None
+        with self._lock:
+            pending = [
+                dict(kwargs)
+                for key, kwargs in self._last_request.items()
+                if (wanted is None or key[0] in wanted) and (mode_norm is None or key[2] == mode_norm)
+            ]
+        for kwargs in pending:
+            self.submit(**kwargs, origin="refresh_ahead")
+        return len(pending)
+
+    def resolve(
+        self,
+        symbol: str,
+        regime: str,
+        market_flow_context: Dict[str, Any],
+        quantile_context: Optional[Dict[str, Any]] = None,
+        request_mode: str = "generic",
+        deadline_seconds: Optional[float] = None,
+    ) -> Optional["WeightMap"]:
+        """
+        决策时取权重:
+        0. 已有未消费的后台完成结果且未超过 max_stale_seconds -> 直接返回；
+           当前上下文预取所得为 fresh，refresh_ahead（上一次决策的上下文）所得为 stale
+        1. 有在途请求则等待至截止时间；无在途请求则立即提交并等待
+        2. 就绪 -> 返回新结果 (freshness=fresh)
+        3. 未就绪/失败 -> 返回 max_stale_seconds 内最近一次有效结果 (freshness=stale)
+        4. 都没有 -> None，由调用方走本地规则
+        """
+        key = self._key(symbol, regime, request_mode)
+        with self._lock:
+            fut = self._inflight.get(key)
+            ready = self._ready.pop(key, None) if fut is None else None
+            if ready is not None:
+                weight_map, completed_at, origin = ready
+                if self._expired(completed_at):
+                    self._stats["ready_expired"] += 1
+                    ready = None
+                elif origin == "refresh_ahead":
+                    self._stats["stale_served"] += 1
+                    weight_map = dataclasses.replace(weight_map, freshness="stale")
+                else:
+                    self._stats["fresh"] += 1
+        if ready is not None:
+            return weight_map
+        if fut is None:
+            fut = self.submit(symbol, regime, market_flow_context, quantile_context, request_mode)
+        timeout = self.deadline_seconds if deadline_seconds is None else max(0.0, float(deadline_seconds))
+        if not fut.done():
+            wait([fut], timeout=timeout)
+        if fut.done():
+            try:
+                result = fut.result()
+            except Exception:
+                result = None
+            if result is not None:
+                with self._lock:
+                    self._latest[key] = (result, time.time())
+                    self._ready.pop(key, None)
+                    self._consumed[key] = fut
+                    self._stats["fresh"] += 1
+                return result
+
+        with self._lock:
+            latest = self._latest.get(key)
+            if latest is None:
+                self._stats["misses"] += 1
+                return None
+            weight_map, fetched_at = latest
+            if self._expired(fetched_at):
+                self._stats["misses"] += 1
+                return None
+            self._stats["stale_served"] += 1
+        return dataclasses.replace(weight_map, freshness="stale")
+
+    def _expired(self, completed_at: float) -> bool:
+        return self.max_stale_seconds > 0 and (time.time() - completed_at) > self.max_stale_seconds
+
+    def pending_keys(self) -> List[ScheduleKey]:
+        with self._lock:
+            return [k for k, f in self._inflight.items() if not f.done()]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "inflight": sum(1 for f in self._inflight.values() if not f.done()),
+                "latest_size": len(self._latest),
+                "ready": len(self._ready),
+                "enabled": self.enabled,
+            }
+
+    def shutdown(self, wait_pending: bool = False) -> None:
+        executor = self._executor
+        self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=wait_pending, cancel_futures=not wait_pending)
+
+
+__all__ = [
+    "AIWeightScheduler",
+]
@@ -24,6 +24,10 @@ from datetime import datetime, timezone, timedelta
 from typing import Any, Dict, List, Optional, Tuple
 import logging
 
+from src.fund_flow.local_weight_provider import LocalWeightProvider, estimate_tokens
+from src.fund_flow.lru_cache import LRUTTLCache
+from src.utils.profiler import profiled
+
 logger = logging.getLogger(__name__)
 
 # 系统提示词 - 固定不变
@@ -38,17 +42,16 @@ tech/capture context 仅用于判断是否该降低或提高 confidence，以及
 TREND 偏向 cvd/oi_delta/funding/depth_ratio/liquidity_delta；RANGE 偏向 imbalance/micro_delta，并压低 cvd_momentum/oi_delta。
 trap/phantom/wide_spread/high_vol 时降低动量权重和 confidence。"""
 
-# 用户提示词模板
+# 用户提示词模板（静态约束在前、每次变化的输入在后，便于服务端前缀缓存命中）
 USER_PROMPT_TEMPLATE = """返回严格JSON对象，仅包含脚本可消费字段。
-输入数据:
-{request_json}
-
 输出约束:
 1. weights 必须包含: cvd, cvd_momentum, oi_delta, funding, depth_ratio, imbalance, liquidity_delta, micro_delta
 2. 每个 weight 在 [0,1]，总和=1
 3. confidence 在 [0,1]
 4. fallback_used 为 true/false
-5. 不输出交易分析长文，不输出买卖建议，不输出 markdown"""
+5. 不输出交易分析长文，不输出买卖建议，不输出 markdown
+输入数据:
+{request_json}"""
 
 # 禁止输出的词列表
 FORBIDDEN_WORDS = [
@@ -145,8 +148,17 @@ class DeepSeekAIService:
         self.timeout = int(ai_cfg.get("timeout", self.DEFAULT_TIMEOUT))
         self.max_retries = int(ai_cfg.get("max_retries", self.DEFAULT_MAX_RETRIES))
         
-        # 功能开关
-        self.enabled = bool(ai_cfg.get("enabled", False)) and bool(self.api_key)
+        # 权重后端：deepseek（远程 API）| local（本地 OpenAI 兼容服务，如 LM Studio）
+        self.provider = str(ai_cfg.get("provider", "deepseek") or "deepseek").strip().lower()
+        self._local_provider: Optional[LocalWeightProvider] = None
+        if self.provider == "local":
+            local_cfg = ai_cfg.get("local", {})
+            self._local_provider = LocalWeightProvider(local_cfg if isinstance(local_cfg, dict) else {})
+        
+        # 功能开关（本地后端不需要 API key）
+        self.enabled = bool(ai_cfg.get("enabled", False)) and (
+            self._local_provider is not None or bool(self.api_key)
+        )
         
         # 默认权重
         dw_cfg = ai_cfg.get("default_weights", {})
@@ -171,7 +183,18 @@ class DeepSeekAIService:
         
         # 缓存配置
         self.cache_ttl = int(ai_cfg.get("cache_ttl", 300))  # 5分钟
-        self._cache: Dict[str, Tuple[AIWeightResponse, float]] = {}
+        # LRU + TTL（线程安全；预取调度会从工作线程并发调用 get_weights）
+        self._cache = LRUTTLCache(
+            max_entries=max(10, int(ai_cfg.get("cache_max_entries", 256))),
+            default_ttl=self.cache_ttl,
+        )
+        
+        # 调用失败时沿用最近一次有效权重的时长（秒，0=关闭，直接降级为默认权重）
+        self.stale_fallback_ttl = max(0, int(ai_cfg.get("stale_fallback_ttl", 0)))
+        self._last_good = LRUTTLCache(
+            max_entries=max(10, int(ai_cfg.get("cache_max_entries", 256))),
+            default_ttl=max(1, self.stale_fallback_ttl),
+        )
         
         # 统计
         self._stats = {
@@ -179,7 +202,10 @@ class DeepSeekAIService:
             "api_calls": 0,
             "cache_hits": 0,
             "fallbacks": 0,
+            "stale_served": 0,
             "errors": 0,
+            "last_prompt_tokens": 0,
+            "prompt_tokens_total": 0,
         }
         
         # HTTP 客户端 (延迟初始化)
@@ -206,7 +232,11 @@ class DeepSeekAIService:
         """构建用户提示词"""
         request_payload = self._build_request_payload(context)
         request_json = json.dumps(request_payload, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
-        return USER_PROMPT_TEMPLATE.format(request_json=request_json)
+        prompt = USER_PROMPT_TEMPLATE.format(request_json=request_json)
+        tokens = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(prompt)
+        self._stats["last_prompt_tokens"] = tokens
+        self._stats["prompt_tokens_total"] += tokens
+        return prompt
 
     @staticmethod
     def _request_profile(request_mode: str) -> Dict[str, Any]:
@@ -444,12 +474,8 @@ class DeepSeekAIService:
     
     def _get_cached(self, cache_key: str) -> Optional[AIWeightResponse]:
         """从缓存获取"""
-        entry = self._cache.get(cache_key)
-        if entry is None:
-            return None
-        response, expires_at = entry
-        if time.time() > expires_at:
-            del self._cache[cache_key]
+        response = self._cache.get(cache_key)
+        if response is None:
             return None
         self._stats["cache_hits"] += 1
         return response
@@ -472,14 +498,7 @@ class DeepSeekAIService:
         """设置缓存"""
         ttl = int(ttl_seconds) if ttl_seconds is not None else int(self.cache_ttl)
         ttl = max(1, ttl)
-        expires_at = time.time() + ttl
-        self._cache[cache_key] = (response, expires_at)
-        
-        # 清理过期缓存
-        now = time.time()
-        expired_keys = [k for k, v in self._cache.items() if v[1] < now]
-        for k in expired_keys:
-            del self._cache[k]
+        self._cache.set(cache_key, response, ttl)
     
     def _should_fallback(self, context: Dict[str, Any]) -> Tuple[bool, str]:
         """判断是否应该直接使用降级策略"""
@@ -697,6 +716,7 @@ class DeepSeekAIService:
         
         return True, parsed, ""
     
+    @profiled("ai_weight.call_api")
     def _call_api(self, user_prompt: str) -> Tuple[bool, str, str]:
         """
         调用 DeepSeek API
@@ -756,6 +776,7 @@ class DeepSeekAIService:
         
         return False, "", "max_retries_exceeded"
     
+    @profiled("ai_weight.get_weights")
     def get_weights(
         self,
         symbol: str,
@@ -820,30 +841,33 @@ class DeepSeekAIService:
             return self._create_fallback_response(context, "ai_disabled")
         
         # 调用 AI
-        user_prompt = self._build_user_prompt(context)
         print(
             "🤖 AI权重请求: "
             f"{json.dumps(request_payload, ensure_ascii=False, separators=(',', ':'))}"
         )
-        success, response_text, error = self._call_api(user_prompt)
+        if self._local_provider is not None:
+            success, response_text, error = self._local_provider.call(request_payload)
+            if success:
+                self._stats["api_calls"] += 1
+        else:
+            success, response_text, error = self._call_api(self._build_user_prompt(context))
+        stale_key = f"{str(symbol).upper()}|{str(regime).upper()}|{request_mode_norm}"
         
         if not success:
             self._stats["errors"] += 1
-            self._stats["fallbacks"] += 1
             print(
                 "🤖 AI权重失败: "
                 f"{json.dumps({'symbol': symbol, 'regime': regime, 'error': error}, ensure_ascii=False, separators=(',', ':'))}"
             )
-            return self._create_fallback_response(context, f"api_error:{error}")
+            return self._stale_or_fallback(stale_key, context, f"api_error:{error}")
         
         # 校验响应
         is_valid, parsed, validation_error = self._validate_response(response_text)
         
         if not is_valid:
             self._stats["errors"] += 1
-            self._stats["fallbacks"] += 1
             logger.warning(f"AI response validation failed: {validation_error}")
-            return self._create_fallback_response(context, f"validation_error:{validation_error}")
+            return self._stale_or_fallback(stale_key, context, f"validation_error:{validation_error}")
         
         # parsed 已验证通过，必定是 dict
         parsed_dict: Dict[str, Any] = parsed if isinstance(parsed, dict) else {}
@@ -872,8 +896,20 @@ class DeepSeekAIService:
             response,
             ttl_seconds=self._get_cache_ttl_for_context(context),
         )
+        if self.stale_fallback_ttl > 0:
+            self._last_good.set(stale_key, response, self.stale_fallback_ttl)
         
         return response
+
+    def _stale_or_fallback(self, stale_key: str, context: Dict[str, Any], reason: str) -> AIWeightResponse:
+        """调用/校验失败：有未过期的最近有效权重则沿用，否则降级为默认权重"""
+        if self.stale_fallback_ttl > 0:
+            last_good = self._last_good.get(stale_key)
+            if last_good is not None:
+                self._stats["stale_served"] += 1
+                return last_good
+        self._stats["fallbacks"] += 1
+        return self._create_fallback_response(context, reason)
     
     def _build_context(
         self,
@@ -1200,14 +1236,15 @@ class DeepSeekAIService:
             "cache_hit_rate": hits / total if total > 0 else 0,
             "fallback_rate": fallbacks / total if total > 0 else 0,
             "cache_size": len(self._cache),
+            "cache": self._cache.stats(),
             "enabled": self.enabled,
+            "provider": self.provider,
+            "local": self._local_provider.get_stats() if self._local_provider is not None else None,
         }
     
     def clear_cache(self) -> int:
         """清空缓存"""
-        count = len(self._cache)
-        self._cache.clear()
-        return count
+        return self._cache.clear()
 
 
 # 导出
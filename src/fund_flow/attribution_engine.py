@@ -2,9 +2,12 @@ from __future__ import annotations
 
 import json
 import os
+import threading
+import time
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional
+from typing import Any, BinaryIO, Dict, Optional, TextIO
 
+from src.fund_flow.attribution_index import index_path_for, make_index_entry
 from src.fund_flow.models import FundFlowDecision
 
 
@@ -16,17 +19,32 @@ class FundFlowAttributionEngine:
     - 记录 DeepSeek 权重快照
     - 记录 15m/5m 分数融合信息
     - 支持因子贡献分析
+
+    写入:
+    - 文件句柄常驻，仅在日期分桶切换时重开；写入走缓冲，flush() 于周期结束调用
+    - 侧车 .idx 记录 (时间, 事件, 交易对, 偏移, 长度)，供 attribution_index.query_attribution 检索
     """
 
+    # 缓冲中的记录数达到该值时自动 flush（防止长周期内积压过多）
+    DEFAULT_FLUSH_EVERY = 256
+
     def __init__(
         self,
         logs_dir: str,
         file_name: str = "fund_flow_attribution.jsonl",
         bucket_root_dir: str | None = None,
+        flush_every: int = DEFAULT_FLUSH_EVERY,
     ) -> None:
         self.logs_dir = logs_dir
         self.file_name = file_name
         self.bucket_root_dir = bucket_root_dir
+        self.flush_every = max(1, int(flush_every))
+        self._lock = threading.Lock()
+        self._fp: Optional[BinaryIO] = None
+        self._idx_fp: Optional[TextIO] = None
+        self._fp_path: Optional[str] = None
+        self._offset = 0
+        self._pending = 0
         os.makedirs(self.logs_dir, exist_ok=True)
         self.log_path = os.path.join(self.logs_dir, self.file_name)
         if isinstance(self.bucket_root_dir, str) and self.bucket_root_dir.strip():
@@ -68,18 +86,75 @@ class FundFlowAttributionEngine:
             return datetime.now()
 
     def _append(self, payload: Dict[str, Any]) -> None:
+        now_epoch = time.time()
         payload = {"ts": self._ts(), **payload}
-        with open(self._resolve_log_path(), "a", encoding="utf-8") as f:
-            f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+        data = (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            self._ensure_open(self._current_log_path())
+            if self._fp is None:
+                return
+            self._fp.write(data)
+            if self._idx_fp is not None:
+                self._idx_fp.write(make_index_entry(payload, self._offset, len(data), ts_epoch=now_epoch))
+            self._offset += len(data)
+            self._pending += 1
+            if self._pending >= self.flush_every:
+                self._flush_locked()
 
-    def _resolve_log_path(self) -> str:
+    def _current_log_path(self) -> str:
+        """按本地日期计算目标文件路径（不做 makedirs，切桶时由 _ensure_open 创建目录）"""
         if not isinstance(self.bucket_root_dir, str) or not self.bucket_root_dir.strip():
             return self.log_path
-        now = datetime.now()
-        month, date, _hour_bucket = self._bucket_parts(now)
-        dir_path = os.path.join(self.bucket_root_dir, month, date)
-        os.makedirs(dir_path, exist_ok=True)
-        return os.path.join(dir_path, self.file_name)
+        month, date, _hour_bucket = self._bucket_parts(datetime.now())
+        return os.path.join(self.bucket_root_dir, month, date, self.file_name)
+
+    def _ensure_open(self, path: str) -> None:
+        if self._fp is not None and self._fp_path == path:
+            return
+        self._close_locked()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._fp = open(path, "ab")
+            self._offset = self._fp.seek(0, os.SEEK_END)
+            self._idx_fp = open(index_path_for(path), "a", encoding="utf-8")
+            self._fp_path = path
+        except Exception as e:
+            print(f"⚠️ 归因日志打开失败: {path}: {e}")
+            self._close_locked()
+
+    def _flush_locked(self) -> None:
+        # 先刷日志本体再刷索引，保证索引不会指向未落盘的数据
+        for fp in (self._fp, self._idx_fp):
+            if fp is None:
+                continue
+            try:
+                fp.flush()
+            except Exception:
+                pass
+        self._pending = 0
+
+    def _close_locked(self) -> None:
+        self._flush_locked()
+        for fp in (self._fp, self._idx_fp):
+            if fp is None:
+                continue
+            try:
+                fp.close()
+            except Exception:
+                pass
+        self._fp = None
+        self._idx_fp = None
+        self._fp_path = None
+        self._offset = 0
+
+    def flush(self) -> None:
+        """把缓冲中的归因记录落盘（每轮周期结束时调用）"""
+        with self._lock:
+            self._flush_locked()
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_locked()
 
     def _target_path_from_local_dt(self, dt_local: datetime) -> str:
         if not isinstance(self.bucket_root_dir, str) or not self.bucket_root_dir.strip():
@@ -0,0 +1,214 @@
+"""
+归因日志侧车索引 (Attribution Index)
+
+每个 fund_flow_attribution.jsonl 旁边维护一个 .idx 文件，每行一条记录:
+    {"t": 事件时间(epoch 秒), "e": 事件类型, "s": 交易对, "o": 字节偏移, "n": 字节长度}
+
+查询时只读索引（体积远小于日志本体），命中后 seek 到偏移读取原始 JSON 行。
+索引未覆盖的尾部（旧文件、迁移追加、异常退出）在查询时增量补建。
+查询侧补建与写入方缓冲中的索引行可能覆盖同一偏移，读取索引时按偏移去重。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+INDEX_SUFFIX = ".idx"
+
+
+def index_path_for(log_path: str) -> str:
+    return log_path + INDEX_SUFFIX
+
+
+def event_symbol(payload: Dict[str, Any]) -> str:
+    """从归因事件中提取交易对（decision/execution 事件在 decision.symbol 中）"""
+    symbol = payload.get("symbol")
+    if not symbol:
+        decision = payload.get("decision")
+        if isinstance(decision, dict):
+            symbol = decision.get("symbol")
+    return str(symbol or "").upper()
+
+
+def parse_ts_epoch(ts: Any) -> float:
+    if not isinstance(ts, str) or not ts.strip():
+        return 0.0
+    try:
+        dt = datetime.fromisoformat(ts.strip().replace("Z", "+00:00"))
+    except Exception:
+        return 0.0
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def make_index_entry(payload: Dict[str, Any], offset: int, length: int, ts_epoch: Optional[float] = None) -> str:
+    entry = {
+        "t": round(ts_epoch if ts_epoch is not None else parse_ts_epoch(payload.get("ts")), 3),
+        "e": str(payload.get("event") or ""),
+        "s": event_symbol(payload),
+        "o": int(offset),
+        "n": int(length),
+    }
+    return json.dumps(entry, separators=(",", ":")) + "\n"
+
+
+def _read_index(idx_path: str) -> List[Dict[str, Any]]:
+    """读取索引行，按字节偏移去重并排序（同一偏移以先写入者为准）"""
+    entries: List[Dict[str, Any]] = []
+    seen: set = set()
+    try:
+        with open(idx_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except Exception:
+                    continue
+                if not isinstance(entry, dict) or "o" not in entry or "n" not in entry:
+                    continue
+                try:
+                    offset = int(entry["o"])
+                except (TypeError, ValueError):
+                    continue
+                if offset in seen:
+                    continue
+                seen.add(offset)
+                entries.append(entry)
+    except FileNotFoundError:
+        pass
+    entries.sort(key=lambda e: int(e["o"]))
+    return entries
+
+
+def ensure_index(log_path: str) -> List[Dict[str, Any]]:
+    """
+    读取索引，并把日志中未被索引覆盖的尾部补进索引。
+
+    只索引以换行结尾的完整行；写入方仍缓冲中的半行留待下次补建。
+    """
+    idx_path = index_path_for(log_path)
+    entries = _read_index(idx_path)
+    try:
+        size = os.path.getsize(log_path)
+    except OSError:
+        return entries
+    covered = max((int(e["o"]) + int(e["n"]) for e in entries), default=0)
+    if covered >= size:
+        return entries
+
+    new_lines: List[str] = []
+    with open(log_path, "rb") as f:
+        f.seek(covered)
+        offset = covered
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            length = len(raw)
+            try:
+                payload = json.loads(raw.decode("utf-8", errors="ignore"))
+            except Exception:
+                payload = None
+            if isinstance(payload, dict):
+                line = make_index_entry(payload, offset, length)
+                new_lines.append(line)
+                entries.append(json.loads(line))
+            offset += length
+    if new_lines:
+        with open(idx_path, "a", encoding="utf-8") as f:
+            f.writelines(new_lines)
+    return entries
+
+
+def candidate_log_files(
+    root_dir: str,
+    file_name: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> List[str]:
+    """
+    列出可能包含目标时间段的日志文件。
+
+    支持两种布局: root/file_name（未分桶）与 root/YYYY-MM/YYYY-MM-DD/file_name（按本地日期分桶）。
+    分桶目录按日期过滤，前后各放宽一天以覆盖时区差异。
+    """
+    paths: List[str] = []
+    flat = os.path.join(root_dir, file_name)
+    if os.path.exists(flat):
+        paths.append(flat)
+    lo = (since - timedelta(days=1)).strftime("%Y-%m-%d") if since else None
+    hi = (until + timedelta(days=1)).strftime("%Y-%m-%d") if until else None
+    try:
+        months = sorted(os.listdir(root_dir))
+    except OSError:
+        return paths
+    for month in months:
+        month_path = os.path.join(root_dir, month)
+        if len(month) != 7 or month[4] != "-" or not os.path.isdir(month_path):
+            continue
+        if lo and month < lo[:7]:
+            continue
+        if hi and month > hi[:7]:
+            continue
+        for date in sorted(os.listdir(month_path)):
+            if lo and date < lo:
+                continue
+            if hi and date > hi:
+                continue
+            path = os.path.join(month_path, date, file_name)
+            if os.path.exists(path):
+                paths.append(path)
+    return paths
+
+
+def query_attribution(
+    root_dir: str,
+    file_name: str = "fund_flow_attribution.jsonl",
+    symbol: Optional[str] = None,
+    events: Optional[Sequence[str]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """按 交易对 / 事件类型 / 时间段 查询归因事件（按文件顺序产出）"""
+    symbol_up = str(symbol).upper() if symbol else None
+    event_set = {str(e) for e in events} if events else None
+    since_ts = since.timestamp() if since else None
+    until_ts = until.timestamp() if until else None
+    produced = 0
+    for path in candidate_log_files(root_dir, file_name, since, until):
+        matches = [
+            e
+            for e in ensure_index(path)
+            if (symbol_up is None or e.get("s") == symbol_up)
+            and (event_set is None or e.get("e") in event_set)
+            and (since_ts is None or float(e.get("t", 0.0)) >= since_ts)
+            and (until_ts is None or float(e.get("t", 0.0)) <= until_ts)
+        ]
+        if not matches:
+            continue
+        with open(path, "rb") as f:
+            for entry in matches:
+                f.seek(int(entry["o"]))
+                raw = f.read(int(entry["n"]))
+                try:
+                    payload = json.loads(raw.decode("utf-8", errors="ignore"))
+                except Exception:
+                    continue
+                yield payload
+                produced += 1
+                if limit is not None and produced >= limit:
+                    return
+
+
+__all__ = [
+    "INDEX_SUFFIX",
+    "candidate_log_files",
+    "ensure_index",
+    "event_symbol",
+    "index_path_for",
+    "make_index_entry",
+    "query_attribution",
+]
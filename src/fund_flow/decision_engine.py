@@ -2,11 +2,13 @@ from __future__ import annotations
 
 from collections import deque
 from datetime import datetime, timezone
-from typing import Any, Deque, Dict, Optional, Tuple
+from typing import Any, Deque, Dict, List, Optional, Tuple
 
 from src.fund_flow.models import ExecutionMode, FundFlowDecision, Operation, TimeInForce
 from src.fund_flow.deepseek_weight_router import DeepSeekWeightRouter, WeightMap
 from src.fund_flow.weight_router import WeightRouter
+from src.config.snapshots import TrendCaptureConfigSnapshot
+from src.utils.profiler import profiled
 
 
 class FundFlowDecisionEngine:
@@ -297,6 +299,13 @@ class FundFlowDecisionEngine:
         logger.info("[WeightRouter] default_weights(RANGE): %s", self.default_weights_config.get("RANGE", {}))
         logger.info("[WeightRouter] score_fusion enabled=%s, 15m_weight=%.2f, 5m_weight=%.2f",
                     self.score_fusion_enabled, self.score_15m_weight, self.score_5m_weight)
+
+        # 热路径配置快照：构建期校验，错误在加载时暴露
+        self._trend_capture_snapshot: Optional[TrendCaptureConfigSnapshot] = None
+        self._engine_params_cache: Dict[str, Dict[str, Any]] = {}
+        self._trend_capture_config()
+        for regime_name in ("TREND", "RANGE"):
+            self._engine_params_for(regime_name)
     
     def _parse_default_weights(self, dw_cfg: Dict[str, Any], prefix: str) -> Dict[str, float]:
         """
@@ -351,7 +360,15 @@ class FundFlowDecisionEngine:
         
         return weights
 
-    def _trend_capture_config(self) -> Dict[str, Any]:
+    def _trend_capture_config(self) -> TrendCaptureConfigSnapshot:
+        """引擎实例内配置不变（热更新会重建引擎），首次调用时解析并缓存为不可变快照"""
+        snapshot = getattr(self, "_trend_capture_snapshot", None)
+        if snapshot is None:
+            snapshot = TrendCaptureConfigSnapshot.from_mapping(self._build_trend_capture_config())
+            self._trend_capture_snapshot = snapshot
+        return snapshot
+
+    def _build_trend_capture_config(self) -> Dict[str, Any]:
         root = getattr(self, "config", None) or {}
         ff = root.get("fund_flow", {}) if isinstance(root, dict) else {}
         regime = ff.get("regime", {}) if isinstance(ff.get("regime"), dict) else {}
@@ -806,7 +823,24 @@ class FundFlowDecisionEngine:
         return lev
 
     def _engine_params_for(self, regime: str) -> Dict[str, Any]:
+        """
+        按 regime 返回引擎参数（解析结果按 regime 缓存）
+
+        参数含 engine_params 中的任意扩展键且会写入决策 metadata，因此返回浅拷贝 dict
+        而不是固定字段快照。
+        """
         normalized_regime = str(regime or "TREND").upper()
+        cache = getattr(self, "_engine_params_cache", None)
+        if cache is None:
+            cache = {}
+            self._engine_params_cache = cache
+        params = cache.get(normalized_regime)
+        if params is None:
+            params = self._build_engine_params(normalized_regime)
+            cache[normalized_regime] = params
+        return dict(params)
+
+    def _build_engine_params(self, normalized_regime: str) -> Dict[str, Any]:
         raw = self.engine_params_cfg.get(normalized_regime, {})
         raw_cfg = raw if isinstance(raw, dict) else {}
         base_pool = self.active_signal_pool_id
@@ -2549,6 +2583,39 @@ class FundFlowDecisionEngine:
             "trap": trap_eval,
         }
 
+    def prefetch_ai_weights(self, items: List[Dict[str, Any]], ai_gate: str = "final") -> int:
+        """
+        为一批候选并发预取 AI 权重（结果由 decide 内的 get_weights 消费）
+
+        items 每项: symbol / market_flow_context / 可选 regime（缺省时按上下文检测）
+        """
+        if not (self.deepseek_router.enabled and self.deepseek_router.ai_enabled):
+            return 0
+        gate = str(ai_gate or "").strip().lower()
+        if gate == "position_review":
+            request_mode = "position_review"
+        elif gate == "final":
+            request_mode = "entry_review"
+        else:
+            request_mode = "generic"
+        requests: List[Dict[str, Any]] = []
+        for item in items or []:
+            if not isinstance(item, dict):
+                continue
+            ctx = item.get("market_flow_context") or {}
+            regime = str(item.get("regime") or self._detect_regime(ctx).get("regime", "NO_TRADE")).upper()
+            requests.append(
+                {
+                    "symbol": item.get("symbol"),
+                    "regime": regime,
+                    "market_flow_context": ctx,
+                    "quantile_context": self._extract_range_quantiles(ctx) if regime == "RANGE" else None,
+                    "request_mode": request_mode,
+                }
+            )
+        return self.deepseek_router.prefetch_weights(requests)
+
+    @profiled("decide")
     def decide(
         self,
         symbol: str,
@@ -2703,6 +2770,8 @@ class FundFlowDecisionEngine:
             "ds_confidence": weight_map.confidence if use_router_runtime else 0.0,
             "ds_source": weight_map.reason if use_router_runtime else "local_only",
             "ds_weights_snapshot": weight_map.to_dict() if use_router_runtime else {},
+            "ds_weights_age_seconds": round(weight_map.age_seconds(), 3) if use_router_runtime else 0.0,
+            "ds_weights_freshness": weight_map.freshness if use_router_runtime else "local_only",
             "weight_router_runtime_enabled": use_router_runtime,
             "ai_weights_runtime_enabled": bool(use_router_runtime and use_ai_weights and self.deepseek_router.ai_enabled),
             "fusion_info": {
@@ -19,13 +19,16 @@ V3.0 增强:
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
 import math
 import hashlib
 import json
 import logging
 
+from src.fund_flow.ai_weight_scheduler import AIWeightScheduler
+from src.fund_flow.lru_cache import LRUTTLCache, SQLiteCacheTier
+
 if TYPE_CHECKING:
     from src.fund_flow.ai_weight_service import DeepSeekAIService, AIWeightResponse
 
@@ -53,6 +56,12 @@ class WeightMap:
     confidence: float = 0.5
     reason: str = "default"
     timestamp: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    # fresh: 本次计算/请求所得; stale: 预取未按时返回时沿用的上一次有效 AI 权重
+    freshness: str = "fresh"
+
+    def age_seconds(self, now: Optional[datetime] = None) -> float:
+        now = now or datetime.now(timezone.utc)
+        return max(0.0, (now - self.timestamp).total_seconds())
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -69,21 +78,19 @@ class WeightMap:
             "confidence": self.confidence,
             "reason": self.reason,
             "timestamp": self.timestamp.isoformat(),
+            "freshness": self.freshness,
         }
 
-
-@dataclass
-class WeightCacheEntry:
-    """权重缓存条目"""
-    weight_map: WeightMap
-    symbol: str
-    regime: str
-    created_at: datetime
-    expires_at: datetime
-    hit_count: int = 0
-    
-    def is_expired(self) -> bool:
-        return datetime.now(timezone.utc) >= self.expires_at
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "WeightMap":
+        kwargs = {k: v for k, v in (data or {}).items() if k in cls.__dataclass_fields__ and k != "timestamp"}
+        ts_raw = (data or {}).get("timestamp")
+        if isinstance(ts_raw, str) and ts_raw:
+            try:
+                kwargs["timestamp"] = datetime.fromisoformat(ts_raw)
+            except ValueError:
+                pass
+        return cls(**kwargs)
 
 
 class DeepSeekWeightRouter:
@@ -149,16 +156,26 @@ class DeepSeekWeightRouter:
         # AI 服务配置
         self.ai_enabled = bool(ds_cfg.get("ai_enabled", False))
         self._ai_service: Optional["DeepSeekAIService"] = None
-        
-        # 缓存存储
-        self._cache: Dict[str, WeightCacheEntry] = {}
+
+        # AI 权重并发预取（stale-while-revalidate）
+        prefetch_cfg = ds_cfg.get("prefetch", {}) if isinstance(ds_cfg.get("prefetch"), dict) else {}
+        self.scheduler = AIWeightScheduler(self._try_ai_weights, prefetch_cfg)
+        
+        # 缓存存储（LRU + TTL；可选 SQLite 写后持久层，重启后可回读）
+        persist_path = str(ds_cfg.get("cache_persist_path") or "").strip()
+        self._cache = LRUTTLCache(
+            max_entries=self.cache_max_entries,
+            default_ttl=self.cache_ttl,
+            tier=SQLiteCacheTier(persist_path, table="deepseek_weight_cache") if persist_path else None,
+            serialize=lambda wm: wm.to_dict(),
+            deserialize=WeightMap.from_dict,
+        )
         
         # 统计
         self._stats = {
             "total_requests": 0,
             "cache_hits": 0,
             "cache_misses": 0,
-            "cache_evictions": 0,
             "ai_calls": 0,
             "ai_successes": 0,
             "fallbacks": 0,
@@ -199,37 +216,13 @@ class DeepSeekWeightRouter:
         hash_str = json.dumps(hash_input, sort_keys=True, default=str)
         return hashlib.md5(hash_str.encode()).hexdigest()
     
-    def _evict_expired_cache(self) -> int:
-        """清理过期缓存"""
-        expired_keys = [k for k, v in self._cache.items() if v.is_expired()]
-        for k in expired_keys:
-            del self._cache[k]
-        if expired_keys:
-            self._stats["cache_evictions"] += len(expired_keys)
-        return len(expired_keys)
-    
-    def _evict_lru_if_needed(self) -> None:
-        """LRU 淘汰"""
-        if len(self._cache) < self.cache_max_entries:
-            return
-        # 按 hit_count 排序，淘汰最少使用的
-        sorted_items = sorted(
-            self._cache.items(),
-            key=lambda x: (x[1].hit_count, x[1].created_at)
-        )
-        evict_count = len(self._cache) - self.cache_max_entries + 1
-        for k, _ in sorted_items[:evict_count]:
-            del self._cache[k]
-            self._stats["cache_evictions"] += 1
-    
     def _get_cached(self, cache_key: str) -> Optional[WeightMap]:
         """从缓存获取权重"""
-        entry = self._cache.get(cache_key)
-        if entry is None or entry.is_expired():
+        weight_map = self._cache.get(cache_key)
+        if weight_map is None:
             return None
-        entry.hit_count += 1
         self._stats["cache_hits"] += 1
-        return entry.weight_map
+        return weight_map
     
     def _set_cache(
         self,
@@ -238,20 +231,8 @@ class DeepSeekWeightRouter:
         regime: str,
         weight_map: WeightMap,
     ) -> None:
-        """设置缓存"""
-        self._evict_expired_cache()
-        self._evict_lru_if_needed()
-        
-        now = datetime.now(timezone.utc)
-        expires_at = now + timedelta(seconds=self.cache_ttl)
-        
-        self._cache[cache_key] = WeightCacheEntry(
-            weight_map=weight_map,
-            symbol=symbol,
-            regime=regime,
-            created_at=now,
-            expires_at=expires_at,
-        )
+        """设置缓存（symbol/regime 已编码在 cache_key 中）"""
+        self._cache.set(cache_key, weight_map, self.cache_ttl)
     
     def _classify_adx_bucket(self, adx: float) -> str:
         """ADX 分类桶"""
@@ -489,15 +470,26 @@ class DeepSeekWeightRouter:
         
         # 尝试调用 AI 服务
         if self.ai_enabled and bool(use_ai):
-            weight_map = self._try_ai_weights(
-                symbol,
-                regime,
-                market_flow_context,
-                quantile_context,
-                request_mode=request_mode,
-            )
+            if self.scheduler.enabled:
+                weight_map = self.scheduler.resolve(
+                    symbol,
+                    regime,
+                    market_flow_context,
+                    quantile_context,
+                    request_mode=request_mode,
+                )
+            else:
+                weight_map = self._try_ai_weights(
+                    symbol,
+                    regime,
+                    market_flow_context,
+                    quantile_context,
+                    request_mode=request_mode,
+                )
             if weight_map is not None:
-                self._set_cache(cache_key, symbol, regime, weight_map)
+                # stale 结果不写缓存，下次决策仍会尝试取新结果
+                if weight_map.freshness == "fresh":
+                    self._set_cache(cache_key, symbol, regime, weight_map)
                 return weight_map
         
         # 本地规则计算权重
@@ -526,8 +518,9 @@ class DeepSeekWeightRouter:
                 reason=reason,
             )
         
-        # 缓存结果
-        self._set_cache(cache_key, symbol, regime, weight_map)
+        # 缓存结果（预取模式下 AI 未就绪时不缓存本地结果，避免遮挡稍后到达的 AI 权重）
+        if not (self.ai_enabled and bool(use_ai) and self.scheduler.enabled):
+            self._set_cache(cache_key, symbol, regime, weight_map)
         
         return weight_map
     
@@ -619,6 +612,26 @@ class DeepSeekWeightRouter:
             self._stats["fallbacks"] += 1
             return None
     
+    def prefetch_weights(self, requests: List[Dict[str, Any]]) -> int:
+        """
+        周期开始时并发预取多个标的的 AI 权重
+
+        requests 每项: symbol / regime / market_flow_context / quantile_context / request_mode
+        """
+        if not (self.enabled and self.ai_enabled and self.scheduler.enabled):
+            return 0
+        return self.scheduler.prefetch(requests)
+
+    def refresh_ahead(self, symbols: Optional[List[str]] = None, request_mode: Optional[str] = None) -> int:
+        """按最近一次上下文提前刷新（对齐窗口之前调用）"""
+        if not (self.enabled and self.ai_enabled and self.scheduler.enabled):
+            return 0
+        return self.scheduler.refresh_known(symbols, request_mode=request_mode)
+
+    def shutdown(self) -> None:
+        self.scheduler.shutdown()
+        self._cache.close()
+
     def get_stats(self) -> Dict[str, Any]:
         """获取统计信息"""
         total = self._stats["total_requests"]
@@ -629,18 +642,18 @@ class DeepSeekWeightRouter:
             **self._stats,
             "cache_hit_rate": hit_rate,
             "cache_size": len(self._cache),
+            "cache_evictions": self._cache.stats()["evictions"],
+            "cache": self._cache.stats(),
+            "prefetch": self.scheduler.get_stats(),
         }
     
     def clear_cache(self) -> int:
         """清空缓存"""
-        count = len(self._cache)
-        self._cache.clear()
-        return count
+        return self._cache.clear()
 
 
 # 导出
 __all__ = [
     "WeightMap",
-    "WeightCacheEntry",
     "DeepSeekWeightRouter",
 ]
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import json
+import time
 from decimal import Decimal, ROUND_HALF_UP
 from typing import Any, Dict, List, Optional, Tuple
 
@@ -8,6 +9,7 @@ from src.fund_flow.attribution_engine import FundFlowAttributionEngine
 from src.fund_flow.models import FundFlowDecision, Operation, TimeInForce
 from src.fund_flow.risk_engine import FundFlowRiskEngine
 from src.trading.intents import PositionSide as IntentPositionSide
+from src.utils.profiler import profiled
 
 
 class FundFlowExecutionRouter:
@@ -23,10 +25,13 @@ class FundFlowExecutionRouter:
         risk_engine: FundFlowRiskEngine,
         attribution_engine: FundFlowAttributionEngine,
         close_retry_times: int = 4,
+        kill_switch: Any = None,
     ) -> None:
         self.client = client
         self.risk = risk_engine
         self.attribution = attribution_engine
+        # 可选 KillSwitchExecutor：回滚强平复用其预热的持仓模式与回退下单序列
+        self.kill_switch = kill_switch
         ff_cfg = ((self.risk.config or {}).get("fund_flow", {}) or {})
         degrade_cfg = ff_cfg.get("execution_degradation", {}) or {}
         if not isinstance(degrade_cfg, dict):
@@ -332,6 +337,7 @@ class FundFlowExecutionRouter:
             return "SHORT"
         return ""
 
+    @profiled("execution.live_position_state")
     def _fetch_live_position_state(self, symbol: str, preferred_side: str = "") -> Dict[str, Any]:
         """
         从交易所实时拉取仓位，避免使用快照导致 reduce-only 方向/数量失配。
@@ -607,6 +613,7 @@ class FundFlowExecutionRouter:
 
         return self._with_degradation_path(current, path)
 
+    @profiled("execution.place_tp_sl")
     def _place_tp_sl(self, decision: FundFlowDecision, position_side: str) -> Dict[str, Any]:
         tp = decision.take_profit_price
         sl = decision.stop_loss_price
@@ -702,6 +709,7 @@ class FundFlowExecutionRouter:
             return {"ok": False, "reason": "missing_stop_loss_order", "has_tp": has_tp, "has_sl": has_sl}
         return {"ok": True, "reason": "ok", "has_tp": has_tp, "has_sl": has_sl}
 
+    @profiled("execution.force_flatten")
     def _force_flatten_position(self, symbol: str, position_side: str) -> Dict[str, Any]:
         side_up = str(position_side or "").upper()
         if side_up not in ("LONG", "SHORT"):
@@ -711,6 +719,27 @@ class FundFlowExecutionRouter:
             if not pos or abs(float(pos.get("positionAmt", 0))) <= 0:
                 return {"status": "noop", "message": "no position to flatten"}
             qty = abs(float(pos.get("positionAmt", 0)))
+            if self.kill_switch is not None:
+                flat = self.kill_switch.flatten_position(
+                    symbol,
+                    side_up,
+                    qty,
+                    confirm_closed=lambda s: self._live_position_amount(s, side_up) <= 0,
+                )
+                order = flat.get("order") if isinstance(flat.get("order"), dict) else {}
+                if flat.get("status") != "success" or self._is_filled(order):
+                    return flat
+                # 回滚路径必须尽量确认仓位是否已实际消失，避免“假成功”。
+                remaining = self._live_position_amount(symbol, side_up)
+                if remaining <= 0:
+                    return {**flat, "message": "position closed after flatten request"}
+                return {
+                    "status": "error",
+                    "message": "force_flatten not confirmed; position still open",
+                    "order": order,
+                    "remaining_qty": remaining,
+                    "latency_ms": flat.get("latency_ms"),
+                }
             qty = float(self.client.format_quantity(symbol, qty))
             close_side = "SELL" if side_up == "LONG" else "BUY"
             params: Dict[str, Any] = {
@@ -756,6 +785,10 @@ class FundFlowExecutionRouter:
         except Exception as e:
             return {"status": "error", "message": f"force_flatten exception: {e}"}
 
+    def _live_position_amount(self, symbol: str, side: str) -> float:
+        latest = self.client.get_position(symbol, side=side)
+        return abs(self._to_float((latest or {}).get("positionAmt"), 0.0)) if isinstance(latest, dict) else 0.0
+
     def _is_filled(self, result: Dict[str, Any]) -> bool:
         if not self._is_success(result):
             return False
@@ -777,6 +810,7 @@ class FundFlowExecutionRouter:
             return executed_qty >= max(orig_qty - 1e-12, 0.0)
         return False
 
+    @profiled("execution.execute_decision")
     def execute_decision(
         self,
         decision: FundFlowDecision,
@@ -887,9 +921,17 @@ class FundFlowExecutionRouter:
                     return result
 
                 entry_filled = self._is_filled(order_result)
+                protection_latency_ms: Optional[float] = None
                 if entry_filled:
+                    # 开仓成交 -> 保护单齐备 的端到端耗时（裸仓暴露窗口），逐笔记入执行归因
+                    opened_at = time.perf_counter()
                     protection = self._place_tp_sl(decision, position_side)
                     protection_guard = self._check_protection_completeness(decision, protection)
+                    protection_latency_ms = round((time.perf_counter() - opened_at) * 1000.0, 1)
+                    print(
+                        f"🛡️ {decision.symbol} 开仓->保护单耗时 {protection_latency_ms:.1f}ms "
+                        f"(ok={bool(protection_guard.get('ok', False))})"
+                    )
                     if not protection_guard.get("ok", False):
                         ff_cfg = (self.risk.config or {}).get("fund_flow", {}) or {}
                         rollback_on_fail = bool(ff_cfg.get("rollback_on_tp_sl_fail", True))
@@ -902,6 +944,7 @@ class FundFlowExecutionRouter:
                             "order": order_result,
                             "protection": protection,
                             "protection_guard": protection_guard,
+                            "protection_latency_ms": protection_latency_ms,
                             "rollback": rollback_result,
                             "quantity": qty,
                             "price": order_price,
@@ -926,6 +969,7 @@ class FundFlowExecutionRouter:
                     "operation": decision.operation.value,
                     "order": order_result,
                     "protection": protection,
+                    "protection_latency_ms": protection_latency_ms,
                     "quantity": qty,
                     "price": order_price,
                     "leverage": leverage,
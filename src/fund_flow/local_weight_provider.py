@@ -0,0 +1,204 @@
+"""
+本地模型权重后端 (Local Weight Provider)
+
+DeepSeekAIService 的可插拔后端：对接本地 OpenAI 兼容服务
+（LM Studio Local Server / tools/mcp/lmstudio_server 所代理的同一端点，或任意兼容实现）:
+1. 紧凑提示词：更短的系统提示 + 请求载荷，超出 token 预算时按优先级裁剪次要分区
+2. 严格输出：response_format=json_schema 约束输出结构；服务端不支持时自动退回普通 JSON 模式
+3. 短超时、不重试：本地推理失败直接交给上层降级（缓存 / 默认权重），不阻塞权重刷新
+4. 复用 HTTP 连接（keep-alive）
+
+配置（deepseek_ai.local）:
+    base_url            默认 $LMSTUDIO_API_BASE 或 http://localhost:1234/v1
+    api_key             默认 $LMSTUDIO_API_KEY 或 lmstudio
+    model               默认 $LMSTUDIO_MODEL 或 local-model
+    timeout             请求超时（秒），默认 3.0
+    max_tokens          输出 token 上限，默认 160
+    max_prompt_tokens   输入 token 预算（估算），默认 600
+    json_schema         是否使用 json_schema 约束输出，默认 true
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "http://localhost:1234/v1"
+DEFAULT_API_KEY = "lmstudio"
+DEFAULT_MODEL = "local-model"
+
+WEIGHT_KEYS = [
+    "cvd", "cvd_momentum", "oi_delta", "funding",
+    "depth_ratio", "imbalance", "liquidity_delta", "micro_delta"
+]
+
+# 本地模型上下文较小，系统提示只保留约束本身
+LOCAL_SYSTEM_PROMPT = (
+    "你是资金流因子 Weight Router。只输出 JSON：weights(8 个因子，各在[0,1]，总和=1)、confidence[0,1]、fallback_used。"
+    "不输出方向/阈值/仓位/杠杆/价格。dq.ok=false、dq.stale>30 或 dq.miss 非空时 fallback_used=true 并返回 dw。"
+    "TREND 偏 cvd/oi_delta/funding/depth_ratio/liquidity_delta；RANGE 偏 imbalance/micro_delta。"
+    "risk 中 trap/phantom/wide 为真时降低动量权重与 confidence。"
+)
+
+# 超出预算时依次裁剪的分区（越靠前越次要）
+TRIM_ORDER = ["capture", "tech", "position_regime", "regime_info", "micro"]
+
+WEIGHT_RESPONSE_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "weights": {
+            "type": "object",
+            "properties": {k: {"type": "number", "minimum": 0, "maximum": 1} for k in WEIGHT_KEYS},
+            "required": list(WEIGHT_KEYS),
+            "additionalProperties": False,
+        },
+        "confidence": {"type": "number", "minimum": 0, "maximum": 1},
+        "fallback_used": {"type": "boolean"},
+    },
+    "required": ["weights", "confidence", "fallback_used"],
+    "additionalProperties": False,
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：ASCII 约 4 字符/token，其它字符（中文等）约 1 字符/token"""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def build_compact_prompt(payload: Dict[str, Any], max_prompt_tokens: int) -> Tuple[str, List[str]]:
+    """请求载荷 -> 紧凑用户提示；超出预算时按 TRIM_ORDER 裁剪，返回 (提示, 被裁剪分区)"""
+    budget = max(1, int(max_prompt_tokens)) - estimate_tokens(LOCAL_SYSTEM_PROMPT)
+    body = dict(payload)
+    trimmed: List[str] = []
+    while True:
+        prompt = json.dumps(body, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+        if estimate_tokens(prompt) <= budget:
+            return prompt, trimmed
+        section = next((k for k in TRIM_ORDER if k in body), None)
+        if section is None:
+            return prompt, trimmed
+        body.pop(section)
+        trimmed.append(section)
+
+
+class LocalWeightProvider:
+    """本地 OpenAI 兼容 chat/completions 权重后端"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None) -> None:
+        cfg = config or {}
+        self.base_url = str(
+            cfg.get("base_url") or os.environ.get("LMSTUDIO_API_BASE") or DEFAULT_BASE_URL
+        ).rstrip("/")
+        self.api_key = str(cfg.get("api_key") or os.environ.get("LMSTUDIO_API_KEY") or DEFAULT_API_KEY)
+        self.model = str(cfg.get("model") or os.environ.get("LMSTUDIO_MODEL") or DEFAULT_MODEL)
+        self.timeout = max(0.1, self._to_float(cfg.get("timeout"), 3.0))
+        self.max_tokens = max(32, int(self._to_float(cfg.get("max_tokens"), 160)))
+        self.max_prompt_tokens = max(64, int(self._to_float(cfg.get("max_prompt_tokens"), 600)))
+        self.json_schema = bool(cfg.get("json_schema", True))
+        self._session = None
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Any] = {
+            "calls": 0,
+            "errors": 0,
+            "schema_downgrades": 0,
+            "trimmed_prompts": 0,
+            "last_prompt_tokens": 0,
+            "last_latency_ms": None,
+            "max_latency_ms": 0.0,
+        }
+
+    @staticmethod
+    def _to_float(value: Any, default: float = 0.0) -> float:
+        try:
+            return float(value)
+        except Exception:
+            return default
+
+    @property
+    def url(self) -> str:
+        return f"{self.base_url}/chat/completions"
+
+    def _get_session(self):
+        """延迟初始化 requests.Session（复用连接）"""
+        if self._session is None:
+            import requests
+
+            self._session = requests.Session()
+        return self._session
+
+    def _request_body(self, user_prompt: str) -> Dict[str, Any]:
+        body: Dict[str, Any] = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": LOCAL_SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt},
+            ],
+            "temperature": 0.0,
+            "max_tokens": self.max_tokens,
+            "stream": False,
+        }
+        if self.json_schema:
+            body["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "weight_router", "strict": True, "schema": WEIGHT_RESPONSE_SCHEMA},
+            }
+        return body
+
+    def call(self, request_payload: Dict[str, Any]) -> Tuple[bool, str, str]:
+        """
+        调用本地模型
+
+        返回: (success, response_text, error_message)，与 DeepSeekAIService._call_api 一致
+        """
+        user_prompt, trimmed = build_compact_prompt(request_payload, self.max_prompt_tokens)
+        headers = {"Content-Type": "application/json", "Authorization": f"Bearer {self.api_key}"}
+        started = time.perf_counter()
+        try:
+            session = self._get_session()
+            response = session.post(self.url, headers=headers, json=self._request_body(user_prompt), timeout=self.timeout)
+            if response.status_code == 400 and self.json_schema:
+                # 部分本地服务不支持 json_schema：关闭后重发一次，之后不再使用
+                self.json_schema = False
+                with self._lock:
+                    self._stats["schema_downgrades"] += 1
+                logger.warning("local weight provider: json_schema unsupported, falling back to plain JSON")
+                response = session.post(self.url, headers=headers, json=self._request_body(user_prompt), timeout=self.timeout)
+            if response.status_code != 200:
+                return self._failed(f"http_error:{response.status_code}")
+            choices = (response.json() or {}).get("choices") or []
+            content = (choices[0].get("message") or {}).get("content", "") if choices else ""
+            if not content:
+                return self._failed("empty_response")
+        except Exception as e:
+            return self._failed(f"exception:{e}")
+        finally:
+            latency_ms = round((time.perf_counter() - started) * 1000.0, 3)
+            with self._lock:
+                self._stats["calls"] += 1
+                self._stats["last_latency_ms"] = latency_ms
+                self._stats["max_latency_ms"] = max(self._stats["max_latency_ms"], latency_ms)
+                self._stats["last_prompt_tokens"] = estimate_tokens(LOCAL_SYSTEM_PROMPT) + estimate_tokens(user_prompt)
+                if trimmed:
+                    self._stats["trimmed_prompts"] += 1
+        return True, content, ""
+
+    def _failed(self, error: str) -> Tuple[bool, str, str]:
+        with self._lock:
+            self._stats["errors"] += 1
+        return False, "", error
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["backend"] = self.base_url
+        stats["json_schema"] = self.json_schema
+        return stats
+
+
+__all__ = ["LocalWeightProvider", "WEIGHT_RESPONSE_SCHEMA", "build_compact_prompt", "estimate_tokens"]
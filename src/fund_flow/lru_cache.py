@@ -0,0 +1,314 @@
+"""
+LRU + TTL 缓存 - 权重调度各层共用的缓存组件
+
+核心功能:
+1. OrderedDict 实现 LRU，get/set 均为 O(1)
+2. TTL 惰性过期：读到过期条目时删除；写入时仅顺带检查 LRU 头部少量条目
+3. 命中/未命中/淘汰/过期计数
+4. 可选 SQLite 写后（write-behind）持久层：写入只入队，由后台落盘线程批量写入；内存未命中时回读
+
+使用方:
+- weight_router.TTLCache（模块级共享缓存）
+- DeepSeekWeightRouter._cache
+- DeepSeekAIService._cache
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 写入时顺带检查的 LRU 头部条目数（保证 set 为常数开销）
+_SWEEP_PER_SET = 2
+
+
+class SQLiteCacheTier:
+    """
+    SQLite 持久层（key -> JSON value + 过期时间）
+
+    - store_many: 批量 UPSERT（由 LRUTTLCache 后台落盘线程 / 显式 flush 调用）
+    - load: 只读查询，过滤已过期记录，不在读路径上做 DELETE
+    - delete: 删除单个 key（LRUTTLCache.delete 同步调用，避免内存未命中时回读已删除条目）
+    - purge_expired: 显式清理（按需/定期调用）
+    """
+
+    def __init__(self, db_path: str, table: str = "lru_cache") -> None:
+        if not table.replace("_", "").isalnum():
+            raise ValueError(f"invalid table name: {table}")
+        self.db_path = db_path
+        self.table = table
+        parent = os.path.dirname(self.db_path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    cache_key TEXT PRIMARY KEY,
+                    value_json TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path)
+
+    def load(self, key: str) -> Optional[Tuple[Any, float]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT value_json, expires_at FROM {self.table} WHERE cache_key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        try:
+            return json.loads(row[0]), float(row[1])
+        except Exception:
+            return None
+
+    def store_many(self, items: List[Tuple[str, Any, float]]) -> int:
+        if not items:
+            return 0
+        rows = [(k, json.dumps(v, ensure_ascii=False, default=str), float(exp)) for k, v, exp in items]
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table}(cache_key, value_json, expires_at) VALUES (?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    def delete(self, key: str) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(f"DELETE FROM {self.table} WHERE cache_key = ?", (key,))
+            return cursor.rowcount > 0
+
+    def purge_expired(self) -> int:
+        with self._connect() as conn:
+            cursor = conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+            return cursor.rowcount
+
+
+class LRUTTLCache:
+    """
+    线程安全的 LRU + TTL 缓存
+
+    Args:
+        max_entries: 最大条目数，超出时淘汰最久未访问条目
+        default_ttl: set 未指定 ttl_seconds 时使用的 TTL（秒）
+        tier: 可选持久层（SQLiteCacheTier），value 需可 JSON 序列化
+        serialize / deserialize: 持久层读写时的 value 转换（默认原样）
+        flush_batch_size: 写后队列达到该长度时唤醒后台落盘线程
+        flush_interval_seconds: 后台落盘线程的定时落盘间隔（0 表示只按队列长度唤醒）
+
+    set() 从不写 SQLite：落盘只发生在后台线程（首次入队时启动）、显式 flush() 或 close()。
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        default_ttl: Optional[float] = None,
+        tier: Optional[SQLiteCacheTier] = None,
+        serialize: Optional[Callable[[Any], Any]] = None,
+        deserialize: Optional[Callable[[Any], Any]] = None,
+        flush_batch_size: int = 32,
+        flush_interval_seconds: float = 5.0,
+    ) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self.default_ttl = default_ttl
+        self._tier = tier
+        self._serialize = serialize
+        self._deserialize = deserialize
+        self.flush_batch_size = max(1, int(flush_batch_size))
+        self.flush_interval_seconds = max(0.0, float(flush_interval_seconds))
+        self._store: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._pending: Dict[str, Tuple[Any, float]] = {}
+        self._lock = threading.RLock()
+        self._flush_wake = threading.Event()
+        self._flush_stop = threading.Event()
+        self._flush_thread: Optional[threading.Thread] = None
+        self._metrics = {
+            "hits": 0,
+            "misses": 0,
+            "tier_hits": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "tier_writes": 0,
+        }
+
+    # ------------------------------------------------------------------ read
+    def get(self, key: str) -> Optional[Any]:
+        """获取缓存值，过期或不存在返回 None"""
+        now = time.time()
+        with self._lock:
+            item = self._store.get(key)
+            if item is not None:
+                expire_at, value = item
+                if now < expire_at:
+                    self._store.move_to_end(key)
+                    self._metrics["hits"] += 1
+                    return value
+                del self._store[key]
+                self._metrics["expirations"] += 1
+            pending = self._pending.get(key) if self._tier is not None else None
+        if self._tier is None:
+            with self._lock:
+                self._metrics["misses"] += 1
+            return None
+        loaded = None
+        if pending is not None:
+            # 已被淘汰但尚未落盘：直接从写后队列取
+            loaded = pending if pending[1] > now else None
+        else:
+            try:
+                loaded = self._tier.load(key)
+            except Exception:
+                loaded = None
+        with self._lock:
+            if loaded is None:
+                self._metrics["misses"] += 1
+                return None
+            raw, expire_at = loaded
+            value = self._deserialize(raw) if self._deserialize else raw
+            self._insert(key, value, expire_at)
+            self._metrics["tier_hits"] += 1
+            return value
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            item = self._store.get(key)
+            return item is not None and time.time() < item[0]
+
+    # ----------------------------------------------------------------- write
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """设置缓存值（ttl_seconds 缺省时使用 default_ttl；两者都为空则不过期）"""
+        ttl = ttl_seconds if ttl_seconds is not None else self.default_ttl
+        expire_at = time.time() + float(ttl) if ttl is not None else float("inf")
+        with self._lock:
+            self._insert(key, value, expire_at)
+            self._sweep_head()
+            if self._tier is not None and expire_at != float("inf"):
+                raw = self._serialize(value) if self._serialize else value
+                self._pending[key] = (raw, expire_at)
+                self._ensure_flush_thread()
+                if len(self._pending) >= self.flush_batch_size:
+                    self._flush_wake.set()
+
+    def _insert(self, key: str, value: Any, expire_at: float) -> None:
+        if key in self._store:
+            self._store.move_to_end(key)
+        self._store[key] = (expire_at, value)
+        while len(self._store) > self.max_entries:
+            self._store.popitem(last=False)
+            self._metrics["evictions"] += 1
+
+    def _sweep_head(self) -> None:
+        """检查 LRU 头部若干条目，过期则删除（常数开销）"""
+        if not self._store:
+            return
+        now = time.time()
+        for _ in range(_SWEEP_PER_SET):
+            key = next(iter(self._store), None)
+            if key is None or self._store[key][0] > now:
+                return
+            del self._store[key]
+            self._metrics["expirations"] += 1
+
+    def delete(self, key: str) -> bool:
+        """从内存、写后队列与持久层删除 key"""
+        with self._lock:
+            self._pending.pop(key, None)
+            removed = self._store.pop(key, None) is not None
+        if self._tier is not None:
+            try:
+                removed = self._tier.delete(key) or removed
+            except Exception:
+                pass
+        return removed
+
+    # -------------------------------------------------------- write-behind
+    def _ensure_flush_thread(self) -> None:
+        """首次入队时启动后台落盘线程（调用方持有 _lock）"""
+        if self._flush_stop.is_set():
+            return
+        if self._flush_thread is not None and self._flush_thread.is_alive():
+            return
+        self._flush_thread = threading.Thread(target=self._flush_loop, name="lru-cache-flush", daemon=True)
+        self._flush_thread.start()
+
+    def _flush_loop(self) -> None:
+        while not self._flush_stop.is_set():
+            self._flush_wake.wait(self.flush_interval_seconds or None)
+            self._flush_wake.clear()
+            if self._flush_stop.is_set():
+                break
+            self.flush()
+
+    def close(self, timeout: float = 5.0) -> int:
+        """停止后台落盘线程并把剩余写后队列落盘，返回最后一次写入条数"""
+        self._flush_stop.set()
+        self._flush_wake.set()
+        thread = self._flush_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=timeout)
+        self._flush_thread = None
+        return self.flush()
+
+    def flush(self) -> int:
+        """把写后队列批量写入持久层，返回写入条数（后台线程 / 周期边界 / 关闭时调用）"""
+        if self._tier is None:
+            return 0
+        with self._lock:
+            batch = [(k, raw, exp) for k, (raw, exp) in self._pending.items()]
+            self._pending = {}
+        if not batch:
+            return 0
+        try:
+            written = self._tier.store_many(batch)
+        except Exception:
+            # 落盘失败时放回队列，等待下次 flush（不覆盖更新的值）
+            with self._lock:
+                for k, raw, exp in batch:
+                    self._pending.setdefault(k, (raw, exp))
+            return 0
+        with self._lock:
+            self._metrics["tier_writes"] += written
+        return written
+
+    # ------------------------------------------------------------- lifecycle
+    def clear(self) -> int:
+        """清空内存缓存（不清理持久层），返回清理条数"""
+        with self._lock:
+            count = len(self._store)
+            self._store.clear()
+            self._pending.clear()
+            return count
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._store)
+
+    def __len__(self) -> int:
+        return self.size()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._metrics["hits"] + self._metrics["tier_hits"] + self._metrics["misses"]
+            hits = self._metrics["hits"] + self._metrics["tier_hits"]
+            return {
+                **self._metrics,
+                "size": len(self._store),
+                "max_entries": self.max_entries,
+                "pending_writes": len(self._pending),
+                "hit_rate": hits / lookups if lookups > 0 else 0.0,
+            }
+
+
+__all__ = [
+    "LRUTTLCache",
+    "SQLiteCacheTier",
+]
@@ -15,8 +15,12 @@ class MarketStorage:
     - ai_decision_logs / program_execution_logs
     """
 
+    # 权重缓存过期清理间隔（写路径上按间隔执行，读路径不做 DELETE）
+    WEIGHT_CACHE_CLEANUP_INTERVAL_SECONDS = 300.0
+
     def __init__(self, db_path: str) -> None:
         self.db_path = db_path
+        self._weight_cache_last_cleanup = 0.0
         parent = os.path.dirname(self.db_path)
         if parent:
             os.makedirs(parent, exist_ok=True)
@@ -757,6 +761,12 @@ class MarketStorage:
         """
         
         with self._connect() as conn:
+            if now.timestamp() - self._weight_cache_last_cleanup >= self.WEIGHT_CACHE_CLEANUP_INTERVAL_SECONDS:
+                conn.execute(
+                    "DELETE FROM weight_router_cache WHERE expires_at < ?",
+                    (now.isoformat(),),
+                )
+                self._weight_cache_last_cleanup = now.timestamp()
             conn.execute(
                 sql,
                 (
@@ -778,23 +788,18 @@ class MarketStorage:
     def get_weight_router_cache(self, cache_key: str) -> Optional[Dict[str, Any]]:
         """
         从数据库获取权重快照
-        
-        自动清理过期记录
+
+        只读查询，过期记录在 SELECT 中过滤；清理由 cleanup_weight_router_cache 负责
+        （save_weight_router_cache 会按间隔顺带触发）。
         """
         now = datetime.utcnow()
         
         with self._connect() as conn:
-            # 清理过期记录
-            conn.execute(
-                "DELETE FROM weight_router_cache WHERE expires_at < ?",
-                (now.isoformat(),),
-            )
-            
             row = conn.execute(
                 """
-                SELECT * FROM weight_router_cache WHERE cache_key = ?
+                SELECT * FROM weight_router_cache WHERE cache_key = ? AND expires_at >= ?
                 """,
-                (cache_key,),
+                (cache_key, now.isoformat()),
             ).fetchone()
         
         if row is None:
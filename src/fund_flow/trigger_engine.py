@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
 
 
 @dataclass
@@ -20,13 +20,60 @@ class ConditionEdgeState:
     seen_count: int = 0
 
 
+METRIC_ALIASES = {
+    "cvd": "cvd_ratio",
+    "oi_delta": "oi_delta_ratio",
+    "depth": "depth_ratio",
+    "liq_norm": "liquidity_delta_norm",
+}
+
+
+def _as_float(value: Any, default: float = 0.0) -> float:
+    try:
+        return float(value)
+    except Exception:
+        return default
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    """预解析后的单条规则：取值函数与比较谓词在编译期绑定"""
+
+    index: int
+    read: Callable[[Dict[str, Any], Dict[str, float]], float]
+    check: Callable[[float], bool]
+    template: Dict[str, Any]
+
+
+@dataclass(frozen=True)
+class CompiledSignalPool:
+    """signal_pool 配置的编译形式（按方向预筛规则、预算边沿 key 后缀）"""
+
+    enabled: bool
+    scheduled_bypass: bool
+    symbols: FrozenSet[str]
+    apply_when_position_exists: bool
+    min_scores: Dict[str, float]
+    # None 表示该方向没有适用规则（仅分数门控）；空元组表示规则均缺少 metric
+    rules: Dict[str, Optional[Tuple[CompiledRule, ...]]]
+    min_pass_count: int
+    logic: str
+    edge_enabled: bool
+    edge_cooldown_seconds: int
+    edge_suffixes: Dict[str, str]
+
+
 class TriggerEngine:
     """
     双触发引擎（scheduled + signal）：
     - 对同一 symbol + trigger_type 去重
     - 支持 trigger_id（signal pool id）幂等
+    - signal_pool 配置编译后缓存（按配置对象身份），评估时不再重复解析；
+      配置 dict 视为不可变，变更请重新 set_signal_pool_config 或传入新对象
     """
 
+    COMPILED_POOL_CACHE_SIZE = 32
+
     def __init__(
         self,
         dedupe_window_seconds: int = 10,
@@ -38,6 +85,8 @@ class TriggerEngine:
         self.signal_pool_config: Dict[str, Any] = (
             signal_pool_config if isinstance(signal_pool_config, dict) else {}
         )
+        self._compiled_pools: Dict[int, Tuple[Dict[str, Any], CompiledSignalPool]] = {}
+        self._compiled_pool(self.signal_pool_config)
 
     @staticmethod
     def _now() -> datetime:
@@ -125,6 +174,137 @@ class TriggerEngine:
         self.signal_pool_config = signal_pool_config if isinstance(signal_pool_config, dict) else {}
         # 配置变化后重置条件边沿状态，避免旧条件状态影响新规则
         self._condition_state = {}
+        self._compiled_pools = {}
+        self._compiled_pool(self.signal_pool_config)
+
+    @classmethod
+    def _compile_metric(cls, metric: str, timeframe: str) -> Callable[[Dict[str, Any], Dict[str, float]], float]:
+        """与 _resolve_metric_value 语义一致的预解析取值函数"""
+        metric_key = metric
+        tf = timeframe
+        if metric_key.lower().startswith("tf:"):
+            parts = metric_key.split(":", 2)
+            if len(parts) == 3:
+                tf = parts[1].strip()
+                metric_key = parts[2].strip()
+        key = METRIC_ALIASES.get(metric_key, metric_key)
+        if key in ("long_score", "short_score"):
+            return lambda ctx, scores: scores[key]
+        if not tf:
+            return lambda ctx, scores: _as_float(ctx.get(key), 0.0)
+        tf_lower = tf.lower()
+        tf_upper = tf.upper()
+
+        def read_tf(ctx: Dict[str, Any], scores: Dict[str, float]) -> float:
+            timeframes = ctx.get("timeframes")
+            if isinstance(timeframes, dict):
+                tf_ctx = timeframes.get(tf)
+                if tf_ctx is None:
+                    tf_ctx = timeframes.get(tf_lower) or timeframes.get(tf_upper)
+                if isinstance(tf_ctx, dict):
+                    return _as_float(tf_ctx.get(key), 0.0)
+            return _as_float(ctx.get(key), 0.0)
+
+        return read_tf
+
+    @staticmethod
+    def _compile_predicate(operator: str, threshold: float, threshold_max: Optional[float]) -> Callable[[float], bool]:
+        """与 _compare 语义一致的预绑定比较谓词"""
+        op = str(operator or ">=").strip().lower()
+        if op == ">":
+            return lambda v: v > threshold
+        if op == "<":
+            return lambda v: v < threshold
+        if op == "<=":
+            return lambda v: v <= threshold
+        if op in ("==", "="):
+            return lambda v: v == threshold
+        if op in ("!=", "<>"):
+            return lambda v: v != threshold
+        if op in ("between", "range"):
+            upper = threshold if threshold_max is None else threshold_max
+            lower = min(threshold, upper)
+            upper2 = max(threshold, upper)
+            return lambda v: lower <= v <= upper2
+        return lambda v: v >= threshold
+
+    def _compile_rules(self, rules: List[Any], operation: str) -> Optional[Tuple[CompiledRule, ...]]:
+        active_rules = [
+            item
+            for item in rules
+            if isinstance(item, dict) and self._normalize_side(item.get("side", "BOTH")) in ("", "BOTH", operation)
+        ]
+        if not active_rules:
+            return None
+        compiled: List[CompiledRule] = []
+        for idx, rule in enumerate(active_rules, start=1):
+            metric = str(rule.get("metric", "")).strip()
+            if not metric:
+                continue
+            timeframe = str(rule.get("timeframe", "")).strip()
+            operator = str(rule.get("operator", ">=")).strip()
+            threshold = self._to_float(rule.get("threshold"), 0.0)
+            threshold_max = rule.get("threshold_max")
+            if isinstance(rule.get("threshold"), list):
+                threshold_list = rule.get("threshold") or []
+                if len(threshold_list) >= 2:
+                    threshold = self._to_float(threshold_list[0], threshold)
+                    threshold_max = self._to_float(threshold_list[1], threshold)
+            th_max_val = self._to_float(threshold_max, threshold) if threshold_max is not None else None
+            compiled.append(
+                CompiledRule(
+                    index=idx,
+                    read=self._compile_metric(metric, timeframe),
+                    check=self._compile_predicate(operator, threshold, th_max_val),
+                    template={
+                        "index": idx,
+                        "name": str(rule.get("name", f"rule_{idx}")),
+                        "metric": metric,
+                        "operator": operator,
+                        "threshold": threshold,
+                        "threshold_max": th_max_val,
+                    },
+                )
+            )
+        return tuple(compiled)
+
+    def compile_signal_pool(self, cfg: Optional[Dict[str, Any]]) -> CompiledSignalPool:
+        """把 signal_pool 配置编译为 CompiledSignalPool（不做缓存）"""
+        cfg = cfg if isinstance(cfg, dict) else {}
+        scoped_symbols = cfg.get("symbols")
+        symbol_set: FrozenSet[str] = frozenset()
+        if isinstance(scoped_symbols, list) and scoped_symbols:
+            symbol_set = frozenset(str(s).upper() for s in scoped_symbols if str(s).strip())
+        raw_rules = cfg.get("rules")
+        rules = raw_rules if isinstance(raw_rules, list) else []
+        pool_id = str(cfg.get("pool_id", cfg.get("id", "default")) or "default")
+        return CompiledSignalPool(
+            enabled=bool(cfg) and self._to_bool(cfg.get("enabled", False), False),
+            scheduled_bypass=self._to_bool(cfg.get("scheduled_trigger_bypass", True), True),
+            symbols=symbol_set,
+            apply_when_position_exists=self._to_bool(cfg.get("apply_when_position_exists", False), False),
+            min_scores={
+                "LONG": self._to_float(cfg.get("min_long_score"), 0.0),
+                "SHORT": self._to_float(cfg.get("min_short_score"), 0.0),
+            },
+            rules={side: self._compile_rules(rules, side) for side in ("LONG", "SHORT")},
+            min_pass_count=int(self._to_float(cfg.get("min_pass_count"), 0)),
+            logic=str(cfg.get("logic", "AND")).strip().upper(),
+            edge_enabled=self._to_bool(cfg.get("edge_trigger_enabled", True), True),
+            edge_cooldown_seconds=max(0, int(self._to_float(cfg.get("edge_cooldown_seconds", 0), 0.0))),
+            edge_suffixes={side: f":{pool_id}:{side}" for side in ("LONG", "SHORT")},
+        )
+
+    def _compiled_pool(self, cfg: Dict[str, Any]) -> CompiledSignalPool:
+        entry = self._compiled_pools.get(id(cfg))
+        # 缓存项持有配置对象本身，id 不会被复用到其它 dict
+        if entry is not None and entry[0] is cfg:
+            return entry[1]
+        compiled = self.compile_signal_pool(cfg)
+        if len(self._compiled_pools) >= self.COMPILED_POOL_CACHE_SIZE:
+            self._compiled_pools = {}
+        self._compiled_pools[id(cfg)] = (cfg, compiled)
+        return compiled
 
     def _resolve_metric_value(
         self,
@@ -140,13 +320,7 @@ class TriggerEngine:
             if len(parts) == 3:
                 tf = parts[1].strip()
                 metric_key = parts[2].strip()
-        aliases = {
-            "cvd": "cvd_ratio",
-            "oi_delta": "oi_delta_ratio",
-            "depth": "depth_ratio",
-            "liq_norm": "liquidity_delta_norm",
-        }
-        metric_key = aliases.get(metric_key, metric_key)
+        metric_key = METRIC_ALIASES.get(metric_key, metric_key)
         if metric_key in ("long_score", "short_score"):
             return self._extract_scores(decision).get(metric_key, 0.0)
         if tf:
@@ -230,25 +404,20 @@ class TriggerEngine:
         self,
         *,
         symbol: str,
-        cfg: Dict[str, Any],
+        pool: CompiledSignalPool,
         now: Optional[datetime] = None,
     ) -> Dict[str, Any]:
-        now = now or self._now()
-        if not isinstance(cfg, dict) or not cfg:
-            return {}
-        if not self._to_bool(cfg.get("edge_trigger_enabled", True), True):
+        if not pool.edge_enabled:
             return {}
-
-        pool_id = str(cfg.get("pool_id", cfg.get("id", "default")) or "default")
-        edge_cd = max(0, int(self._to_float(cfg.get("edge_cooldown_seconds", 0), 0.0)))
+        now = now or self._now()
+        symbol_key = symbol.upper()
         synced: Dict[str, Any] = {}
         for operation in ("LONG", "SHORT"):
-            edge_key = f"{symbol.upper()}:{pool_id}:{operation}"
             synced[operation] = self._edge_trigger(
-                key=edge_key,
+                key=symbol_key + pool.edge_suffixes[operation],
                 condition_met=False,
                 now=now,
-                cooldown_seconds=edge_cd,
+                cooldown_seconds=pool.edge_cooldown_seconds,
             )
         return synced
 
@@ -268,33 +437,30 @@ class TriggerEngine:
         """
         cfg = signal_pool_config if isinstance(signal_pool_config, dict) else self.signal_pool_config
         cfg = cfg if isinstance(cfg, dict) else {}
-        if not cfg or not self._to_bool(cfg.get("enabled", False), False):
+        pool = self._compiled_pool(cfg)
+        if not pool.enabled:
             return {"passed": True, "reason": "signal_pool_disabled"}
 
-        if str(trigger_type).lower() == "scheduled" and self._to_bool(cfg.get("scheduled_trigger_bypass", True), True):
+        if pool.scheduled_bypass and str(trigger_type).lower() == "scheduled":
             return {"passed": True, "reason": "scheduled_bypass"}
 
-        scoped_symbols = cfg.get("symbols")
-        if isinstance(scoped_symbols, list) and scoped_symbols:
-            symbol_set = {str(s).upper() for s in scoped_symbols if str(s).strip()}
-            if symbol_set and symbol.upper() not in symbol_set:
-                return {"passed": False, "reason": "symbol_not_in_pool_scope"}
+        if pool.symbols and symbol.upper() not in pool.symbols:
+            return {"passed": False, "reason": "symbol_not_in_pool_scope"}
 
         operation = self._normalize_side(getattr(decision, "operation", ""))
         if operation not in ("LONG", "SHORT"):
-            synced_edges = self._sync_pool_edges_inactive(symbol=symbol, cfg=cfg)
+            synced_edges = self._sync_pool_edges_inactive(symbol=symbol, pool=pool)
             return {"passed": True, "reason": "non_entry_operation", "edge_sync": synced_edges}
 
-        apply_when_position_exists = self._to_bool(cfg.get("apply_when_position_exists", False), False)
-        if has_position and not apply_when_position_exists:
-            synced_edges = self._sync_pool_edges_inactive(symbol=symbol, cfg=cfg)
+        if has_position and not pool.apply_when_position_exists:
+            synced_edges = self._sync_pool_edges_inactive(symbol=symbol, pool=pool)
             return {"passed": True, "reason": "position_exists_bypass", "edge_sync": synced_edges}
 
         scores = self._extract_scores(decision)
         side_score = scores["long_score"] if operation == "LONG" else scores["short_score"]
-        min_score_key = "min_long_score" if operation == "LONG" else "min_short_score"
-        min_score_required = self._to_float(cfg.get(min_score_key), 0.0)
+        min_score_required = pool.min_scores[operation]
         if side_score < min_score_required:
+            min_score_key = "min_long_score" if operation == "LONG" else "min_short_score"
             return {
                 "passed": False,
                 "reason": f"{min_score_key}_not_met",
@@ -302,17 +468,8 @@ class TriggerEngine:
                 "required": min_score_required,
             }
 
-        raw_rules = cfg.get("rules")
-        rules = raw_rules if isinstance(raw_rules, list) else []
-        active_rules: List[Dict[str, Any]] = []
-        for item in rules:
-            if not isinstance(item, dict):
-                continue
-            rule_side = self._normalize_side(item.get("side", "BOTH"))
-            if rule_side in ("", "BOTH", operation):
-                active_rules.append(item)
-
-        if not active_rules:
+        rules = pool.rules[operation]
+        if rules is None:
             return {
                 "passed": True,
                 "reason": "score_gate_only",
@@ -320,72 +477,41 @@ class TriggerEngine:
                 "required": min_score_required,
             }
 
+        total_rules = len(rules)
+        if total_rules <= 0:
+            return {"passed": True, "reason": "empty_rules_after_filter", "score": side_score}
+
+        ctx = market_flow_context or {}
         evaluations: List[Dict[str, Any]] = []
         pass_count = 0
-        for idx, rule in enumerate(active_rules, start=1):
-            metric = str(rule.get("metric", "")).strip()
-            if not metric:
-                continue
-            timeframe = str(rule.get("timeframe", "")).strip()
-            value = self._resolve_metric_value(
-                metric,
-                market_flow_context or {},
-                decision,
-                timeframe=timeframe or None,
-            )
-            operator = str(rule.get("operator", ">=")).strip()
-            threshold = self._to_float(rule.get("threshold"), 0.0)
-            threshold_max = rule.get("threshold_max")
-            if isinstance(rule.get("threshold"), list):
-                threshold_list = rule.get("threshold") or []
-                if len(threshold_list) >= 2:
-                    threshold = self._to_float(threshold_list[0], threshold)
-                    threshold_max = self._to_float(threshold_list[1], threshold)
-            th_max_val = self._to_float(threshold_max, threshold) if threshold_max is not None else None
-            passed = self._compare(value, operator, threshold, th_max_val)
-            if passed:
+        for rule in rules:
+            value = rule.read(ctx, scores)
+            ok = rule.check(value)
+            if ok:
                 pass_count += 1
-            evaluations.append(
-                {
-                    "index": idx,
-                    "name": str(rule.get("name", f"rule_{idx}")),
-                    "metric": metric,
-                    "operator": operator,
-                    "threshold": threshold,
-                    "threshold_max": th_max_val,
-                    "value": value,
-                    "passed": passed,
-                }
-            )
-
-        total_rules = len(evaluations)
-        if total_rules <= 0:
-            return {"passed": True, "reason": "empty_rules_after_filter", "score": side_score}
+            item = dict(rule.template)
+            item["value"] = value
+            item["passed"] = ok
+            evaluations.append(item)
 
-        min_pass_count = int(self._to_float(cfg.get("min_pass_count"), 0))
-        logic = str(cfg.get("logic", "AND")).strip().upper()
-        if min_pass_count > 0:
-            required = min(total_rules, min_pass_count)
+        if pool.min_pass_count > 0:
+            required = min(total_rules, pool.min_pass_count)
             passed = pass_count >= required
             reason = f"min_pass_count({pass_count}/{required})"
-        elif logic == "OR":
+        elif pool.logic == "OR":
             passed = pass_count > 0
             reason = f"logic_or({pass_count}/{total_rules})"
         else:
             passed = pass_count == total_rules
             reason = f"logic_and({pass_count}/{total_rules})"
 
-        edge_enabled = self._to_bool(cfg.get("edge_trigger_enabled", True), True)
-        edge_cd = max(0, int(self._to_float(cfg.get("edge_cooldown_seconds", 0), 0.0)))
         edge_info: Dict[str, Any] = {"triggered": passed, "reason": "edge_disabled", "active": bool(passed)}
         final_passed = passed
-        if edge_enabled:
-            pool_id = str(cfg.get("pool_id", cfg.get("id", "default")) or "default")
-            edge_key = f"{symbol.upper()}:{pool_id}:{operation}"
+        if pool.edge_enabled:
             edge_info = self._edge_trigger(
-                key=edge_key,
+                key=symbol.upper() + pool.edge_suffixes[operation],
                 condition_met=passed,
-                cooldown_seconds=edge_cd,
+                cooldown_seconds=pool.edge_cooldown_seconds,
             )
             final_passed = bool(edge_info.get("triggered", False))
 
@@ -30,11 +30,12 @@ from __future__ import annotations
 import json
 import math
 import re
-import time
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
 
+from src.fund_flow.lru_cache import LRUTTLCache
+
 if TYPE_CHECKING:
     from src.fund_flow.market_storage import MarketStorage
 
@@ -64,65 +65,11 @@ BANNED_REGEX = re.compile("|".join(BANNED_PATTERNS), re.IGNORECASE)
 
 
 # =========================
-# TTL 缓存类
+# TTL 缓存（LRU + 惰性过期）
 # =========================
 
-class TTLCache:
-    """简单 TTL 缓存（内存版）"""
-    
-    def __init__(self, max_entries: int = 1000):
-        self._store: Dict[str, Tuple[float, Any]] = {}
-        self._max_entries = max_entries
-    
-    def get(self, key: str) -> Optional[Any]:
-        """获取缓存值，过期返回 None"""
-        item = self._store.get(key)
-        if item is None:
-            return None
-        expire_at, value = item
-        if time.time() >= expire_at:
-            self._store.pop(key, None)
-            return None
-        return value
-    
-    def set(self, key: str, value: Any, ttl_seconds: int) -> None:
-        """设置缓存值"""
-        # 清理过期条目
-        self._evict_expired()
-        
-        # LRU 淘汰
-        if len(self._store) >= self._max_entries:
-            self._evict_lru()
-        
-        self._store[key] = (time.time() + ttl_seconds, value)
-    
-    def _evict_expired(self) -> int:
-        """清理过期条目"""
-        now = time.time()
-        expired = [k for k, v in self._store.items() if v[0] < now]
-        for k in expired:
-            del self._store[k]
-        return len(expired)
-    
-    def _evict_lru(self) -> None:
-        """LRU 淘汰"""
-        # 简单实现：删除 10% 的条目
-        if len(self._store) < 10:
-            return
-        n_remove = len(self._store) // 10
-        keys = list(self._store.keys())[:n_remove]
-        for k in keys:
-            del self._store[k]
-    
-    def clear(self) -> int:
-        """清空缓存"""
-        count = len(self._store)
-        self._store.clear()
-        return count
-    
-    def size(self) -> int:
-        """缓存大小"""
-        return len(self._store)
+# 兼容旧名：TTLCache(max_entries).get / set(key, value, ttl_seconds) / clear / size
+TTLCache = LRUTTLCache
 
 
 # 全局缓存实例
@@ -804,6 +751,7 @@ class WeightRouter:
             "cache_hit_rate": self._stats["cache_hits"] / total if total > 0 else 0,
             "fallback_rate": self._stats["fallbacks"] / total if total > 0 else 0,
             "cache_size": self._cache.size(),
+            "cache": self._cache.stats(),
         }
     
     def clear_cache(self) -> int:
@@ -7,9 +7,6 @@ import argparse
 import time
 import math
 
-from collections import deque
-import requests
-
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
@@ -21,11 +18,8 @@ import csv
 
 import pandas as pd
 
-import numpy as np
-
-import tempfile
 
-import shutil
+from string import Template
 
 import os
 import sys
@@ -46,10 +40,12 @@ from src.api.binance_client import BinanceClient
 from src.config.config_loader import ConfigLoader
 
 from src.config.config_monitor import ConfigMonitor
+from src.config.config_watcher import ConfigWatcher
 
 from src.config.env_manager import EnvManager
 
 from src.data.account_data import AccountDataManager
+from src.data.microstructure_engine import MicrostructureEngine
 
 from src.data.market_data import MarketDataManager
 
@@ -65,10 +61,92 @@ from src.trading.trade_executor import TradeExecutor
 
 from src.strategy import V5Strategy
 
+from src.utils.dashboard_writer import DashboardWriter
+from src.utils.state_writer import DebouncedStateWriter
+
 
 import json
 
 
+DCA_DASHBOARD_CSV_HEADER = [
+    "timestamp",
+    "equity",
+    "peak_equity",
+    "drawdown_pct",
+    "symbol",
+    "side",
+    "engine",
+    "entry_price",
+    "mark_price",
+    "pnl_percent",
+    "dca_count",
+    "last_dca_price",
+    "entry_time",
+    "event_type",
+    "event_symbol",
+    "event_side",
+    "event_status",
+    "event_quantity",
+    "event_price",
+    "event_pnl",
+    "event_pnl_percent",
+    "event_reason",
+]
+
+# DCA 看板 HTML 模板（string.Template，$ 占位；由看板后台线程渲染）
+DCA_DASHBOARD_HTML_TEMPLATE = Template(
+    """
+<!doctype html>
+<html lang="zh">
+<head>
+    <meta charset="utf-8" />
+    <meta http-equiv="refresh" content="10" />
+    <title>DCA 实盘看板</title>
+    <style>
+        body { font-family: Arial, sans-serif; margin: 20px; background: #0f172a; color: #e2e8f0; }
+        .summary { display: flex; gap: 16px; margin-bottom: 16px; flex-wrap: wrap; }
+        .card { padding: 12px 16px; border: 1px solid #1e293b; border-radius: 10px; background: #111827; }
+        table { border-collapse: collapse; width: 100%; background: #0b1220; }
+        th, td { border: 1px solid #1e293b; padding: 8px; text-align: center; }
+        th { background: #111827; }
+        .pnl-pos { color: #22c55e; font-weight: 600; }
+        .pnl-neg { color: #ef4444; font-weight: 600; }
+    </style>
+</head>
+<body>
+    <h2>DCA 实盘看板</h2>
+    <div>更新时间: ${timestamp}</div>
+    ${api_probe_line}
+    <div class="summary">
+        <div class="card">权益: ${equity}</div>
+        <div class="card">峰值权益: ${peak_equity}</div>
+        <div class="card">回撤(%): ${drawdown_pct}</div>
+        <div class="card">挂单数: ${open_orders}</div>
+    </div>
+    <table>
+        <thead>
+            <tr>
+                <th>交易对</th>
+                <th>方向</th>
+                <th>引擎</th>
+                <th>入场价</th>
+                <th>标记价</th>
+                <th>盈亏%</th>
+                <th>DCA次数</th>
+                <th>最近加仓价</th>
+                <th>入场时间</th>
+            </tr>
+        </thead>
+        <tbody>
+            ${table_rows}
+        </tbody>
+    </table>
+</body>
+</html>
+"""
+)
+
+
 class TerminalOutputLogger:
     def __init__(self, original: TextIO, log_path_provider: Callable[[], str]):
         self.original = original
@@ -98,7 +176,7 @@ class TradingBot:
     _get_log_file_path: Callable[[], str]
     _normalize_position_side: Callable[[Any], Optional[str]]
     _dca_get_total_stop_loss_cooldown_seconds: Callable[[Dict[str, Any]], int]
-    _sync_dca_dashboard_snapshot: Callable[[], None]
+    _dca_dashboard_mirror_path: Callable[[], Optional[str]]
     _append_trade_log: Callable[..., None]
 
     def run(self) -> None:
@@ -133,6 +211,9 @@ class TradingBot:
     dca_config_path: str
     dca_config: Dict[str, Any]
     dca_config_mtime: Optional[float]
+    _dca_state_writer: DebouncedStateWriter
+    _dca_dashboard_writer: DashboardWriter
+    _dca_config_watcher: Optional[ConfigWatcher] = None
     dca_state: Dict[str, Dict[str, Any]]
     dca_last_entry_time: Optional[datetime]
     dca_initial_equity: Optional[float]
@@ -178,8 +259,14 @@ class TradingBot:
         self.config = ConfigLoader.load_trading_config(config_path)
         print("✅ 配置加载完成")
 
-        # 初始化配置监控器
-        self.config_monitor = ConfigMonitor(config_path)
+        # 初始化配置监控器（后台监听，首次检查时启动）
+        reload_cfg = self.config.get("config_reload", {}) if isinstance(self.config.get("config_reload"), dict) else {}
+        self.config_monitor = ConfigMonitor(
+            config_path,
+            poll_interval_seconds=float(reload_cfg.get("poll_interval_seconds", 1.0) or 1.0),
+            debounce_seconds=float(reload_cfg.get("debounce_seconds", 0.2) or 0.0),
+            use_inotify=False if str(reload_cfg.get("backend", "auto")).strip().lower() == "poll" else None,
+        )
         print("✅ 配置监控器初始化完成")
 
         # 加载环境变量（支持按环境切换）
@@ -254,10 +341,20 @@ class TradingBot:
         self._dca_open_plan_cache_bucket: Optional[int] = None
         self._dca_open_plan_cache_created_at: Optional[str] = None
         self.dca_state_path = os.path.join(self.logs_dir, "dca_state.json")
+        # DCA 状态写盘合并：周期内多次变更至多写一次，成交/平仓立即落盘
+        self._dca_state_writer = DebouncedStateWriter(self.dca_state_path, self._build_dca_state_payload)
         self.dca_dashboard_path = os.path.join(self.logs_dir, "dca_dashboard.json")
         self.dca_dashboard_csv_path = os.path.join(self.logs_dir, "dca_dashboard.csv")
         self.dca_dashboard_html_path = os.path.join(self.logs_dir, "dca_dashboard.html")
-        self._last_dca_snapshot_key: Optional[str] = None
+        # 看板：无实质变化跳过；CSV 只追加变化行；JSON/CSV/HTML 均在后台线程写出，HTML 独立限流
+        self._dca_dashboard_writer = DashboardWriter(
+            self.dca_dashboard_path,
+            self.dca_dashboard_csv_path,
+            DCA_DASHBOARD_CSV_HEADER,
+            html_path=self.dca_dashboard_html_path,
+            render_html=self._render_dca_dashboard_html,
+            csv_mirror_path=self._dca_dashboard_mirror_path,
+        )
         self._last_open_orders_count: Optional[int] = None
         # 本次进程内 _get_dca_symbols 缓存，避免在短时间内重复触发网络/日志密集型筛选
         # cache: {"symbols": List[str], "ts": float}
@@ -371,9 +468,10 @@ class TradingBot:
         self._dca_flow_oi_history: Dict[str, List[float]] = {}
         self._flow_confirm_cache: Dict[str, Dict[str, Any]] = {}  # 资金流信号确认缓存
         # 微结构(15s)缓存：按symbol存环形缓冲区，用于聚合到1m/5m并识别盘口陷阱
-        self._ms_ring: Dict[str, Any] = {}  # sym -> deque
+        # aggTrades 按 fromId 增量拉取（走 BinanceBroker 连接池），1m/5m 聚合与自适应阈值滚动维护
+        self._ms_engine = MicrostructureEngine(lambda sym, **kw: self.client.get_agg_trades(sym, **kw))
+        self._ms_ring: Dict[str, Any] = self._ms_engine.rings  # sym -> deque
         self._ms_state: Dict[str, Dict[str, Any]] = {}  # sym -> {last_ts, last_bid_notional, last_ask_notional}
-        self._ms_last_agg_trade_id: Dict[str, int] = {}  # sym -> last aggTradeId
 
 
         # 预加载历史K线数据
@@ -879,6 +977,17 @@ class TradingBot:
         return selected
 
     def _load_dca_rotation_config(self, initial: bool = False) -> None:
+        """同步加载 DCA 轮动配置（启动时调用）；运行期变更由后台监听准备，见 _reload_dca_config_if_changed"""
+        if initial and self._dca_config_watcher is None:
+            # 先建立监听基线再读取文件，读取之后的修改都会被捕获
+            self._dca_config_watcher = ConfigWatcher(
+                self.dca_config_path,
+                prepare=self._prepare_dca_rotation_config,
+                poll_interval_seconds=self.config_monitor.poll_interval_seconds,
+                debounce_seconds=self.config_monitor.debounce_seconds,
+                use_inotify=self.config_monitor.use_inotify,
+                name="DCA",
+            )
         if not os.path.exists(self.dca_config_path):
             if initial:
                 print(f"⚠️ 未找到交易配置文件: {self.dca_config_path}")
@@ -889,18 +998,28 @@ class TradingBot:
                 return
             with open(self.dca_config_path, "r", encoding="utf-8") as f:
                 trading_cfg = json.load(f)
-            self.dca_config = trading_cfg.get("dca_rotation", {})
-            self._apply_oscillation_overrides_from_risk()
-            self._apply_flow_profile_template()
-            self._apply_dual_engine_runtime_params()
-            self.dca_config_mtime = mtime
-            self._apply_data_endpoints()
-            print(f"✅ 已加载 DCA 轮动配置 ({os.path.basename(self.dca_config_path)})")
-            if initial:
-                self._print_risk_summary()
+            self._install_dca_rotation_config(self._prepare_dca_rotation_config(trading_cfg), mtime, initial=initial)
         except Exception as e:
             print(f"❌ 读取 DCA 配置失败: {e}")
 
+    def _prepare_dca_rotation_config(self, trading_cfg: Dict[str, Any]) -> Dict[str, Any]:
+        """由交易配置派生完整的 dca_rotation（risk.oscillation 覆盖 + 资金流模板），不修改实例状态"""
+        dca_config = trading_cfg.get("dca_rotation", {})
+        # risk 取自同一次读取的配置文件：监听线程上 self.config 可能仍是旧配置
+        self._apply_oscillation_overrides_from_risk(dca_config, source_config=trading_cfg)
+        self._apply_flow_profile_template(dca_config)
+        return dca_config
+
+    def _install_dca_rotation_config(self, dca_config: Dict[str, Any], mtime: float, initial: bool = False) -> None:
+        """整体替换已派生好的 DCA 配置（周期边界调用）"""
+        self.dca_config = dca_config
+        self._apply_dual_engine_runtime_params()
+        self.dca_config_mtime = mtime
+        self._apply_data_endpoints()
+        print(f"✅ 已加载 DCA 轮动配置 ({os.path.basename(self.dca_config_path)})")
+        if initial:
+            self._print_risk_summary()
+
     def _apply_dual_engine_runtime_params(self) -> None:
         """应用双引擎运行时参数（执行层周期等）。"""
         params = self.dca_config.get("params", {}) if isinstance(self.dca_config, dict) else {}
@@ -914,20 +1033,29 @@ class TradingBot:
         exec_interval = max(5, min(300, exec_interval))
         self._dual_engine_exec_interval_seconds = exec_interval
 
-    def _apply_oscillation_overrides_from_risk(self) -> None:
+    def _apply_oscillation_overrides_from_risk(
+        self,
+        dca_config: Optional[Dict[str, Any]] = None,
+        source_config: Optional[Dict[str, Any]] = None,
+    ) -> None:
         """
         将 risk.oscillation 下的同层参数覆盖到 dca_rotation.params，
         让震荡开仓门禁、出场参数和 RANGE/RANGE_LOCK ratio
         可在 risk 顶层统一控制。
+
+        dca_config 默认为 self.dca_config；传入时只修改传入的配置。
+        source_config 为读取 risk 的配置（默认 self.config；重载时传入新读取的配置）。
         """
-        risk_cfg = self.config.get("risk", {}) if isinstance(self.config, dict) else {}
+        dca_config = self.dca_config if dca_config is None else dca_config
+        source_config = self.config if source_config is None else source_config
+        risk_cfg = source_config.get("risk", {}) if isinstance(source_config, dict) else {}
         if not isinstance(risk_cfg, dict):
             return
         osc_cfg = risk_cfg.get("oscillation", {})
         if not isinstance(osc_cfg, dict) or not osc_cfg:
             return
 
-        params = self.dca_config.setdefault("params", {})
+        params = dca_config.setdefault("params", {})
         if not isinstance(params, dict):
             return
 
@@ -978,14 +1106,16 @@ class TradingBot:
         if applied:
             print(f"✅ 已应用 risk.oscillation 覆盖到 DCA 参数: {', '.join(applied)}")
 
-    def _apply_flow_profile_template(self) -> None:
+    def _apply_flow_profile_template(self, dca_config: Optional[Dict[str, Any]] = None) -> None:
         """
         资金流模板覆盖：
         - dca_rotation.params.flow_profile: 当前模板名（如 loose / strict）
         - dca_rotation.params.flow_profiles: 模板字典
         模板值会覆盖到 params 同名字段，支持按模板一键切换门禁强度。
+        dca_config 默认为 self.dca_config。
         """
-        params = self.dca_config.setdefault("params", {})
+        dca_config = self.dca_config if dca_config is None else dca_config
+        params = dca_config.setdefault("params", {})
         if not isinstance(params, dict):
             return
         profile_name = str(params.get("flow_profile", "") or "").strip().lower()
@@ -1274,7 +1404,6 @@ class TradingBot:
             self.dca_day_open_tz = data.get("dca_day_open_tz")
             self.dca_initial_equity = data.get("dca_initial_equity")
             self.dca_peak_equity = data.get("dca_peak_equity")
-            self._last_dca_snapshot_key = data.get("last_dca_snapshot_key")
             last_entry = data.get("dca_last_entry_time")
             if last_entry:
                 self.dca_last_entry_time = datetime.fromisoformat(last_entry)
@@ -1293,37 +1422,49 @@ class TradingBot:
         except Exception as e:
             print(f"⚠️ DCA 状态恢复失败: {e}")
 
-    def _save_dca_state(self) -> None:
-        try:
-            last_entry_time = self.dca_last_entry_time
-            payload = {
-                "dca_halt": self.dca_halt,
-                "consecutive_losses": int(self.consecutive_losses or 0),
-                "consecutive_stopouts": int(self.consecutive_stopouts or 0),
-                "dca_cooldown_expires": (
-                    self.dca_cooldown_expires.isoformat() if isinstance(self.dca_cooldown_expires, datetime) else None
-                ),
-                "dca_cooldown_reason": self.dca_cooldown_reason,
-                "dca_day_open_equity": self.dca_day_open_equity,
-                "dca_day_open_tz": self.dca_day_open_tz,
-                "dca_day_open_date": self.dca_day_open_date,
-                "dca_initial_equity": self.dca_initial_equity,
-                "dca_peak_equity": self.dca_peak_equity,
-                "dca_last_entry_time": last_entry_time.isoformat() if isinstance(last_entry_time, datetime) else None,
-                "last_dca_snapshot_key": self._last_dca_snapshot_key,
-                "dca_state": {},
+    def _build_dca_state_payload(self) -> Dict[str, Any]:
+        last_entry_time = self.dca_last_entry_time
+        payload = {
+            "dca_halt": self.dca_halt,
+            "consecutive_losses": int(self.consecutive_losses or 0),
+            "consecutive_stopouts": int(self.consecutive_stopouts or 0),
+            "dca_cooldown_expires": (
+                self.dca_cooldown_expires.isoformat() if isinstance(self.dca_cooldown_expires, datetime) else None
+            ),
+            "dca_cooldown_reason": self.dca_cooldown_reason,
+            "dca_day_open_equity": self.dca_day_open_equity,
+            "dca_day_open_tz": self.dca_day_open_tz,
+            "dca_day_open_date": self.dca_day_open_date,
+            "dca_initial_equity": self.dca_initial_equity,
+            "dca_peak_equity": self.dca_peak_equity,
+            "dca_last_entry_time": last_entry_time.isoformat() if isinstance(last_entry_time, datetime) else None,
+            "dca_state": {},
+        }
+        for symbol, s in self.dca_state.items():
+            entry_time = s.get("entry_time")
+            payload["dca_state"][symbol] = {
+                **s,
+                "entry_time": entry_time.isoformat() if isinstance(entry_time, datetime) else None,
             }
-            for symbol, s in self.dca_state.items():
-                entry_time = s.get("entry_time")
-                payload["dca_state"][symbol] = {
-                    **s,
-                    "entry_time": entry_time.isoformat() if isinstance(entry_time, datetime) else None,
-                }
-            os.makedirs(self.logs_dir, exist_ok=True)
-            with open(self.dca_state_path, "w", encoding="utf-8") as f:
-                json.dump(payload, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"⚠️ DCA 状态保存失败: {e}")
+        return payload
+
+    def _save_dca_state(self, immediate: bool = False) -> None:
+        """
+        标记 DCA 状态已变更。
+
+        默认只打脏标记（超过去抖时间才写盘，周期结束时统一落盘）；
+        开平仓/加仓成交与关闭时传 immediate=True 立即原子落盘。
+        """
+        writer = self._dca_state_writer
+        writer.mark_dirty()
+        if immediate:
+            writer.flush(force=True)
+        else:
+            writer.maybe_flush()
+
+    def _flush_dca_state(self) -> None:
+        """周期边界：落盘本周期内合并的状态变更"""
+        self._dca_state_writer.flush()
 
     def _reconcile_dca_state(self, positions: Dict[str, Dict[str, Any]]) -> None:
         current_symbols = set(positions.keys())
@@ -1424,43 +1565,17 @@ class TradingBot:
                     }
                 )
 
-            with open(self.dca_dashboard_path, "w", encoding="utf-8") as f:
-                json.dump(payload, f, ensure_ascii=False, indent=2)
-            self._write_dca_dashboard_csv(payload)
-            self._write_dca_dashboard_html(payload)
+            self._dca_dashboard_writer.publish(
+                payload,
+                self._dca_dashboard_rows(payload),
+                has_event=payload["event"] is not None,
+            )
         except Exception as e:
             print(f"⚠️ DCA 看板写入失败: {e}")
 
-    def _write_dca_dashboard_csv(self, payload: Dict[str, Any]) -> None:
-        header = [
-            "timestamp",
-            "equity",
-            "peak_equity",
-            "drawdown_pct",
-            "symbol",
-            "side",
-            "engine",
-            "entry_price",
-            "mark_price",
-            "pnl_percent",
-            "dca_count",
-            "last_dca_price",
-            "entry_time",
-            "event_type",
-            "event_symbol",
-            "event_side",
-            "event_status",
-            "event_quantity",
-            "event_price",
-            "event_pnl",
-            "event_pnl_percent",
-            "event_reason",
-        ]
-        # 尝试以更鲁棒的方式写入 CSV：捕获 PermissionError 并重试，创建文件时使用临时文件替换以保证原子性
-        max_retries = 5
-        backoff = 0.5
-        written = False
-        rows = []
+    def _dca_dashboard_rows(self, payload: Dict[str, Any]) -> List[List[Any]]:
+        """看板载荷 -> CSV 行（每个持仓一行；无持仓时事件单独一行）"""
+        rows: List[List[Any]] = []
         raw_event = payload.get("event")
         event: Dict[str, Any]
         if isinstance(raw_event, dict):
@@ -1530,71 +1645,7 @@ class TradingBot:
                     event_reason,
                 ]
             )
-
-        for attempt in range(1, max_retries + 1):
-            try:
-                os.makedirs(self.logs_dir, exist_ok=True)
-                exists = os.path.exists(self.dca_dashboard_csv_path)
-                if exists:
-                    try:
-                        with open(self.dca_dashboard_csv_path, "r", newline="", encoding="utf-8") as rf:
-                            first_row = next(csv.reader(rf), None)
-                        if first_row != header:
-                            legacy_path = self.dca_dashboard_csv_path + ".legacy.%s" % datetime.now().strftime("%Y%m%dT%H%M%S")
-                            shutil.move(self.dca_dashboard_csv_path, legacy_path)
-                            print(f"ℹ️ DCA 看板 CSV 表头已升级，旧文件已备份: {legacy_path}")
-                            exists = False
-                    except Exception:
-                        pass
-                # 如果文件不存在，先写入临时文件再替换，避免并发创建时的竞争
-                if not exists:
-                    dir_name = os.path.dirname(self.dca_dashboard_csv_path)
-                    fd, tmp_path = tempfile.mkstemp(prefix="dca_dashboard_", dir=dir_name, text=True)
-                    os.close(fd)
-                    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
-                        writer = csv.writer(f)
-                        writer.writerow(header)
-                        for r in rows:
-                            writer.writerow(r)
-                    # 原子替换（在同一文件系统上）
-                    shutil.move(tmp_path, self.dca_dashboard_csv_path)
-                else:
-                    # 直接以追加方式写入
-                    with open(self.dca_dashboard_csv_path, "a", newline="", encoding="utf-8") as f:
-                        writer = csv.writer(f)
-                        for r in rows:
-                            writer.writerow(r)
-                written = True
-                break
-            except PermissionError as pe:
-                print(f"⚠️ DCA 看板写入被拒绝（第{attempt}次）：{pe}")
-                time.sleep(backoff)
-                backoff = min(backoff * 2, 5.0)
-            except Exception as e:
-                print(f"⚠️ DCA 看板写入异常（第{attempt}次）：{e}")
-                try:
-                    import traceback
-
-                    traceback.print_exc()
-                except Exception:
-                    pass
-                time.sleep(backoff)
-                backoff = min(backoff * 2, 5.0)
-
-        if not written:
-            # 最后回退：保存到一个错误文件以免数据丢失
-            try:
-                err_path = self.dca_dashboard_csv_path + ".err.%s" % datetime.now().strftime("%Y%m%dT%H%M%S")
-                with open(err_path, "w", newline="", encoding="utf-8") as f:
-                    writer = csv.writer(f)
-                    writer.writerow(header)
-                    for r in rows:
-                        writer.writerow(r)
-                print(f"❌ DCA 看板写入失败，已保存到备份: {err_path}")
-            except Exception as e:
-                print(f"❌ 无法保存 DCA 看板备份: {e}")
-        else:
-            self._sync_dca_dashboard_snapshot()
+        return rows
 
     def _record_dca_trade_event(
         self,
@@ -1630,7 +1681,7 @@ class TradingBot:
         except Exception as e:
             print(f"⚠️ DCA 事件快照写入失败: {e}")
 
-    def _write_dca_dashboard_html(self, payload: Dict[str, Any]) -> None:
+    def _render_dca_dashboard_html(self, payload: Dict[str, Any]) -> str:
         rows = []
         for pos in payload.get("positions", []):
             pnl = pos.get("pnl_percent")
@@ -1657,72 +1708,15 @@ class TradingBot:
                 f"| papi={api_probe.get('papi')} | base={api_probe.get('recommended_base_url')}</div>"
             )
 
-        html = f"""
-<!doctype html>
-<html lang="zh">
-<head>
-    <meta charset="utf-8" />
-    <meta http-equiv="refresh" content="10" />
-    <title>DCA 实盘看板</title>
-    <style>
-        body {{ font-family: Arial, sans-serif; margin: 20px; background: #0f172a; color: #e2e8f0; }}
-        .summary {{ display: flex; gap: 16px; margin-bottom: 16px; flex-wrap: wrap; }}
-        .card {{ padding: 12px 16px; border: 1px solid #1e293b; border-radius: 10px; background: #111827; }}
-        table {{ border-collapse: collapse; width: 100%; background: #0b1220; }}
-        th, td {{ border: 1px solid #1e293b; padding: 8px; text-align: center; }}
-        th {{ background: #111827; }}
-        .pnl-pos {{ color: #22c55e; font-weight: 600; }}
-        .pnl-neg {{ color: #ef4444; font-weight: 600; }}
-    </style>
-</head>
-<body>
-    <h2>DCA 实盘看板</h2>
-    <div>更新时间: {payload.get("timestamp")}</div>
-    {api_probe_line}
-    <div class="summary">
-        <div class="card">权益: {payload.get("equity")}</div>
-        <div class="card">峰值权益: {payload.get("peak_equity")}</div>
-        <div class="card">回撤(%): {payload.get("drawdown_pct")}</div>
-        <div class="card">挂单数: {payload.get("open_orders")}</div>
-    </div>
-    <table>
-        <thead>
-            <tr>
-                <th>交易对</th>
-                <th>方向</th>
-                <th>引擎</th>
-                <th>入场价</th>
-                <th>标记价</th>
-                <th>盈亏%</th>
-                <th>DCA次数</th>
-                <th>最近加仓价</th>
-                <th>入场时间</th>
-            </tr>
-        </thead>
-        <tbody>
-            {table_rows}
-        </tbody>
-    </table>
-</body>
-</html>
-"""
-        with open(self.dca_dashboard_html_path, "w", encoding="utf-8") as f:
-            f.write(html)
-        # 使用原子写入以避免并发/权限问题：先写入临时文件再替换
-        try:
-            dir_name = os.path.dirname(self.dca_dashboard_html_path) or "."
-            fd, tmp_path = tempfile.mkstemp(prefix="dca_dashboard_", suffix=".html", dir=dir_name, text=True)
-            os.close(fd)
-            with open(tmp_path, "w", encoding="utf-8") as f:
-                f.write(html)
-            shutil.move(tmp_path, self.dca_dashboard_html_path)
-        except Exception as e:
-            print(f"⚠️ DCA HTML 写入失败，尝试直接写入: {e}")
-            try:
-                with open(self.dca_dashboard_html_path, "w", encoding="utf-8") as f:
-                    f.write(html)
-            except Exception as e2:
-                print(f"❌ 无法写入 DCA HTML: {e2}")
+        return DCA_DASHBOARD_HTML_TEMPLATE.substitute(
+            timestamp=payload.get("timestamp"),
+            api_probe_line=api_probe_line,
+            equity=payload.get("equity"),
+            peak_equity=payload.get("peak_equity"),
+            drawdown_pct=payload.get("drawdown_pct"),
+            open_orders=payload.get("open_orders"),
+            table_rows=table_rows,
+        )
 
     @staticmethod
     def _fmt_dt(value: Any) -> Optional[str]:
@@ -2044,16 +2038,19 @@ class TradingBot:
                 out.append(ss)
             return out
 
+        # 读取/解析/覆盖派生都在后台监听线程完成，这里只在周期边界换入已准备好的配置
+        watcher = self._dca_config_watcher
+        prepared = watcher.start().take() if watcher is not None else None
+        if prepared is None:
+            return {"updated": False, "symbols_changed": False, "removed_symbols": [], "added_symbols": []}
+
         prev_symbols = set(_normalize_list(self.dca_config.get("symbols", [])))
-        prev_mtime = self.dca_config_mtime
-        # reload config (this updates self.dca_config and self.dca_config_mtime)
-        self._load_dca_rotation_config(initial=False)
+        self._install_dca_rotation_config(prepared.derived, prepared.mtime)
         new_symbols = set(_normalize_list(self.dca_config.get("symbols", [])))
 
-        updated = prev_mtime is None or self.dca_config_mtime != prev_mtime
         symbols_changed = prev_symbols != new_symbols
         return {
-            "updated": updated,
+            "updated": True,
             "symbols_changed": symbols_changed,
             "removed_symbols": list(prev_symbols - new_symbols),
             "added_symbols": list(new_symbols - prev_symbols),
@@ -4583,7 +4580,7 @@ class TradingBot:
                 st.setdefault("entry_regime", None)
 
             self.dca_state[symbol] = st
-            self._save_dca_state()
+            self._save_dca_state(immediate=True)
         except Exception:
             return
 
@@ -5134,42 +5131,7 @@ class TradingBot:
 # 微结构(15s)采集与聚合
 # =========================
 def _ms_get_ring(self, sym: str, maxlen: int) -> Any:
-    ring = self._ms_ring.get(sym)
-    if not isinstance(ring, deque):
-        ring = deque(maxlen=maxlen)
-        self._ms_ring[sym] = ring
-    else:
-        # deque 的 maxlen 不能动态修改，必要时重建
-        if ring.maxlen != maxlen:
-            old = list(ring)
-            ring = deque(old[-maxlen:], maxlen=maxlen)
-            self._ms_ring[sym] = ring
-    return ring
-
-def _ms_get_fapi_base(self) -> str:
-    # 允许通过环境变量注入多个 endpoint（逗号分隔），这里只取第一个
-    raw = os.getenv("BINANCE_FUTURES_ENDPOINTS", "").strip()
-    if raw:
-        parts = [p.strip() for p in raw.split(",") if p.strip()]
-        if parts:
-            return parts[0].rstrip("/")
-    return "https://fapi.binance.com"
-
-def _ms_fetch_agg_trades(self, sym: str, start_ms: int, end_ms: int, limit: int = 1000) -> List[Dict[str, Any]]:
-    """获取期货 aggTrades（无需签名的公共接口）。若失败返回空列表。"""
-    try:
-        base = self._ms_get_fapi_base()
-        url = f"{base}/fapi/v1/aggTrades"
-        params = {"symbol": sym, "startTime": int(start_ms), "endTime": int(end_ms), "limit": int(limit)}
-        # requests 会读取系统代理环境变量；如你配置里禁用代理，这里尽量跟随
-        timeout = float(getattr(self, "network_timeout", 6.0) or 6.0)
-        r = requests.get(url, params=params, timeout=timeout)
-        if r.status_code != 200:
-            return []
-        data = r.json()
-        return data if isinstance(data, list) else []
-    except Exception:
-        return []
+    return self._ms_engine.ring(sym, maxlen)
 
 @staticmethod
 def _ms_parse_book_metrics(order_book: Dict[str, Any], depth_levels: int) -> Dict[str, float]:
@@ -5258,7 +5220,6 @@ def _ms_update_microstructure_ring(self, sym: str, params: Dict[str, Any]) -> Op
     except Exception:
         ring_maxlen = 60
     ring_maxlen = max(20, min(400, ring_maxlen))
-    ring = self._ms_get_ring(sym, ring_maxlen)
 
     now_ts = time.time()
     st = self._ms_state.get(sym, {})
@@ -5280,32 +5241,12 @@ def _ms_update_microstructure_ring(self, sym: str, params: Dict[str, Any]) -> Op
     start_ms = int((last_ts * 1000) if last_ts > 0 else (end_ms - interval * 1000))
     start_ms = max(0, start_ms)
 
-    trades = self._ms_fetch_agg_trades(sym, start_ms=start_ms, end_ms=end_ms, limit=1000)
-
-    buy_quote = 0.0
-    sell_quote = 0.0
-    trade_count = 0
-    last_trade_id = None
-
-    # aggTrades: p=price, q=qty, m=buyerIsMaker (True -> sell taker)
-    for t in trades:
-        if not isinstance(t, dict):
-            continue
-        try:
-            price = float(t.get("p", 0.0) or 0.0)
-            qty = float(t.get("q", 0.0) or 0.0)
-            if price <= 0 or qty <= 0:
-                continue
-            quote = price * qty
-            buyer_is_maker = bool(t.get("m", False))
-            if buyer_is_maker:
-                sell_quote += quote
-            else:
-                buy_quote += quote
-            trade_count += 1
-            last_trade_id = t.get("a", last_trade_id)
-        except Exception:
-            continue
+    # 有游标时按 fromId 只拉上次之后的新成交；首次/游标过旧时按上述时间窗口引导
+    flow = self._ms_engine.pull_trades(sym, start_ms=start_ms, end_ms=end_ms)
+    buy_quote = float(flow["buy_quote"])
+    sell_quote = float(flow["sell_quote"])
+    trade_count = int(flow["trade_count"])
+    last_trade_id = flow["last_trade_id"]
 
     total_quote = buy_quote + sell_quote
     trade_imb = (buy_quote - sell_quote) / total_quote if total_quote > 1e-12 else 0.0
@@ -5358,7 +5299,7 @@ def _ms_update_microstructure_ring(self, sym: str, params: Dict[str, Any]) -> Op
         "trap_reason": str(trap_reason),
         "trap_score": float(trap_score),
     }
-    ring.append(entry)
+    self._ms_engine.record(sym, entry, ring_maxlen)
 
     self._ms_state[sym] = {
         "last_ts": float(now_ts),
@@ -5391,42 +5332,11 @@ def _ms_adaptive_thresholds(self, sym: str, params: Dict[str, Any]) -> Dict[str,
     q_spread = max(0.50, min(0.99, q_spread))
     q_book = max(0.50, min(0.99, q_book))
 
-    ring = self._ms_ring.get(sym)
-    if not isinstance(ring, deque) or not ring:
+    # 分位数取自引擎维护的有序滚动窗口（线性插值，与 np.quantile 一致），不再遍历 ring
+    quantiles = self._ms_engine.adaptive_quantiles(sym, horizon, q_spread, q_book, time.time())
+    if quantiles is None:
         return {}
-
-    now_ts = time.time()
-    spreads: List[float] = []
-    book_abs: List[float] = []
-    for e in reversed(ring):
-        try:
-            ts = float(e.get("ts", 0.0) or 0.0)
-        except Exception:
-            ts = 0.0
-        if ts <= 0 or (now_ts - ts) > horizon:
-            break
-        try:
-            sp = float(e.get("spread", 0.0) or 0.0)
-            bi = float(e.get("book_imb", 0.0) or 0.0)
-        except Exception:
-            continue
-        if sp >= 0:
-            spreads.append(sp)
-        book_abs.append(abs(bi))
-
-    if len(spreads) < 8 or len(book_abs) < 8:
-        return {}
-
-    # 分位数：用 numpy（已有依赖）更稳健
-    try:
-        spread_q = float(np.quantile(np.array(spreads, dtype=float), q_spread))
-        book_q = float(np.quantile(np.array(book_abs, dtype=float), q_book))
-    except Exception:
-        # 回退：排序取位点
-        spreads_s = sorted(spreads)
-        book_s = sorted(book_abs)
-        spread_q = spreads_s[int((len(spreads_s) - 1) * q_spread)]
-        book_q = book_s[int((len(book_s) - 1) * q_book)]
+    spread_q, book_q = quantiles
 
     # clamp：避免极端导致阈值过低/过高
     try:
@@ -5521,106 +5431,18 @@ def _ms_calc_trap(
 
 def _ms_consecutive_trap(self, sym: str, required: int, params: Dict[str, Any]) -> Tuple[bool, int]:
     """判断最近 required 个 15s 条目是否连续触发 trap（用于 hard gate 连续性确认）。"""
-    ring = self._ms_ring.get(sym)
-    if not isinstance(ring, deque) or not ring:
-        return False, 0
     try:
         interval = int(params.get("microstructure_interval_seconds", 15) or 15)
     except Exception:
         interval = 15
-    # 允许一定的时间漂移：required * interval * 1.8
-    now_ts = time.time()
-    max_age = float(required * interval) * 1.8
-
-    cnt = 0
-    last_ts = None
-    for e in reversed(ring):
-        try:
-            ts = float(e.get("ts", 0.0) or 0.0)
-        except Exception:
-            ts = 0.0
-        if ts <= 0 or (now_ts - ts) > max_age:
-            break
-        if last_ts is not None and abs(last_ts - ts) > (interval * 2.2):
-            # 间隔断开，视为不连续
-            break
-        last_ts = ts
-        if bool(e.get("trap_flag", False)):
-            cnt += 1
-            if cnt >= required:
-                return True, cnt
-        else:
-            break
-    return False, cnt
+    # 允许一定的时间漂移：required * interval * 1.8；间隔超过 interval * 2.2 视为不连续
+    return self._ms_engine.consecutive_trap(sym, int(required), interval, time.time())
 
 def _ms_aggregate(self, sym: str, horizon_seconds: int, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    ring = self._ms_ring.get(sym)
-    if not isinstance(ring, deque) or not ring:
-        return None
-    now_ts = time.time()
+    # 成交额为滚动和；book_imb / microprice bias / depth_ratio 取滚动中位数抗尖刺；trap 用 max_score + 触发次数
     horizon_seconds = max(15, int(horizon_seconds))
-    items = [x for x in list(ring) if isinstance(x, dict) and (now_ts - float(x.get("ts", 0.0) or 0.0)) <= horizon_seconds]
-    if not items:
-        return None
-
-    # 成交不平衡用量加权
-    buy_sum = sum(float(x.get("buy_quote", 0.0) or 0.0) for x in items)
-    sell_sum = sum(float(x.get("sell_quote", 0.0) or 0.0) for x in items)
-    total = buy_sum + sell_sum
-    trade_imb = (buy_sum - sell_sum) / total if total > 1e-12 else 0.0
-
-    # book_imb / microprice bias 用中位数抗尖刺
-    try:
-        book_imbs = [float(x.get("book_imb", 0.0) or 0.0) for x in items]
-        micro_bias = []
-        for x in items:
-            mid = float(x.get("mid", 0.0) or 0.0)
-            mp = float(x.get("microprice", 0.0) or 0.0)
-            micro_bias.append((mp - mid) / mid if mid > 0 else 0.0)
-        book_imb_med = float(pd.Series(book_imbs).median()) if book_imbs else 0.0
-        micro_bias_med = float(pd.Series(micro_bias).median()) if micro_bias else 0.0
-    except Exception:
-        book_imb_med = 0.0
-        micro_bias_med = 0.0
-
-    spread_max = max(float(x.get("spread", 0.0) or 0.0) for x in items)
-
-    phantom_bid_sum = sum(max(0.0, float(x.get("phantom_bid", 0.0) or 0.0)) for x in items)
-    phantom_ask_sum = sum(max(0.0, float(x.get("phantom_ask", 0.0) or 0.0)) for x in items)
-
-    # depth_ratio 用中位数
-    try:
-        depth_ratios = [float(x.get("depth_ratio", 1.0) or 1.0) for x in items]
-        depth_ratio_med = float(pd.Series(depth_ratios).median()) if depth_ratios else 1.0
-    except Exception:
-        depth_ratio_med = 1.0
-
-    # trap 聚合：用 max_score + 触发次数
-    trap_score_max = max(float(x.get("trap_score", 0.0) or 0.0) for x in items)
-    trap_hits = sum(1 for x in items if bool(x.get("trap_flag", False)))
-    trap_flag = trap_score_max >= float(params.get("ms_trap_score_threshold", 0.55) or 0.55) or trap_hits >= max(2, int(len(items) * 0.4))
-
-    # 汇总 reason（只保留最近一次触发）
-    trap_reason = "-"
-    for x in reversed(items):
-        if bool(x.get("trap_flag", False)):
-            trap_reason = str(x.get("trap_reason", "-") or "-")
-            break
-
-    return {
-        "horizon": int(horizon_seconds),
-        "trade_imb": float(trade_imb),
-        "book_imb": float(book_imb_med),
-        "spread_max": float(spread_max),
-        "micro_bias": float(micro_bias_med),
-        "depth_ratio": float(depth_ratio_med),
-        "phantom_bid": float(phantom_bid_sum),
-        "phantom_ask": float(phantom_ask_sum),
-        "trap_score": float(trap_score_max),
-        "trap_hits": int(trap_hits),
-        "trap_flag": bool(trap_flag),
-        "trap_reason": str(trap_reason),
-    }
+    trap_threshold = float(params.get("ms_trap_score_threshold", 0.55) or 0.55)
+    return self._ms_engine.aggregate(sym, horizon_seconds, time.time(), trap_threshold)
 
     def _dca_get_flow_signal_snapshot(self, symbol: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         sym = str(symbol or "").upper()
@@ -6949,7 +6771,7 @@ def _dca_apply_flow_profile_override(self, params: Dict[str, Any], profile_name:
                     side=pos.get("side"),
                 )
                 self.dca_state.pop(symbol, None)
-                self._save_dca_state()
+                self._save_dca_state(immediate=True)
                 self._write_dca_dashboard(positions)
                 continue
 
@@ -6970,7 +6792,7 @@ def _dca_apply_flow_profile_override(self, params: Dict[str, Any], profile_name:
                         side=pos.get("side"),
                     )
                     self.dca_state.pop(symbol, None)
-                    self._save_dca_state()
+                    self._save_dca_state(immediate=True)
                     self._write_dca_dashboard(positions)
                     continue
             else:
@@ -6995,7 +6817,7 @@ def _dca_apply_flow_profile_override(self, params: Dict[str, Any], profile_name:
                     side=pos.get("side"),
                 )
                 self.dca_state.pop(symbol, None)
-                self._save_dca_state()
+                self._save_dca_state(immediate=True)
                 self._write_dca_dashboard(positions)
                 continue
 
@@ -7009,7 +6831,7 @@ def _dca_apply_flow_profile_override(self, params: Dict[str, Any], profile_name:
                     side=pos.get("side"),
                 )
                 self.dca_state.pop(symbol, None)
-                self._save_dca_state()
+                self._save_dca_state(immediate=True)
                 self._write_dca_dashboard(positions)
                 continue
 
@@ -7020,7 +6842,7 @@ def _dca_apply_flow_profile_override(self, params: Dict[str, Any], profile_name:
                     side=pos.get("side"),
                 )
                 self.dca_state.pop(symbol, None)
-                self._save_dca_state()
+                self._save_dca_state(immediate=True)
                 self._write_dca_dashboard(positions)
                 continue
 
@@ -7150,7 +6972,7 @@ def _dca_apply_flow_profile_override(self, params: Dict[str, Any], profile_name:
                         )
                         # 加仓后更新 state 并重置 peak
                         self._on_dca_add_fill(state, current_price, side="SHORT")
-                        self._save_dca_state()
+                        self._save_dca_state(immediate=True)
                         self._write_dca_dashboard(positions)
                 else:
                     if td_down >= int(params.get("td_add_count", 9)) and current_price <= long_trigger:
@@ -7164,7 +6986,7 @@ def _dca_apply_flow_profile_override(self, params: Dict[str, Any], profile_name:
                         )
                         # 加仓后更新 state 并重置 peak
                         self._on_dca_add_fill(state, current_price, side="LONG")
-                        self._save_dca_state()
+                        self._save_dca_state(immediate=True)
                         self._write_dca_dashboard(positions)
 
         # =====================================================================
@@ -8033,7 +7855,7 @@ def _dca_apply_flow_profile_override(self, params: Dict[str, Any], profile_name:
                         # 清理 DCA 状态并写盘
                         try:
                             self.dca_state.pop(symbol, None)
-                            self._save_dca_state()
+                            self._save_dca_state(immediate=True)
                             self._write_dca_dashboard(positions)
                         except Exception:
                             pass
@@ -8073,7 +7895,7 @@ def _dca_apply_flow_profile_override(self, params: Dict[str, Any], profile_name:
                     closed_by_score.append(sym)
     
                 if closed_by_score:
-                    self._save_dca_state()
+                    self._save_dca_state(immediate=True)
                     try:
                         self._write_dca_dashboard(self.position_data.get_all_positions() or {})
                     except Exception:
@@ -8190,7 +8012,7 @@ def _dca_apply_flow_profile_override(self, params: Dict[str, Any], profile_name:
                                 self.dca_state.pop(sym, None)
                                 positions_changed = True
                     self._last_regime = new_regime.split("_")[0]  # BULL_STRONG -> BULL
-                    self._save_dca_state()
+                    self._save_dca_state(immediate=True)
     
                 elif action == "RANGE_LOCK":
                     print("\n🔒 【flip超限】进入 RANGE_LOCK，强制震荡模式")
@@ -8240,7 +8062,7 @@ def _dca_apply_flow_profile_override(self, params: Dict[str, Any], profile_name:
                         except Exception as e:
                             print(f"⚠️ RANGE_LOCK修剪失败 {sym}: {e}")
                     if trim_plan:
-                        self._save_dca_state()
+                        self._save_dca_state(immediate=True)
     
                 if positions_changed:
                     positions_after_close = self.position_data.get_all_positions() or {}
@@ -8328,7 +8150,7 @@ def _dca_apply_flow_profile_override(self, params: Dict[str, Any], profile_name:
                                         self._close_position(sym, {"action": "CLOSE", "reason": "trend_score_bull_close_short"}, side="SHORT")
                                         self.dca_state.pop(sym, None)
                             self._last_regime = effective_regime
-                            self._save_dca_state()
+                            self._save_dca_state(immediate=True)
                         else:
                             print(f"   ⏳ 趋势转换待确认（当前: {self._last_regime} → 候选: {effective_regime}）")
                             effective_regime = self._last_regime
@@ -8358,7 +8180,7 @@ def _dca_apply_flow_profile_override(self, params: Dict[str, Any], profile_name:
                                         self._close_position(sym, {"action": "CLOSE", "reason": "major_regime_bull_close_short"}, side="SHORT")
                                         self.dca_state.pop(sym, None)
                             self._last_regime = major_regime
-                            self._save_dca_state()
+                            self._save_dca_state(immediate=True)
                     else:
                         cache_regime_details = self._btc_regime_cache.get("details", {})
                         regime_details = cache_regime_details if isinstance(cache_regime_details, dict) else {}
@@ -8942,17 +8764,9 @@ def _dca_apply_flow_profile_override(self, params: Dict[str, Any], profile_name:
         snapshot_name = f"DCA_dashboard_{now.strftime('%Y-%m-%d')}_{hour_block:02d}.csv"
         return os.path.join(month_dir, snapshot_name)
 
-    def _sync_dca_dashboard_snapshot(self, when: Optional[datetime] = None) -> None:
-        """将当前 dca_dashboard.csv 复制为按时间段命名的快照文件"""
-        try:
-            now = when or datetime.now()
-            snapshot_path = self._get_dca_dashboard_snapshot_path(now)
-            if os.path.exists(self.dca_dashboard_csv_path):
-                shutil.copyfile(self.dca_dashboard_csv_path, snapshot_path)
-                # 保留最近一次快照标记，便于调试（不再用于跳过写入）
-                self._last_dca_snapshot_key = snapshot_path
-        except Exception as e:
-            print(f"⚠️ DCA 看板快照写入失败: {e}")
+    def _dca_dashboard_mirror_path(self) -> Optional[str]:
+        """看板后台线程调用：当前时间段的 CSV 快照路径（切换时段时整体复制一次，其余追加新行）"""
+        return self._get_dca_dashboard_snapshot_path()
 
     def _write_log(self, message: str):
         """
@@ -9011,6 +8825,12 @@ def _dca_apply_flow_profile_override(self, params: Dict[str, Any], profile_name:
                 account_summary=account_summary,
                 history=history,
             )
+            if pb.compact:
+                ps = pb.get_prompt_stats()
+                print(
+                    f"📏 提示词 ~{ps['last_prompt_tokens']} tokens（载荷 {ps['last_payload_bytes']}B，"
+                    f"前缀复用 {ps['prefix_reuse']}/{ps['calls']}）"
+                )
 
             # 调用AI
             print("\n🤖 调用AI一次性分析所有币种...")
@@ -10517,8 +10337,8 @@ def _dca_apply_flow_profile_override(self, params: Dict[str, Any], profile_name:
             # 应用新配置
             self.config_monitor.apply_updates(update_info)
 
-            # 重新加载配置到内存
-            self.config = ConfigLoader.load_trading_config(self.config_path)
+            # 换入后台已加载并校验的新配置
+            self.config = update_info["new_config"]
             print("✅ 配置已重新加载，后续将使用新配置执行")
 
         # 获取交易币种列表（使用更新后的配置）
@@ -10586,7 +10406,10 @@ def _dca_apply_flow_profile_override(self, params: Dict[str, Any], profile_name:
 
         # 规则策略模式（单币种逐个分析）
         if self._is_dual_engine_mode():
-            self._run_dca_rotation_cycle()
+            try:
+                self._run_dca_rotation_cycle()
+            finally:
+                self._flush_dca_state()
 
         # 规则策略模式（单币种逐个分析）
         elif self.strategy_mode == "V5_RULE":
@@ -10876,7 +10699,8 @@ def _dca_apply_flow_profile_override(self, params: Dict[str, Any], profile_name:
         print("🛑 交易机器人正在关闭...")
         print("=" * 60)
         if self._is_dual_engine_mode():
-            self._save_dca_state()
+            self._save_dca_state(immediate=True)
+            self._dca_dashboard_writer.close()
         print(f"✅ 本次运行交易次数: {self.trade_count}")
         print(f"✅ 决策记录数量: {len(self.decision_history)}")
         print("🎉 交易机器人已安全退出")
@@ -0,0 +1,336 @@
+"""
+紧急平仓执行器 (Kill Switch)
+
+与决策循环解耦的强平通道:
+1. 预热：启动/重载时缓存持仓模式(hedge)与交易对过滤器，强平时不再查询
+2. 单仓强平：closePosition -> reduce-only 市价 -> 无 positionSide 变体，逐级回退
+3. 批量强平：所有目标的平仓单并发下发；某 symbol 的平仓确认成交后才撤销其条件单/TP/SL，
+   平仓失败或未完全成交时保留保护单，逐 symbol 记录耗时
+4. 异步提交：决策循环内只提交任务，结果通过回调/drain 汇总
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class KillSwitchExecutor:
+    """预热的紧急平仓执行器"""
+
+    def __init__(self, client, config: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            client: Binance API客户端（需提供 _execute_order_v2 / format_quantity / cancel_all_*）
+            config: kill_switch 配置段
+        """
+        cfg = config if isinstance(config, dict) else {}
+        self.client = client
+        self.max_workers = max(1, int(self._to_float(cfg.get("max_workers"), 8)))
+        self.cancel_open_orders = bool(cfg.get("cancel_open_orders", True))
+        self.drain_timeout_seconds = max(0.0, self._to_float(cfg.get("drain_timeout_seconds"), 15.0))
+        self._hedge_mode: Optional[bool] = None
+        self._warmed_symbols: set = set()
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="kill-switch")
+        self._lock = threading.Lock()
+        self._pending: List[Future] = []
+
+    @staticmethod
+    def _to_float(value: Any, default: float = 0.0) -> float:
+        try:
+            return float(value)
+        except Exception:
+            return default
+
+    # ---------------------------------------------------------------- warm
+    def warm(self, symbols: List[str]) -> Dict[str, Any]:
+        """缓存持仓模式与交易对过滤器（强平路径上不再为此发请求）"""
+        try:
+            self._hedge_mode = bool(self.client.broker.get_hedge_mode())
+        except Exception as e:
+            print(f"⚠️ Kill switch 预热持仓模式失败: {e}")
+        warmed = 0
+        market = getattr(getattr(self.client, "broker", None), "market", None)
+        if market is not None and hasattr(market, "warm_symbol_info"):
+            try:
+                warmed = int(market.warm_symbol_info(list(symbols)))
+            except Exception as e:
+                print(f"⚠️ Kill switch 预热交易对过滤器失败: {e}")
+        self._warmed_symbols.update(str(s).upper() for s in symbols)
+        return {"hedge_mode": self._hedge_mode, "symbols_warmed": warmed}
+
+    def hedge_mode(self) -> bool:
+        if self._hedge_mode is None:
+            try:
+                self._hedge_mode = bool(self.client.broker.get_hedge_mode())
+            except Exception:
+                return False
+        return self._hedge_mode
+
+    # --------------------------------------------------------------- build
+    def build_candidates(
+        self,
+        symbol: str,
+        side: str,
+        quantity: float,
+        reduce_ratio: float = 1.0,
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """按回退顺序生成平仓参数（全部为 reduce-only 市价单）"""
+        base_params: Dict[str, Any] = {"symbol": symbol, "type": "MARKET", "quantity": quantity}
+        hedge_mode = self.hedge_mode()
+        full_close = reduce_ratio >= 0.999
+        candidates: List[Tuple[str, Dict[str, Any]]] = []
+        if full_close:
+            p_close = dict(base_params, closePosition=True)
+            if hedge_mode:
+                p_close["positionSide"] = side
+            candidates.append(("close_position", p_close))
+
+        p_reduce = dict(base_params)
+        if hedge_mode:
+            p_reduce["positionSide"] = side
+        candidates.append(("reduce_only_market", p_reduce))
+
+        if hedge_mode:
+            # 兜底：部分账户/模式下 positionSide 可能导致拒单，提供无 positionSide 变体
+            if full_close:
+                candidates.append(("close_position_no_ps", dict(base_params, closePosition=True)))
+            candidates.append(("reduce_only_market_no_ps", dict(base_params)))
+        return candidates
+
+    # ------------------------------------------------------------- execute
+    def flatten_position(
+        self,
+        symbol: str,
+        side: str,
+        amount: float,
+        reduce_ratio: float = 1.0,
+        confirm_closed: Optional[Callable[[str], bool]] = None,
+    ) -> Dict[str, Any]:
+        """
+        同步强平单个持仓腿，返回结果附带 latency_ms
+
+        confirm_closed(symbol) 用于交易所返回非标准结构时二次确认仓位是否已消失。
+        """
+        started = time.perf_counter()
+        result = self._flatten(symbol, str(side or "").upper(), amount, reduce_ratio, confirm_closed)
+        result["symbol"] = symbol
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+        return result
+
+    def _flatten(
+        self,
+        symbol: str,
+        side: str,
+        amount: float,
+        reduce_ratio: float,
+        confirm_closed: Optional[Callable[[str], bool]],
+    ) -> Dict[str, Any]:
+        qty_total = self._to_float(amount, 0.0)
+        if side not in ("LONG", "SHORT") or qty_total <= 0:
+            return {"status": "error", "message": f"invalid close input side={side}, qty={qty_total}"}
+        ratio = min(1.0, max(0.1, self._to_float(reduce_ratio, 1.0)))
+        qty_target = qty_total * ratio
+        try:
+            qty_target = float(self.client.format_quantity(symbol, qty_target))
+        except Exception:
+            pass
+        if qty_target <= 0:
+            return {"status": "error", "message": f"invalid close qty after format: {qty_target}"}
+
+        close_side = "SELL" if side == "LONG" else "BUY"
+        errors: List[str] = []
+        for mode, params in self.build_candidates(symbol, side, qty_target, ratio):
+            try:
+                order = self.client._execute_order_v2(params=params, side=close_side, reduce_only=True)
+                if isinstance(order, dict):
+                    code = order.get("code")
+                    if isinstance(code, (int, float)) and float(code) < 0:
+                        errors.append(f"{mode}: code={code}, msg={order.get('msg')}")
+                        continue
+                    if order.get("orderId") is not None:
+                        return {"status": "success", "order": order, "mode": mode}
+                    if str(order.get("status", "")).lower() == "success":
+                        return {"status": "success", "order": order, "mode": mode}
+
+                # 若返回结构不标准，二次确认仓位是否已消失，避免误判。
+                if confirm_closed is not None and confirm_closed(symbol):
+                    return {
+                        "status": "success",
+                        "order": order,
+                        "mode": mode,
+                        "message": "position closed after emergency request",
+                    }
+                errors.append(f"{mode}: unexpected response={order}")
+            except Exception as e:
+                errors.append(f"{mode}: {e}")
+        return {"status": "error", "message": " | ".join(errors)[:1200]}
+
+    def cancel_symbol_orders(self, symbol: str) -> Dict[str, Any]:
+        """撤销该 symbol 的条件单与普通挂单（强平后残留的 TP/SL 不再需要）"""
+        started = time.perf_counter()
+        out: Dict[str, Any] = {"symbol": symbol}
+        try:
+            out["conditional"] = self.client.cancel_all_conditional_orders(symbol)
+        except Exception as e:
+            out["conditional_error"] = str(e)
+        if self.cancel_open_orders:
+            try:
+                out["open"] = self.client.cancel_all_open_orders(symbol)
+            except Exception as e:
+                out["open_error"] = str(e)
+        out["latency_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+        return out
+
+    def submit(
+        self,
+        symbol: str,
+        side: str,
+        amount: float,
+        reduce_ratio: float = 1.0,
+        confirm_closed: Optional[Callable[[str], bool]] = None,
+        callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Future:
+        """异步提交单仓强平（不阻塞决策循环），callback 在工作线程中以结果调用"""
+
+        def _task() -> Dict[str, Any]:
+            result = self.flatten_position(symbol, side, amount, reduce_ratio, confirm_closed)
+            if callback is not None:
+                try:
+                    callback(result)
+                except Exception as e:
+                    print(f"⚠️ Kill switch 回调异常 {symbol}: {e}")
+            return result
+
+        future = self._pool.submit(_task)
+        with self._lock:
+            self._pending.append(future)
+        return future
+
+    def close_filled(
+        self,
+        result: Dict[str, Any],
+        reduce_ratio: float = 1.0,
+        confirm_closed: Optional[Callable[[str], bool]] = None,
+    ) -> bool:
+        """平仓腿是否确认全部成交（仓位已不存在），只有此时才能撤掉保护单"""
+        if result.get("status") != "success" or self._to_float(reduce_ratio, 1.0) < 0.999:
+            return False
+        order = result.get("order") if isinstance(result.get("order"), dict) else {}
+        if str(order.get("status") or "").upper() == "FILLED":
+            return True
+        orig_qty = self._to_float(order.get("origQty"), 0.0)
+        if orig_qty > 0 and self._to_float(order.get("executedQty"), 0.0) >= orig_qty:
+            return True
+        # 仅返回 ACK/NEW 等非终态：以交易所持仓为准
+        if confirm_closed is None:
+            return False
+        try:
+            return bool(confirm_closed(str(result.get("symbol") or "")))
+        except Exception:
+            return False
+
+    def flatten_all(
+        self,
+        targets: List[Dict[str, Any]],
+        reason: str = "",
+        confirm_closed: Optional[Callable[[str], bool]] = None,
+        cancel_orders: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        并发强平全部目标，某 symbol 的全部平仓腿确认成交后再撤销其挂单，阻塞至完成
+
+        平仓失败或未完全成交的 symbol 保留条件单/TP/SL（cancels 中记为 skipped）。
+        targets: [{"symbol", "side", "amount", "reduce_ratio"(可选)}]
+        """
+        started = time.perf_counter()
+        close_futures: Dict[Future, Tuple[str, float]] = {}
+        legs_left: Dict[str, int] = {}
+        for target in targets:
+            symbol = str(target.get("symbol") or "").upper()
+            if not symbol:
+                continue
+            reduce_ratio = self._to_float(target.get("reduce_ratio"), 1.0)
+            future = self._pool.submit(
+                self.flatten_position,
+                symbol,
+                str(target.get("side") or ""),
+                self._to_float(target.get("amount"), 0.0),
+                reduce_ratio,
+                confirm_closed,
+            )
+            close_futures[future] = (symbol, reduce_ratio)
+            legs_left[symbol] = legs_left.get(symbol, 0) + 1
+
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        filled: Dict[str, bool] = {}
+        cancel_futures: Dict[str, Future] = {}
+        cancels: Dict[str, Dict[str, Any]] = {}
+        for future in as_completed(close_futures):
+            symbol, reduce_ratio = close_futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"symbol": symbol, "status": "error", "message": str(e)}
+            results.setdefault(symbol, []).append(result)
+            filled[symbol] = filled.get(symbol, True) and self.close_filled(result, reduce_ratio, confirm_closed)
+            legs_left[symbol] -= 1
+            if legs_left[symbol] > 0 or not cancel_orders:
+                continue
+            if filled[symbol]:
+                cancel_futures[symbol] = self._pool.submit(self.cancel_symbol_orders, symbol)
+            else:
+                cancels[symbol] = {"symbol": symbol, "skipped": "close not confirmed filled, protective orders kept"}
+                print(f"⚠️ Kill switch {symbol}: 平仓未确认成交，保留条件单/TP/SL")
+        for symbol, future in cancel_futures.items():
+            try:
+                cancels[symbol] = future.result()
+            except Exception as e:
+                cancels[symbol] = {"symbol": symbol, "error": str(e)}
+
+        report = {
+            "reason": reason,
+            "total_ms": round((time.perf_counter() - started) * 1000.0, 1),
+            "closed": sum(1 for legs in results.values() for r in legs if r.get("status") == "success"),
+            "failed": sum(1 for legs in results.values() for r in legs if r.get("status") != "success"),
+            "results": results,
+            "cancels": cancels,
+        }
+        for symbol, legs in results.items():
+            for r in legs:
+                print(
+                    f"🧯 Kill switch {symbol}: status={r.get('status')} mode={r.get('mode')} "
+                    f"latency={r.get('latency_ms')}ms"
+                )
+        print(
+            f"🧯 Kill switch 完成 reason={reason}: closed={report['closed']} failed={report['failed']} "
+            f"total={report['total_ms']}ms"
+        )
+        return report
+
+    def drain(self, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """等待已提交的异步强平完成（有上限），返回已完成的结果并移出队列"""
+        with self._lock:
+            pending = list(self._pending)
+        if not pending:
+            return []
+        wait(pending, timeout=self.drain_timeout_seconds if timeout is None else timeout)
+        done: List[Dict[str, Any]] = []
+        with self._lock:
+            remaining: List[Future] = []
+            for future in self._pending:
+                if not future.done():
+                    remaining.append(future)
+                    continue
+                try:
+                    done.append(future.result())
+                except Exception as e:
+                    done.append({"status": "error", "message": str(e)})
+            self._pending = remaining
+        return done
+
+    def shutdown(self, wait_pending: bool = True) -> None:
+        self._pool.shutdown(wait=wait_pending)
+
+
+__all__ = ["KillSwitchExecutor"]
@@ -1,10 +1,14 @@
 import requests  # type: ignore
 
+import json
 import os
 import time
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
+from src.trading.pretrade_cache import PreTradeCache
+from src.utils.concurrency import map_bounded
+
 
 class OrderGateway:
     """
@@ -15,6 +19,8 @@ class OrderGateway:
         self.broker = broker
         # 🔒 L1: symbol + side 时间锁（20秒内禁止重复 OPEN）
         self._open_locks: Dict[str, float] = {}
+        # 下单前校验缓存（持仓/标记价格），由 BinanceBroker 注册写回调失效
+        self.pretrade = PreTradeCache(broker)
 
     def _is_fatal_auth_error(self, err: Any) -> bool:
         """检测致命权限错误（401 / -2015 / -2014）- 不可重试"""
@@ -47,10 +53,11 @@ class OrderGateway:
         except Exception:
             pass
 
-    def has_open_position(self, symbol: str, side: Optional[str] = None) -> bool:
+    def has_open_position(self, symbol: str, side: Optional[str] = None, fresh: bool = False) -> bool:
         """🔥 L2: 统一的「是否已有仓位」判断（支持方向 LONG/SHORT/BOTH 和 BUY/SELL）
 
         接受的 side 可以是 'LONG'/'SHORT' 或者 'BUY'/'SELL'，也可以为 None (等同于 BOTH)。
+        默认读下单前校验缓存；fresh=True 时强制实时拉取（L3 使用）。
         """
         if side:
             s = side.upper()
@@ -65,7 +72,7 @@ class OrderGateway:
         else:
             query_side = "BOTH"
 
-        pos = self.broker.position.get_position(symbol, side=query_side)
+        pos = self.pretrade.position(symbol, side=query_side, fresh=fresh)
         if not pos:
             return False
         try:
@@ -88,6 +95,8 @@ class OrderGateway:
     ) -> Dict[str, Any]:
         """
         在平仓请求下，解析目标腿并回读交易所实时仓位，避免 reduce-only 在无仓位/错腿时触发 -2022。
+
+        止盈/止损成交没有推送使缓存失效，这里必须实时拉取（每次解析只拉一次）。
         """
         side_up = str(side or "").upper()
         target_side = str(final_params.get("positionSide") or "").upper()
@@ -108,10 +117,14 @@ class OrderGateway:
         matched_position: Optional[Dict[str, Any]] = None
         matched_qty = 0.0
         inferred_side = ""
+        try:
+            live_positions: Optional[List[Dict[str, Any]]] = self.pretrade.positions(fresh=True)
+        except Exception:
+            live_positions = None
 
         if target_side in ("LONG", "SHORT"):
             try:
-                pos_target = self.broker.position.get_position(symbol, side=target_side)
+                pos_target = self.pretrade.match_position(live_positions, symbol, side=target_side)
             except Exception:
                 pos_target = None
             amt_target = self._to_float((pos_target or {}).get("positionAmt"), 0.0) if isinstance(pos_target, dict) else 0.0
@@ -122,7 +135,7 @@ class OrderGateway:
 
         if matched_qty <= 0:
             try:
-                pos_any = self.broker.position.get_position(symbol)
+                pos_any = self.pretrade.match_position(live_positions, symbol)
             except Exception:
                 pos_any = None
             amt_any = self._to_float((pos_any or {}).get("positionAmt"), 0.0) if isinstance(pos_any, dict) else 0.0
@@ -161,6 +174,9 @@ class OrderGateway:
         - L1: 时间锁（同symbol+side 20秒内禁止重复）
         - L2: 真实仓位检查（不是openOrders）
         - L3: 失败后再次检查仓位（防止已成交）
+
+        L2 / 最小名义额价格读 PreTradeCache（周期账户快照或短 TTL，下单后失效）；
+        平仓腿解析 / closePosition 数量 / L3 始终实时拉取（交易所侧成交无推送失效）。
         """
         now = time.time()
         lock_key = f"{symbol}:{side}"
@@ -240,16 +256,9 @@ class OrderGateway:
             qty = final.get("quantity")
             price = final.get("price")
             if qty and (not price or float(price) <= 0):
-                # 尝试从行情获取当前价格
+                # 标记价格（缓存未命中时按 symbol 拉 premiumIndex）
                 try:
-                    ticker = self.broker.request(
-                        "GET",
-                        f"{self.broker.MARKET_BASE}/fapi/v1/ticker/24hr",
-                        params={"symbol": symbol},
-                        allow_error=True,
-                    )
-                    ticker_data = ticker.json() if ticker is not None else {}
-                    price = float((ticker_data or {}).get("lastPrice", 0) or 0)
+                    price = self.pretrade.mark_price(symbol)
                 except Exception:
                     price = None
 
@@ -284,14 +293,7 @@ class OrderGateway:
                     price = final.get("price")
                     if not price or float(price) <= 0:
                         try:
-                            t = self.broker.request(
-                                "GET",
-                                f"{self.broker.MARKET_BASE}/fapi/v1/ticker/24hr",
-                                params={"symbol": symbol},
-                                allow_error=True,
-                            )
-                            t_data = t.json() if t is not None else {}
-                            price = float((t_data or {}).get("lastPrice", 0) or 0)
+                            price = self.pretrade.mark_price(symbol)
                         except Exception:
                             price = None
                     if not price or float(price) <= 0:
@@ -346,6 +348,7 @@ class OrderGateway:
                     # 容错：计算过程中出错，放弃自动重试路径
                     return None
 
+            self.pretrade.record_submit(symbol, now)
             response = self.broker.request(
                 method="POST",
                 url=self._order_endpoint(),
@@ -423,7 +426,7 @@ class OrderGateway:
                         }
 
                 # 🔥 L3: 失败后 → 再查一次仓位（防止已成交）
-                cond_l3 = not reduce_only and self.has_open_position(symbol, pos_check_side)
+                cond_l3 = not reduce_only and self.has_open_position(symbol, pos_check_side, fresh=True)
                 if cond_l3:
                     print("[WARN] Order failed but position exists")
                     print(data)
@@ -481,7 +484,7 @@ class OrderGateway:
                 self._log_order_reject(symbol, side, final, str(e))
 
             # 🔥 L3: 失败后 → 再查一次仓位（防止已成交）
-            cond_l3_exc = not reduce_only and self.has_open_position(symbol, pos_check_side)
+            cond_l3_exc = not reduce_only and self.has_open_position(symbol, pos_check_side, fresh=True)
             if cond_l3_exc:
                 print("[WARNING] Exception but position exists:")
                 print(e)
@@ -550,6 +553,7 @@ class OrderGateway:
 
         endpoint = self._order_endpoint()
 
+        orders: List[Dict[str, Any]] = []
         for price, otype in [(tp, "TAKE_PROFIT_MARKET"), (sl, "STOP_MARKET")]:
             if price is None:
                 continue
@@ -563,17 +567,73 @@ class OrderGateway:
             }
             if pos_side:
                 p["positionSide"] = pos_side
-
+            orders.append(p)
+        if not orders:
+            return results
+
+        # FAPI 支持 batchOrders（单次最多 5 单）：TP+SL 一次往返下发
+        batch_endpoint = self._batch_order_endpoint()
+        if batch_endpoint and len(orders) > 1:
+            batched = self._place_batch(batch_endpoint, symbol, order_side, orders)
+            if batched is not None:
+                return batched
+
+        # PAPI-UM 无批量端点（或批量请求整体失败）：有界并发逐单下发
+        def _submit(p: Dict[str, Any]) -> Optional[Dict[str, Any]]:
             try:
                 resp = self.broker.request("POST", endpoint, params=p, signed=True)
-                results.append(resp.json())
+                return resp.json()
             except Exception as e:
                 # 记录并继续尝试下一个保护单
                 try:
                     self._log_order_reject(symbol, order_side, p, str(e))
                 except Exception:
                     pass
+                return None
+
+        for item in map_bounded(_submit, orders):
+            if item is not None:
+                results.append(item)
+        return results
+
+    def _batch_order_endpoint(self) -> Optional[str]:
+        if self.broker.is_papi_only():
+            return None
+        return f"{self.broker.FAPI_BASE}/fapi/v1/batchOrders"
 
+    def _place_batch(
+        self,
+        endpoint: str,
+        symbol: str,
+        order_side: str,
+        orders: List[Dict[str, Any]],
+    ) -> Optional[List[Dict[str, Any]]]:
+        """批量下单；返回与 orders 对齐的逐单结果，请求整体失败时返回 None 以便回退"""
+        payload = [{k: (str(v).lower() if isinstance(v, bool) else str(v)) for k, v in p.items()} for p in orders]
+        try:
+            resp = self.broker.request(
+                "POST",
+                endpoint,
+                params={"batchOrders": json.dumps(payload, separators=(",", ":"))},
+                signed=True,
+                allow_error=True,
+            )
+            data = resp.json()
+        except Exception as e:
+            print(f"⚠️ 批量保护单请求失败，回退逐单下发: {e}")
+            return None
+        if not isinstance(data, list):
+            return None
+        results: List[Dict[str, Any]] = []
+        for p, item in zip(orders, data):
+            if not isinstance(item, dict):
+                continue
+            if isinstance(item.get("code"), (int, float)) and item.get("code") < 0:
+                try:
+                    self._log_order_reject(symbol, order_side, p, str(item.get("msg") or item))
+                except Exception:
+                    pass
+            results.append(item)
         return results
 
     def _finalize_params(self, params: Dict[str, Any], side: str, reduce_only: bool) -> Dict[str, Any]:
@@ -611,7 +671,7 @@ class OrderGateway:
         if p.get("closePosition") is True or str(p.get("closePosition")).lower() == "true":
             p["closePosition"] = True
             if "quantity" not in p or not p["quantity"]:
-                pos = self.broker.position.get_position(p.get("symbol"), side="BOTH")
+                pos = self.pretrade.position(p.get("symbol"), side="BOTH", fresh=True)
                 if pos:
                     p["quantity"] = abs(float(pos.get("positionAmt", 0)))
                 else:
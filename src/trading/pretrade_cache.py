@@ -0,0 +1,250 @@
+"""
+下单前校验缓存 (Pre-trade Validation Cache)
+
+place_standard_order 关键路径上的读取统一走本缓存，不再每次阻塞拉取:
+1. 持仓（仅 L2 重复开仓检查）：挂接了 AccountSnapshotService 时直接读周期账户快照，不另存一份；
+   未挂接时整账户 positionRisk 拉取一次，按 (symbol, positionSide) 索引，短 TTL
+2. 标记价格：来自持仓快照 / 决策时价格，未命中时按 symbol 拉 premiumIndex
+3. 失效：下单类写请求（BinanceBroker 写回调）使持仓整体失效；撤单/改杠杆不影响持仓数量，不触发失效。
+   失效会递增代数（generation），拉取期间代数变化则丢弃该次拉取结果，不覆盖更新的状态。
+   当前没有用户数据流：止盈/止损等交易所侧成交不会使缓存失效，
+   因此平仓腿解析、closePosition 数量与 L3 复核都传 fresh=True 实时拉取
+4. 延迟统计：下单前校验耗时与 决策 -> 下单提交 耗时（p50/p95/max）
+
+交易对过滤器（步长/最小名义额）已由 MarketGateway 常驻缓存，数量取整与最小名义额在本地计算。
+
+环境变量:
+    BINANCE_PRETRADE_CACHE=0                 关闭缓存（每次实时拉取）
+    BINANCE_PRETRADE_POSITION_MAX_AGE=2.0    持仓快照最大年龄（秒，未挂接账户快照时）
+    BINANCE_PRETRADE_PRICE_MAX_AGE=5.0       标记价格最大年龄（秒）
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+# 会改变持仓数量的写请求路径（撤单/改杠杆/保证金模式不影响 positionAmt）
+POSITION_CHANGING_PATHS = ("/order", "/batchOrders")
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class PreTradeCache:
+    """短 TTL + 写请求失效的持仓 / 标记价格缓存"""
+
+    def __init__(
+        self,
+        broker: Any,
+        position_max_age_seconds: Optional[float] = None,
+        price_max_age_seconds: Optional[float] = None,
+        enabled: Optional[bool] = None,
+        latency_window: int = 500,
+    ):
+        """
+        Args:
+            broker: BinanceBroker（需提供 position.get_positions / request / MARKET_BASE）
+            position_max_age_seconds: 持仓快照最大年龄
+            price_max_age_seconds: 标记价格最大年龄
+            enabled: 是否启用缓存（关闭时每次实时拉取）
+            latency_window: 延迟统计的滑动样本数
+        """
+        self.broker = broker
+        self.enabled = os.getenv("BINANCE_PRETRADE_CACHE", "1") != "0" if enabled is None else bool(enabled)
+        self.position_max_age_seconds = max(
+            0.0,
+            _env_float("BINANCE_PRETRADE_POSITION_MAX_AGE", 2.0)
+            if position_max_age_seconds is None
+            else float(position_max_age_seconds),
+        )
+        self.price_max_age_seconds = max(
+            0.0,
+            _env_float("BINANCE_PRETRADE_PRICE_MAX_AGE", 5.0) if price_max_age_seconds is None else float(price_max_age_seconds),
+        )
+        self._lock = threading.RLock()
+        self._positions: Optional[Tuple[float, List[Dict[str, Any]]]] = None
+        # 外部持仓来源（AccountSnapshotService.positions），挂接后非 fresh 读取不再自建快照
+        self._position_source: Optional[Callable[[], List[Dict[str, Any]]]] = None
+        self._generation = 0
+        self._prices: Dict[str, Tuple[float, float]] = {}
+        self._decision_ts: Dict[str, float] = {}
+        self._latency: Dict[str, Deque[float]] = {
+            "pretrade_ms": deque(maxlen=max(1, int(latency_window))),
+            "decision_to_submit_ms": deque(maxlen=max(1, int(latency_window))),
+        }
+        self._metrics = {
+            "position_fetches": 0,
+            "position_hits": 0,
+            "price_fetches": 0,
+            "price_hits": 0,
+            "invalidations": 0,
+            "snapshot_reads": 0,
+            "stale_fetches_dropped": 0,
+        }
+
+    @staticmethod
+    def _to_float(value: Any, default: float = 0.0) -> float:
+        try:
+            return float(value)
+        except Exception:
+            return default
+
+    # ------------------------------------------------------------ positions
+    def attach_position_source(self, source: Optional[Callable[[], List[Dict[str, Any]]]]) -> None:
+        """挂接周期账户快照作为持仓来源（失效由快照自身的写回调负责）"""
+        with self._lock:
+            self._position_source = source
+            self._positions = None
+
+    def _position_list(self, fresh: bool = False) -> List[Dict[str, Any]]:
+        source = self._position_source
+        if self.enabled and not fresh and source is not None:
+            positions = source()
+            with self._lock:
+                self._metrics["snapshot_reads"] += 1
+            return positions if isinstance(positions, list) else []
+        now = time.time()
+        with self._lock:
+            cached = self._positions
+            if (
+                self.enabled
+                and not fresh
+                and cached is not None
+                and now - cached[0] <= self.position_max_age_seconds
+            ):
+                self._metrics["position_hits"] += 1
+                return cached[1]
+            generation = self._generation
+        positions = self.broker.position.get_positions()
+        if not isinstance(positions, list):
+            positions = []
+        with self._lock:
+            self._metrics["position_fetches"] += 1
+            if self._generation != generation:
+                # 拉取期间发生失效：本次结果可能早于该写请求，不写入缓存
+                self._metrics["stale_fetches_dropped"] += 1
+                if self._positions is not None:
+                    return self._positions[1]
+                return positions
+            self._positions = (time.time(), positions)
+            for p in positions:
+                mark = self._to_float(p.get("markPrice"), 0.0)
+                if mark > 0:
+                    self._prices[str(p.get("symbol", "")).upper()] = (time.time(), mark)
+        return positions
+
+    def positions(self, fresh: bool = False) -> List[Dict[str, Any]]:
+        """整账户持仓列表；fresh=True 时实时拉取（结果同时刷新自建快照）"""
+        return self._position_list(fresh=fresh)
+
+    def position(self, symbol: str, side: Optional[str] = None, fresh: bool = False) -> Optional[Dict[str, Any]]:
+        """与 PositionGateway.get_position 相同的匹配语义，数据来自缓存快照"""
+        return self.match_position(self._position_list(fresh=fresh), symbol, side)
+
+    @classmethod
+    def match_position(
+        cls,
+        positions: List[Dict[str, Any]],
+        symbol: str,
+        side: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """side 为空时返回该 symbol 第一条非零持仓；否则按 positionSide 精确匹配"""
+        for p in positions:
+            if p.get("symbol") != symbol:
+                continue
+            if side:
+                if p.get("positionSide", "BOTH") == side.upper():
+                    return p
+            elif abs(cls._to_float(p.get("positionAmt"), 0.0)) > 0:
+                return p
+        return None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            if self._positions is not None:
+                self._metrics["invalidations"] += 1
+            self._positions = None
+
+    def on_write(self, method: str, url: str, params: Dict[str, Any]) -> None:
+        """BinanceBroker 写回调：仅下单类请求使持仓失效"""
+        if str(method).upper() == "POST" and str(url).split("?")[0].endswith(POSITION_CHANGING_PATHS):
+            self.invalidate()
+
+    # --------------------------------------------------------------- prices
+    def observe_price(self, symbol: str, price: float, ts: Optional[float] = None) -> None:
+        if price and float(price) > 0:
+            with self._lock:
+                self._prices[str(symbol).upper()] = (time.time() if ts is None else float(ts), float(price))
+
+    def mark_price(self, symbol: str) -> Optional[float]:
+        key = str(symbol).upper()
+        with self._lock:
+            cached = self._prices.get(key)
+            if self.enabled and cached is not None and time.time() - cached[0] <= self.price_max_age_seconds:
+                self._metrics["price_hits"] += 1
+                return cached[1]
+        try:
+            resp = self.broker.request(
+                "GET",
+                f"{self.broker.MARKET_BASE}/fapi/v1/premiumIndex",
+                params={"symbol": key},
+                allow_error=True,
+            )
+            data = resp.json() if resp is not None else {}
+            price = self._to_float((data or {}).get("markPrice"), 0.0)
+        except Exception:
+            price = 0.0
+        with self._lock:
+            self._metrics["price_fetches"] += 1
+        if price <= 0:
+            return None
+        self.observe_price(key, price)
+        return price
+
+    # -------------------------------------------------------------- latency
+    def mark_decision(self, symbol: str, price: Optional[float] = None, ts: Optional[float] = None) -> None:
+        """决策产生时调用：记录时间戳（用于 决策->提交 延迟），决策价格作为标记价格候选"""
+        now = time.time() if ts is None else float(ts)
+        with self._lock:
+            self._decision_ts[str(symbol).upper()] = now
+        if price:
+            self.observe_price(symbol, float(price), ts=now)
+
+    def record_submit(self, symbol: str, started_at: float) -> None:
+        """下单请求发出前调用"""
+        now = time.time()
+        with self._lock:
+            self._latency["pretrade_ms"].append((now - started_at) * 1000.0)
+            decided_at = self._decision_ts.pop(str(symbol).upper(), None)
+            if decided_at is not None:
+                self._latency["decision_to_submit_ms"].append((now - decided_at) * 1000.0)
+
+    @staticmethod
+    def _summary(samples: Deque[float]) -> Dict[str, Any]:
+        if not samples:
+            return {"count": 0}
+        ordered = sorted(samples)
+        n = len(ordered)
+        return {
+            "count": n,
+            "p50": round(ordered[n // 2], 3),
+            "p95": round(ordered[min(n - 1, int(n * 0.95))], 3),
+            "max": round(ordered[-1], 3),
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._metrics)
+            for name, samples in self._latency.items():
+                stats[name] = self._summary(samples)
+        return stats
+
+
+__all__ = ["PreTradeCache"]
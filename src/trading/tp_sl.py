@@ -6,6 +6,8 @@ from typing import Any, Dict, List, Optional, Literal, Tuple
 import json
 import os
 
+from src.utils.concurrency import map_bounded
+
 Side = Literal["BUY", "SELL"]
 PositionSide = Literal["LONG", "SHORT"]
 
@@ -73,20 +75,31 @@ class PapiTpSlManager:
         for tp_order in self._build_tp_orders(cfg, tp_levels):
             orders.append(tp_order)
 
-        results = []
+        # 数量在下发前统一补齐（刚开仓时仓位可能尚未同步，短暂重试一次即可供所有缺量订单共用）
+        ready: List[Dict[str, Any]] = []
+        fallback_qty: Optional[float] = None
+        fallback_resolved = False
         for order in orders:
             if not order.get("quantity"):
-                # 尝试在短时间内重试获取仓位数量（防止刚开仓时尚未同步）
-                qty = None
-                for _ in range(3):
-                    qty = self._resolve_close_quantity(cfg)
-                    if qty:
-                        order["quantity"] = qty
-                        break
-                    time.sleep(0.2)
+                if not fallback_resolved:
+                    fallback_resolved = True
+                    for _ in range(3):
+                        fallback_qty = self._resolve_close_quantity(cfg)
+                        if fallback_qty:
+                            break
+                        time.sleep(0.2)
+                if fallback_qty:
+                    order["quantity"] = fallback_qty
                 if not order.get("quantity"):
                     print(f"⚠️ TP/SL 未能获取数量，跳过: {order.get('symbol')}")
                     continue
+            ready.append(order)
+
+        # PAPI 条件单没有批量端点：SL 与各档 TP 以有界并发同时下发，结果保持原顺序
+        return map_bounded(self._submit_order, ready)
+
+    def _submit_order(self, order: Dict[str, Any]) -> Dict[str, Any]:
+        try:
             resp = self.broker.request(
                 "POST",
                 self._order_endpoint(),
@@ -94,13 +107,12 @@ class PapiTpSlManager:
                 signed=True,
                 allow_error=True,
             )
-            try:
-                data = resp.json()
-            except Exception:
-                data = {"status_code": resp.status_code, "text": resp.text}
-            results.append(data)
-
-        return results
+        except Exception as e:
+            return {"code": -1, "msg": f"request exception: {e}", "symbol": order.get("symbol")}
+        try:
+            return resp.json()
+        except Exception:
+            return {"status_code": resp.status_code, "text": resp.text}
 
     def _resolve_prices(self, cfg: TpSlConfig) -> Tuple[Optional[float], Optional[float]]:
         entry = cfg.entry_price
@@ -0,0 +1,40 @@
+"""
+并发工具
+用于下单/撤单等 I/O 密集型调用的有界并发
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# 保护单并发度上限（交易所对单账户下单频率有限制，不宜过大）
+DEFAULT_ORDER_CONCURRENCY = 4
+
+
+def order_concurrency(default: int = DEFAULT_ORDER_CONCURRENCY) -> int:
+    """保护单并发度，可通过环境变量 BINANCE_ORDER_CONCURRENCY 覆盖（1 表示串行）"""
+    try:
+        return max(1, int(os.getenv("BINANCE_ORDER_CONCURRENCY", default)))
+    except (TypeError, ValueError):
+        return max(1, int(default))
+
+
+def map_bounded(fn: Callable[[T], R], items: Sequence[T], max_workers: Optional[int] = None) -> List[R]:
+    """
+    以有界并发执行 fn(item)，结果按输入顺序返回
+
+    单个任务或并发度为 1 时在当前线程串行执行；fn 内部的异常会原样抛出，
+    需要逐项容错的调用方应在 fn 内部自行捕获。
+    """
+    items = list(items)
+    workers = min(len(items), max_workers if max_workers is not None else order_concurrency())
+    if workers <= 1:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="order-io") as pool:
+        return list(pool.map(fn, items))
+
+
+__all__ = ["DEFAULT_ORDER_CONCURRENCY", "map_bounded", "order_concurrency"]
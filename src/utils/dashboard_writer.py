@@ -0,0 +1,308 @@
+"""
+增量看板写入器 (Incremental Dashboard Writer)
+
+交易线程每个周期只做一次载荷比较 + 入队，文件 IO 全部在后台线程完成:
+1. 载荷去掉时间戳后与上次发布的内容比较，无实质变化（且无事件）时整体跳过
+2. JSON：只保留最新一份，原子替换写入
+3. CSV 历史：按行 key（交易对）与上一次写入的行比较，只追加发生变化的行；事件行总是追加。
+   表头校验/旧文件备份只在首次写入时做一次；可选镜像文件（如按时段命名的快照）同步追加，
+   镜像路径变化时整体复制一次
+4. HTML：由模板渲染，后台按独立的最小间隔限流，只渲染最新载荷
+
+环境变量:
+    DCA_DASHBOARD_HTML_INTERVAL_SECONDS=10.0    HTML 渲染最小间隔（秒）
+"""
+
+import csv
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from src.utils.state_writer import write_json_atomic
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class DashboardWriter:
+    """看板 JSON / CSV / HTML 的增量后台写入"""
+
+    def __init__(
+        self,
+        json_path: str,
+        csv_path: str,
+        csv_header: Sequence[str],
+        html_path: Optional[str] = None,
+        render_html: Optional[Callable[[Dict[str, Any]], str]] = None,
+        csv_mirror_path: Optional[Callable[[], Optional[str]]] = None,
+        html_min_interval_seconds: Optional[float] = None,
+        volatile_keys: Sequence[str] = ("timestamp",),
+        row_key_index: int = 4,
+        row_ignore_indexes: Sequence[int] = (0,),
+        max_retries: int = 5,
+        background: bool = True,
+    ):
+        """
+        Args:
+            json_path / csv_path / html_path: 输出文件
+            csv_header: CSV 表头（已有文件表头不同则备份为 .legacy.* 后重建）
+            render_html: 载荷 -> HTML 文本
+            csv_mirror_path: 返回 CSV 镜像文件路径（None 表示不镜像）
+            html_min_interval_seconds: HTML 渲染最小间隔
+            volatile_keys: 比较载荷时忽略的键
+            row_key_index: CSV 行 key 所在列（同 key 的行与上次写入比较）
+            row_ignore_indexes: 比较 CSV 行时忽略的列（如时间戳）
+            max_retries: 单批 CSV 写入失败重试次数，用尽后写入 .err.* 备份
+            background: False 时在调用线程同步写入（测试 / 无线程环境）
+        """
+        self.json_path = json_path
+        self.csv_path = csv_path
+        self.csv_header = list(csv_header)
+        self.html_path = html_path
+        self.render_html = render_html
+        self.csv_mirror_path = csv_mirror_path
+        self.html_min_interval_seconds = max(
+            0.0,
+            _env_float("DCA_DASHBOARD_HTML_INTERVAL_SECONDS", 10.0)
+            if html_min_interval_seconds is None
+            else float(html_min_interval_seconds),
+        )
+        self.volatile_keys = tuple(volatile_keys)
+        self.row_key_index = int(row_key_index)
+        self.row_ignore_indexes = frozenset(int(i) for i in row_ignore_indexes)
+        self.max_retries = max(1, int(max_retries))
+        self.background = bool(background)
+
+        self._cond = threading.Condition()
+        self._last_material: Optional[Dict[str, Any]] = None
+        self._last_row_sig: Dict[Any, tuple] = {}
+        self._pending_json: Optional[Dict[str, Any]] = None
+        self._pending_html: Optional[Dict[str, Any]] = None
+        self._pending_rows: List[List[Any]] = []
+        self._busy = False
+        self._last_html_at = 0.0
+        self._header_checked = False
+        self._mirror_current: Optional[str] = None
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._metrics: Dict[str, int] = {
+            "published": 0,
+            "skipped_unchanged": 0,
+            "rows_appended": 0,
+            "rows_skipped": 0,
+            "json_writes": 0,
+            "html_renders": 0,
+            "errors": 0,
+        }
+
+    # ------------------------------------------------------------ producer
+    def publish(self, payload: Dict[str, Any], rows: Sequence[Sequence[Any]], has_event: bool = False) -> bool:
+        """交易线程调用：比较后入队；返回是否有内容需要写出"""
+        material = {k: v for k, v in payload.items() if k not in self.volatile_keys}
+        with self._cond:
+            if not has_event and material == self._last_material:
+                self._metrics["skipped_unchanged"] += 1
+                return False
+            self._last_material = material
+            new_rows = []
+            for row in rows:
+                row = list(row)
+                key = row[self.row_key_index] if len(row) > self.row_key_index else None
+                sig = tuple(v for i, v in enumerate(row) if i not in self.row_ignore_indexes)
+                if not has_event and self._last_row_sig.get(key) == sig:
+                    self._metrics["rows_skipped"] += 1
+                    continue
+                self._last_row_sig[key] = sig
+                new_rows.append(row)
+            self._pending_json = payload
+            self._pending_html = payload
+            self._pending_rows.extend(new_rows)
+            self._metrics["published"] += 1
+            self._cond.notify()
+        if not self.background:
+            self.flush()
+        else:
+            self._ensure_worker()
+        return True
+
+    # ------------------------------------------------------------- control
+    def flush(self, timeout: float = 10.0) -> bool:
+        """同步写出所有待写内容（HTML 不受限流）；关闭前调用"""
+        if self.background and self._thread is not None and self._thread.is_alive():
+            deadline = time.monotonic() + timeout
+            with self._cond:
+                self._last_html_at = 0.0
+                self._cond.notify()
+                while (self._has_work(force_html=True) or self._busy) and time.monotonic() < deadline:
+                    self._cond.wait(0.05)
+                    self._last_html_at = 0.0
+                    self._cond.notify()
+                return not (self._has_work(force_html=True) or self._busy)
+        self._drain(force_html=True)
+        return True
+
+    def close(self, timeout: float = 10.0) -> None:
+        self.flush(timeout=timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=timeout)
+        self._thread = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats: Dict[str, Any] = dict(self._metrics)
+            stats["pending_rows"] = len(self._pending_rows)
+        return stats
+
+    # ------------------------------------------------------------- worker
+    def _ensure_worker(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="dashboard-writer", daemon=True)
+        self._thread.start()
+
+    def _html_due(self, force: bool = False) -> bool:
+        if self._pending_html is None or self.html_path is None or self.render_html is None:
+            return False
+        return force or time.monotonic() - self._last_html_at >= self.html_min_interval_seconds
+
+    def _has_work(self, force_html: bool = False) -> bool:
+        return bool(self._pending_rows) or self._pending_json is not None or self._html_due(force_html)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed and not self._has_work():
+                    wait = None
+                    if self._pending_html is not None:
+                        wait = max(0.01, self.html_min_interval_seconds - (time.monotonic() - self._last_html_at))
+                    self._cond.wait(wait)
+                if self._closed and not self._has_work():
+                    return
+            self._drain()
+
+    def _drain(self, force_html: bool = False) -> None:
+        with self._cond:
+            self._busy = True
+            json_payload, self._pending_json = self._pending_json, None
+            rows, self._pending_rows = self._pending_rows, []
+            html_payload = None
+            if self._html_due(force_html):
+                html_payload, self._pending_html = self._pending_html, None
+                self._last_html_at = time.monotonic()
+        try:
+            if json_payload is not None:
+                self._write_json(json_payload)
+            if rows:
+                self._append_rows(rows)
+            if html_payload is not None:
+                self._write_html(html_payload)
+        finally:
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+    def _write_json(self, payload: Dict[str, Any]) -> None:
+        try:
+            write_json_atomic(self.json_path, payload, indent=2)
+            self._metrics["json_writes"] += 1
+        except Exception as e:
+            self._metrics["errors"] += 1
+            print(f"⚠️ 看板 JSON 写入失败: {e}")
+
+    def _check_header(self) -> bool:
+        """首次写入时校验表头；返回文件是否可直接追加"""
+        if not os.path.exists(self.csv_path):
+            return False
+        if self._header_checked:
+            return True
+        self._header_checked = True
+        try:
+            with open(self.csv_path, "r", newline="", encoding="utf-8") as rf:
+                first_row = next(csv.reader(rf), None)
+        except Exception:
+            return True
+        if first_row == self.csv_header:
+            return True
+        legacy_path = self.csv_path + ".legacy.%s" % datetime.now().strftime("%Y%m%dT%H%M%S")
+        shutil.move(self.csv_path, legacy_path)
+        print(f"ℹ️ 看板 CSV 表头已升级，旧文件已备份: {legacy_path}")
+        return False
+
+    @staticmethod
+    def _append(path: str, rows: List[List[Any]], header: Optional[List[str]] = None) -> None:
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if header is not None:
+                writer.writerow(header)
+            writer.writerows(rows)
+
+    def _append_rows(self, rows: List[List[Any]]) -> None:
+        backoff = 0.5
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.csv_path)), exist_ok=True)
+                if self._check_header():
+                    self._append(self.csv_path, rows)
+                else:
+                    self._append(self.csv_path, rows, header=self.csv_header)
+                self._metrics["rows_appended"] += len(rows)
+                self._sync_mirror(rows)
+                return
+            except Exception as e:
+                self._metrics["errors"] += 1
+                print(f"⚠️ 看板 CSV 写入异常（第{attempt}次）：{e}")
+                if attempt < self.max_retries:
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, 5.0)
+        # 最后回退：保存到错误文件以免数据丢失
+        try:
+            err_path = self.csv_path + ".err.%s" % datetime.now().strftime("%Y%m%dT%H%M%S")
+            self._append(err_path, rows, header=self.csv_header)
+            print(f"❌ 看板 CSV 写入失败，已保存到备份: {err_path}")
+        except Exception as e:
+            print(f"❌ 无法保存看板 CSV 备份: {e}")
+
+    def _sync_mirror(self, rows: List[List[Any]]) -> None:
+        if self.csv_mirror_path is None:
+            return
+        try:
+            mirror = self.csv_mirror_path()
+            if not mirror:
+                return
+            if mirror != self._mirror_current or not os.path.exists(mirror):
+                shutil.copyfile(self.csv_path, mirror)
+                self._mirror_current = mirror
+            else:
+                self._append(mirror, rows)
+        except Exception as e:
+            self._mirror_current = None
+            print(f"⚠️ 看板 CSV 快照写入失败: {e}")
+
+    def _write_html(self, payload: Dict[str, Any]) -> None:
+        if self.html_path is None or self.render_html is None:
+            return
+        try:
+            html = self.render_html(payload)
+            tmp = f"{self.html_path}.tmp.{os.getpid()}"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(html)
+            os.replace(tmp, self.html_path)
+            self._metrics["html_renders"] += 1
+        except Exception as e:
+            self._metrics["errors"] += 1
+            print(f"⚠️ 看板 HTML 写入失败: {e}")
+
+
+__all__ = ["DashboardWriter"]
@@ -0,0 +1,351 @@
+"""
+周期耗时剖析 (Cycle Profiler)
+
+用于定位一轮交易周期的时间花在哪里:
+1. span(name): 上下文管理器，记录分段墙钟耗时与调用次数
+2. profiled(name): 装饰器版本，未启用时直接透传（几乎零开销）
+3. record_rest(headers): 按调用方 span 归集 REST 调用次数与 request weight（跳过 rest.* 传输层 span）
+4. begin_cycle/end_cycle: 每轮输出一行 JSONL（按大小轮转）
+5. 按需 cProfile: 调用 request_cprofile() 或创建触发文件，仅剖析下一轮
+"""
+
+from __future__ import annotations
+
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+
+class _NullSpan:
+    """未启用时返回的空上下文管理器（单例，避免每次分配对象）"""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> bool:
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("_profiler", "_name", "_start")
+
+    def __init__(self, profiler: "CycleProfiler", name: str) -> None:
+        self._profiler = profiler
+        self._name = name
+        self._start = 0.0
+
+    def __enter__(self) -> "_Span":
+        self._profiler._push(self._name)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> bool:
+        elapsed = time.perf_counter() - self._start
+        self._profiler._pop(self._name, elapsed)
+        return False
+
+
+class CycleProfiler:
+    """
+    每轮分段计时器
+
+    phases 中的耗时为“包含式”统计：嵌套 span 的时间同时计入外层与内层。
+    REST 调用按线程内最近的业务 span 归集：rest.* 传输层 span（如 BinanceBroker.request）
+    只记耗时，不截留调用次数与 weight；不在任何业务 span 内的调用归入 "_unscoped"。
+    """
+
+    WEIGHT_HEADER = "X-MBX-USED-WEIGHT-1M"
+    TRANSPORT_SPAN_PREFIX = "rest."
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        output_dir: Optional[str] = None,
+        file_name: str = "cycle_profile.jsonl",
+        max_bytes: int = 5 * 1024 * 1024,
+        backup_count: int = 5,
+        cprofile_trigger_file: str = "PROFILE_NEXT_CYCLE",
+    ) -> None:
+        self.enabled = bool(enabled)
+        self.output_dir = output_dir
+        self.file_name = file_name
+        self.max_bytes = max(0, int(max_bytes))
+        self.backup_count = max(0, int(backup_count))
+        self.cprofile_trigger_file = cprofile_trigger_file
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._cycle_id = 0
+        self._cycle_label = ""
+        self._cycle_start: Optional[float] = None
+        self._phases: Dict[str, Dict[str, float]] = {}
+        self._rest_calls = 0
+        self._rest_weight = 0
+        self._last_used_weight: Optional[int] = None
+        self._cprofile_requested = False
+        self._cprofile: Optional[cProfile.Profile] = None
+
+    # ------------------------------------------------------------------ config
+    def configure(self, config: Optional[Dict[str, Any]], default_dir: Optional[str] = None) -> None:
+        """从配置 profiling 段更新参数（热更新时可重复调用）"""
+        cfg = config if isinstance(config, dict) else {}
+        self.enabled = bool(cfg.get("enabled", False))
+        out_dir = cfg.get("dir") or default_dir
+        if isinstance(out_dir, str) and out_dir.strip():
+            self.output_dir = out_dir
+        self.file_name = str(cfg.get("file_name") or self.file_name)
+        try:
+            self.max_bytes = max(0, int(cfg.get("max_bytes", self.max_bytes)))
+            self.backup_count = max(0, int(cfg.get("backup_count", self.backup_count)))
+        except (TypeError, ValueError):
+            pass
+        trigger = cfg.get("cprofile_trigger_file")
+        if isinstance(trigger, str) and trigger.strip():
+            self.cprofile_trigger_file = trigger
+        if bool(cfg.get("cprofile_next_cycle", False)):
+            self._cprofile_requested = True
+
+    # ------------------------------------------------------------------- spans
+    def span(self, name: str) -> Any:
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def _stack(self) -> List[str]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = []
+            self._local.stack = stack
+        return stack
+
+    def _push(self, name: str) -> None:
+        self._stack().append(name)
+
+    def _pop(self, name: str, elapsed: float) -> None:
+        stack = self._stack()
+        if stack:
+            stack.pop()
+        with self._lock:
+            phase = self._phase(name)
+            phase["wall_ms"] += elapsed * 1000.0
+            phase["calls"] += 1
+
+    def _phase(self, name: str) -> Dict[str, float]:
+        phase = self._phases.get(name)
+        if phase is None:
+            phase = {"wall_ms": 0.0, "calls": 0, "rest_calls": 0, "rest_weight": 0}
+            self._phases[name] = phase
+        return phase
+
+    def current_span(self) -> str:
+        stack = self._stack()
+        return stack[-1] if stack else "_unscoped"
+
+    def caller_span(self) -> str:
+        """最内层的非传输层 span（REST 调用归集到发起请求的业务阶段）"""
+        for name in reversed(self._stack()):
+            if not name.startswith(self.TRANSPORT_SPAN_PREFIX):
+                return name
+        return "_unscoped"
+
+    # -------------------------------------------------------------------- REST
+    def record_rest(self, headers: Any = None) -> None:
+        """
+        记录一次 REST 调用。
+
+        Binance 仅返回窗口内累计的 X-MBX-USED-WEIGHT-1M，这里用相邻两次的差值
+        近似单次请求 weight；窗口翻转（值变小）时以新值计。
+        """
+        if not self.enabled:
+            return
+        used: Optional[int] = None
+        try:
+            raw = headers.get(self.WEIGHT_HEADER) if headers is not None else None
+            if raw is not None:
+                used = int(raw)
+        except Exception:
+            used = None
+        scope = self.caller_span()
+        with self._lock:
+            delta = 0
+            if used is not None:
+                last = self._last_used_weight
+                if last is None:
+                    delta = 0
+                elif used >= last:
+                    delta = used - last
+                else:
+                    delta = used
+                self._last_used_weight = used
+            self._rest_calls += 1
+            self._rest_weight += delta
+            phase = self._phase(scope)
+            phase["rest_calls"] += 1
+            phase["rest_weight"] += delta
+
+    # ------------------------------------------------------------------ cycles
+    def request_cprofile(self) -> None:
+        """请求对下一轮执行 cProfile 采样"""
+        self._cprofile_requested = True
+
+    def _consume_cprofile_trigger(self) -> bool:
+        if self._cprofile_requested:
+            self._cprofile_requested = False
+            return True
+        if not self.output_dir or not self.cprofile_trigger_file:
+            return False
+        trigger_path = os.path.join(self.output_dir, self.cprofile_trigger_file)
+        if not os.path.exists(trigger_path):
+            return False
+        try:
+            os.remove(trigger_path)
+        except Exception:
+            pass
+        return True
+
+    def begin_cycle(self, label: str = "") -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._cycle_id += 1
+            self._cycle_label = str(label or "")
+            self._cycle_start = time.perf_counter()
+            self._phases = {}
+            self._rest_calls = 0
+            self._rest_weight = 0
+        if self._consume_cprofile_trigger():
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def end_cycle(self, extra: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """结束本轮并落盘，返回本轮汇总（未启用或未 begin 时返回 None）"""
+        if not self.enabled or self._cycle_start is None:
+            return None
+        cprofile_path: Optional[str] = None
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            cprofile_path = self._dump_cprofile(self._cprofile)
+            self._cprofile = None
+        with self._lock:
+            wall_ms = (time.perf_counter() - self._cycle_start) * 1000.0
+            phases = {
+                name: {
+                    "wall_ms": round(float(p["wall_ms"]), 3),
+                    "calls": int(p["calls"]),
+                    "rest_calls": int(p["rest_calls"]),
+                    "rest_weight": int(p["rest_weight"]),
+                }
+                for name, p in sorted(self._phases.items(), key=lambda kv: -kv[1]["wall_ms"])
+            }
+            record: Dict[str, Any] = {
+                "ts": datetime.now(timezone.utc).isoformat(),
+                "cycle": self._cycle_id,
+                "label": self._cycle_label,
+                "wall_ms": round(wall_ms, 3),
+                "rest_calls": self._rest_calls,
+                "rest_weight": self._rest_weight,
+                "used_weight_1m": self._last_used_weight,
+                "phases": phases,
+            }
+            if cprofile_path:
+                record["cprofile"] = cprofile_path
+            if extra:
+                record.update(extra)
+            self._cycle_start = None
+        self._write_record(record)
+        return record
+
+    def _dump_cprofile(self, prof: cProfile.Profile) -> Optional[str]:
+        if not self.output_dir:
+            return None
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+            path = os.path.join(self.output_dir, f"cycle_{self._cycle_id}_{stamp}.prof")
+            prof.dump_stats(path)
+            return path
+        except Exception as e:
+            print(f"⚠️ cProfile 落盘失败: {e}")
+            return None
+
+    # -------------------------------------------------------------- JSONL sink
+    def output_path(self) -> Optional[str]:
+        if not self.output_dir:
+            return None
+        return os.path.join(self.output_dir, self.file_name)
+
+    def _rotate_if_needed(self, path: str) -> None:
+        if self.max_bytes <= 0:
+            return
+        try:
+            if os.path.getsize(path) < self.max_bytes:
+                return
+        except OSError:
+            return
+        if self.backup_count <= 0:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return
+        for idx in range(self.backup_count - 1, 0, -1):
+            src = f"{path}.{idx}"
+            if os.path.exists(src):
+                os.replace(src, f"{path}.{idx + 1}")
+        os.replace(path, f"{path}.1")
+
+    def _write_record(self, record: Dict[str, Any]) -> None:
+        path = self.output_path()
+        if not path:
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._rotate_if_needed(path)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        except Exception as e:
+            print(f"⚠️ 周期剖析日志写入失败: {e}")
+
+
+_PROFILER = CycleProfiler()
+
+
+def get_profiler() -> CycleProfiler:
+    """进程级共享的 profiler（broker / AI 服务 / 执行器共用同一实例）"""
+    return _PROFILER
+
+
+def span(name: str) -> Any:
+    return _PROFILER.span(name)
+
+
+def profiled(name: str) -> Callable[[Callable], Callable]:
+    """
+    分段计时装饰器
+
+    Usage:
+        @profiled("positions_snapshot")
+        def _position_snapshot_by_symbol(self, symbols): ...
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs) -> Any:
+            prof = _PROFILER
+            if not prof.enabled:
+                return func(*args, **kwargs)
+            with _Span(prof, name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
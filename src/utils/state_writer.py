@@ -0,0 +1,136 @@
+"""
+合并写盘的状态持久化 (Debounced State Writer)
+
+交易循环中状态变更很频繁，逐次全量重写 JSON 会带来大量同步磁盘 IO:
+1. mark_dirty() 只打脏标记，不写盘；同一周期内多次变更合并为一次写入
+2. maybe_flush()：脏数据超过去抖时间才写盘；周期边界调用 flush() 至多写一次
+3. 成交/平仓等关键变更调用 flush(force=True) 立即落盘；关闭时 close() 落盘
+4. 写入走临时文件 + fsync + os.replace，进程崩溃时文件要么是旧版本要么是新版本，不会半截
+
+环境变量:
+    DCA_STATE_DEBOUNCE_SECONDS=5.0    非关键变更的最长合并时间（秒）
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def write_json_atomic(path: str, payload: Any, indent: Optional[int] = None) -> int:
+    """原子写 JSON：同目录临时文件 -> fsync -> os.replace；返回写入字节数"""
+    data = json.dumps(payload, ensure_ascii=False, indent=indent, separators=None if indent else (",", ":"))
+    raw = data.encode("utf-8")
+    tmp = f"{path}.tmp.{os.getpid()}"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return len(raw)
+
+
+class DebouncedStateWriter:
+    """脏标记合并 + 去抖 + 原子替换的 JSON 状态写入器"""
+
+    def __init__(
+        self,
+        path: str,
+        snapshot: Callable[[], Dict[str, Any]],
+        debounce_seconds: Optional[float] = None,
+        indent: Optional[int] = None,
+    ):
+        """
+        Args:
+            path: 状态文件路径
+            snapshot: 在调用线程中构建待写入的 payload（写盘时才调用）
+            debounce_seconds: 非关键变更的最长合并时间
+            indent: JSON 缩进（None 为紧凑格式）
+        """
+        self.path = path
+        self.snapshot = snapshot
+        self.debounce_seconds = max(
+            0.0,
+            _env_float("DCA_STATE_DEBOUNCE_SECONDS", 5.0) if debounce_seconds is None else float(debounce_seconds),
+        )
+        self.indent = indent
+        self._lock = threading.Lock()
+        self._dirty_since: Optional[float] = None
+        self._dir_ready = False
+        self._metrics: Dict[str, Any] = {
+            "marks": 0,
+            "writes": 0,
+            "forced_writes": 0,
+            "errors": 0,
+            "bytes": 0,
+            "last_write_ms": None,
+        }
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty_since is not None
+
+    def mark_dirty(self) -> None:
+        with self._lock:
+            self._metrics["marks"] += 1
+            if self._dirty_since is None:
+                self._dirty_since = time.monotonic()
+
+    def maybe_flush(self) -> bool:
+        """脏数据已超过去抖时间则写盘"""
+        dirty_since = self._dirty_since
+        if dirty_since is None or time.monotonic() - dirty_since < self.debounce_seconds:
+            return False
+        return self.flush()
+
+    def flush(self, force: bool = False) -> bool:
+        """有脏数据（或 force）时立即写盘；返回是否写入"""
+        with self._lock:
+            if self._dirty_since is None and not force:
+                return False
+            started = time.perf_counter()
+            try:
+                payload = self.snapshot()
+                if not self._dir_ready:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                    self._dir_ready = True
+                written = write_json_atomic(self.path, payload, indent=self.indent)
+            except Exception as e:
+                # 保留脏标记，下次 flush 重试
+                self._metrics["errors"] += 1
+                print(f"⚠️ 状态保存失败({os.path.basename(self.path)}): {e}")
+                return False
+            self._dirty_since = None
+            self._metrics["writes"] += 1
+            if force:
+                self._metrics["forced_writes"] += 1
+            self._metrics["bytes"] = written
+            self._metrics["last_write_ms"] = round((time.perf_counter() - started) * 1000.0, 3)
+            return True
+
+    def close(self) -> None:
+        self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._metrics)
+            stats["dirty"] = self._dirty_since is not None
+        return stats
+
+
+__all__ = ["DebouncedStateWriter", "write_json_atomic"]
@@ -0,0 +1,111 @@
+from src.data.account_snapshot import AccountSnapshotService
+from src.data.position_data import PositionDataManager
+
+
+class _FakeBroker:
+    def __init__(self):
+        self.listeners = []
+
+    def add_write_listener(self, listener):
+        self.listeners.append(listener)
+
+    def write(self, params):
+        for listener in self.listeners:
+            listener("POST", "https://fapi.binance.com/fapi/v1/order", params)
+
+
+class _FakeClient:
+    def __init__(self):
+        self.broker = _FakeBroker()
+        self.calls = {"positions": 0, "open_orders": [], "conditional": []}
+        self.positions = [
+            {"symbol": "BTCUSDT", "positionAmt": "0.01", "positionSide": "LONG", "entryPrice": "100", "markPrice": "101", "leverage": "5"},
+            {"symbol": "ETHUSDT", "positionAmt": "-1", "positionSide": "SHORT", "entryPrice": "10", "markPrice": "9", "leverage": "5"},
+            {"symbol": "SOLUSDT", "positionAmt": "0", "positionSide": "LONG"},
+        ]
+        self.orders = [
+            {"symbol": "BTCUSDT", "orderId": 1, "type": "LIMIT", "status": "NEW"},
+            {"symbol": "ETHUSDT", "orderId": 2, "type": "STOP_MARKET", "status": "NEW"},
+        ]
+
+    def get_all_positions(self):
+        self.calls["positions"] += 1
+        return [dict(p) for p in self.positions]
+
+    def get_open_orders(self, symbol=None):
+        self.calls["open_orders"].append(symbol)
+        return [dict(o) for o in self.orders if symbol is None or o["symbol"] == symbol]
+
+    def get_open_conditional_orders(self, symbol=None):
+        self.calls["conditional"].append(symbol)
+        return []
+
+
+def test_cycle_reads_share_one_fetch_per_kind():
+    client = _FakeClient()
+    snap = AccountSnapshotService(client)
+    data = PositionDataManager(client, snapshot=snap)
+    snap.begin_cycle()
+    for symbol in ("BTCUSDT", "ETHUSDT", "SOLUSDT", "BNBUSDT"):
+        data.get_current_position(symbol)
+        snap.open_orders(symbol)
+        snap.conditional_orders(symbol)
+    assert set(data.get_all_positions()) == {"BTCUSDT", "ETHUSDT"}
+
+    assert client.calls["positions"] == 1
+    assert client.calls["open_orders"] == [None]
+    assert client.calls["conditional"] == [None]
+    assert [o["orderId"] for o in snap.open_orders("ETHUSDT")] == [2]
+    assert [p["symbol"] for p in snap.positions_for("ETHUSDT", "SHORT")] == ["ETHUSDT"]
+    assert snap.positions_for("ETHUSDT", "LONG") == []
+    snap.end_cycle()
+
+
+def test_write_invalidates_positions_and_patches_symbol_orders():
+    client = _FakeClient()
+    snap = AccountSnapshotService(client)
+    snap.begin_cycle()
+    snap.positions()
+    snap.open_orders("BTCUSDT")
+
+    client.orders.append({"symbol": "BTCUSDT", "orderId": 3, "type": "LIMIT", "status": "NEW"})
+    client.positions[0]["positionAmt"] = "0.02"
+    client.broker.write({"symbol": "BTCUSDT"})
+
+    assert [o["orderId"] for o in snap.open_orders("BTCUSDT")] == [1, 3]
+    assert [o["orderId"] for o in snap.open_orders("ETHUSDT")] == [2]
+    assert client.calls["open_orders"] == [None, "BTCUSDT"]
+    assert snap.positions_for("BTCUSDT")[0]["positionAmt"] == "0.02"
+    assert client.calls["positions"] == 2
+    assert snap.get_stats()["symbol_fetches"] == 1
+
+
+def test_outside_cycle_reads_pass_through():
+    client = _FakeClient()
+    snap = AccountSnapshotService(client)
+    snap.positions()
+    snap.positions()
+    assert client.calls["positions"] == 2
+
+    snap.begin_cycle()
+    snap.positions()
+    snap.positions()
+    assert client.calls["positions"] == 3
+
+
+def test_nested_cycle_reuses_outer_snapshot():
+    client = _FakeClient()
+    snap = AccountSnapshotService(client)
+    # 调度循环外层：持仓判断；run_cycle 内层不清空快照
+    snap.begin_cycle()
+    snap.positions()
+    snap.begin_cycle()
+    snap.positions()
+    snap.end_cycle()
+    assert snap.get_stats()["in_cycle"]
+    snap.positions()
+    snap.end_cycle()
+    assert client.calls["positions"] == 1
+    assert not snap.get_stats()["in_cycle"]
+    snap.positions()
+    assert client.calls["positions"] == 2
@@ -0,0 +1,190 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.fund_flow.deepseek_weight_router import DeepSeekWeightRouter
+
+WEIGHTS = {
+    "cvd": 0.2, "cvd_momentum": 0.1, "oi_delta": 0.2, "funding": 0.1,
+    "depth_ratio": 0.1, "imbalance": 0.1, "liquidity_delta": 0.1, "micro_delta": 0.1,
+}
+
+
+class _StubChatCompletions:
+    """本地 chat-completions 端点桩：每次请求延迟 delay 秒后返回 confidence，记录并发峰值"""
+
+    def __init__(self, delay=0.0, confidence=0.8):
+        self.delay = delay
+        self.confidence = confidence
+        self.requests = []
+        self.inflight = 0
+        self.max_inflight = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):  # noqa: N802
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub.lock:
+                    stub.requests.append((self.headers.get("Authorization"), body))
+                    stub.inflight += 1
+                    stub.max_inflight = max(stub.max_inflight, stub.inflight)
+                    delay, confidence = stub.delay, stub.confidence
+                time.sleep(delay)
+                content = json.dumps({"weights": WEIGHTS, "confidence": confidence, "fallback_used": False})
+                payload = json.dumps({"choices": [{"message": {"content": content}}]}).encode("utf-8")
+                with stub.lock:
+                    stub.inflight -= 1
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                return
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.api_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1/chat/completions"
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    monkeypatch.delenv("DEEPSEEK_API_KEY", raising=False)
+    server = _StubChatCompletions()
+    yield server
+    server.server.shutdown()
+
+
+def _router(stub, **prefetch):
+    return DeepSeekWeightRouter(
+        {
+            "deepseek_weight_router": {
+                "enabled": True,
+                "ai_enabled": True,
+                "prefetch": {"enabled": True, "max_workers": 4, **prefetch},
+            },
+            "deepseek_ai": {"enabled": True, "api_key": "test-key", "api_url": stub.api_url, "timeout": 5, "max_retries": 1},
+        }
+    )
+
+
+def _context():
+    history = [{"cvd": i * 0.1, "oi_delta": -i * 0.1} for i in range(8)]
+    return {"cvd_ratio": 0.3, "oi_delta_ratio": 0.1, "timeframes": {"15m": {"history": history, "adx": 30.0}, "5m": {}, "3m": {}}}
+
+
+def test_prefetch_runs_symbols_concurrently(stub):
+    stub.delay = 0.2
+    router = _router(stub)
+    symbols = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "BNBUSDT"]
+    started = time.perf_counter()
+    assert router.prefetch_weights([{"symbol": s, "regime": "TREND", "market_flow_context": _context()} for s in symbols]) == 4
+    results = [router.scheduler.resolve(s, "TREND", _context(), deadline_seconds=3.0) for s in symbols]
+    elapsed = time.perf_counter() - started
+
+    assert all(r is not None and r.freshness == "fresh" and r.reason == "ai_weight_router" for r in results)
+    assert elapsed < 0.2 * len(symbols) * 0.75
+    assert len(stub.requests) == len(symbols) and stub.max_inflight >= 2
+    assert all(auth == "Bearer test-key" for auth, _ in stub.requests)
+    router.shutdown()
+
+
+def test_resolve_serves_stale_on_deadline_and_refreshes_in_background(stub):
+    router = _router(stub, decision_deadline_seconds=0.05)
+    first = router.scheduler.resolve("BTCUSDT", "RANGE", _context(), deadline_seconds=3.0)
+    assert first.freshness == "fresh" and first.confidence == 0.8
+
+    # 服务端缓存清空后端点变慢：截止时间内未返回，沿用上一次有效权重
+    router._get_ai_service().clear_cache()
+    stub.delay, stub.confidence = 0.3, 0.3
+    second = router.scheduler.resolve("BTCUSDT", "RANGE", _context())
+    assert second.freshness == "stale"
+    assert second.timestamp == first.timestamp
+    assert router.scheduler.get_stats()["stale_served"] == 1
+
+    time.sleep(0.5)
+    third = router.scheduler.resolve("BTCUSDT", "RANGE", _context())
+    assert third.freshness == "fresh"
+    assert third.confidence == 0.3
+    assert len(stub.requests) == 2
+    router.shutdown()
+
+
+def test_router_picks_up_ai_weights_after_local_fallback(stub):
+    stub.delay = 0.1
+    router = _router(stub, decision_deadline_seconds=0.0, max_stale_seconds=60)
+
+    miss = router.get_weights("BTCUSDT", "TREND", _context())
+    assert miss.reason != "ai_weight_router"
+    time.sleep(0.4)
+    picked_up = router.get_weights("BTCUSDT", "TREND", _context())
+    assert picked_up.reason == "ai_weight_router" and picked_up.confidence == 0.8
+    assert router.get_stats()["prefetch"]["submitted"] >= 1
+    assert len(stub.requests) == 1
+    router.shutdown()
+
+
+def test_ready_results_respect_max_stale_and_refresh_ahead_origin():
+    from src.fund_flow.ai_weight_scheduler import AIWeightScheduler
+    from src.fund_flow.deepseek_weight_router import WeightMap
+
+    calls = []
+
+    def fetch(**kwargs):
+        calls.append(kwargs["market_flow_context"])
+        return WeightMap(confidence=0.7, reason="ai_weight_router")
+
+    scheduler = AIWeightScheduler(fetch, {"enabled": True, "max_stale_seconds": 60})
+    scheduler.submit("BTCUSDT", "TREND", {"cycle": 1}).result()
+    time.sleep(0.05)
+
+    # 后台完成超过 max_stale_seconds：丢弃并按当前上下文重新请求
+    key = scheduler._key("BTCUSDT", "TREND", "generic")
+    result, completed_at, origin = scheduler._ready[key]
+    scheduler._ready[key] = (result, completed_at - 120, origin)
+    fresh = scheduler.resolve("BTCUSDT", "TREND", {"cycle": 2}, deadline_seconds=2.0)
+    assert fresh.freshness == "fresh" and calls[-1] == {"cycle": 2}
+    assert scheduler.get_stats()["ready_expired"] == 1
+
+    # refresh_ahead 沿用上一次决策的上下文：结果按 stale 消费
+    assert scheduler.refresh_known(["BTCUSDT"]) == 1
+    time.sleep(0.1)
+    served = scheduler.resolve("BTCUSDT", "TREND", {"cycle": 3})
+    assert served.freshness == "stale" and calls[-1] == {"cycle": 2}
+    assert scheduler.get_stats()["stale_served"] == 1
+    scheduler.shutdown()
+
+
+def test_cycle_prefetch_builds_contexts_once_for_position_review():
+    from types import SimpleNamespace
+
+    from src.app.fund_flow_bot import TradingBot
+
+    prefetched = []
+    engine = SimpleNamespace(
+        deepseek_router=SimpleNamespace(enabled=True, ai_enabled=True),
+        prefetch_ai_weights=lambda items, ai_gate: prefetched.append((ai_gate, [i["symbol"] for i in items])) or len(items),
+    )
+    bot = TradingBot.__new__(TradingBot)
+    bot.fund_flow_decision_engine = engine
+    bot.get_market_data_for_symbol = lambda s: {"realtime": {"price": 100.0}}
+    bot._build_symbol_flow_inputs = lambda s, md, with_confluence: {"market_data": md, "flow_context": {"symbol": s}}
+    context = {
+        "ai_review_mode": "positions",
+        "ai_gate_enabled": True,
+        "ai_review_cfg": {},
+        "symbols": ["BTCUSDT", "ETHUSDT"],
+        "position_snapshot": {"ETHUSDT": {"side": "LONG"}},
+    }
+    bot._prefetch_cycle_ai_weights(context)
+    # 持仓复核窗口：只为持仓标的预取，构建的上下文留给逐个处理复用
+    assert prefetched == [("position_review", ["ETHUSDT"])]
+    assert list(context["prebuilt_inputs"]) == ["ETHUSDT"]
+
+    prefetched.clear()
+    bot._prefetch_cycle_ai_weights({**context, "ai_review_mode": "disabled"})
+    assert prefetched == []
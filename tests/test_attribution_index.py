@@ -0,0 +1,81 @@
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+from src.fund_flow.attribution_engine import FundFlowAttributionEngine
+from src.fund_flow.attribution_index import ensure_index, index_path_for, query_attribution
+
+
+def _log_fusion(engine, symbol):
+    engine.log_score_fusion(
+        symbol=symbol,
+        regime="TREND",
+        score_15m={"long": 0.6},
+        score_5m={"long": 0.5},
+        final_score={"long": 0.55},
+        fusion_info={},
+        direction_lock="BOTH",
+    )
+
+
+def test_writer_keeps_handle_open_and_buffers_until_flush(tmp_path):
+    engine = FundFlowAttributionEngine(str(tmp_path), flush_every=1000)
+    _log_fusion(engine, "BTCUSDT")
+    fp = engine._fp
+    _log_fusion(engine, "ETHUSDT")
+    assert engine._fp is fp
+    assert os.path.getsize(engine.log_path) == 0
+
+    engine.flush()
+    lines = open(engine.log_path, encoding="utf-8").read().splitlines()
+    assert [json.loads(line)["symbol"] for line in lines] == ["BTCUSDT", "ETHUSDT"]
+    assert len(open(index_path_for(engine.log_path), encoding="utf-8").read().splitlines()) == 2
+    engine.close()
+
+
+def test_query_by_symbol_event_and_time_uses_index(tmp_path):
+    engine = FundFlowAttributionEngine(str(tmp_path / "flat"), bucket_root_dir=str(tmp_path / "logs"))
+    for symbol in ("BTCUSDT", "ETHUSDT", "BTCUSDT"):
+        _log_fusion(engine, symbol)
+    engine.log_weight_snapshot("BTCUSDT", "TREND", {}, {})
+    engine.close()
+
+    since = datetime.now(timezone.utc) - timedelta(hours=6)
+    rows = list(query_attribution(str(tmp_path / "logs"), symbol="btcusdt", events=["score_fusion"], since=since))
+    assert len(rows) == 2
+    assert all(r["event"] == "score_fusion" and r["symbol"] == "BTCUSDT" for r in rows)
+
+    future = datetime.now(timezone.utc) + timedelta(hours=1)
+    assert list(query_attribution(str(tmp_path / "logs"), since=future)) == []
+
+
+def test_index_backfills_unindexed_tail(tmp_path):
+    engine = FundFlowAttributionEngine(str(tmp_path))
+    _log_fusion(engine, "BTCUSDT")
+    engine.close()
+    # 模拟旧版/迁移写入的未索引记录（末尾半行不应被索引）
+    with open(engine.log_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"ts": "2026-01-01T00:00:00+00:00", "event": "decision", "decision": {"symbol": "SOLUSDT"}}) + "\n")
+        f.write('{"ts": "partial')
+
+    entries = ensure_index(engine.log_path)
+    assert [e["s"] for e in entries] == ["BTCUSDT", "SOLUSDT"]
+    rows = list(query_attribution(str(tmp_path), symbol="SOLUSDT"))
+    assert rows[0]["decision"]["symbol"] == "SOLUSDT"
+
+
+def test_query_backfill_racing_buffered_writer_index_has_no_duplicates(tmp_path):
+    engine = FundFlowAttributionEngine(str(tmp_path), flush_every=1000)
+    _log_fusion(engine, "BTCUSDT")
+    _log_fusion(engine, "ETHUSDT")
+    # 日志行已落盘而写入方的索引行仍在缓冲：查询侧先补建同一批偏移
+    engine._fp.flush()
+    assert len(list(query_attribution(str(tmp_path)))) == 2
+    engine.flush()
+
+    raw_idx = open(index_path_for(engine.log_path), encoding="utf-8").read().splitlines()
+    assert len(raw_idx) == 4
+    rows = list(query_attribution(str(tmp_path)))
+    assert [r["symbol"] for r in rows] == ["BTCUSDT", "ETHUSDT"]
+    assert [e["o"] for e in ensure_index(engine.log_path)] == sorted({json.loads(x)["o"] for x in raw_idx})
+    engine.close()
@@ -0,0 +1,142 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pytest
+
+from src.data.bulk_klines import BulkKlineDownloader, RequestWeightBudget
+from src.data.kline_store import KlineStore
+
+STEP = 300_000
+START = 1704067200000  # 2024-01-01 UTC
+END = START + STEP * 2000
+
+
+class _StandIn:
+    """本地交易所替身：futures exchangeInfo + 合成 klines"""
+
+    def __init__(self, listings, fail_after=None, delay=0.0):
+        self.listings = listings
+        self.fail_after = fail_after
+        self.delay = delay
+        self.kline_calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+
+def _handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("X-MBX-USED-WEIGHT-1M", "5")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            q = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if url.path == "/api/v3/exchangeInfo":
+                return self._send(200, {"symbols": []})
+            if url.path == "/fapi/v1/exchangeInfo":
+                return self._send(
+                    200,
+                    {"symbols": [{"symbol": s, "status": "TRADING", "onboardDate": t} for s, t in state.listings.items()]},
+                )
+            if url.path != "/fapi/v1/klines":
+                return self._send(404, {})
+            with state.lock:
+                state.kline_calls += 1
+                call_no = state.kline_calls
+                state.in_flight += 1
+                state.max_in_flight = max(state.max_in_flight, state.in_flight)
+            try:
+                time.sleep(state.delay)
+                if state.fail_after is not None and call_no > state.fail_after:
+                    return self._send(500, {"msg": "boom"})
+                listed = state.listings[q["symbol"]]
+                start = max(int(q["startTime"]), listed)
+                start = -(-start // STEP) * STEP
+                stop = min(int(q["endTime"]), start + STEP * (int(q["limit"]) - 1))
+                rows = [[t, "1", "2", "0.5", "1.5", "10", t + STEP - 1] for t in range(start, stop + 1, STEP)]
+                return self._send(200, rows)
+            finally:
+                with state.lock:
+                    state.in_flight -= 1
+
+    return Handler
+
+
+@pytest.fixture
+def stand_in():
+    servers = []
+
+    def _start(**kwargs):
+        state = _StandIn(**kwargs)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(state))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        return state, {"spot": [base], "futures": [base]}
+
+    yield _start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_concurrent_download_fills_store_and_respects_listing(tmp_path, stand_in):
+    listings = {"AAAUSDT": 0, "BBBUSDT": START + STEP * 500}
+    state, endpoints = stand_in(listings=listings, delay=0.02)
+    store = KlineStore(str(tmp_path))
+    dl = BulkKlineDownloader(store, max_workers=6, page_limit=200, endpoints=endpoints)
+
+    report = dl.download(["AAAUSDT", "BBBUSDT", "ZZZUSDT"], "5m", START, END)
+    assert report["skipped"] == ["ZZZUSDT"]
+    assert report["failed_pages"] == 0
+    assert report["rows_by_symbol"]["AAAUSDT"] == 2001
+    assert report["rows_by_symbol"]["BBBUSDT"] == 1501
+    assert state.max_in_flight > 1
+
+    arr = store.load_array("AAAUSDT", "5m")
+    assert arr[0, 0] == START and np.all(np.diff(arr[0]) == STEP)
+    # 上市前区间按 onboardDate 直接标记为无数据，不发请求
+    assert store.missing_ranges("BBBUSDT", "5m", START, END) == []
+
+    calls = state.kline_calls
+    again = dl.download(["AAAUSDT", "BBBUSDT"], "5m", START, END)
+    assert again["pages"] == 0 and state.kline_calls == calls
+
+
+def test_interrupted_download_resumes_only_missing_pages(tmp_path, stand_in):
+    state, endpoints = stand_in(listings={"AAAUSDT": 0}, fail_after=4)
+    store = KlineStore(str(tmp_path))
+    first = BulkKlineDownloader(store, max_workers=1, page_limit=200, endpoints=endpoints, max_retries=1)
+    report = first.download(["AAAUSDT"], "5m", START, END)
+    assert report["failed_pages"] == report["pages"] - 4
+    assert store.load_array("AAAUSDT", "5m").shape[1] == 800
+
+    state.fail_after = None
+    state.kline_calls = 0
+    resumed = BulkKlineDownloader(store, max_workers=4, page_limit=200, endpoints=endpoints)
+    report = resumed.download(["AAAUSDT"], "5m", START, END)
+    assert report["failed_pages"] == 0
+    assert state.kline_calls == report["pages"] == 7
+    assert store.load_array("AAAUSDT", "5m").shape[1] == 2001
+
+
+def test_weight_budget_throttles_when_exhausted():
+    budget = RequestWeightBudget(weight_per_minute=600)  # 10/s
+    budget.acquire(600)
+    started = time.perf_counter()
+    budget.acquire(2)
+    assert 0.1 <= time.perf_counter() - started < 1.0
@@ -0,0 +1,98 @@
+import json
+import re
+
+import pandas as pd
+
+from src.ai.compact_prompt import derived_flags, quantize
+from src.ai.decision_parser import DecisionParser
+from src.ai.prompt_builder import PromptBuilder
+
+CONFIG = {
+    "trading": {"min_position_percent": 10, "max_position_percent": 30, "reserve_percent": 20},
+    "risk": {"max_daily_loss_percent": 10, "max_consecutive_losses": 5},
+    "ai": {},
+}
+
+
+class _FakeCompletion:
+    """离线补全后端：记录提示词，按提示中的价格是否高于 EMA 给出决策"""
+
+    def __init__(self):
+        self.prompts = []
+
+    def analyze_and_decide(self, prompt):
+        self.prompts.append(prompt)
+        if "## 输入\n" in prompt:
+            price = json.loads(prompt.split("## 输入\n", 1)[1])["px"]
+        else:
+            price = float(re.search(r"当前价格: \$([\d,.]+)", prompt).group(1).replace(",", ""))
+        action = "BUY_OPEN" if price > 64000.5 else "HOLD"
+        return {"content": json.dumps({"action": action, "confidence": 0.7, "reason": "ema20>ema50"})}
+
+
+def _market(price):
+    df = pd.DataFrame({"open": [100.0, 101.0, 102.0], "close": [101.0, 102.0, 101.5]})
+    ind = {"rsi": 41.23456, "macd": 12.3456789, "macd_signal": 10.1, "macd_histogram": 2.2456789,
+           "ema_20": 64000.123456, "ema_50": 63000.987654, "atr_14": 321.456, "volume_ratio": 180.26}
+    return {
+        "realtime": {"price": price, "change_24h": 1.23456, "change_15m": -0.2, "funding_rate": 0.000123456, "open_interest": 81234.5},
+        "multi_timeframe": {tf: {"indicators": dict(ind), "dataframe": df} for tf in ("15m", "1h", "4h", "1d")},
+    }
+
+
+def test_compact_prompt_reuses_prefix_and_keeps_decisions():
+    compact = PromptBuilder(CONFIG)
+    verbose = PromptBuilder({**CONFIG, "ai": {"compact_prompt": False}})
+    backend = _FakeCompletion()
+    position = {"side": "LONG", "amount": 0.01, "entry_price": 63000.0, "mark_price": 64321.12, "leverage": 5,
+                "unrealized_pnl": 13.2112, "pnl_percent": 2.0970}
+
+    decisions = []
+    for builder in (verbose, compact, compact):
+        prompt = builder.build_analysis_prompt("BTCUSDT", _market(64321.12), position=position)
+        decisions.append(DecisionParser.parse_ai_response(backend.analyze_and_decide(prompt)["content"]))
+    assert [d["action"] for d in decisions] == ["BUY_OPEN"] * 3
+
+    verbose_prompt, first, second = backend.prompts
+    assert len(second.encode("utf-8")) < len(verbose_prompt.encode("utf-8"))
+    # 静态前缀在前且跨调用不变，载荷为紧凑 JSON
+    prefix = compact.compact_builder.single_prefix()
+    assert first.startswith(prefix) and second.startswith(prefix)
+    payload = json.loads(second.split("## 输入\n", 1)[1])
+    assert payload["px"] == 64321
+    assert payload["tf"]["4h"]["e20"] == 64000 and payload["tf"]["4h"]["rsi"] == 41.235
+    assert payload["tf"]["1h"]["k"][-1] == [101.5, -0.49]
+    assert payload["pos"]["sd"] == "LONG" and "hist" not in payload
+
+    stats = compact.get_prompt_stats()
+    assert stats["calls"] == 2 and stats["prefix_reuse"] == 1 and stats["last_prompt_tokens"] > 0
+
+
+def test_multi_symbol_payload_and_quantize():
+    builder = PromptBuilder(CONFIG)
+    prompt = builder.build_multi_symbol_analysis_prompt(
+        {"BTCUSDT": {"market_data": _market(64321.12), "position": None}, "ETHUSDT": {"market_data": {}, "position": None}},
+        all_positions={},
+        account_summary={"equity": 1234.5678, "available_balance": 1000.0, "total_unrealized_pnl": -1.23456},
+    )
+    assert prompt.startswith(builder.compact_builder.multi_prefix())
+    payload = json.loads(prompt.split("## 输入\n", 1)[1])
+    assert set(payload["sym"]["BTCUSDT"]["tf"]) == {"1d", "4h", "1h", "15m"}
+    assert "atr" not in payload["sym"]["BTCUSDT"]["tf"]["1d"]
+    # 原文本的派生标记保留为短编码，缺失周期显式标记
+    assert {k: payload["sym"]["BTCUSDT"]["tf"]["4h"][k] for k in ("tr", "rs", "mg")} == {"tr": "U", "rs": "N", "mg": "+"}
+    assert payload["sym"]["ETHUSDT"] == {"tf": {"1d": "NA", "4h": "NA", "1h": "NA", "15m": "NA"}}
+    verbose = PromptBuilder({**CONFIG, "ai": {"compact_prompt": False}})._format_all_symbols_data(
+        {"BTCUSDT": {"market_data": _market(64321.12)}, "ETHUSDT": {"market_data": {}}}
+    )
+    assert "[4h] 📈上升 | RSI 41.2⚪中性" in verbose and "✅转正" in verbose and "[1d] 数据缺失" in verbose
+    assert payload["acct"] == {"eq": 1234.57, "av": 1000, "up": -1.235}
+
+    assert quantize(0.000123456, 3) == 0.000123
+    assert quantize(float("nan")) is None and quantize(7) == 7 and quantize("UP") == "UP"
+
+
+def test_derived_flags_match_verbose_markers():
+    assert derived_flags({"rsi": 75, "macd_histogram": 0, "ema_20": 1, "ema_50": 2}) == {"tr": "D", "rs": "OB", "mg": "-"}
+    # 缺失值按 0 计，与原文本一致（RSI 0 -> 超卖，EMA 相等 -> 横盘）
+    assert derived_flags({"macd_histogram": 0.1}) == {"tr": "F", "rs": "OS", "mg": "+"}
@@ -0,0 +1,85 @@
+import dataclasses
+import json
+import os
+
+import pytest
+
+from src.app.fund_flow_bot import TradingBot
+from src.config.snapshots import ConfigSnapshotError, DcaConfigSnapshot, RiskConfigSnapshot
+from src.fund_flow.decision_engine import FundFlowDecisionEngine
+
+
+def _bot(config):
+    bot = TradingBot.__new__(TradingBot)
+    bot.config = config
+    return bot
+
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "..", "config", "trading_config_fund_flow.json")
+
+
+def _config():
+    with open(CONFIG_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_bot_snapshots_are_built_once_and_frozen():
+    bot = _bot(_config())
+    risk = bot._risk_config()
+    assert bot._risk_config() is risk
+    assert risk["enabled"] == risk.enabled
+    assert risk.get("missing", 1) == 1
+    assert not hasattr(risk, "__dict__")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        risk.enabled = False
+
+    dca = bot._dca_config()
+    assert isinstance(dca["drawdown_thresholds"], tuple)
+    assert dca == DcaConfigSnapshot.from_mapping(bot._build_dca_config())
+
+
+def test_snapshot_values_match_legacy_dict_parsing():
+    config = _config()
+    bot = _bot(config)
+    assert bot._pretrade_risk_gate_config().to_dict() == bot._build_pretrade_risk_gate_config()
+    assert dict(bot._ma10_macd_confluence_config()) == bot._build_ma10_macd_confluence_config()
+
+    engine = FundFlowDecisionEngine(config)
+    assert dict(engine._trend_capture_config()) == engine._build_trend_capture_config()
+    params = engine._engine_params_for("TREND")
+    params["max_active_symbols"] = -1
+    assert engine._engine_params_for("TREND")["max_active_symbols"] != -1
+
+
+def test_dca_override_snapshot_is_cached_per_override():
+    bot = _bot(_config())
+    override = {"dca_max_additions": 1, "dca_drawdown_thresholds": [0.02], "dca_multipliers": [1.5]}
+    first = bot._dca_config(override)
+    assert bot._dca_config(dict(override)) is first
+    assert first.max_additions == 1
+    assert first.drawdown_thresholds == (0.02,)
+
+
+def test_snapshot_validation_rejects_bad_types_and_unknown_fields():
+    good = {
+        "enabled": True,
+        "max_daily_loss_pct": 0.1,
+        "max_consecutive_losses": 3,
+        "daily_loss_cooldown_seconds": 60,
+        "consecutive_loss_cooldown_seconds": 60,
+        "daily_reset_timezone": "Asia/Tokyo",
+    }
+    assert RiskConfigSnapshot.from_mapping(good).max_consecutive_losses == 3
+    with pytest.raises(ConfigSnapshotError):
+        RiskConfigSnapshot.from_mapping({**good, "max_consecutive_losses": "3"})
+    with pytest.raises(ConfigSnapshotError):
+        RiskConfigSnapshot.from_mapping({**good, "unexpected": 1})
+    with pytest.raises(ConfigSnapshotError):
+        RiskConfigSnapshot.from_mapping({**good, "max_daily_loss_pct": float("nan")})
+
+
+def test_invalid_config_fails_at_snapshot_build_time():
+    config = _config()
+    config.setdefault("risk", {})["max_consecutive_losses"] = "three"
+    with pytest.raises(ValueError):
+        _bot(config)._build_config_snapshots()
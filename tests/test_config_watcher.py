@@ -0,0 +1,115 @@
+import json
+import os
+import time
+
+import pytest
+
+from src.app.fund_flow_bot import TradingBot
+from src.config.config_monitor import ConfigMonitor
+from src.config.config_watcher import ConfigWatcher
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "..", "config", "trading_config_fund_flow.json")
+
+
+def _write(path, data):
+    # 与多数编辑器一致：写临时文件后 rename 原子替换
+    tmp = str(path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _wait_for(fn, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        value = fn()
+        if value is not None:
+            return value
+        time.sleep(0.02)
+    return None
+
+
+@pytest.mark.parametrize("use_inotify", [None, False])
+def test_watcher_prepares_snapshot_off_thread(tmp_path, use_inotify):
+    path = tmp_path / "cfg.json"
+    _write(path, {"trading": {"symbols": ["BTCUSDT"]}})
+    prepared_threads = []
+
+    def _prepare(config):
+        import threading
+
+        prepared_threads.append(threading.current_thread().name)
+        if config["trading"].get("bad"):
+            raise ValueError("bad config")
+        return tuple(config["trading"]["symbols"])
+
+    watcher = ConfigWatcher(str(path), prepare=_prepare, poll_interval_seconds=0.05, debounce_seconds=0.01, use_inotify=use_inotify)
+    watcher.start()
+    try:
+        assert watcher.backend in (("inotify", "poll") if use_inotify is None else ("poll",))
+        assert watcher.take() is None
+
+        _write(path, {"trading": {"symbols": ["ETHUSDT"], "bad": True}})
+        assert _wait_for(lambda: watcher.get_stats()["errors"] or None) == 1
+        assert watcher.take() is None
+
+        _write(path, {"trading": {"symbols": ["ETHUSDT", "SOLUSDT"]}})
+        prepared = _wait_for(watcher.take)
+        assert prepared is not None and prepared.derived == ("ETHUSDT", "SOLUSDT")
+        assert prepared.config["trading"]["symbols"] == ["ETHUSDT", "SOLUSDT"]
+        assert watcher.take() is None
+        assert set(prepared_threads) == {"config-watcher"}
+    finally:
+        watcher.stop()
+
+
+def test_config_monitor_swaps_in_prepared_config(tmp_path):
+    path = tmp_path / "cfg.json"
+    _write(path, {"trading": {"symbols": ["BTCUSDT", "ETHUSDT"]}})
+    monitor = ConfigMonitor(str(path), poll_interval_seconds=0.05, debounce_seconds=0.0, use_inotify=False)
+    try:
+        assert monitor.check_for_updates()["updated"] is False
+        _write(path, {"trading": {"symbols": ["ETHUSDT", "SOLUSDT"]}})
+        info = _wait_for(lambda: (lambda r: r if r["updated"] else None)(monitor.check_for_updates()))
+        assert info["removed_symbols"] == ["BTCUSDT"] and info["added_symbols"] == ["SOLUSDT"]
+        monitor.apply_updates(info)
+        assert monitor.get_current_symbols() == ["ETHUSDT", "SOLUSDT"]
+        assert monitor.get_current_config() == info["new_config"]
+    finally:
+        monitor.watcher.stop()
+
+
+def test_bot_prepare_rejects_invalid_config_without_touching_state(tmp_path):
+    with open(CONFIG_PATH, encoding="utf-8") as f:
+        config = json.load(f)
+    bot = TradingBot.__new__(TradingBot)
+    bot.config = config
+    bot.client = None
+    bot.logs_dir = str(tmp_path / "logs")
+    bot.log_root_dir = str(tmp_path / "logs_root")
+    current = bot._snapshots()
+
+    path = tmp_path / "cfg.json"
+    _write(path, config)
+    watcher = ConfigWatcher(str(path), prepare=bot._prepare_config_reload)
+    broken = json.loads(json.dumps(config))
+    broken["risk"]["max_consecutive_losses"] = "three"
+    _write(path, broken)
+    assert watcher.check_now() is False
+    assert watcher.get_stats()["errors"] == 1
+    assert bot._snapshots() is current
+
+    changed = json.loads(json.dumps(config))
+    changed["risk"]["max_consecutive_losses"] = 7
+    _write(path, changed)
+    assert watcher.check_now() is True
+    prepared = watcher.take()
+    assert prepared.derived["snapshots"].risk.max_consecutive_losses == 7
+    assert bot._snapshots() is current and bot.config is config
+    # 资金流模块在监听侧构建完成，交易线程换入时只替换引用
+    modules = prepared.derived["modules"]
+    assert modules["decision_engine"] is not None and modules["storage"] is not None
+    assert getattr(bot, "fund_flow_decision_engine", None) is None
+    bot._install_fund_flow_modules(modules)
+    assert bot.fund_flow_decision_engine is modules["decision_engine"]
+    assert bot.fund_flow_execution_router is modules["execution_router"]
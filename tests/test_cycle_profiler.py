@@ -0,0 +1,108 @@
+import json
+import os
+
+from src.utils.profiler import CycleProfiler, _NULL_SPAN
+
+
+def test_disabled_profiler_is_noop(tmp_path):
+    prof = CycleProfiler(enabled=False, output_dir=str(tmp_path))
+    assert prof.span("x") is _NULL_SPAN
+    prof.begin_cycle("flat")
+    prof.record_rest({"X-MBX-USED-WEIGHT-1M": "10"})
+    assert prof.end_cycle() is None
+    assert not os.path.exists(tmp_path / "cycle_profile.jsonl")
+
+
+def test_cycle_breakdown_with_rest_weight_per_phase(tmp_path):
+    prof = CycleProfiler(enabled=True, output_dir=str(tmp_path))
+    prof.begin_cycle("positions")
+    with prof.span("account_fetch"):
+        prof.record_rest({"X-MBX-USED-WEIGHT-1M": "100"})
+    with prof.span("orderbook"):
+        prof.record_rest({"X-MBX-USED-WEIGHT-1M": "105"})
+        prof.record_rest({"X-MBX-USED-WEIGHT-1M": "110"})
+    with prof.span("orderbook"):
+        pass
+    record = prof.end_cycle(extra={"symbols_processed": 2})
+
+    assert record["label"] == "positions"
+    assert record["rest_calls"] == 3
+    assert record["rest_weight"] == 10
+    assert record["phases"]["orderbook"]["calls"] == 2
+    assert record["phases"]["orderbook"]["rest_calls"] == 2
+    assert record["phases"]["orderbook"]["rest_weight"] == 10
+    assert record["phases"]["account_fetch"]["rest_calls"] == 1
+    assert record["symbols_processed"] == 2
+
+    lines = (tmp_path / "cycle_profile.jsonl").read_text(encoding="utf-8").splitlines()
+    assert json.loads(lines[-1])["cycle"] == 1
+
+
+def test_jsonl_rotation(tmp_path):
+    prof = CycleProfiler(enabled=True, output_dir=str(tmp_path), max_bytes=1, backup_count=2)
+    for _ in range(4):
+        prof.begin_cycle()
+        prof.end_cycle()
+    assert (tmp_path / "cycle_profile.jsonl").exists()
+    assert (tmp_path / "cycle_profile.jsonl.1").exists()
+    assert (tmp_path / "cycle_profile.jsonl.2").exists()
+    assert not (tmp_path / "cycle_profile.jsonl.3").exists()
+
+
+def test_cprofile_trigger_file_captures_single_cycle(tmp_path):
+    prof = CycleProfiler(enabled=True, output_dir=str(tmp_path))
+    (tmp_path / "PROFILE_NEXT_CYCLE").write_text("")
+    prof.begin_cycle()
+    sum(range(1000))
+    first = prof.end_cycle()
+    prof.begin_cycle()
+    second = prof.end_cycle()
+
+    assert first["cprofile"].endswith(".prof")
+    assert os.path.exists(first["cprofile"])
+    assert not (tmp_path / "PROFILE_NEXT_CYCLE").exists()
+    assert "cprofile" not in second
+
+
+def test_rest_calls_through_broker_request_credit_calling_phase(monkeypatch):
+    from src.api.binance_client import BinanceBroker
+    from src.utils.profiler import get_profiler
+
+    class _Resp:
+        status_code = 200
+        text = "{}"
+
+        def __init__(self, weight):
+            self.headers = {"X-MBX-USED-WEIGHT-1M": str(weight), "Content-Type": "application/json"}
+
+        def json(self):
+            return {}
+
+        def raise_for_status(self):
+            return None
+
+    monkeypatch.setattr(BinanceBroker, "_detect_api_capability", lambda self: "fapi")
+    monkeypatch.setattr(BinanceBroker, "_detect_account_mode", lambda self: "fapi")
+    monkeypatch.setattr(BinanceBroker, "_sync_time_offset", lambda self, force=False: None)
+    broker = BinanceBroker("key", "secret")
+    weights = iter([100, 105, 112])
+    monkeypatch.setattr(broker._session, "request", lambda *a, **k: _Resp(next(weights)))
+
+    prof = get_profiler()
+    monkeypatch.setattr(prof, "enabled", True)
+    monkeypatch.setattr(prof, "output_dir", None)
+    prof.begin_cycle("broker")
+    with prof.span("account_fetch"):
+        broker.request("GET", f"{broker.FAPI_BASE}/fapi/v2/positionRisk")
+    with prof.span("orderbook"):
+        broker.request("GET", f"{broker.FAPI_BASE}/fapi/v1/depth")
+        broker.request("GET", f"{broker.FAPI_BASE}/fapi/v1/depth")
+    record = prof.end_cycle()
+
+    assert record["rest_calls"] == 3
+    assert record["phases"]["account_fetch"]["rest_calls"] == 1
+    assert record["phases"]["orderbook"]["rest_calls"] == 2
+    assert record["phases"]["orderbook"]["rest_weight"] == 12
+    # 传输层 span 只记耗时
+    assert record["phases"]["rest.request"]["calls"] == 3
+    assert record["phases"]["rest.request"]["rest_calls"] == 0
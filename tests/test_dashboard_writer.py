@@ -0,0 +1,89 @@
+import csv
+import json
+
+from src.utils.dashboard_writer import DashboardWriter
+
+HEADER = ["timestamp", "equity", "symbol", "price", "event"]
+
+
+def _payload(ts, price, event=None):
+    return {"timestamp": ts, "equity": 100.0, "event": event, "positions": [{"symbol": "BTCUSDT", "price": price}]}
+
+
+def _rows(payload):
+    ev = (payload["event"] or {}).get("type", "")
+    rows = [[payload["timestamp"], payload["equity"], p["symbol"], p["price"], ev] for p in payload["positions"]]
+    rows.append([payload["timestamp"], payload["equity"], "ETHUSDT", 50.0, ev])
+    return rows
+
+
+def _read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def test_unchanged_payload_is_skipped_and_only_changed_rows_append(tmp_path):
+    mirror = tmp_path / "mirror.csv"
+    renders = []
+    writer = DashboardWriter(
+        str(tmp_path / "d.json"),
+        str(tmp_path / "d.csv"),
+        HEADER,
+        html_path=str(tmp_path / "d.html"),
+        render_html=lambda p: renders.append(p["timestamp"]) or f"<p>{p['timestamp']}</p>",
+        csv_mirror_path=lambda: str(mirror),
+        html_min_interval_seconds=3600,
+        row_key_index=2,
+        background=False,
+    )
+    assert writer.publish(_payload("t1", 1.0), _rows(_payload("t1", 1.0)))
+    # 仅时间戳变化：整体跳过
+    assert not writer.publish(_payload("t2", 1.0), _rows(_payload("t2", 1.0)))
+    # BTC 价格变化：只追加 BTC 行，ETH 行不变不追加
+    assert writer.publish(_payload("t3", 2.0), _rows(_payload("t3", 2.0)))
+    # 事件总是写出全部行
+    ev = _payload("t4", 2.0, event={"type": "CLOSE"})
+    assert writer.publish(ev, _rows(ev), has_event=True)
+
+    rows = _read_csv(tmp_path / "d.csv")
+    assert rows[0] == HEADER
+    assert [(r[0], r[2]) for r in rows[1:]] == [
+        ("t1", "BTCUSDT"),
+        ("t1", "ETHUSDT"),
+        ("t3", "BTCUSDT"),
+        ("t4", "BTCUSDT"),
+        ("t4", "ETHUSDT"),
+    ]
+    # 镜像首次整体复制，之后追加，内容与主文件一致
+    assert _read_csv(mirror) == rows
+    assert json.loads((tmp_path / "d.json").read_text(encoding="utf-8"))["timestamp"] == "t4"
+    # 同步模式下 flush 不受 HTML 限流
+    assert (tmp_path / "d.html").read_text(encoding="utf-8") == "<p>t4</p>"
+    stats = writer.get_stats()
+    assert stats["skipped_unchanged"] == 1 and stats["rows_skipped"] == 1 and stats["rows_appended"] == 5
+
+
+def test_background_worker_rate_limits_html_and_upgrades_legacy_header(tmp_path):
+    csv_path = tmp_path / "d.csv"
+    csv_path.write_text("old,header\n1,2\n", encoding="utf-8")
+    renders = []
+    writer = DashboardWriter(
+        str(tmp_path / "d.json"),
+        str(csv_path),
+        HEADER,
+        html_path=str(tmp_path / "d.html"),
+        render_html=lambda p: renders.append(p["timestamp"]) or p["timestamp"],
+        html_min_interval_seconds=3600,
+        row_key_index=2,
+    )
+    for i in range(5):
+        p = _payload(f"t{i}", float(i))
+        writer.publish(p, _rows(p))
+    writer.close()
+
+    # 限流窗口内至多渲染首批一次 + 关闭时的最新载荷一次
+    assert renders[-1] == "t4" and len(renders) <= 2
+    assert (tmp_path / "d.html").read_text(encoding="utf-8") == "t4"
+    rows = _read_csv(csv_path)
+    assert rows[0] == HEADER and rows[-1][0] == "t4"
+    assert len(list(tmp_path.glob("d.csv.legacy.*"))) == 1
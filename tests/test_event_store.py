@@ -0,0 +1,107 @@
+import csv
+from datetime import datetime
+
+from tools.analysis import auto_hourly_report as ahr
+from tools.logs_analysis.event_store import EventStore
+
+HEADER = ["timestamp", "symbol", "action", "result", "pnl", "reason"]
+
+
+def _append(path, rows, header=HEADER):
+    new = not path.exists()
+    with path.open("a", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        if new:
+            w.writerow(header)
+        w.writerows(rows)
+
+
+def _legacy_hourly(path, bar_minutes=5):
+    opens, closes = ahr.build_events(ahr.load_rows(path), bar_minutes=bar_minutes)
+    return ahr.aggregate_hourly(opens, closes)
+
+
+def _as_tuple(h):
+    return (h.hour, h.open_count, h.trend_open_count, h.close_count, h.score_close_count, round(h.net_pnl, 8), h.avg_hold_bars)
+
+
+def test_trade_log_tail_matches_full_scan_and_only_reads_new_bytes(tmp_path):
+    log = tmp_path / "trade_log.csv"
+    _append(
+        log,
+        [
+            ["2026-03-01T10:05:00", "BTCUSDT", "BUY_OPEN", "success", "", "entry_engine=TREND"],
+            ["2026-03-01T10:07:00", "ETHUSDT", "SELL_OPEN", "failed", "", "engine=RANGE"],
+            ["2026-03-01T10:20:00", "ETHUSDT", "SELL_OPEN", "success", "", "engine=RANGE"],
+            ["2026-03-01T10:50:00", "BTCUSDT", "CLOSE", "success", "1.5", "评分低于阈值 0.1"],
+        ],
+    )
+    store = EventStore(str(tmp_path / "events.db"))
+    assert store.ingest_trade_log(log) == 4
+
+    _append(log, [["2026-03-01T11:40:00", "ETHUSDT", "CLOSE", "success", "-0.5", "tp"]])
+    with log.open("a", encoding="utf-8") as f:
+        f.write("2026-03-01T11:45:00,BTCUSDT,BUY_OPEN,succ")  # 写了一半的行
+    assert store.ingest_trade_log(log) == 1
+    with log.open("a", encoding="utf-8") as f:
+        f.write("ess,,entry_engine=TREND\n")
+    assert store.ingest_trade_log(log) == 1
+    assert store.ingest_trade_log(log) == 0
+
+    hourly = ahr.compute_hourly(ahr.LogSource(kind="trade_log", trade_log_path=log), 5, 0, store=store)
+    assert [_as_tuple(h) for h in hourly] == [_as_tuple(h) for h in _legacy_hourly(log)]
+    assert hourly[0].avg_hold_bars == 9.0
+    store.close()
+
+
+def test_rewritten_file_is_reread_without_duplicates(tmp_path):
+    log = tmp_path / "trade_log.csv"
+    rows = [
+        ["2026-03-01T10:05:00", "BTCUSDT", "BUY_OPEN", "success", "", ""],
+        ["2026-03-01T10:30:00", "BTCUSDT", "CLOSE", "success", "2", ""],
+    ]
+    _append(log, rows)
+    store = EventStore(str(tmp_path / "events.db"))
+    store.ingest_trade_log(log)
+
+    # 模拟 trade_log 列迁移：整体重写并新增列
+    log.unlink()
+    _append(log, [r + [""] for r in rows] + [["2026-03-01T12:00:00", "SOLUSDT", "BUY_OPEN", "success", "", "", ""]],
+            header=HEADER + ["pnl_percent"])
+    assert store.ingest_trade_log(log) == 1
+    assert [e["symbol"] for e in store.query(kind="open")] == ["BTCUSDT", "SOLUSDT"]
+    assert len(store.query(kind="close")) == 1
+    store.close()
+
+
+def test_dashboard_snapshots_dedupe_and_runtime_state_persists(tmp_path):
+    header = ["timestamp", "event_type", "event_symbol", "event_side", "event_status", "event_price", "event_pnl", "event_reason"]
+    row_open = ["2026-03-01T10:00:00", "OPEN_LONG", "BTCUSDT", "", "success", "100", "", "entry_engine=TREND"]
+    row_close = ["2026-03-01T10:30:00", "CLOSE", "BTCUSDT", "LONG", "success", "101", "0.7", "tp"]
+    _append(tmp_path / "DCA_dashboard_2026-03-01_10.csv", [row_open], header=header)
+    _append(tmp_path / "DCA_dashboard_2026-03-01_11.csv", [row_open, row_close], header=header)
+
+    runtime = tmp_path / "runtime.out.1.log"
+    runtime.write_text(
+        "=== FUND_FLOW cycle 7 @ 2026-03-01 10:00:00 UTC ===\n"
+        "[BTCUSDT] 决策=BUY | 状态=success | 目标占比=0.10\n",
+        encoding="utf-8",
+    )
+    store = EventStore(str(tmp_path / "events.db"))
+    counts = store.ingest_dir(str(tmp_path))
+    assert counts["dashboard"] == 2 and counts["runtime"] == 1
+
+    with runtime.open("a", encoding="utf-8") as f:
+        f.write("   方向判断: dir_lw=LONG(+0.42) | dir_ev=SHOR(-0.10) | x\n")
+        f.write("🧯 Kill switch ETHUSDT: status=success\n")
+    store.ingest_dir(str(tmp_path))
+
+    stats = store.hourly_stats("dashboard")
+    assert stats[0]["open_count"] == 1 and stats[0]["close_count"] == 1
+    assert stats[0]["hold_minutes_sum"] == 30.0
+    direction = store.query(kind="direction")[0]
+    assert direction["symbol"] == "BTCUSDT" and direction["cycle"] == 7
+    assert direction["data"]["lw_score"] == 0.42
+    risk = store.query(kind="risk", since=datetime(2026, 3, 1))
+    assert [r["symbol"] for r in risk] == ["ETHUSDT"]
+    store.close()
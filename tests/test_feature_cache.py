@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from tools.backtest.backtest_dca_rotation import DCAParams, DCARotationBacktester, _rolling_last_quantile, _run_length
+from tools.backtest.feature_cache import FeatureCache
+
+
+def _raw(n=600, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.004, n)))
+    index = pd.date_range("2024-01-01", periods=n, freq="5min", name="timestamp")
+    return pd.DataFrame(
+        {
+            "open": close,
+            "high": close * 1.002,
+            "low": close * 0.998,
+            "close": close,
+            "volume": rng.integers(1, 50, n).astype(float),
+        },
+        index=index,
+    )
+
+
+def _bt(cache, **params):
+    return DCARotationBacktester(["AAA"], params=DCAParams(**params), feature_cache=cache)
+
+
+def test_vectorized_helpers_match_reference_loops():
+    raw = _raw()
+    ref_q = raw["volume"].rolling(window=60).apply(lambda x: float(np.mean(x <= x[-1])), raw=True)
+    got_q = _rolling_last_quantile(raw["volume"].to_numpy(), 60)
+    assert np.allclose(ref_q.to_numpy(), got_q, equal_nan=True)
+
+    cond = raw["close"] > raw["close"].shift(4)
+    ref_td, count = [], 0
+    for val in cond.fillna(False):
+        count = count + 1 if val else 0
+        ref_td.append(count)
+    assert _run_length(cond).tolist() == ref_td
+
+
+def test_cache_reuses_groups_across_instances(tmp_path):
+    raw = _raw()
+    plain = DCARotationBacktester(["AAA"], feature_cache=None)
+    plain.feature_cache = None
+    expected = plain.calculate_indicators(raw, symbol="AAAUSDT")
+
+    cache = FeatureCache(str(tmp_path))
+    first = _bt(cache).calculate_indicators(raw, symbol="AAAUSDT")
+    assert cache.stats["computed"] == 3
+    pd.testing.assert_frame_equal(first[expected.columns], expected, check_dtype=False)
+
+    # 新进程等价：新的缓存实例只读磁盘，不再计算
+    disk = FeatureCache(str(tmp_path))
+    again = _bt(disk).calculate_indicators(raw, symbol="AAAUSDT")
+    assert disk.stats == {"memory_hits": 0, "disk_hits": 3, "computed": 0}
+    pd.testing.assert_frame_equal(again, first)
+
+    # 只改趋势 EMA 参数：仅重算 trend 组
+    _bt(disk, trend_ema_fast=30).calculate_indicators(raw, symbol="AAAUSDT")
+    assert disk.stats == {"memory_hits": 2, "disk_hits": 3, "computed": 1}
+
+    # 数据变化 -> 新的哈希键
+    changed = raw.copy()
+    changed.iloc[-1, changed.columns.get_loc("close")] *= 1.01
+    _bt(disk).calculate_indicators(changed, symbol="AAAUSDT")
+    assert disk.stats["computed"] == 4
@@ -0,0 +1,199 @@
+import threading
+import time
+
+from src.app.fund_flow_bot import TradingBot
+from src.data.fill_ingestor import FillIngestor, FillStore
+
+
+class _Resp:
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+class _FakeUserTrades:
+    """本地 userTrades 端点桩：按 fromId / startTime 返回成交，记录每次请求参数"""
+
+    def __init__(self):
+        self.trades = []
+        self.calls = []
+        self.fail = False
+        self.lock = threading.Lock()
+
+    def um_base(self):
+        return "https://fapi.binance.com"
+
+    def add(self, symbol, order_id, n, pnl=0.0):
+        with self.lock:
+            for _ in range(n):
+                trade_id = len(self.trades) + 1
+                self.trades.append(
+                    {"symbol": symbol, "id": trade_id, "orderId": order_id, "time": int(time.time() * 1000),
+                     "side": "SELL", "price": "100", "qty": "1", "quoteQty": "100", "realizedPnl": str(pnl),
+                     "commission": "0.04", "commissionAsset": "USDT"}
+                )
+
+    def request(self, method, url, params=None, signed=False, allow_error=False):
+        assert method == "GET" and signed and url.endswith("/fapi/v1/userTrades")
+        params = dict(params or {})
+        with self.lock:
+            self.calls.append(params)
+            if self.fail:
+                return _Resp(503, {"msg": "unavailable"})
+            rows = [t for t in self.trades if t["symbol"] == params["symbol"]]
+            if "orderId" in params:
+                rows = [t for t in rows if t["orderId"] == params["orderId"]]
+            if "fromId" in params:
+                rows = [t for t in rows if t["id"] >= params["fromId"]]
+            elif "startTime" in params:
+                rows = [t for t in rows if t["time"] >= params["startTime"]]
+            return _Resp(200, [dict(t) for t in rows[: params["limit"]]])
+
+
+class _FakeClient:
+    def __init__(self):
+        self.broker = _FakeUserTrades()
+
+
+def test_incremental_cursor_dedupes_and_persists(tmp_path):
+    client = _FakeClient()
+    db_path = str(tmp_path / "fills.db")
+    client.broker.add("BTCUSDT", 11, 3)
+    ingestor = FillIngestor(client, FillStore(db_path), {"batch_limit": 2})
+
+    # 引导：按时间窗口拉取，满页后按 fromId 翻页
+    assert len(ingestor.ingest_symbol("BTCUSDT")) == 3
+    assert "startTime" in client.broker.calls[0] and client.broker.calls[1]["fromId"] == 3
+    assert ingestor.store.get_cursor("BTCUSDT") == 3
+
+    # 无新成交：一次空页请求，无重复入库
+    assert ingestor.ingest_symbol("BTCUSDT") == []
+    assert client.broker.calls[-1]["fromId"] == 4
+    assert ingestor.store.insert_fills("BTCUSDT", client.broker.trades) == []
+
+    # 游标持久化：新实例从上次位置继续，只拿到增量成交，并回调新成交
+    client.broker.add("BTCUSDT", 12, 1, pnl=-2.5)
+    seen = []
+    restarted = FillIngestor(client, FillStore(db_path), {"batch_limit": 2}, on_new_fills=lambda s, f: seen.append((s, [x["id"] for x in f])))
+    assert [f["id"] for f in restarted.ingest_symbol("BTCUSDT")] == [4]
+    assert client.broker.calls[-1] == {"symbol": "BTCUSDT", "limit": 2, "fromId": 4}
+    assert seen == [("BTCUSDT", [4])]
+    assert [f["id"] for f in restarted.store.fills_for_order("BTCUSDT", 11)] == [1, 2, 3]
+    assert restarted.store.count() == 4
+
+
+def test_close_pnl_fetches_missing_order_directly_without_waiting(tmp_path):
+    client = _FakeClient()
+    client.broker.add("ETHUSDT", 7, 1)
+    client.broker.trades[0]["time"] -= 60_000
+    seen = []
+    ingestor = FillIngestor(
+        client, FillStore(str(tmp_path / "fills.db")), {"interval_seconds": 60},
+        on_new_fills=lambda s, f: seen.append([x["id"] for x in f]),
+    )
+    ingestor.ingest_symbol("ETHUSDT")
+    ingestor.start(lambda: ["ETHUSDT"])
+    try:
+        bot = TradingBot.__new__(TradingBot)
+        bot.fill_ingestor = ingestor
+        # 平仓成交尚未入库：按 orderId 单独拉取一次，不等待后台同步
+        client.broker.add("ETHUSDT", 99, 1)
+        client.broker.add("ETHUSDT", 8, 2, pnl=1.5)
+        result = {"order": {"orderId": 8, "executedQty": "2"}}
+        started = time.monotonic()
+        assert bot._extract_close_realized_pnl("ETHUSDT", result) == 3.0
+        assert time.monotonic() - started < 0.5
+        assert client.broker.calls[-1] == {"symbol": "ETHUSDT", "limit": 1000, "orderId": 8}
+        stats = ingestor.get_stats()
+        assert stats["lookup_fetches"] == 1 and stats["stored"] == 3 and stats["running"]
+        assert seen == [[3, 4]]
+        # 单独补拉不推进游标：订单 99 的成交仍由增量同步拿到
+        assert ingestor.store.get_cursor("ETHUSDT") == 1
+        assert [f["id"] for f in ingestor.ingest_symbol("ETHUSDT")] == [2]
+        assert seen == [[3, 4], [2]]
+
+        # 已入库：直接命中本地库，不再请求
+        calls = len(client.broker.calls)
+        assert bot._extract_close_realized_pnl("ETHUSDT", result) == 3.0
+        assert len(client.broker.calls) == calls
+    finally:
+        ingestor.stop()
+    assert not ingestor.running
+
+
+def test_trade_fill_log_defers_to_running_ingestor(tmp_path):
+    client = _FakeClient()
+    bot = TradingBot.__new__(TradingBot)
+    written = []
+    bot._append_trade_fill_rows = written.extend
+    ingestor = FillIngestor(
+        client, FillStore(str(tmp_path / "fills.db")), {"interval_seconds": 60}, on_new_fills=bot._on_ingested_fills
+    )
+    bot.fill_ingestor = ingestor
+    order = {"orderId": 5, "executedQty": "0.5", "avgPrice": "200", "cumQuote": "100", "side": "BUY", "updateTime": 1}
+
+    # 未运行增量同步：同步拉取，userTrades 不可用时回退记录订单回报
+    client.broker.fail = True
+    bot._write_trade_fill_log(symbol="BNBUSDT", decision=None, execution_result={"order": order})
+    assert [(r["来源"], r["订单ID"], r["数量"]) for r in written] == [("order_fallback", "5", 0.5)]
+
+    client.broker.fail = False
+    written.clear()
+    ingestor.start(lambda: [])
+    try:
+        calls_before = len(client.broker.calls)
+        client.broker.add("BNBUSDT", 6, 1)
+        bot._write_trade_fill_log(symbol="BNBUSDT", decision=None, execution_result={"order": dict(order, orderId=6)})
+        # 运行中：只标记活跃，不发 userTrades 请求，也不直接写日志
+        assert len(client.broker.calls) == calls_before and written == []
+        assert "BNBUSDT" in ingestor._active_until
+    finally:
+        ingestor.stop()
+    # 由增量同步写入该成交
+    ingestor.ingest_symbol("BNBUSDT")
+    assert [r["成交ID"] for r in written] == ["1"]
+
+
+def test_empty_bootstrap_stores_time_cursor(tmp_path):
+    client = _FakeClient()
+    ingestor = FillIngestor(client, FillStore(str(tmp_path / "fills.db")), {"batch_limit": 2})
+
+    # 从未成交：引导一次后记录时间游标，之后按 startTime 续拉而不是重新引导
+    assert ingestor.ingest_symbol("SOLUSDT") == []
+    state = ingestor.store.get_cursor_state("SOLUSDT")
+    assert state is not None and state[0] == -1
+    assert ingestor.ingest_symbol("SOLUSDT") == []
+    assert ingestor.get_stats()["bootstraps"] == 1
+    assert client.broker.calls[-1]["startTime"] >= client.broker.calls[0]["startTime"] + 3600 * 1000
+
+    # 首笔成交出现后切换为成交 ID 游标
+    client.broker.add("SOLUSDT", 21, 1)
+    assert [f["id"] for f in ingestor.ingest_symbol("SOLUSDT")] == [1]
+    assert ingestor.store.get_cursor("SOLUSDT") == 1
+    ingestor.ingest_symbol("SOLUSDT")
+    assert client.broker.calls[-1]["fromId"] == 2
+
+
+def test_idle_symbols_back_off_and_wake_on_activity(tmp_path):
+    ingestor = FillIngestor(
+        _FakeClient(), FillStore(str(tmp_path / "fills.db")),
+        {"interval_seconds": 10, "active_window_seconds": 0, "idle_max_interval_seconds": 40},
+    )
+    ingestor.set_held_symbols(["BTCUSDT"])
+    intervals = []
+    for _ in range(4):
+        ingestor._schedule_next("BTCUSDT", False)
+        ingestor._schedule_next("ETHUSDT", False)
+        intervals.append(ingestor._idle_interval.get("ETHUSDT"))
+    # 持仓中的 symbol 不退避；空闲 symbol 间隔翻倍至上限
+    assert "BTCUSDT" not in ingestor._idle_interval
+    assert intervals == [10, 20, 40, 40]
+    now = time.monotonic()
+    assert ingestor._is_due("BTCUSDT", now + 10) and not ingestor._is_due("ETHUSDT", now + 10)
+
+    # 下单后 request_refresh：立即到期并重置退避
+    ingestor.request_refresh("ETHUSDT")
+    assert ingestor._is_due("ETHUSDT", time.monotonic()) and "ETHUSDT" not in ingestor._idle_interval
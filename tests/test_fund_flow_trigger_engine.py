@@ -11,3 +11,83 @@ def test_trigger_dedupe_within_window():
     assert not engine.should_trigger("BTCUSDT", "signal", "id-1", now=now + timedelta(seconds=1))
     assert not engine.should_trigger("BTCUSDT", "signal", "id-2", now=now + timedelta(seconds=5))
     assert engine.should_trigger("BTCUSDT", "signal", "id-3", now=now + timedelta(seconds=16))
+
+
+class _Decision:
+    def __init__(self, operation, long_score=0.0, short_score=0.0):
+        self.operation = operation
+        self.metadata = {"long_score": long_score, "short_score": short_score}
+
+
+def _pool_rules():
+    return [
+        {"name": "cvd", "side": "LONG", "metric": "cvd", "operator": ">", "threshold": 0.1},
+        {"name": "oi", "metric": "oi_delta", "operator": "between", "threshold": [0.5, -0.2]},
+        {"name": "tf_depth", "metric": "tf:15m:depth", "operator": "<=", "threshold": 1.2},
+        {"name": "tf_field", "side": "BOTH", "metric": "imbalance", "timeframe": "1H", "operator": "!=", "threshold": 0},
+        {"name": "score", "side": "SHORT", "metric": "short_score", "operator": "<", "threshold": 0.9},
+        {"name": "eq", "metric": "liq_norm", "operator": "=", "threshold": "0.25"},
+        {"name": "missing", "metric": "", "operator": ">"},
+        {"name": "unknown_op", "metric": "funding", "operator": "~", "threshold": -0.01, "threshold_max": 0.5},
+    ]
+
+
+def test_compiled_pool_matches_rule_interpretation():
+    ctx = {
+        "cvd_ratio": 0.3,
+        "oi_delta_ratio": 0.1,
+        "liquidity_delta_norm": 0.25,
+        "funding": None,
+        "depth_ratio": 9.0,
+        "timeframes": {"15m": {"depth_ratio": 1.1}, "1h": {"imbalance": 0.0}},
+    }
+    engine = TriggerEngine(signal_pool_config={"enabled": True, "logic": "OR", "edge_trigger_enabled": False, "rules": _pool_rules()})
+    for operation in ("BUY", "SELL"):
+        decision = _Decision(operation, long_score=0.4, short_score=0.7)
+        result = engine.evaluate_signal_pool(
+            symbol="BTCUSDT", trigger_type="signal", market_flow_context=ctx, decision=decision, has_position=False
+        )
+        side = "LONG" if operation == "BUY" else "SHORT"
+        active = [r for r in _pool_rules() if TriggerEngine._normalize_side(r.get("side", "BOTH")) in ("", "BOTH", side)]
+        expected = []
+        for idx, rule in enumerate(active, start=1):
+            if not rule["metric"]:
+                continue
+            threshold = rule.get("threshold")
+            lo, hi = (threshold if isinstance(threshold, list) else (threshold, rule.get("threshold_max")))
+            lo = TriggerEngine._to_float(lo, 0.0)
+            hi = TriggerEngine._to_float(hi, lo) if hi is not None else None
+            value = engine._resolve_metric_value(rule["metric"], ctx, decision, timeframe=rule.get("timeframe"))
+            expected.append((idx, rule["name"], value, TriggerEngine._compare(value, rule["operator"], lo, hi)))
+        got = [(e["index"], e["name"], e["value"], e["passed"]) for e in result["evaluations"]]
+        assert got == expected
+        assert result["side"] == side and result["total_rules"] == len(expected)
+        assert result["pass_count"] == sum(1 for e in expected if e[3])
+        assert result["reason"] == f"logic_or({result['pass_count']}/{len(expected)})"
+
+
+def test_compiled_pool_cache_and_edges_follow_config_object():
+    engine = TriggerEngine()
+    cfg = {"enabled": True, "pool_id": "p1", "symbols": ["btcusdt"], "rules": [{"metric": "cvd", "threshold": 0.1}]}
+    kwargs = dict(trigger_type="signal", decision=_Decision("BUY"), has_position=False, signal_pool_config=cfg)
+
+    assert engine.evaluate_signal_pool(symbol="ETHUSDT", market_flow_context={}, **kwargs)["reason"] == "symbol_not_in_pool_scope"
+    first = engine.evaluate_signal_pool(symbol="BTCUSDT", market_flow_context={"cvd_ratio": 0.2}, **kwargs)
+    assert first["passed"] and first["edge"]["reason"] == "initial_true"
+    assert not engine.evaluate_signal_pool(symbol="BTCUSDT", market_flow_context={"cvd_ratio": 0.2}, **kwargs)["passed"]
+    assert "BTCUSDT:p1:LONG" in engine._condition_state
+    # 同一配置对象只编译一次
+    assert len(engine._compiled_pools) == 2
+
+    # 非开仓操作同步两个方向的边沿为非激活
+    synced = engine.evaluate_signal_pool(
+        symbol="BTCUSDT", market_flow_context={}, **{**kwargs, "decision": _Decision("HOLD")}
+    )
+    assert synced["edge_sync"]["LONG"]["reason"] == "falling_edge"
+
+    # 热更新后重新编译并重置边沿状态
+    engine.set_signal_pool_config({"enabled": False})
+    assert engine._condition_state == {} and len(engine._compiled_pools) == 1
+    assert engine.evaluate_signal_pool(
+        symbol="BTCUSDT", trigger_type="signal", market_flow_context={}, decision=_Decision("BUY"), has_position=False
+    )["reason"] == "signal_pool_disabled"
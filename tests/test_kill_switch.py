@@ -0,0 +1,125 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from src.trading.kill_switch import KillSwitchExecutor
+
+
+class _FakeClient:
+    def __init__(self, delay=0.0, hedge=True, reject_modes=(), fail_symbols=()):
+        self.delay = delay
+        self.fail_symbols = set(fail_symbols)
+        self.reject_modes = set(reject_modes)
+        self.hedge_queries = 0
+        self.orders = []
+        self.cancels = []
+        self._lock = threading.Lock()
+        warmed = []
+
+        def get_hedge_mode():
+            self.hedge_queries += 1
+            return hedge
+
+        self.broker = SimpleNamespace(
+            get_hedge_mode=get_hedge_mode,
+            market=SimpleNamespace(warm_symbol_info=lambda symbols: warmed.extend(symbols) or len(symbols)),
+        )
+        self.warmed = warmed
+
+    def format_quantity(self, symbol, qty):
+        return round(qty, 3)
+
+    def _execute_order_v2(self, params, side, reduce_only):
+        time.sleep(self.delay)
+        with self._lock:
+            self.orders.append((params["symbol"], side, dict(params)))
+        if params["symbol"] in self.fail_symbols:
+            raise RuntimeError("Service unavailable")
+        if params.get("closePosition") and "close" in self.reject_modes:
+            return {"code": -2022, "msg": "ReduceOnly Order is rejected."}
+        return {"orderId": len(self.orders), "status": "FILLED"}
+
+    def cancel_all_conditional_orders(self, symbol):
+        time.sleep(self.delay)
+        with self._lock:
+            self.cancels.append(("conditional", symbol))
+        return {"code": 200}
+
+    def cancel_all_open_orders(self, symbol):
+        with self._lock:
+            self.cancels.append(("open", symbol))
+        return {"code": 200}
+
+
+def test_warm_caches_hedge_mode_and_filters():
+    client = _FakeClient(hedge=True)
+    ks = KillSwitchExecutor(client)
+    warm = ks.warm(["BTCUSDT", "ETHUSDT"])
+    assert warm == {"hedge_mode": True, "symbols_warmed": 2}
+
+    result = ks.flatten_position("BTCUSDT", "LONG", 0.5)
+    assert result["status"] == "success"
+    assert result["mode"] == "close_position"
+    assert result["latency_ms"] >= 0
+    assert client.hedge_queries == 1
+    assert client.orders[0][2]["positionSide"] == "LONG"
+    ks.shutdown()
+
+
+def test_flatten_falls_back_to_reduce_only_market():
+    client = _FakeClient(hedge=False, reject_modes=("close",))
+    ks = KillSwitchExecutor(client)
+    ks.warm([])
+    result = ks.flatten_position("ETHUSDT", "SHORT", 2.0)
+    assert result["status"] == "success"
+    assert result["mode"] == "reduce_only_market"
+    assert [o[1] for o in client.orders] == ["BUY", "BUY"]
+    ks.shutdown()
+
+
+def test_flatten_all_fans_out_closes_and_cancels_concurrently():
+    client = _FakeClient(delay=0.15, hedge=False)
+    ks = KillSwitchExecutor(client, {"max_workers": 8})
+    ks.warm([])
+    targets = [{"symbol": s, "side": "LONG", "amount": 1.0} for s in ("BTCUSDT", "ETHUSDT", "SOLUSDT", "BNBUSDT")]
+    started = time.perf_counter()
+    report = ks.flatten_all(targets, reason="test")
+    elapsed = time.perf_counter() - started
+
+    assert report["closed"] == 4 and report["failed"] == 0
+    assert elapsed < 0.15 * 4 * 0.75
+    assert {c[1] for c in client.cancels if c[0] == "conditional"} == {t["symbol"] for t in targets}
+    assert all(r[0]["latency_ms"] > 0 for r in report["results"].values())
+    ks.shutdown()
+
+
+def test_flatten_all_keeps_protective_orders_when_close_fails():
+    client = _FakeClient(hedge=True, fail_symbols=("ETHUSDT",))
+    ks = KillSwitchExecutor(client)
+    ks.warm([])
+    targets = [
+        {"symbol": "BTCUSDT", "side": "LONG", "amount": 1.0},
+        {"symbol": "ETHUSDT", "side": "LONG", "amount": 1.0},
+        {"symbol": "SOLUSDT", "side": "LONG", "amount": 1.0, "reduce_ratio": 0.5},
+    ]
+    report = ks.flatten_all(targets, reason="test", confirm_closed=lambda symbol: False)
+
+    assert report["closed"] == 2 and report["failed"] == 1
+    # 只有平仓确认成交的 symbol 撤销保护单；失败与部分减仓的保留
+    assert {c[1] for c in client.cancels} == {"BTCUSDT"}
+    assert "skipped" in report["cancels"]["ETHUSDT"] and "skipped" in report["cancels"]["SOLUSDT"]
+    ks.shutdown()
+
+
+def test_submit_runs_outside_caller_and_drain_collects_results():
+    client = _FakeClient(delay=0.05, hedge=False)
+    ks = KillSwitchExecutor(client)
+    ks.warm([])
+    seen = []
+    ks.submit("BTCUSDT", "LONG", 1.0, callback=seen.append)
+    assert seen == []
+    done = ks.drain(timeout=2.0)
+    assert [r["symbol"] for r in done] == ["BTCUSDT"]
+    assert seen and seen[0]["status"] == "success"
+    assert ks.drain() == []
+    ks.shutdown()
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+from src.data.kline_store import KlineStore, frame_to_block
+from src.data.klines_downloader import load_from_store
+
+STEP = 300_000  # 5m
+# 2024-01-31 23:00 UTC，跨月边界
+BASE = 1706742000000
+
+
+def _block(start, n, price=1.0):
+    ts = start + STEP * np.arange(n, dtype=np.float64)
+    px = np.full(n, price)
+    return np.vstack([ts, px, px + 1, px - 1, px, np.arange(n, dtype=np.float64)])
+
+
+def test_append_dedupes_and_partitions_by_month(tmp_path):
+    store = KlineStore(str(tmp_path))
+    assert store.append("btcusdt", "5m", _block(BASE, 24)) == 24
+    # 重叠写入：只新增 6 根，重叠部分以新数据为准
+    assert store.append("BTCUSDT", "5m", _block(BASE + STEP * 18, 12, price=2.0)) == 6
+
+    manifest = store.read_manifest("BTCUSDT", "5m")
+    assert sorted(manifest["partitions"]) == ["2024-01", "2024-02"]
+    assert sum(p["rows"] for p in manifest["partitions"].values()) == 30
+
+    arr = store.load_array("BTCUSDT", "5m")
+    assert arr.shape == (6, 30)
+    assert np.all(np.diff(arr[0]) == STEP)
+    assert arr[4, 17] == 1.0 and arr[4, 18] == 2.0
+
+
+def test_single_partition_load_is_memory_mapped(tmp_path):
+    store = KlineStore(str(tmp_path))
+    start = BASE + STEP * 24  # 全部落在 2024-02
+    store.append("ETHUSDT", "5m", _block(start, 10))
+    arr = store.load_array("ETHUSDT", "5m", start_ms=start + STEP * 2, end_ms=start + STEP * 5)
+    assert isinstance(arr.base, np.memmap) or isinstance(arr, np.memmap)
+    assert arr.shape[1] == 4
+
+    df = store.load_frame("ETHUSDT", "5m")
+    assert list(df.columns) == ["open", "high", "low", "close", "volume"]
+    assert df.index.name == "timestamp"
+    assert df.index[0] == pd.Timestamp(start, unit="ms")
+    assert np.allclose(frame_to_block(df), store.load_array("ETHUSDT", "5m"))
+
+
+def test_missing_ranges_cover_head_gaps_and_tail(tmp_path):
+    store = KlineStore(str(tmp_path))
+    store.append("SOLUSDT", "5m", _block(BASE + STEP * 10, 5))
+    store.append("SOLUSDT", "5m", _block(BASE + STEP * 20, 5))
+
+    assert store.find_gaps("SOLUSDT", "5m") == [(BASE + STEP * 15, BASE + STEP * 19)]
+    missing = store.missing_ranges("SOLUSDT", "5m", BASE, BASE + STEP * 40)
+    assert missing == [
+        (BASE, BASE + STEP * 9),
+        (BASE + STEP * 15, BASE + STEP * 19),
+        (BASE + STEP * 25, BASE + STEP * 40),
+    ]
+
+    # 上市前区间标记为无数据后不再补拉；尾部不足两根视为已覆盖
+    store.mark_empty("SOLUSDT", "5m", BASE, BASE + STEP * 9)
+    assert store.missing_ranges("SOLUSDT", "5m", BASE, BASE + STEP * 25) == [
+        (BASE + STEP * 15, BASE + STEP * 19),
+    ]
+
+
+def test_load_from_store_imports_legacy_csv_offline(tmp_path):
+    now_ms = (int(pd.Timestamp.now(tz="UTC").timestamp() * 1000) // STEP) * STEP
+    index = pd.to_datetime(now_ms - STEP * np.arange(50)[::-1], unit="ms")
+    legacy = pd.DataFrame(
+        {"open": 1.0, "high": 2.0, "low": 0.5, "close": 1.5, "volume": 10.0},
+        index=pd.DatetimeIndex(index, name="timestamp"),
+    )
+    legacy.to_csv(tmp_path / "BNBUSDT_5m_1d.csv", index_label="timestamp")
+
+    df, series_dir = load_from_store("BNBUSDT", "5m", 1, data_dir=str(tmp_path), offline=True)
+    assert len(df) == 50
+    assert df["close"].iloc[-1] == 1.5
+    assert series_dir.endswith("5m")
+    assert KlineStore(str(tmp_path / "klines")).coverage("BNBUSDT", "5m") == (int(index[0].value // 1_000_000), now_ms)
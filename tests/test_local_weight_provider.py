@@ -0,0 +1,88 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.fund_flow.ai_weight_service import DeepSeekAIService
+from src.fund_flow.local_weight_provider import LocalWeightProvider, build_compact_prompt, estimate_tokens
+
+WEIGHTS = {
+    "cvd": 0.2, "cvd_momentum": 0.1, "oi_delta": 0.2, "funding": 0.1,
+    "depth_ratio": 0.1, "imbalance": 0.1, "liquidity_delta": 0.1, "micro_delta": 0.1,
+}
+
+
+class _StubModel:
+    """本地 OpenAI 兼容服务桩：按脚本依次返回 (status, content)"""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.bodies = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):  # noqa: N802
+                stub.bodies.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+                status, content = stub.replies.pop(0) if stub.replies else (500, "")
+                body = json.dumps({"choices": [{"message": {"content": content}}]}).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                return
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+
+def _context():
+    history = [{"cvd": i * 0.1, "oi_delta": -i * 0.1} for i in range(8)]
+    return {"cvd_ratio": 0.3, "oi_delta_ratio": 0.1, "timeframes": {"15m": {"history": history, "adx": 25}, "5m": {}, "3m": {}}}
+
+
+def _service(stub, **extra):
+    cfg = {"enabled": True, "provider": "local", "local": {"base_url": stub.base_url, "model": "stub", "timeout": 2}}
+    cfg.update(extra)
+    return DeepSeekAIService({"deepseek_ai": cfg})
+
+
+def test_local_provider_serves_weights_then_stale_on_failure():
+    ok = json.dumps({"weights": WEIGHTS, "confidence": 0.7, "fallback_used": False})
+    stub = _StubModel([(200, ok), (200, "not json")])
+    service = _service(stub, stale_fallback_ttl=600, cache_ttl=1)
+    assert service.enabled
+
+    first = service.get_weights("BTCUSDT", "TREND", _context())
+    assert not first.fallback_used and first.confidence == 0.7
+    body = stub.bodies[0]
+    assert body["model"] == "stub" and body["response_format"]["type"] == "json_schema"
+    assert json.loads(body["messages"][1]["content"])["symbol"] == "BTCUSDT"
+
+    # 结构化缓存失效后再次请求：本地模型输出非法，沿用最近一次有效权重
+    service.clear_cache()
+    second = service.get_weights("BTCUSDT", "TREND", _context())
+    assert second is first
+    stats = service.get_stats()
+    assert stats["stale_served"] == 1 and stats["fallbacks"] == 0 and stats["local"]["calls"] == 2
+
+    # 无有效权重可沿用（其它 symbol）时降级为默认权重
+    third = service.get_weights("ETHUSDT", "TREND", _context())
+    assert third.fallback_used and third.error.startswith("api_error:http_error:500")
+    stub.server.shutdown()
+
+
+def test_schema_downgrade_and_prompt_budget():
+    ok = json.dumps({"weights": WEIGHTS, "confidence": 0.5, "fallback_used": False})
+    stub = _StubModel([(400, ""), (200, ok)])
+    provider = LocalWeightProvider({"base_url": stub.base_url, "timeout": 2, "max_prompt_tokens": 64})
+    success, content, error = provider.call({"symbol": "BTCUSDT", "flow": {"cvd": 1.0}, "capture": {"x" * 400: 1}})
+    assert success and not error and json.loads(content)["confidence"] == 0.5
+    assert "response_format" in stub.bodies[0] and "response_format" not in stub.bodies[1]
+    assert provider.get_stats()["schema_downgrades"] == 1 and provider.get_stats()["trimmed_prompts"] == 1
+    assert "capture" not in stub.bodies[1]["messages"][1]["content"]
+    stub.server.shutdown()
+
+    prompt, trimmed = build_compact_prompt({"symbol": "BTC", "tech": {"ma": "UP" * 200}, "micro": {"s": 1}}, 10_000)
+    assert trimmed == [] and estimate_tokens(prompt) < 10_000
@@ -0,0 +1,118 @@
+import threading
+import time
+
+from src.fund_flow.deepseek_weight_router import DeepSeekWeightRouter, WeightMap
+from src.fund_flow.lru_cache import LRUTTLCache, SQLiteCacheTier
+from src.fund_flow.market_storage import MarketStorage
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUTTLCache(max_entries=3, default_ttl=60)
+    for key in ("a", "b", "c"):
+        cache.set(key, key.upper())
+    assert cache.get("a") == "A"  # a 变为最近访问
+    cache.set("d", "D")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["size"] == 3
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+
+def test_ttl_expires_lazily():
+    cache = LRUTTLCache(max_entries=10)
+    cache.set("k", 1, ttl_seconds=0.05)
+    cache.set("forever", 2)
+    time.sleep(0.08)
+    assert cache.get("k") is None
+    assert cache.get("forever") == 2
+    assert cache.stats()["expirations"] == 1
+
+
+def test_write_behind_tier_survives_restart(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    first = LRUTTLCache(max_entries=2, tier=SQLiteCacheTier(db_path), flush_batch_size=100)
+    first.set("x", {"v": 1}, ttl_seconds=60)
+    first.set("y", {"v": 2}, ttl_seconds=60)
+    first.set("z", {"v": 3}, ttl_seconds=60)
+    # x 已被淘汰但仍在写后队列中
+    assert first.get("x") == {"v": 1}
+    assert first.stats()["pending_writes"] == 3
+    assert first.flush() == 3
+
+    second = LRUTTLCache(max_entries=2, tier=SQLiteCacheTier(db_path))
+    assert second.get("z") == {"v": 3}
+    assert second.stats()["tier_hits"] == 1
+
+    # 删除同时作用于持久层：内存未命中时不会回读已删除条目
+    assert second.delete("y") and second.get("y") is None
+    assert LRUTTLCache(max_entries=2, tier=SQLiteCacheTier(db_path)).get("y") is None
+
+
+def test_set_never_writes_tier_on_caller_thread(tmp_path):
+    class _SlowTier(SQLiteCacheTier):
+        def __init__(self, path):
+            super().__init__(path)
+            self.writer_threads = []
+            self.release = threading.Event()
+
+        def store_many(self, items):
+            self.writer_threads.append(threading.current_thread().name)
+            self.release.wait(2)
+            return super().store_many(items)
+
+    tier = _SlowTier(str(tmp_path / "cache.db"))
+    cache = LRUTTLCache(max_entries=10, tier=tier, flush_batch_size=2, flush_interval_seconds=0)
+    started = time.perf_counter()
+    for i in range(6):
+        cache.set(f"k{i}", i, ttl_seconds=60)
+    # 落盘阻塞时 set 仍立即返回：写入只入队，由后台线程落盘
+    assert time.perf_counter() - started < 0.5
+    deadline = time.time() + 2
+    while not tier.writer_threads and time.time() < deadline:
+        time.sleep(0.01)
+    assert tier.writer_threads[0] == "lru-cache-flush"
+    tier.release.set()
+    # 关闭时停止后台线程并落盘剩余队列
+    cache.close()
+    assert cache.stats()["pending_writes"] == 0
+    assert LRUTTLCache(max_entries=10, tier=SQLiteCacheTier(tier.db_path)).get("k5") == 5
+
+
+def test_deepseek_router_cache_persists_weight_maps(tmp_path):
+    cfg = {
+        "deepseek_weight_router": {
+            "enabled": True,
+            "cache_max_entries": 10,
+            "cache_persist_path": str(tmp_path / "weights.db"),
+        }
+    }
+    router = DeepSeekWeightRouter(cfg)
+    router._set_cache("key", "BTCUSDT", "TREND", WeightMap(confidence=0.7, reason="ai_weight_router"))
+    router.shutdown()
+
+    restored = DeepSeekWeightRouter(cfg)._get_cached("key")
+    assert isinstance(restored, WeightMap)
+    assert restored.confidence == 0.7
+    assert restored.reason == "ai_weight_router"
+
+
+def test_market_storage_weight_cache_read_filters_expired(tmp_path):
+    storage = MarketStorage(str(tmp_path / "market.db"))
+    common = dict(
+        symbol="BTCUSDT",
+        regime="TREND",
+        timestamp="2026-01-01T00:00:00Z",
+        weights={"cvd": 1.0},
+        confidence=0.5,
+        fallback_used=False,
+    )
+    storage.save_weight_router_cache(cache_key="live", ttl_seconds=600, **common)
+    storage.save_weight_router_cache(cache_key="dead", ttl_seconds=-10, **common)
+
+    assert storage.get_weight_router_cache("dead") is None
+    assert storage.get_weight_router_cache("live")["weights"] == {"cvd": 1.0}
+    assert storage.cleanup_weight_router_cache() == 1
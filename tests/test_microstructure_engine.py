@@ -0,0 +1,162 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.microstructure_engine import AGG_TRADES_PAGE_LIMIT, MicrostructureEngine
+
+
+class _FakeAggTrades:
+    """按 ID 递增的成交流；记录每次请求参数"""
+
+    def __init__(self):
+        self.trades = []
+        self.calls = []
+
+    def add(self, n, price=100.0, qty=1.0, maker=False, ts=None):
+        start = len(self.trades) + 1
+        for i in range(n):
+            trade = {"a": start + i, "p": str(price), "q": str(qty), "m": maker}
+            if ts is not None:
+                trade["T"] = ts
+            self.trades.append(trade)
+
+    def __call__(self, sym, from_id=None, start_time=None, end_time=None, limit=500):
+        self.calls.append({"from_id": from_id, "start_time": start_time, "limit": limit})
+        if from_id is None:
+            return self.trades[-limit:]
+        return [t for t in self.trades if t["a"] >= from_id][:limit]
+
+
+def test_pull_trades_is_incremental_by_from_id():
+    feed = _FakeAggTrades()
+    feed.add(3, price=100.0, qty=2.0)
+    engine = MicrostructureEngine(feed, max_pages=3)
+
+    first = engine.pull_trades("BTCUSDT", start_ms=0, end_ms=15_000)
+    assert first["buy_quote"] == 600.0 and first["last_trade_id"] == 3
+    assert feed.calls[-1]["from_id"] is None
+
+    # 没有新成交：按 fromId 只拿到空页，不重复计数
+    assert engine.pull_trades("BTCUSDT", start_ms=15_000, end_ms=30_000)["trade_count"] == 0
+    assert feed.calls[-1]["from_id"] == 4
+
+    # 积压超过一页时翻页，直到拿到不满页
+    feed.add(AGG_TRADES_PAGE_LIMIT + 5, price=10.0, qty=1.0, maker=True)
+    flow = engine.pull_trades("BTCUSDT", start_ms=30_000, end_ms=45_000)
+    assert flow["trade_count"] == AGG_TRADES_PAGE_LIMIT + 5 and flow["buy_quote"] == 0.0
+    assert [c["from_id"] for c in feed.calls[-2:]] == [4, 4 + AGG_TRADES_PAGE_LIMIT]
+
+    # 游标过旧（长时间未采样）时改回时间窗口引导
+    feed.add(2)
+    engine.pull_trades("BTCUSDT", start_ms=900_000, end_ms=915_000)
+    assert feed.calls[-1]["from_id"] is None and feed.calls[-1]["start_time"] == 900_000
+    stats = engine.get_stats()
+    assert stats["bootstraps"] == 2 and stats["incremental_pulls"] == 2 and stats["cursors"]["BTCUSDT"] == len(feed.trades)
+
+
+def test_pull_trades_skips_ahead_when_cursor_cannot_catch_up():
+    feed = _FakeAggTrades()
+    feed.add(1, ts=1_000)
+    engine = MicrostructureEngine(feed, max_pages=2)
+    engine.pull_trades("BTCUSDT", start_ms=0, end_ms=15_000)
+
+    # 一个采样间隔内成交超过 max_pages 页：翻满两页后最后成交仍早于 start_ms
+    feed.add(3 * AGG_TRADES_PAGE_LIMIT, ts=12_000)
+    feed.add(10, price=50.0, qty=1.0, ts=29_000)
+    flow = engine.pull_trades("BTCUSDT", start_ms=15_000, end_ms=30_000)
+    assert flow["skipped_ahead"]
+    assert [c["from_id"] for c in feed.calls[-3:]] == [2, 2 + AGG_TRADES_PAGE_LIMIT, None]
+    # 只统计最新一页中本窗口内的成交，游标跳到最新
+    assert flow["trade_count"] == 10 and flow["buy_quote"] == 500.0
+    assert flow["last_trade_id"] == len(feed.trades)
+
+    feed.add(2, ts=31_000)
+    flow = engine.pull_trades("BTCUSDT", start_ms=30_000, end_ms=45_000)
+    assert flow["trade_count"] == 2 and not flow["skipped_ahead"]
+    assert engine.get_stats()["skip_aheads"] == 1
+
+
+def _entry(rng, ts):
+    mid = 100.0 + rng.uniform(-1, 1)
+    trap = rng.random() < 0.4
+    return {
+        "ts": ts,
+        "mid": mid,
+        "microprice": mid * (1 + rng.uniform(-1e-4, 1e-4)),
+        "spread": rng.choice([rng.uniform(0, 0.002), 0.0005]),
+        "book_imb": rng.uniform(-0.8, 0.8),
+        "depth_ratio": rng.uniform(0.5, 1.5),
+        "buy_quote": rng.uniform(0, 1e5),
+        "sell_quote": rng.uniform(0, 1e5),
+        "phantom_bid": rng.uniform(0, 1e4),
+        "phantom_ask": rng.uniform(0, 1e4),
+        "trap_flag": trap,
+        "trap_reason": f"r{int(ts)}" if trap else "-",
+        "trap_score": rng.uniform(0.3, 0.7) if trap else rng.uniform(0, 0.3),
+    }
+
+
+def _reference_aggregate(ring, horizon, now_ts, threshold):
+    items = [x for x in ring if (now_ts - x["ts"]) <= horizon]
+    if not items:
+        return None
+    buy, sell = sum(x["buy_quote"] for x in items), sum(x["sell_quote"] for x in items)
+    trap_score = max(x["trap_score"] for x in items)
+    hits = sum(1 for x in items if x["trap_flag"])
+    reason = next((x["trap_reason"] for x in reversed(items) if x["trap_flag"]), "-")
+    return {
+        "trade_imb": (buy - sell) / (buy + sell),
+        "book_imb": float(pd.Series([x["book_imb"] for x in items]).median()),
+        "micro_bias": float(pd.Series([(x["microprice"] - x["mid"]) / x["mid"] for x in items]).median()),
+        "depth_ratio": float(pd.Series([x["depth_ratio"] for x in items]).median()),
+        "spread_max": max(x["spread"] for x in items),
+        "phantom_bid": sum(x["phantom_bid"] for x in items),
+        "trap_score": trap_score,
+        "trap_hits": hits,
+        "trap_flag": trap_score >= threshold or hits >= max(2, int(len(items) * 0.4)),
+        "trap_reason": reason,
+    }
+
+
+def test_rolling_windows_match_full_ring_scan():
+    rng = random.Random(5)
+    engine = MicrostructureEngine(lambda *a, **k: [])
+    ring_maxlen = 30
+    ts = 1_000.0
+    for step in range(160):
+        ts += rng.choice([15.0, 15.0, 16.0, 40.0])
+        engine.record("ETHUSDT", _entry(rng, ts), ring_maxlen)
+        ring = list(engine.rings["ETHUSDT"])
+        assert len(ring) == min(step + 1, ring_maxlen)
+        now_ts = ts + rng.uniform(0, 10)
+        for horizon in (60, 300):
+            got = engine.aggregate("ETHUSDT", horizon, now_ts, 0.55)
+            want = _reference_aggregate(ring, horizon, now_ts, 0.55)
+            if want is None:
+                assert got is None
+                continue
+            for key, value in want.items():
+                assert got[key] == (pytest.approx(value, rel=1e-9, abs=1e-9) if isinstance(value, float) else value), key
+
+        window = [x for x in ring if (now_ts - x["ts"]) <= 600]
+        quantiles = engine.adaptive_quantiles("ETHUSDT", 600, 0.9, 0.85, now_ts)
+        if len(window) < 8:
+            assert quantiles is None
+        else:
+            assert quantiles[0] == pytest.approx(float(np.quantile([x["spread"] for x in window], 0.9)))
+            assert quantiles[1] == pytest.approx(float(np.quantile([abs(x["book_imb"]) for x in window], 0.85)))
+
+        streak = 0
+        prev_ts = None
+        for x in reversed(ring):
+            if not x["trap_flag"] or (now_ts - x["ts"]) > 2 * 15 * 1.8:
+                break
+            if streak and abs(prev_ts - x["ts"]) > 15 * 2.2:
+                break
+            prev_ts = x["ts"]
+            streak += 1
+            if streak >= 2:
+                break
+        assert engine.consecutive_trap("ETHUSDT", 2, 15, now_ts) == (streak >= 2, streak)
@@ -0,0 +1,79 @@
+from tools.backtest.param_search import (
+    halton,
+    hyperband,
+    rung_budgets,
+    sample_space,
+    successive_halving,
+)
+
+SPACE = {
+    "take_profit_pct": [0.010, 0.015, 0.020, 0.025, 0.030],
+    "max_dca": [1, 2, 3, 4],
+    "score_threshold": [0.04, 0.06, 0.08, 0.10],
+}
+
+
+def _evaluate_factory(calls):
+    """合成回测：收益随预算线性累积；max_dca=4 的候选早期回撤即爆表"""
+
+    def evaluate(params, frac):
+        calls.append((tuple(params.values()), frac))
+        quality = params["take_profit_pct"] * 1000 - abs(params["score_threshold"] - 0.06) * 100 + params["max_dca"]
+        dd = 35.0 if params["max_dca"] == 4 else 5.0 + params["score_threshold"] * 10
+        return {"total_return_pct": quality * frac * 10, "max_drawdown_pct": dd, "total_trades": 100 * frac}
+
+    return evaluate
+
+
+def test_samplers_cover_space_without_duplicates():
+    pts = halton(50, 3)
+    assert all(0.0 <= v < 1.0 for p in pts for v in p)
+    assert len({tuple(p) for p in pts}) == 50
+
+    grid = sample_space(SPACE, method="grid")
+    assert len(grid) == 5 * 4 * 4
+    for method in ("halton", "random"):
+        cands = sample_space(SPACE, 40, method, seed=1)
+        keys = [tuple(c.values()) for c in cands]
+        assert len(keys) == len(set(keys))
+        assert all(c["max_dca"] in SPACE["max_dca"] for c in cands)
+
+
+def test_rung_budgets_end_at_full_history():
+    assert rung_budgets(1.0 / 9.0, 3) == [round(1 / 9, 6), round(1 / 3, 6), 1.0]
+    assert rung_budgets(1.0, 3) == [1.0]
+
+
+def test_successive_halving_finds_grid_winner_with_less_compute():
+    calls = []
+    grid = sample_space(SPACE, method="grid")
+    statuses = []
+    outcome = successive_halving(
+        grid,
+        _evaluate_factory(calls),
+        rung_budgets(1.0 / 9.0, 3),
+        eta=3,
+        max_drawdown_pct=20.0,
+        on_result=lambda p, f, m, s: statuses.append((p["max_dca"], s)),
+    )
+    final = sorted(outcome["final"], key=lambda x: x[1]["total_return_pct"], reverse=True)
+    assert final[0][0] == {"take_profit_pct": 0.030, "max_dca": 3, "score_threshold": 0.06}
+    # 回撤越界的候选在第一档即被剪枝
+    assert all(s == "pruned" for dca, s in statuses if dca == 4)
+    assert outcome["budget_used"] < len(grid) * 0.35
+    assert outcome["evaluations"] == len(calls)
+
+
+def test_hyperband_runs_all_brackets():
+    calls = []
+    outcome = hyperband(
+        lambda n, b: sample_space(SPACE, n, "halton", seed=b * 100),
+        _evaluate_factory(calls),
+        min_fraction=1.0 / 9.0,
+        eta=3,
+        max_drawdown_pct=20.0,
+    )
+    assert {f for _, f in calls} == {round(1 / 9, 6), round(1 / 3, 6), 1.0}
+    assert outcome["final"]
+    # 全历史一档不剪枝（结果照常写入 CSV，由网格筛选条件判定）
+    assert len(outcome["final"]) == sum(1 for _, f in calls if f == 1.0)
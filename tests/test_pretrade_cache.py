@@ -0,0 +1,167 @@
+import pytest
+
+from src.trading.order_gateway import OrderGateway
+
+
+class _Resp:
+    def __init__(self, data, status_code=200):
+        self._data = data
+        self.status_code = status_code
+        self.text = str(data)
+
+    def json(self):
+        return self._data
+
+
+class _Positions:
+    def __init__(self, rows):
+        self.rows = rows
+        self.fetches = 0
+
+    def get_positions(self):
+        self.fetches += 1
+        return [dict(r) for r in self.rows]
+
+
+class _Broker:
+    MARKET_BASE = "https://fapi.binance.com"
+    FAPI_BASE = "https://fapi.binance.com"
+    PAPI_BASE = "https://papi.binance.com"
+
+    def __init__(self, rows, fail_order=False, notify_writes=True):
+        self.position = _Positions(rows)
+        self.fail_order = fail_order
+        self.notify_writes = notify_writes
+        self.requests = []
+        self.order = None
+
+    def get_hedge_mode(self):
+        return True
+
+    def calculate_position_side(self, side, reduce_only):
+        if side.upper() == "BUY":
+            return "SHORT" if reduce_only else "LONG"
+        return "LONG" if reduce_only else "SHORT"
+
+    def is_papi_only(self):
+        return False
+
+    def format_quantity(self, symbol, qty):
+        return round(qty, 3)
+
+    def ensure_min_notional_quantity(self, symbol, qty, price):
+        return max(qty, round(5.2 / price, 3))
+
+    def request(self, method, url, params=None, signed=False, allow_error=False, close_request=False):
+        self.requests.append((method, url.split("binance.com")[1], dict(params or {})))
+        if url.endswith("/premiumIndex"):
+            return _Resp({"symbol": params["symbol"], "markPrice": "100.0"})
+        if url.endswith("/order") and method == "POST":
+            # 与 BinanceBroker 一致：写请求完成后通知监听者
+            if self.notify_writes:
+                self.order.pretrade.on_write(method, url, params)
+            if self.fail_order:
+                return _Resp({"code": -2019, "msg": "Margin is insufficient."}, status_code=400)
+            return _Resp({"orderId": len(self.requests), "status": "NEW"})
+        raise AssertionError(f"unexpected request {method} {url}")
+
+
+def _gateway(rows, **kwargs):
+    broker = _Broker(rows, **kwargs)
+    gateway = OrderGateway(broker)
+    broker.order = gateway
+    return broker, gateway
+
+
+def test_open_uses_cached_price_and_single_position_fetch():
+    broker, gw = _gateway([{"symbol": "ETHUSDT", "positionSide": "LONG", "positionAmt": "0", "markPrice": "0"}])
+    gw.pretrade.mark_decision("BTCUSDT", price=101.0)
+    gw.place_standard_order("BTCUSDT", "BUY", {"symbol": "BTCUSDT", "quantity": 0.01})
+
+    assert broker.position.fetches == 1
+    # 决策价格命中缓存，不再请求行情；数量按最小名义额在本地放大
+    assert [r[1] for r in broker.requests] == ["/fapi/v1/order"]
+    assert broker.requests[0][2]["quantity"] == 0.051
+    stats = gw.pretrade.get_stats()
+    assert stats["decision_to_submit_ms"]["count"] == 1 and stats["pretrade_ms"]["count"] == 1
+
+    # L1 时间锁仍然生效
+    with pytest.raises(RuntimeError, match="within 20s lock"):
+        gw.place_standard_order("BTCUSDT", "BUY", {"symbol": "BTCUSDT", "quantity": 0.01})
+
+    # 下单后持仓快照已失效：L2 重新拉取并看到交易所上的新持仓
+    broker.position.rows.append({"symbol": "SOLUSDT", "positionSide": "SHORT", "positionAmt": "-3"})
+    with pytest.raises(RuntimeError, match="already has open position"):
+        gw.place_standard_order("SOLUSDT", "SELL", {"symbol": "SOLUSDT", "quantity": 1})
+    assert broker.position.fetches == 2
+    # 未命中缓存的标记价格按 symbol 拉 premiumIndex
+    assert gw.pretrade.mark_price("ETHUSDT") == 100.0
+    assert broker.requests[-1][1] == "/fapi/v1/premiumIndex"
+
+
+def test_close_leg_state_reads_live_positions_after_exchange_side_fill():
+    broker, gw = _gateway([{"symbol": "BTCUSDT", "positionSide": "LONG", "positionAmt": "0.5", "markPrice": "100"}])
+    gw.pretrade.position_max_age_seconds = 3600
+    assert gw.pretrade.position("BTCUSDT", side="LONG")["positionAmt"] == "0.5"
+    gw.place_standard_order("BTCUSDT", "SELL", {"symbol": "BTCUSDT", "quantity": 0.8, "positionSide": "LONG"}, reduce_only=True)
+    # 平仓腿解析实时拉取一次（目标腿与任意腿共用这次结果）
+    assert broker.position.fetches == 2
+    method, path, params = broker.requests[-1]
+    assert path == "/fapi/v1/order" and params["quantity"] == 0.5
+
+    # 止损在交易所侧成交：没有写回调，缓存不会失效，平仓仍须看到已平仓
+    broker.position.rows = [{"symbol": "BTCUSDT", "positionSide": "LONG", "positionAmt": "0"}]
+    gw.pretrade.position("BTCUSDT", side="LONG")
+    result = gw.place_standard_order("BTCUSDT", "SELL", {"symbol": "BTCUSDT", "quantity": 0.5, "positionSide": "LONG"}, reduce_only=True)
+    assert result["status"] == "noop"
+    assert broker.position.fetches == 4
+
+
+def test_l2_reads_attached_account_snapshot():
+    broker, gw = _gateway([])
+    snapshot_rows = [{"symbol": "BTCUSDT", "positionSide": "LONG", "positionAmt": "0.1"}]
+    gw.pretrade.attach_position_source(lambda: snapshot_rows)
+    gw.pretrade.observe_price("BTCUSDT", 100.0)
+
+    with pytest.raises(RuntimeError, match="already has open position"):
+        gw.place_standard_order("BTCUSDT", "BUY", {"symbol": "BTCUSDT", "quantity": 0.1})
+    # L2 读周期账户快照，不自建快照也不拉取
+    assert broker.position.fetches == 0
+    assert gw.pretrade.get_stats()["snapshot_reads"] == 1
+    # fresh 读取绕过快照
+    assert gw.pretrade.position("BTCUSDT", side="LONG", fresh=True) is None
+    assert broker.position.fetches == 1
+
+
+def test_l3_rechecks_live_positions_after_reject():
+    broker, gw = _gateway([], fail_order=True, notify_writes=False)
+    gw.pretrade.position_max_age_seconds = 3600
+    gw.pretrade.observe_price("BTCUSDT", 100.0)
+    assert gw.pretrade.position("BTCUSDT", side="LONG") is None
+
+    # 下单被拒但交易所实际已成交：缓存仍认为无仓，L3 必须实时复核
+    broker.position.rows.append({"symbol": "BTCUSDT", "positionSide": "LONG", "positionAmt": "0.1"})
+    result = gw.place_standard_order("BTCUSDT", "BUY", {"symbol": "BTCUSDT", "quantity": 0.1})
+    assert result["warning"] == "order_failed_but_position_exists"
+    assert broker.position.fetches == 2
+
+
+def test_fetch_racing_invalidation_is_not_cached():
+    broker, gw = _gateway([{"symbol": "BTCUSDT", "positionSide": "LONG", "positionAmt": "0"}])
+    gw.pretrade.position_max_age_seconds = 3600
+    fetch = broker.position.get_positions
+
+    def racing_fetch():
+        rows = fetch()
+        # 拉取返回前：另一线程下单成交（写回调失效）
+        broker.position.rows = [{"symbol": "BTCUSDT", "positionSide": "LONG", "positionAmt": "0.2"}]
+        gw.pretrade.on_write("POST", "https://fapi.binance.com/fapi/v1/order", {})
+        return rows
+
+    broker.position.get_positions = racing_fetch
+    assert gw.pretrade.position("BTCUSDT", side="LONG")["positionAmt"] == "0"
+    broker.position.get_positions = fetch
+    # 旧快照未写入缓存：下一次读取重新拉取并看到新持仓
+    assert gw.pretrade.position("BTCUSDT", side="LONG")["positionAmt"] == "0.2"
+    assert broker.position.fetches == 2
+    assert gw.pretrade.get_stats()["stale_fetches_dropped"] == 1
@@ -0,0 +1,107 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from src.api.binance_client import BinanceBroker
+from src.app.sharding import (
+    CoordinatorClient,
+    CoordinatorServer,
+    ShardCoordinator,
+    ShardSpec,
+    estimate_request_weight,
+    shard_symbols,
+)
+
+SYMBOLS = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "BNBUSDT", "XRPUSDT", "DOGEUSDT", "ADAUSDT", "LINKUSDT"]
+
+
+def _cluster(tmp_path, **kwargs):
+    address = str(tmp_path / "coord.sock")
+    coordinator = ShardCoordinator(state_path=str(tmp_path / "state.json"), **kwargs)
+    server = CoordinatorServer(coordinator, address, b"secret").start()
+    clients = [CoordinatorClient(ShardSpec(i, 2, address, b"secret")) for i in range(2)]
+    return coordinator, server, clients
+
+
+def test_shards_partition_symbols_stably():
+    parts = [shard_symbols(SYMBOLS, i, 3) for i in range(3)]
+    assert sorted(sum(parts, [])) == sorted(SYMBOLS)
+    grown = [shard_symbols(SYMBOLS + ["NEWUSDT"], i, 3) for i in range(3)]
+    assert [[s for s in g if s != "NEWUSDT"] for g in grown] == parts
+
+    assert estimate_request_weight("GET", "https://fapi.binance.com/fapi/v1/klines", {"limit": 1000}) == 5
+    assert estimate_request_weight("GET", "https://fapi.binance.com/fapi/v1/depth", {"limit": 20}) == 2
+    assert estimate_request_weight("GET", "https://fapi.binance.com/fapi/v1/openOrders", {}) == 40
+    assert estimate_request_weight("GET", "https://fapi.binance.com/fapi/v1/openOrders", {"symbol": "BTCUSDT"}) == 1
+    assert estimate_request_weight("POST", "https://fapi.binance.com/fapi/v1/order", {"symbol": "BTCUSDT"}) == 0
+
+
+def test_slots_and_risk_guard_are_account_wide(tmp_path):
+    coordinator, server, (a, b) = _cluster(tmp_path)
+    try:
+        a.call("sync_positions", ["BTCUSDT"])
+        assert a.call("reserve_slot", "ETHUSDT", 2) is True
+        assert b.call("reserve_slot", "SOLUSDT", 2) is False
+        assert b.call("reserve_slot", "ETHUSDT", 2) is False
+        a.call("release_slot", "ETHUSDT")
+        assert b.call("reserve_slot", "SOLUSDT", 2) is True
+
+        # worker 断开后其预占自动释放
+        b.close()
+        deadline = time.time() + 5
+        while coordinator.snapshot()["reserved"] and time.time() < deadline:
+            time.sleep(0.02)
+        assert a.call("reserve_slot", "XRPUSDT", 2) is True
+
+        cfg = {"enabled": True, "max_daily_loss_pct": 0.1, "daily_loss_cooldown_seconds": 600, "max_consecutive_losses": 2}
+        assert a.call("risk_guard", 1000.0, cfg)["blocked"] is False
+        tripped = a.call("risk_guard", 880.0, cfg)
+        assert tripped["blocked"] and tripped["reason"] == "daily_loss" and tripped["kill_switch_owner"]
+        assert a.call("risk_guard", 870.0, cfg)["kill_switch_owner"] is False
+    finally:
+        a.close()
+        server.close()
+
+    # 风控状态落盘，协调进程重启后延续冷却
+    assert ShardCoordinator(state_path=str(tmp_path / "state.json")).snapshot()["risk"]["cooldown_reason"] == "daily_loss"
+
+
+def test_broker_gate_serializes_writes_across_workers(tmp_path):
+    coordinator, server, (a, b) = _cluster(tmp_path, weight_per_minute=6000)
+    in_flight, peak, lock = [0], [0], threading.Lock()
+
+    def _send(*args, **kwargs):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.05)
+        with lock:
+            in_flight[0] -= 1
+        return SimpleNamespace(headers={"X-MBX-USED-WEIGHT-1M": "10"})
+
+    def _broker(gate):
+        broker = BinanceBroker.__new__(BinanceBroker)
+        broker._write_listeners = []
+        broker._request_gate = gate
+        broker._send_request = _send
+        return broker
+
+    brokers = [_broker(a), _broker(a), _broker(b)]
+    threads = [
+        threading.Thread(target=br.request, args=("POST", "https://fapi.binance.com/fapi/v1/order"), kwargs={"signed": True})
+        for br in brokers
+    ]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=10)
+        _broker(b).request("GET", "https://fapi.binance.com/fapi/v1/klines", params={"limit": 1000})
+        snap = coordinator.snapshot()
+    finally:
+        a.close()
+        b.close()
+        server.close()
+    assert peak[0] == 1
+    assert snap["orders"] == 3 and snap["order_owner"] is None
+    assert snap["weight_acquired"] == 5
@@ -0,0 +1,59 @@
+import json
+import os
+
+from src.utils.state_writer import DebouncedStateWriter
+
+
+def test_state_writer_coalesces_and_flushes_on_boundaries(tmp_path):
+    path = tmp_path / "nested" / "state.json"
+    state = {"BTCUSDT": {"dca_count": 0}}
+    builds = []
+
+    def _snapshot():
+        builds.append(1)
+        return {"dca_state": dict(state)}
+
+    writer = DebouncedStateWriter(str(path), _snapshot, debounce_seconds=3600)
+    for i in range(5):
+        state["BTCUSDT"] = {"dca_count": i}
+        writer.mark_dirty()
+        assert writer.maybe_flush() is False
+    assert not path.exists() and builds == []
+
+    # 周期边界只写一次最新状态
+    assert writer.flush() is True
+    assert json.loads(path.read_text(encoding="utf-8")) == {"dca_state": {"BTCUSDT": {"dca_count": 4}}}
+    assert writer.flush() is False and len(builds) == 1
+
+    # 成交立即落盘
+    state["ETHUSDT"] = {"dca_count": 1}
+    writer.mark_dirty()
+    assert writer.flush(force=True) is True
+    assert "ETHUSDT" in json.loads(path.read_text(encoding="utf-8"))["dca_state"]
+
+    writer.debounce_seconds = 0.0
+    writer.mark_dirty()
+    assert writer.maybe_flush() is True
+    stats = writer.get_stats()
+    assert stats["writes"] == 3 and stats["forced_writes"] == 1 and stats["marks"] == 7 and not stats["dirty"]
+
+
+def test_state_writer_keeps_previous_file_when_snapshot_fails(tmp_path):
+    path = tmp_path / "state.json"
+    payload = {"ok": True}
+    writer = DebouncedStateWriter(str(path), lambda: dict(payload), debounce_seconds=0)
+    writer.mark_dirty()
+    writer.flush()
+
+    payload["bad"] = object()
+    writer.mark_dirty()
+    assert writer.flush() is False
+    assert json.loads(path.read_text(encoding="utf-8")) == {"ok": True}
+    assert writer.dirty and writer.get_stats()["errors"] == 1
+    assert sorted(os.listdir(tmp_path)) == ["state.json"]
+
+    # 修复后重试写入
+    payload.pop("bad")
+    payload["v"] = 2
+    assert writer.flush() is True
+    assert json.loads(path.read_text(encoding="utf-8")) == {"ok": True, "v": 2}
@@ -1,5 +1,9 @@
+import json
+import threading
+import time
 from types import SimpleNamespace
 
+from src.trading.order_gateway import OrderGateway
 from src.trading.tp_sl import PapiTpSlManager, TpSlConfig
 
 
@@ -31,3 +35,68 @@ def test_build_tp_orders_supports_ladder_reduce():
     assert orders[1]["quantity"] == 5.0
     assert "closePosition" not in orders[0]
     assert "closePosition" not in orders[1]
+
+
+class _Resp:
+    def __init__(self, data, status_code=200):
+        self._data = data
+        self.status_code = status_code
+        self.text = json.dumps(data)
+
+    def json(self):
+        return self._data
+
+
+class _SlowPostBroker(_FakeBroker):
+    PAPI_BASE = "https://papi.binance.com"
+    FAPI_BASE = "https://fapi.binance.com"
+
+    def __init__(self, delay=0.15, papi_only=True):
+        super().__init__()
+        self.delay = delay
+        self.papi_only = papi_only
+        self.market = SimpleNamespace(get_symbol_info=lambda symbol: {"tick_size": 0.1})
+        self.posts = []
+        self._lock = threading.Lock()
+
+    def is_papi_only(self):
+        return self.papi_only
+
+    def request(self, method, url, params=None, signed=False, allow_error=False):
+        with self._lock:
+            self.posts.append((url, dict(params or {})))
+        time.sleep(self.delay)
+        if url.endswith("/batchOrders"):
+            batch = json.loads(params["batchOrders"])
+            return _Resp([{"orderId": i + 1, "type": o["type"]} for i, o in enumerate(batch)])
+        return _Resp({"orderId": len(self.posts), "strategyType": params.get("strategyType"), "type": params.get("type")})
+
+
+def test_place_tp_sl_submits_ladder_concurrently_in_order(monkeypatch, tmp_path):
+    monkeypatch.setenv("BINANCE_TICK_CACHE_PATH", str(tmp_path / "ticks.json"))
+    broker = _SlowPostBroker(delay=0.15)
+    manager = PapiTpSlManager(broker)
+    cfg = TpSlConfig(
+        symbol="BTCUSDT",
+        position_side="LONG",
+        entry_price=100.0,
+        quantity=10.0,
+        stop_loss_price=99.0,
+        take_profit_levels=[(100.6, 0.5), (101.0, 0.5)],
+    )
+    started = time.perf_counter()
+    results = manager.place_tp_sl(cfg)
+    elapsed = time.perf_counter() - started
+
+    assert [r["strategyType"] for r in results] == ["STOP", "TAKE_PROFIT", "TAKE_PROFIT"]
+    assert elapsed < 0.15 * 3 * 0.75
+
+
+def test_fapi_protection_orders_use_single_batch_request():
+    broker = _SlowPostBroker(delay=0.0, papi_only=False)
+    gateway = OrderGateway(broker)
+    results = gateway.place_protection_orders("BTCUSDT", "LONG", tp=101.0, sl=99.0)
+
+    assert len(broker.posts) == 1
+    assert broker.posts[0][0].endswith("/fapi/v1/batchOrders")
+    assert [r["type"] for r in results] == ["TAKE_PROFIT_MARKET", "STOP_MARKET"]
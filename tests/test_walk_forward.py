@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from tools.backtest import walk_forward as wf
+from tools.backtest.feature_cache import FeatureCache
+
+DAYS = 6
+INTERVAL = "15m"
+
+
+def _raw(seed, n=DAYS * 96):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.006, n)))
+    index = pd.date_range("2024-03-01", periods=n, freq="15min", name="timestamp")
+    return pd.DataFrame(
+        {"open": close, "high": close * 1.003, "low": close * 0.997, "close": close, "volume": rng.uniform(1e5, 2e5, n)},
+        index=index,
+    )
+
+
+def test_make_folds_rolls_train_and_test_windows():
+    folds = wf.make_folds(pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-11"), train_days=4, test_days=2)
+    assert [(f["train_start"].day, f["train_end"].day, f["test_end"].day) for f in folds] == [(1, 5, 7), (3, 7, 9), (5, 9, 11)]
+
+
+def test_stitch_and_stability_helpers():
+    t0 = pd.Timestamp("2024-01-01").value
+    hour = pd.Timedelta(hours=1).value
+    folds = [
+        {"fold": 1, "params": {"a": 2, "b": 1}, "equity": [(t0 + 2 * hour, 110.0), (t0 + 3 * hour, 121.0)]},
+        {"fold": 0, "params": {"a": 1, "b": 1}, "equity": [(t0, 100.0), (t0 + hour, 110.0)]},
+    ]
+    eq = wf.stitch_equity(folds, 100.0)
+    assert eq["fold"].tolist() == [0, 0, 1, 1]
+    assert np.allclose(eq["equity"], [100.0, 110.0, 121.0, 133.1])
+
+    stab = wf.parameter_stability(folds)
+    assert stab["a"] == {"values": [1, 2], "distinct": 2, "modal": 1, "modal_share": 0.5}
+    assert stab["b"]["modal_share"] == 1.0
+
+
+def test_walk_forward_runs_folds_in_parallel_on_shared_data(tmp_path, monkeypatch):
+    bdr = wf.bdr
+    for i, sym in enumerate(("AAAUSDT", "BBBUSDT", "BTCUSDT")):
+        monkeypatch.setitem(bdr._SERIES_CACHE, (sym, INTERVAL, DAYS, "store"), (_raw(i), None))
+    monkeypatch.setattr(bdr, "_FEATURE_CACHE", FeatureCache(str(tmp_path / "features")))
+    monkeypatch.setattr(bdr, "load_from_store", lambda *a, **k: (_ for _ in ()).throw(AssertionError("reloaded data")))
+
+    report = wf.run_walk_forward(
+        ["AAA", "BBB"],
+        INTERVAL,
+        DAYS,
+        100.0,
+        bdr.DCAParams(),
+        train_days=2,
+        test_days=1,
+        workers=2,
+        search={"samples": 3, "min_budget": 1.0},
+        space={"take_profit_pct": [0.01, 0.02, 0.03], "max_dca": [2, 3]},
+        data_backend="store",
+        out_dir=str(tmp_path / "logs"),
+    )
+    # 数据末根K线在第 6 天 23:45，第 4 折的测试窗不完整，不切分
+    assert report["summary"]["folds"] == 3
+    assert report["summary"]["folds_evaluated"] == 3
+    assert set(report["parameter_stability"]) == {"take_profit_pct", "max_dca"}
+    equity = report["equity"]
+    assert equity["timestamp"].is_monotonic_increasing
+    assert equity["fold"].nunique() == 3
+    assert sorted(p.name.split("_")[2] for p in (tmp_path / "logs").iterdir()) == ["equity", "folds", "summary"]
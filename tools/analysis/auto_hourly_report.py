@@ -11,7 +11,9 @@ from __future__ import annotations
 
 import argparse
 import csv
+import os
 import re
+import sys
 import time
 from collections import defaultdict, deque
 from dataclasses import dataclass
@@ -19,6 +21,11 @@ from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Deque, Dict, Iterable, List, Optional, Set
 
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from tools.logs_analysis.event_store import EventStore, default_db_path  # noqa: E402
 
 SCORE_CLOSE_KEY = "评分低于阈值"
 ENTRY_ENGINE_RE = re.compile(r"entry_engine=([A-Z_]+)")
@@ -48,6 +55,7 @@ class LogSource:
     kind: str  # trade_log | dashboard
     trade_log_path: Optional[Path] = None
     dashboard_files: Optional[List[Path]] = None
+    log_dir: Optional[str] = None
 
 
 @dataclass
@@ -111,6 +119,16 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="常驻运行，每小时自动输出上一完整小时",
     )
+    parser.add_argument(
+        "--events-db",
+        default=None,
+        help="事件库路径（默认 <log-dir>/events.db）；增量摄取后直接查询聚合",
+    )
+    parser.add_argument(
+        "--no-event-store",
+        action="store_true",
+        help="不使用事件库，每次全量读取 CSV",
+    )
     parser.add_argument(
         "--output-csv",
         default=None,
@@ -208,7 +226,7 @@ def resolve_log_source(log_dir: str, trade_log: Optional[str]) -> LogSource:
     except FileNotFoundError as trade_err:
         dashboard_files = resolve_dashboard_files(log_dir=log_dir)
         if dashboard_files:
-            return LogSource(kind="dashboard", dashboard_files=dashboard_files)
+            return LogSource(kind="dashboard", dashboard_files=dashboard_files, log_dir=log_dir)
         raise trade_err
 
 
@@ -498,11 +516,13 @@ def run_once(
     bar_minutes: int,
     since_hours: int,
     output_csv: Optional[Path],
+    store: Optional[EventStore] = None,
 ) -> List[HourStat]:
     hourly = compute_hourly(
         log_source=log_source,
         bar_minutes=bar_minutes,
         since_hours=since_hours,
+        store=store,
     )
     print_table(hourly)
     if output_csv is not None:
@@ -510,7 +530,48 @@ def run_once(
     return hourly
 
 
-def compute_hourly(log_source: LogSource, bar_minutes: int, since_hours: int) -> List[HourStat]:
+def compute_hourly_from_store(
+    store: EventStore,
+    log_source: LogSource,
+    bar_minutes: int,
+    since_hours: int,
+) -> List[HourStat]:
+    """增量摄取新增行后直接在事件库中按小时聚合（耗时与日志总量无关）"""
+    bar_minutes = max(1, int(bar_minutes))
+    if log_source.kind == "trade_log":
+        assert log_source.trade_log_path is not None
+        store.ingest_trade_log(log_source.trade_log_path)
+    else:
+        # 每次重新发现 dashboard 文件，常驻运行时新生成的小时快照也会被摄取
+        files = resolve_dashboard_files(log_source.log_dir) if log_source.log_dir else []
+        for path in sorted(set(files) | set(log_source.dashboard_files or [])):
+            store.ingest_dashboard(path)
+    since = floor_hour(datetime.now() - timedelta(hours=since_hours)) if since_hours > 0 else None
+    hours: List[HourStat] = []
+    for row in store.hourly_stats(origin=log_source.kind, since=since):
+        hours.append(
+            HourStat(
+                hour=datetime.fromisoformat(row["hour"]),
+                open_count=int(row["open_count"] or 0),
+                trend_open_count=int(row["trend_open_count"] or 0),
+                close_count=int(row["close_count"] or 0),
+                score_close_count=int(row["score_close_count"] or 0),
+                net_pnl=float(row["net_pnl"] or 0.0),
+                hold_bars_sum=float(row["hold_minutes_sum"] or 0.0) / bar_minutes,
+                hold_bars_count=int(row["hold_count"] or 0),
+            )
+        )
+    return hours
+
+
+def compute_hourly(
+    log_source: LogSource,
+    bar_minutes: int,
+    since_hours: int,
+    store: Optional[EventStore] = None,
+) -> List[HourStat]:
+    if store is not None:
+        return compute_hourly_from_store(store, log_source, bar_minutes, since_hours)
     if log_source.kind == "trade_log":
         assert log_source.trade_log_path is not None
         rows = load_rows(log_source.trade_log_path)
@@ -534,6 +595,7 @@ def run_watch(
     bar_minutes: int,
     since_hours: int,
     output_csv: Optional[Path],
+    store: Optional[EventStore] = None,
 ) -> None:
     last_emitted: Optional[datetime] = None
     if log_source.kind == "trade_log":
@@ -546,6 +608,7 @@ def run_watch(
             log_source=log_source,
             bar_minutes=bar_minutes,
             since_hours=since_hours,
+            store=store,
         )
         if output_csv is not None:
             write_csv(output_csv, hourly)
@@ -569,22 +632,32 @@ def main() -> None:
     args = parse_args()
     log_source = resolve_log_source(args.log_dir, args.trade_log)
     output_csv = Path(args.output_csv) if args.output_csv else None
+    store: Optional[EventStore] = None
+    if not args.no_event_store:
+        anchor = str(log_source.trade_log_path) if log_source.trade_log_path else args.log_dir
+        store = EventStore(args.events_db or default_db_path(anchor))
 
-    if args.watch:
-        run_watch(
+    try:
+        if args.watch:
+            run_watch(
+                log_source=log_source,
+                bar_minutes=args.bar_minutes,
+                since_hours=args.since_hours,
+                output_csv=output_csv,
+                store=store,
+            )
+            return
+
+        run_once(
             log_source=log_source,
             bar_minutes=args.bar_minutes,
             since_hours=args.since_hours,
             output_csv=output_csv,
+            store=store,
         )
-        return
-
-    run_once(
-        log_source=log_source,
-        bar_minutes=args.bar_minutes,
-        since_hours=args.since_hours,
-        output_csv=output_csv,
-    )
+    finally:
+        if store is not None:
+            store.close()
 
 
 if __name__ == "__main__":
@@ -1,78 +1,72 @@
 #!/usr/bin/env python3
 """分析 LW 和 EV 方向判断准确率 - 从 runtime.out.*.log 文件"""
+import argparse
 import os
-import re
+import sys
 from collections import defaultdict
+from pathlib import Path
 
-def analyze_runtime_logs():
-    log_dir = r'D:\AIDCA\AI2\logs\2026-02\2026-02-26'
-    log_files = [f for f in os.listdir(log_dir) if f.startswith('runtime.out') and f.endswith('.log')]
-    
-    print(f'找到日志文件: {sorted(log_files)}')
-    
-    # 存储所有记录
-    all_directions = []  # 所有方向判断记录
-    trades = []  # 交易决策
-    close_results = []  # 平仓结果
-    
-    for log_file in sorted(log_files):
-        filepath = os.path.join(log_dir, log_file)
-        current_symbol = None
-        current_cycle = None
-        current_time = None
-        
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = f.readlines()
-        
-        for i, line in enumerate(lines):
-            # 解析 cycle 时间
-            cycle_match = re.search(r'FUND_FLOW cycle (\d+) @ ([\d-]+ [\d:]+)', line)
-            if cycle_match:
-                current_cycle = int(cycle_match.group(1))
-                current_time = cycle_match.group(2)
-            
-            # 解析 symbol 和决策
-            symbol_match = re.search(r'\[([A-Z]+USDT)\] 决策=(\w+)', line)
-            if symbol_match:
-                current_symbol = symbol_match.group(1)
-                decision = symbol_match.group(2)
-                
-                if decision in ('BUY', 'SELL'):
-                    # 向后查找方向判断
-                    lw_dir, lw_score, ev_dir, ev_score = None, None, None, None
-                    for j in range(i+1, min(i+10, len(lines))):
-                        dir_match = re.search(r'方向判断: dir_lw=(\w+)\(([+-][\d.]+)\) \| dir_ev=(\w+)\(([+-][\d.]+)\)', lines[j])
-                        if dir_match:
-                            lw_dir = dir_match.group(1)
-                            lw_score = float(dir_match.group(2))
-                            ev_dir = dir_match.group(3)
-                            ev_score = float(dir_match.group(4))
-                            break
-                    
-                    trades.append({
-                        'cycle': current_cycle,
-                        'time': current_time,
-                        'symbol': current_symbol,
-                        'decision': decision,
-                        'lw_dir': lw_dir,
-                        'lw_score': lw_score,
-                        'ev_dir': ev_dir,
-                        'ev_score': ev_score,
-                        'file': log_file
-                    })
-            
-            # 解析方向判断记录（所有）
-            dir_match = re.search(r'方向判断: dir_lw=(\w+)\(([+-][\d.]+)\) \| dir_ev=(\w+)\(([+-][\d.]+)\)', line)
-            if dir_match and current_symbol:
-                all_directions.append({
-                    'cycle': current_cycle,
-                    'time': current_time,
-                    'symbol': current_symbol,
-                    'lw_dir': dir_match.group(1),
-                    'lw_score': float(dir_match.group(2)),
-                    'ev_dir': dir_match.group(3),
-                    'ev_score': float(dir_match.group(4))
-                })
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from tools.logs_analysis.event_store import EventStore, default_db_path  # noqa: E402
+
+DEFAULT_LOG_DIR = r'D:\AIDCA\AI2\logs\2026-02\2026-02-26'
+
+
+def analyze_runtime_logs(log_dir=DEFAULT_LOG_DIR, db_path=None):
+    """增量摄取 runtime.out.*.log 到事件库后查询（已摄取部分不再重复扫描）"""
+    log_files = sorted(p.name for p in Path(log_dir).glob('runtime.out*.log'))
+    print(f'找到日志文件: {log_files}')
+
+    store = EventStore(db_path or default_db_path(log_dir))
+    try:
+        for name in log_files:
+            store.ingest_runtime_log(Path(log_dir) / name)
+        directions = store.query(kind='direction', origin='runtime')
+        decisions = store.query(kind='decision', origin='runtime')
+    finally:
+        store.close()
+
+    # 所有方向判断记录
+    all_directions = [
+        {
+            'cycle': d['cycle'],
+            'time': d['ts'],
+            'symbol': d['symbol'],
+            'lw_dir': d['data'].get('lw_dir'),
+            'lw_score': d['data'].get('lw_score'),
+            'ev_dir': d['data'].get('ev_dir'),
+            'ev_score': d['data'].get('ev_score'),
+        }
+        for d in directions
+    ]
+
+    # 交易决策：取同一 cycle、同一交易对在决策之后的第一条方向判断
+    first_direction = {}
+    for d in directions:
+        first_direction.setdefault((d['cycle'], d['symbol']), []).append(d)
+    trades = []
+    for dec in decisions:
+        decision = dec['data'].get('decision')
+        if decision not in ('BUY', 'SELL'):
+            continue
+        follow = next(
+            (d for d in first_direction.get((dec['cycle'], dec['symbol']), []) if d['id'] > dec['id']),
+            None,
+        )
+        fd = follow['data'] if follow else {}
+        trades.append({
+            'cycle': dec['cycle'],
+            'time': dec['ts'],
+            'symbol': dec['symbol'],
+            'decision': decision,
+            'lw_dir': fd.get('lw_dir'),
+            'lw_score': fd.get('lw_score'),
+            'ev_dir': fd.get('ev_dir'),
+            'ev_score': fd.get('ev_score'),
+        })
     
     print(f'\n=== 方向判断统计 ===')
     print(f'总方向判断记录: {len(all_directions)} 条')
@@ -116,4 +110,8 @@ def analyze_runtime_logs():
     return trades, all_directions
 
 if __name__ == '__main__':
-    analyze_runtime_logs()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--log-dir', default=DEFAULT_LOG_DIR, help='runtime.out.*.log 所在目录')
+    parser.add_argument('--db', default=None, help='事件库路径（默认 <log-dir>/events.db）')
+    args = parser.parse_args()
+    analyze_runtime_logs(args.log_dir, args.db)
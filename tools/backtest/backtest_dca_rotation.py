@@ -28,7 +28,7 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(_
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
-from src.data.klines_downloader import load_or_download
+from src.data.klines_downloader import load_from_store, load_or_download
 
 import json
 from dataclasses import dataclass, field
@@ -37,6 +37,12 @@ from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from feature_cache import FeatureCache, frame_hash
+from param_search import hyperband, rung_budgets, sample_space, successive_halving
+
+# 原始K线（未计算指标）的进程内缓存，参数搜索时各候选共用同一份数据
+_SERIES_CACHE: Dict[Tuple[str, str, int, str], Tuple[Optional[pd.DataFrame], Optional[str]]] = {}
+
 
 @dataclass
 class DCAParams:
@@ -110,14 +116,52 @@ class DCAParams:
     bull_short_close_mult: float = 0.65
     bear_long_close_mult: float = 0.65
 
+_FEATURE_CACHE: Optional[FeatureCache] = None
+
+
+def default_feature_cache() -> Optional[FeatureCache]:
+    """进程内共享的特征缓存（目录 BACKTEST_FEATURE_CACHE_DIR，默认 data/feature_cache）"""
+    global _FEATURE_CACHE
+    if os.getenv("BACKTEST_FEATURE_CACHE", "1") == "0":
+        return None
+    if _FEATURE_CACHE is None:
+        root = os.getenv("BACKTEST_FEATURE_CACHE_DIR") or os.path.join(PROJECT_ROOT, "data", "feature_cache")
+        _FEATURE_CACHE = FeatureCache(root)
+    return _FEATURE_CACHE
+
+
+def _rolling_last_quantile(values: np.ndarray, window: int) -> np.ndarray:
+    """等价于 rolling(window).apply(lambda x: mean(x <= x[-1]))，窗口内含 NaN 时为 NaN"""
+    out = np.full(values.shape[0], np.nan)
+    if values.shape[0] < window:
+        return out
+    win = np.lib.stride_tricks.sliding_window_view(values, window)
+    q = np.mean(win <= win[:, -1:], axis=1)
+    q[np.isnan(win).any(axis=1)] = np.nan
+    out[window - 1:] = q
+    return out
+
+
+def _run_length(cond: pd.Series) -> np.ndarray:
+    """连续为 True 的计数（遇 False/NaN 归零），即 TD Sequential 计数"""
+    flags = cond.fillna(False).to_numpy(dtype=bool)
+    idx = np.arange(1, flags.shape[0] + 1)
+    last_reset = np.maximum.accumulate(np.where(flags, 0, idx))
+    return (idx - last_reset).astype(np.int64)
+
 
 class DCARotationBacktester:
 
     def __init__(self, symbols: List[str], interval: str = "5m", days: int = 30, initial_capital: float = 100.0,
                  params: Optional[DCAParams] = None, enable_15m_filters: bool = True,
                  fee_pct: float = 0.0, slippage_pct: float = 0.0,
-                 bar_log_enabled: bool = False):
+                 bar_log_enabled: bool = False, data_backend: Optional[str] = None,
+                 feature_cache: Optional[FeatureCache] = None):
         self.symbols = symbols
+        # 数据来源: store=分区二进制存储（增量补拉），csv=旧的整段 CSV 缓存
+        self.data_backend = str(data_backend or os.getenv("BACKTEST_DATA_BACKEND", "store")).lower()
+        # 指标特征缓存（BACKTEST_FEATURE_CACHE=0 关闭）
+        self.feature_cache = feature_cache if feature_cache is not None else default_feature_cache()
         self.interval = interval
         self.days = days
         self.initial_capital = initial_capital
@@ -144,11 +188,25 @@ class DCARotationBacktester:
         self.total_bars: int = 0
         self.bar_log_enabled: bool = bool(bar_log_enabled)
         self.bar_logs: List[Dict] = []
+        # 逐K线权益（含浮动盈亏），用于拼接滚动样本外权益曲线
+        self.equity_curve: List[Tuple[pd.Timestamp, float]] = []
         # BTC 数据用于综合牛熊判断
         self.btc_data: Optional[pd.DataFrame] = None
         # 缓存每个时间戳的综合牛熊状态
         self.regime_cache: Dict[pd.Timestamp, Tuple[str, float, Dict]] = {}
 
+    def _load_series(self, symbol: str) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+        key = (symbol, self.interval, int(self.days), self.data_backend)
+        cached = _SERIES_CACHE.get(key)
+        if cached is not None and cached[0] is not None:
+            return cached
+        if self.data_backend == "csv":
+            loaded = load_or_download(symbol, self.interval, self.days)
+        else:
+            loaded = load_from_store(symbol, self.interval, self.days)
+        _SERIES_CACHE[key] = loaded
+        return loaded
+
     def _load_csv(self, symbol: str) -> Optional[pd.DataFrame]:
         candidates = [
             f"{symbol}USDT",
@@ -156,7 +214,7 @@ class DCARotationBacktester:
         ]
         for sym in candidates:
             try:
-                df, path = load_or_download(sym, self.interval, self.days)
+                df, path = self._load_series(sym)
                 if df is not None and len(df) > 0:
                     return df
             except Exception as e:
@@ -181,11 +239,11 @@ class DCARotationBacktester:
             df = self._load_csv(symbol)
             if df is None or len(df) == 0:
                 continue
-            ind = self.calculate_indicators(df)
+            ind = self.calculate_indicators(df, symbol=symbol)
             self.data[symbol] = ind
             loaded_symbols.append(symbol)
             try:
-                self.mtf_15[symbol] = self._compute_15m_metrics(ind)
+                self.mtf_15[symbol] = self._indicators_15m(symbol, df)
             except Exception:
                 self.mtf_15[symbol] = pd.DataFrame()
             self.total_bars += len(df)
@@ -199,9 +257,9 @@ class DCARotationBacktester:
         # 加载 BTC 数据用于牛熊判断
         if bool(getattr(self.params, "combined_regime_enabled", True)):
             try:
-                btc_df, _ = load_or_download("BTCUSDT", self.interval, self.days)
+                btc_df, _ = self._load_series("BTCUSDT")
                 if btc_df is not None and len(btc_df) > 0:
-                    self.btc_data = self.calculate_indicators(btc_df)
+                    self.btc_data = self.calculate_indicators(btc_df, symbol="BTCUSDT")
                     print(f"[OK] BTC数据加载成功: {len(self.btc_data)} 根K线")
             except Exception as e:
                 print(f"[WARN] BTC数据加载失败: {e}")
@@ -211,72 +269,88 @@ class DCARotationBacktester:
         
         print(f"[OK] 成功加载 {len(loaded_symbols)} 个交易对: {loaded_symbols}")
 
-    def calculate_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
-        df = df.copy()
+    def _indicator_group_params(self) -> Dict[str, Dict[str, Any]]:
+        """各指标组依赖的参数（特征缓存键的一部分；修改指标算法时递增 v）"""
+        return {
+            "base": {"v": 1},
+            "window_24h": {"v": 1, "bar_minutes": self.bar_minutes},
+            "trend": {"v": 1, "fast": self.params.trend_ema_fast, "slow": self.params.trend_ema_slow},
+        }
 
-        # RSI(14)
-        delta = df["close"].diff()
-        gain = delta.where(delta > 0, 0)
-        loss = -delta.where(delta < 0, 0)
-        avg_gain = gain.rolling(window=14).mean()
-        avg_loss = loss.rolling(window=14).mean()
-        rs = avg_gain / avg_loss
-        df["rsi"] = 100 - (100 / (1 + rs))
-
-        # Bollinger Bands(20)
-        df["bb_middle"] = df["close"].rolling(window=20).mean()
-        bb_std = df["close"].rolling(window=20).std()
-        df["bb_upper"] = df["bb_middle"] + (bb_std * 2)
-        df["bb_lower"] = df["bb_middle"] - (bb_std * 2)
-
-        # Volume quantile (60)
-        df["volume_quantile"] = df["volume"].rolling(window=60).apply(
-            lambda x: float(np.mean(x <= x[-1])), raw=True
-        )
+    def _compute_indicator_group(self, group: str, df: pd.DataFrame) -> Dict[str, Any]:
+        close = df["close"]
+        if group == "base":
+            # RSI(14)
+            delta = close.diff()
+            gain = delta.where(delta > 0, 0)
+            loss = -delta.where(delta < 0, 0)
+            avg_gain = gain.rolling(window=14).mean()
+            avg_loss = loss.rolling(window=14).mean()
+            rs = avg_gain / avg_loss
+            # Bollinger Bands(20)
+            bb_middle = close.rolling(window=20).mean()
+            bb_std = close.rolling(window=20).std()
+            return {
+                "rsi": 100 - (100 / (1 + rs)),
+                "bb_middle": bb_middle,
+                "bb_upper": bb_middle + (bb_std * 2),
+                "bb_lower": bb_middle - (bb_std * 2),
+                # Volume quantile (60)
+                "volume_quantile": _rolling_last_quantile(df["volume"].to_numpy(dtype=np.float64), 60),
+                # TD Sequential (up / down count)
+                "td_up": _run_length(close > close.shift(4)),
+                "td_down": _run_length(close < close.shift(4)),
+                # momentum (5 bars)
+                "momentum_5": close.pct_change(5),
+                "ema_fast_20": close.ewm(span=20, adjust=False).mean(),
+                "ema_slow_50": close.ewm(span=50, adjust=False).mean(),
+            }
+        if group == "window_24h":
+            # 24h quote volume / realized volatility
+            bars_24h = int(24 * 60 / self.bar_minutes)
+            quote_volume = df["volume"] * close
+            ret_1 = close.pct_change()
+            return {
+                "quote_volume": quote_volume,
+                "quote_volume_24h": quote_volume.rolling(window=bars_24h).sum(),
+                "volatility_24h": ret_1.rolling(window=max(20, bars_24h)).std() * (bars_24h ** 0.5),
+            }
+        if group == "trend":
+            # trend regime EMA
+            return {
+                "ema_trend_fast": close.ewm(span=self.params.trend_ema_fast, adjust=False).mean(),
+                "ema_trend_slow": close.ewm(span=self.params.trend_ema_slow, adjust=False).mean(),
+            }
+        raise ValueError(f"unknown indicator group: {group}")
 
-        # 24h quote volume
-        df["quote_volume"] = df["volume"] * df["close"]
-        bars_24h = int(24 * 60 / self.bar_minutes)
-        df["quote_volume_24h"] = df["quote_volume"].rolling(window=bars_24h).sum()
+    def calculate_indicators(self, df: pd.DataFrame, symbol: Optional[str] = None) -> pd.DataFrame:
+        """
+        计算全部指标列
 
-        # TD Sequential (up count)
-        close = df["close"]
-        cond_up = close > close.shift(4)
-        td_up = []
-        count = 0
-        for val in cond_up.fillna(False):
-            if val:
-                count += 1
-            else:
-                count = 0
-            td_up.append(count)
-        df["td_up"] = td_up
-
-        # TD Sequential (down count)
-        cond_down = close < close.shift(4)
-        td_down = []
-        count = 0
-        for val in cond_down.fillna(False):
-            if val:
-                count += 1
+        传入 symbol 且启用特征缓存时，按 (symbol, interval, 数据哈希, 组参数) 复用已计算的指标组。
+        """
+        df = df.copy()
+        data_hash = frame_hash(df) if (symbol and self.feature_cache is not None) else None
+        for group, group_params in self._indicator_group_params().items():
+            if data_hash is not None:
+                columns = self.feature_cache.get_columns(
+                    symbol, self.interval, data_hash, group, group_params,
+                    lambda g=group: self._compute_indicator_group(g, df),
+                )
             else:
-                count = 0
-            td_down.append(count)
-        df["td_down"] = td_down
-
-        # momentum (5 bars)
-        df["momentum_5"] = close.pct_change(5)
-        # 24h realized volatility
-        ret_1 = close.pct_change()
-        df["volatility_24h"] = ret_1.rolling(window=max(20, bars_24h)).std() * (bars_24h ** 0.5)
-
-        # trend regime EMA
-        df["ema_trend_fast"] = close.ewm(span=self.params.trend_ema_fast, adjust=False).mean()
-        df["ema_trend_slow"] = close.ewm(span=self.params.trend_ema_slow, adjust=False).mean()
-        df["ema_fast_20"] = close.ewm(span=20, adjust=False).mean()
-        df["ema_slow_50"] = close.ewm(span=50, adjust=False).mean()
+                columns = self._compute_indicator_group(group, df)
+            for name, values in columns.items():
+                df[name] = values
         return df
 
+    def _indicators_15m(self, symbol: str, raw: pd.DataFrame) -> pd.DataFrame:
+        if self.feature_cache is None:
+            return self._compute_15m_metrics(raw)
+        return self.feature_cache.get_frame(
+            symbol, self.interval, frame_hash(raw), "mtf_15m", {"v": 1},
+            lambda: self._compute_15m_metrics(raw),
+        )
+
     def _compute_15m_metrics(self, df: pd.DataFrame) -> pd.DataFrame:
         """从5m数据聚合出15m的 volume_ratio 和 change_15m 指标。"""
         d = df.copy()
@@ -836,12 +910,27 @@ class DCARotationBacktester:
                     return "ADD", "DCA_ADD_SHORT"
         return "HOLD", ""
 
-    def run_backtest(self) -> None:
+    def run_backtest(
+        self,
+        budget_fraction: float = 1.0,
+        start: Optional[pd.Timestamp] = None,
+        end: Optional[pd.Timestamp] = None,
+    ) -> None:
+        """
+        start/end 限定回测时间窗 [start, end)（指标仍基于全历史计算，窗口前的数据作为预热）；
+        budget_fraction < 1 时只回测窗口内时间轴的前缀（参数搜索的短窗口评估）
+        """
         self.load_data()
         all_index = pd.DatetimeIndex([])
         for df in self.data.values():
             all_index = all_index.union(pd.DatetimeIndex(df.index))
         all_times = all_index.sort_values()
+        if start is not None:
+            all_times = all_times[all_times >= pd.Timestamp(start)]
+        if end is not None:
+            all_times = all_times[all_times < pd.Timestamp(end)]
+        if budget_fraction < 1.0:
+            all_times = all_times[: max(1, int(np.ceil(len(all_times) * max(0.0, float(budget_fraction)))))]
 
         for timestamp in all_times:
             bar_actions: Dict[str, Dict[str, Any]] = {}
@@ -857,6 +946,7 @@ class DCARotationBacktester:
             equity = self._equity(snapshot)
             self.peak_equity = max(self.peak_equity, equity)
             self.last_equity = equity
+            self.equity_curve.append((timestamp, equity))
             drawdown = (self.peak_equity - equity) / self.peak_equity if self.peak_equity > 0 else 0
             if drawdown >= self.params.total_stop_loss_pct:
                 for symbol in list(self.positions.keys()):
@@ -1295,12 +1385,22 @@ def main():
     parser.add_argument('--bar_log', action='store_true', help='enable per-bar action log output')
     parser.add_argument('--grid', action='store_true', help='run grid search optimization')
     parser.add_argument('--workers', type=int, default=1, help='parallel workers for grid search')
+    parser.add_argument('--search', choices=['grid', 'halving', 'hyperband'], default='grid',
+                        help='search mode: full grid, successive halving or hyperband over time-prefix budgets')
+    parser.add_argument('--sampler', choices=['grid', 'random', 'halton'], default='halton',
+                        help='candidate sampling for halving/hyperband')
+    parser.add_argument('--samples', type=int, default=81, help='number of sampled candidates (halving)')
+    parser.add_argument('--eta', type=float, default=3.0, help='keep top 1/eta per rung')
+    parser.add_argument('--min_budget', type=float, default=1.0 / 9.0, help='smallest history fraction per candidate')
+    parser.add_argument('--prune_max_dd', type=float, default=20.0, help='prune when short-window drawdown reaches this pct')
+    parser.add_argument('--prune_min_return', type=float, default=-10.0, help='prune when short-window return is below this pct')
+    parser.add_argument('--seed', type=int, default=0, help='sampling seed')
     args = parser.parse_args()
     
     config_path = args.config
     symbols, interval, days, initial_capital, base_params = load_run_config(config_path)
     
-    if not args.grid:
+    if not args.grid and args.search == 'grid':
         # 单次回测
         print(f"[BACKTEST] 回测配置:")
         print(f"   交易对: {len(symbols)} 个")
@@ -1326,9 +1426,108 @@ def main():
         print(backtester.summarize())
         print("="*50)
         backtester.save_results()
-    else:
+    elif args.search == 'grid':
         # 网格搜索
         run_grid_search(symbols, interval, days, initial_capital, base_params, args)
+    else:
+        # 自适应搜索（逐次减半 / Hyperband）
+        run_adaptive_search(symbols, interval, days, initial_capital, base_params, args)
+
+
+# 定义参数网格 - 针对盈利200%+、回撤<20%、交易300-600优化
+# 第一阶段粗搜索：约500组参数
+GRID_SEARCH_SPACE: Dict[str, List[Any]] = {
+    # p_win 阈值：较低阈值增加交易频率
+    'min_p_win_threshold': [0.35, 0.40, 0.45],
+    'min_p_win_short': [0.35, 0.42],
+    'min_p_win_long': [0.35, 0.42],
+    # 牛熊调整
+    'bull_min_p_win_short': [0.50, 0.60],
+    'bear_min_p_win_long': [0.50, 0.60],
+    # 止盈止损
+    'take_profit_pct': [0.015, 0.022],
+    'symbol_stop_loss_pct': [0.12, 0.16],
+    # 加仓
+    'max_dca': [2, 3],
+    # 评分阈值
+    'score_threshold': [0.06, 0.10],
+    'score_threshold_short': [0.08],
+    'score_threshold_long': [0.08],
+}
+
+
+def _grid_csv_header(keys: List[str]) -> List[str]:
+    return list(keys) + ['total_return_pct', 'max_drawdown_pct', 'total_trades', 'win_rate_pct', 'final_equity', 'passes_filter']
+
+
+def _grid_passes_filter(met: Dict[str, float]) -> bool:
+    """筛选条件：盈利>=200%、回撤<20%、交易300-600"""
+    return (
+        met['total_return_pct'] >= 200.0 and
+        met['max_drawdown_pct'] < 20.0 and
+        300 <= met['total_trades'] <= 600
+    )
+
+
+def _grid_result(values: Dict[str, Any], met: Dict[str, float], backtester: "DCARotationBacktester", initial_capital: float) -> Dict[str, Any]:
+    return {
+        **values,
+        'total_return_pct': met['total_return_pct'],
+        'max_drawdown_pct': met['max_drawdown_pct'],
+        'total_trades': met['total_trades'],
+        'win_rate_pct': met['win_rate_pct'],
+        'final_equity': initial_capital + backtester.trades[-1]['pnl'] if backtester.trades else initial_capital,
+        'passes_filter': _grid_passes_filter(met),
+    }
+
+
+def _append_grid_row(results_file: str, header: List[str], result: Dict[str, Any]) -> None:
+    with open(results_file, 'a', encoding='utf-8', newline='') as f:
+        row = [str(result.get(k, '')) for k in header]
+        f.write(','.join(row) + '\n')
+
+
+def _report_grid_best(
+    results: List[Dict[str, Any]],
+    best_results: List[Dict[str, Any]],
+    keys: List[str],
+    timestamp_str: str,
+) -> None:
+    """打印 TOP 结果并保存 logs/grid_search_best_<ts>.json"""
+    if best_results:
+        # 按收益排序
+        best_results.sort(key=lambda x: x['total_return_pct'], reverse=True)
+        print("\n[TOP 10 符合条件的结果]")
+        print("-"*60)
+        for i, r in enumerate(best_results[:10]):
+            print(f"#{i+1} 返回={r['total_return_pct']:.1f}%, 回撤={r['max_drawdown_pct']:.1f}%, 交易={r['total_trades']:.0f}, 胜率={r['win_rate_pct']:.1f}%")
+            # 打印关键参数
+            param_str = ", ".join([f"{k}={r[k]}" for k in keys[:5]])
+            print(f"    参数: {param_str}")
+        
+        # 保存最佳参数配置
+        best = best_results[0]
+        best_config = {
+            "grid_search_best": {
+                "total_return_pct": best['total_return_pct'],
+                "max_drawdown_pct": best['max_drawdown_pct'],
+                "total_trades": best['total_trades'],
+                "win_rate_pct": best['win_rate_pct'],
+                "params": {k: best[k] for k in keys},
+            }
+        }
+        best_file = f"logs/grid_search_best_{timestamp_str}.json"
+        with open(best_file, 'w', encoding='utf-8') as f:
+            json.dump(best_config, f, indent=2, ensure_ascii=False)
+        print(f"\n最佳参数已保存: {best_file}")
+    else:
+        print("\n[WARN] 没有找到符合条件的结果")
+        # 显示最接近的结果
+        if results:
+            results.sort(key=lambda x: (x['total_return_pct'], -x['max_drawdown_pct']), reverse=True)
+            print("\n[TOP 10 最接近的结果]")
+            for i, r in enumerate(results[:10]):
+                print(f"#{i+1} 返回={r['total_return_pct']:.1f}%, 回撤={r['max_drawdown_pct']:.1f}%, 交易={r['total_trades']:.0f}")
 
 
 def run_grid_search(
@@ -1343,26 +1542,7 @@ def run_grid_search(
     from itertools import product
     import time
     
-    # 定义参数网格 - 针对盈利200%+、回撤<20%、交易300-600优化
-    # 第一阶段粗搜索：约500组参数
-    param_grid = {
-        # p_win 阈值：较低阈值增加交易频率
-        'min_p_win_threshold': [0.35, 0.40, 0.45],
-        'min_p_win_short': [0.35, 0.42],
-        'min_p_win_long': [0.35, 0.42],
-        # 牛熊调整
-        'bull_min_p_win_short': [0.50, 0.60],
-        'bear_min_p_win_long': [0.50, 0.60],
-        # 止盈止损
-        'take_profit_pct': [0.015, 0.022],
-        'symbol_stop_loss_pct': [0.12, 0.16],
-        # 加仓
-        'max_dca': [2, 3],
-        # 评分阈值
-        'score_threshold': [0.06, 0.10],
-        'score_threshold_short': [0.08],
-        'score_threshold_long': [0.08],
-    }
+    param_grid = GRID_SEARCH_SPACE
     
     # 计算总组合数
     total_combinations = 1
@@ -1388,7 +1568,7 @@ def run_grid_search(
     results_file = f"logs/grid_search_results_{timestamp_str}.csv"
     
     # 写入CSV头
-    header = list(keys) + ['total_return_pct', 'max_drawdown_pct', 'total_trades', 'win_rate_pct', 'final_equity', 'passes_filter']
+    header = _grid_csv_header(keys)
     with open(results_file, 'w', encoding='utf-8', newline='') as f:
         f.write(','.join(header) + '\n')
     
@@ -1419,28 +1599,12 @@ def run_grid_search(
             backtester.run_backtest()
             met = backtester.metrics()
             
-            # 检查是否符合筛选条件
-            passes = (
-                met['total_return_pct'] >= 200.0 and
-                met['max_drawdown_pct'] < 20.0 and
-                300 <= met['total_trades'] <= 600
-            )
-            
-            result = {
-                **{k: combo[j] for j, k in enumerate(keys)},
-                'total_return_pct': met['total_return_pct'],
-                'max_drawdown_pct': met['max_drawdown_pct'],
-                'total_trades': met['total_trades'],
-                'win_rate_pct': met['win_rate_pct'],
-                'final_equity': initial_capital + backtester.trades[-1]['pnl'] if backtester.trades else initial_capital,
-                'passes_filter': passes,
-            }
+            result = _grid_result({k: combo[j] for j, k in enumerate(keys)}, met, backtester, initial_capital)
+            passes = result['passes_filter']
             results.append(result)
             
             # 写入CSV
-            with open(results_file, 'a', encoding='utf-8', newline='') as f:
-                row = [str(result.get(k, '')) for k in header]
-                f.write(','.join(row) + '\n')
+            _append_grid_row(results_file, header, result)
             
             if passes:
                 best_results.append(result)
@@ -1461,41 +1625,114 @@ def run_grid_search(
     print(f"[GRID SEARCH COMPLETE] 总组合: {len(results)}, 通过筛选: {len(best_results)}")
     print(f"结果文件: {results_file}")
     print("="*60)
-    
-    if best_results:
-        # 按收益排序
-        best_results.sort(key=lambda x: x['total_return_pct'], reverse=True)
-        print("\n[TOP 10 符合条件的结果]")
-        print("-"*60)
-        for i, r in enumerate(best_results[:10]):
-            print(f"#{i+1} 返回={r['total_return_pct']:.1f}%, 回撤={r['max_drawdown_pct']:.1f}%, 交易={r['total_trades']:.0f}, 胜率={r['win_rate_pct']:.1f}%")
-            # 打印关键参数
-            param_str = ", ".join([f"{k}={r[k]}" for k in keys[:5]])
-            print(f"    参数: {param_str}")
-        
-        # 保存最佳参数配置
-        best = best_results[0]
-        best_config = {
-            "grid_search_best": {
-                "total_return_pct": best['total_return_pct'],
-                "max_drawdown_pct": best['max_drawdown_pct'],
-                "total_trades": best['total_trades'],
-                "win_rate_pct": best['win_rate_pct'],
-                "params": {k: best[k] for k in keys},
-            }
-        }
-        best_file = f"logs/grid_search_best_{timestamp_str}.json"
-        with open(best_file, 'w', encoding='utf-8') as f:
-            json.dump(best_config, f, indent=2, ensure_ascii=False)
-        print(f"\n最佳参数已保存: {best_file}")
+    _report_grid_best(results, best_results, keys, timestamp_str)
+
+
+def run_adaptive_search(
+    symbols: List[str],
+    interval: str,
+    days: int,
+    initial_capital: float,
+    base_params: DCAParams,
+    args: Any,
+) -> None:
+    """
+    逐次减半 / Hyperband 参数搜索
+
+    候选先在历史前缀上回测，越过回撤/收益下限或排名靠后的候选被剪枝；
+    只有存活到全历史的候选写入与网格搜索相同格式的 CSV 与 grid_search_best_*.json。
+    """
+    import time
+
+    space = GRID_SEARCH_SPACE
+    keys = list(space.keys())
+    mode = str(getattr(args, 'search', 'halving'))
+    sampler = str(getattr(args, 'sampler', 'halton'))
+    eta = float(getattr(args, 'eta', 3.0))
+    min_budget = float(getattr(args, 'min_budget', 1.0 / 9.0))
+    seed = int(getattr(args, 'seed', 0))
+
+    timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+    os.makedirs("logs", exist_ok=True)
+    results_file = f"logs/grid_search_results_{timestamp_str}.csv"
+    pruned_file = f"logs/grid_search_pruned_{timestamp_str}.csv"
+    header = _grid_csv_header(keys)
+    with open(results_file, 'w', encoding='utf-8', newline='') as f:
+        f.write(','.join(header) + '\n')
+    pruned_header = list(keys) + ['budget_fraction', 'status', 'total_return_pct', 'max_drawdown_pct', 'total_trades']
+    with open(pruned_file, 'w', encoding='utf-8', newline='') as f:
+        f.write(','.join(pruned_header) + '\n')
+
+    results: List[Dict[str, Any]] = []
+    best_results: List[Dict[str, Any]] = []
+    last_runs: Dict[Tuple[Any, ...], DCARotationBacktester] = {}
+    start_time = time.time()
+
+    def evaluate(values: Dict[str, Any], frac: float) -> Optional[Dict[str, float]]:
+        params = DCAParams(**{**base_params.__dict__, **values})
+        try:
+            backtester = DCARotationBacktester(
+                symbols=symbols,
+                interval=interval,
+                days=days,
+                initial_capital=initial_capital,
+                params=params,
+                fee_pct=args.fee_pct,
+                slippage_pct=args.slippage_pct,
+                bar_log_enabled=False,
+            )
+            backtester.run_backtest(budget_fraction=frac)
+        except Exception as e:
+            print(f"[ERROR] 候选评估失败 budget={frac:.3f}: {e}")
+            return None
+        last_runs[tuple(values[k] for k in keys)] = backtester
+        return backtester.metrics()
+
+    def on_result(values: Dict[str, Any], frac: float, met: Optional[Dict[str, float]], status: str) -> None:
+        if status == 'final' and met is not None:
+            backtester = last_runs.pop(tuple(values[k] for k in keys))
+            result = _grid_result(values, met, backtester, initial_capital)
+            results.append(result)
+            _append_grid_row(results_file, header, result)
+            if result['passes_filter']:
+                best_results.append(result)
+                print(f"[PASS #{len(best_results)}] 返回={met['total_return_pct']:.1f}%, 回撤={met['max_drawdown_pct']:.1f}%, 交易={met['total_trades']:.0f}")
+            return
+        last_runs.pop(tuple(values[k] for k in keys), None)
+        met = met or {}
+        row = {**values, 'budget_fraction': frac, 'status': status, **{k: met.get(k, '') for k in pruned_header[-3:]}}
+        with open(pruned_file, 'a', encoding='utf-8', newline='') as f:
+            f.write(','.join(str(row.get(k, '')) for k in pruned_header) + '\n')
+
+    prune = {
+        'max_drawdown_pct': getattr(args, 'prune_max_dd', None),
+        'min_return_pct': getattr(args, 'prune_min_return', None),
+        'on_result': on_result,
+    }
+    print(f"[SEARCH] 模式={mode} 采样={sampler} eta={eta} 最小预算={min_budget:.3f}")
+    if mode == 'hyperband':
+        outcome = hyperband(
+            lambda n, bracket: sample_space(space, n, sampler, seed=seed + bracket * 1000),
+            evaluate,
+            min_fraction=min_budget,
+            eta=eta,
+            **prune,
+        )
     else:
-        print("\n[WARN] 没有找到符合条件的结果")
-        # 显示最接近的结果
-        if results:
-            results.sort(key=lambda x: (x['total_return_pct'], -x['max_drawdown_pct']), reverse=True)
-            print("\n[TOP 10 最接近的结果]")
-            for i, r in enumerate(results[:10]):
-                print(f"#{i+1} 返回={r['total_return_pct']:.1f}%, 回撤={r['max_drawdown_pct']:.1f}%, 交易={r['total_trades']:.0f}")
+        candidates = sample_space(space, int(getattr(args, 'samples', 81)), sampler, seed=seed)
+        print(f"   候选数: {len(candidates)} (网格全组合 {len(sample_space(space, method='grid'))})")
+        outcome = successive_halving(candidates, evaluate, rung_budgets(min_budget, eta), eta=eta, **prune)
+
+    elapsed = time.time() - start_time
+    print("\n" + "="*60)
+    print(
+        f"[SEARCH COMPLETE] 评估次数: {outcome['evaluations']}, 全历史等价回测: {outcome['budget_used']:.1f}, "
+        f"完成全历史: {len(results)}, 通过筛选: {len(best_results)}, 耗时: {elapsed/60:.1f}分钟"
+    )
+    print(f"结果文件: {results_file}")
+    print(f"剪枝记录: {pruned_file}")
+    print("="*60)
+    _report_grid_best(results, best_results, keys, timestamp_str)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+回测指标/特征磁盘缓存
+
+缓存键: (symbol, interval, 原始K线内容哈希, 指标组名, 指标组参数)
+- 指标按组存储（每组一个 .npz），只有参数变化的组需要重算，其余组直接复用
+- 跨进程共享：写入走临时文件 + os.replace，网格搜索的多个 worker 可并发读写
+- 进程内另有一层内存缓存，同一进程内的重复回测连磁盘读取也省掉
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+Columns = Dict[str, np.ndarray]
+
+
+def frame_hash(df: pd.DataFrame, columns: Optional[list] = None) -> str:
+    """原始K线内容哈希（时间索引 + 指定列），与数据来源（CSV/分区存储）无关"""
+    h = hashlib.blake2b(digest_size=16)
+    index = pd.DatetimeIndex(df.index)
+    h.update(np.ascontiguousarray(index.asi8).tobytes())
+    for col in columns or list(df.columns):
+        h.update(str(col).encode("utf-8"))
+        h.update(np.ascontiguousarray(np.asarray(df[col], dtype=np.float64)).tobytes())
+    return h.hexdigest()
+
+
+def params_key(params: Dict[str, Any]) -> str:
+    raw = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=6).hexdigest()
+
+
+class FeatureCache:
+    """按指标组存储的特征缓存"""
+
+    def __init__(self, root_dir: str, max_memory_items: int = 256):
+        self.root_dir = root_dir
+        self.max_memory_items = max(0, int(max_memory_items))
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "computed": 0}
+
+    def _path(self, symbol: str, interval: str, data_hash: str, group: str, params: Dict[str, Any]) -> str:
+        return os.path.join(
+            self.root_dir,
+            str(symbol).upper(),
+            interval,
+            data_hash,
+            f"{group}-{params_key(params)}.npz",
+        )
+
+    def _remember(self, path: str, value: Any) -> None:
+        if self.max_memory_items <= 0:
+            return
+        with self._lock:
+            self._memory[path] = value
+            self._memory.move_to_end(path)
+            while len(self._memory) > self.max_memory_items:
+                self._memory.popitem(last=False)
+
+    def _recall(self, path: str) -> Optional[Any]:
+        with self._lock:
+            value = self._memory.get(path)
+            if value is not None:
+                self._memory.move_to_end(path)
+                self.stats["memory_hits"] += 1
+            return value
+
+    @staticmethod
+    def _read(path: str) -> Optional[Columns]:
+        try:
+            with np.load(path, allow_pickle=False) as npz:
+                return {name: npz[name] for name in npz.files}
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write(path: str, columns: Columns) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        try:
+            np.savez(tmp, **columns)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"[WARN] 特征缓存写入失败 {path}: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def get_columns(
+        self,
+        symbol: str,
+        interval: str,
+        data_hash: str,
+        group: str,
+        params: Dict[str, Any],
+        compute: Callable[[], Columns],
+    ) -> Columns:
+        """读取指标组的列（与原始K线等长）；未命中时调用 compute() 计算并落盘"""
+        path = self._path(symbol, interval, data_hash, group, params)
+        cached = self._recall(path)
+        if cached is not None:
+            return cached
+        columns = self._read(path)
+        if columns is not None:
+            self.stats["disk_hits"] += 1
+        else:
+            columns = {name: np.asarray(values, dtype=np.float64) for name, values in compute().items()}
+            self.stats["computed"] += 1
+            self._write(path, columns)
+        self._remember(path, columns)
+        return columns
+
+    def get_frame(
+        self,
+        symbol: str,
+        interval: str,
+        data_hash: str,
+        group: str,
+        params: Dict[str, Any],
+        compute: Callable[[], pd.DataFrame],
+    ) -> pd.DataFrame:
+        """读取独立索引的派生表（如 15m 聚合），索引以纳秒时间戳存储"""
+
+        def _compute_columns() -> Columns:
+            frame = compute()
+            out = {"__index__": np.asarray(pd.DatetimeIndex(frame.index).asi8, dtype=np.int64)}
+            out.update({str(c): np.asarray(frame[c], dtype=np.float64) for c in frame.columns})
+            return out
+
+        path = self._path(symbol, interval, data_hash, group, params)
+        cached = self._recall(path)
+        if cached is None:
+            columns = self._read(path)
+            if columns is not None:
+                self.stats["disk_hits"] += 1
+            else:
+                columns = _compute_columns()
+                self.stats["computed"] += 1
+                self._write(path, columns)
+            self._remember(path, columns)
+        else:
+            columns = cached
+        index = pd.DatetimeIndex(np.asarray(columns["__index__"], dtype="datetime64[ns]"))
+        data = {name: values for name, values in columns.items() if name != "__index__"}
+        return pd.DataFrame(data, index=index)
+
+
+__all__ = ["FeatureCache", "frame_hash", "params_key"]
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+自适应参数搜索（逐次减半 / Hyperband）
+
+预算 = 回测时间前缀占全历史的比例。候选先在短前缀上评估：
+- 回撤或收益越过下限的候选直接剪枝，不再消耗更长的回测
+- 其余按得分保留前 1/eta 进入下一档预算，直到全历史
+采样支持全网格、随机与 Halton 低差异序列（无需额外依赖）。
+"""
+import math
+import random
+from itertools import product
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+Metrics = Dict[str, float]
+Evaluate = Callable[[Dict[str, Any], float], Optional[Metrics]]
+
+_PRIMES = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61, 67, 71, 73, 79, 83, 89, 97]
+
+
+def halton(n: int, dims: int, skip: int = 1) -> List[List[float]]:
+    """Halton 低差异序列，返回 n 个 [0, 1)^dims 的点"""
+    if dims > len(_PRIMES):
+        raise ValueError(f"halton supports up to {len(_PRIMES)} dims, got {dims}")
+    points: List[List[float]] = []
+    for i in range(skip, skip + n):
+        point = []
+        for base in _PRIMES[:dims]:
+            f, r, k = 1.0, 0.0, i
+            while k > 0:
+                f /= base
+                r += f * (k % base)
+                k //= base
+            point.append(r)
+        points.append(point)
+    return points
+
+
+def sample_space(
+    space: Dict[str, Sequence[Any]],
+    n: Optional[int] = None,
+    method: str = "halton",
+    seed: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    从离散参数空间采样候选
+
+    method: grid=全组合（忽略 n），random=均匀随机，halton=低差异序列；结果去重
+    """
+    keys = list(space.keys())
+    if method == "grid" or n is None:
+        return [dict(zip(keys, combo)) for combo in product(*(space[k] for k in keys))]
+    if method == "random":
+        rng = random.Random(seed)
+        units = [[rng.random() for _ in keys] for _ in range(n)]
+    elif method == "halton":
+        units = halton(n, len(keys), skip=1 + seed)
+    else:
+        raise ValueError(f"unknown sampling method: {method}")
+
+    seen = set()
+    out: List[Dict[str, Any]] = []
+    for unit in units:
+        cand = {k: space[k][min(len(space[k]) - 1, int(u * len(space[k])))] for k, u in zip(keys, unit)}
+        key = tuple(cand[k] for k in keys)
+        if key in seen:
+            continue
+        seen.add(key)
+        out.append(cand)
+    return out
+
+
+def rung_budgets(min_fraction: float, eta: float) -> List[float]:
+    """各档预算（时间前缀比例），从 min_fraction 按 eta 倍递增，最后一档为 1.0"""
+    min_fraction = min(1.0, max(1e-3, float(min_fraction)))
+    eta = max(1.5, float(eta))
+    budgets: List[float] = []
+    frac = min_fraction
+    while frac < 1.0 - 1e-9:
+        budgets.append(round(frac, 6))
+        frac *= eta
+    budgets.append(1.0)
+    return budgets
+
+
+def candidate_score(met: Metrics, dd_weight: float = 1.0) -> float:
+    """排序得分：收益减去回撤惩罚"""
+    return float(met.get("total_return_pct", 0.0)) - dd_weight * float(met.get("max_drawdown_pct", 0.0))
+
+
+def breaches_floor(met: Metrics, max_drawdown_pct: Optional[float], min_return_pct: Optional[float]) -> bool:
+    """短窗口上已越过回撤上限或收益下限（继续回测也无法通过筛选）"""
+    if max_drawdown_pct is not None and float(met.get("max_drawdown_pct", 0.0)) >= max_drawdown_pct:
+        return True
+    if min_return_pct is not None and float(met.get("total_return_pct", 0.0)) < min_return_pct:
+        return True
+    return False
+
+
+def successive_halving(
+    candidates: List[Dict[str, Any]],
+    evaluate: Evaluate,
+    budgets: List[float],
+    eta: float = 3.0,
+    max_drawdown_pct: Optional[float] = None,
+    min_return_pct: Optional[float] = None,
+    dd_weight: float = 1.0,
+    on_result: Optional[Callable[[Dict[str, Any], float, Optional[Metrics], str], None]] = None,
+) -> Dict[str, Any]:
+    """
+    对候选执行逐次减半
+
+    evaluate(params, budget_fraction) 返回 metrics（失败返回 None）。
+    on_result(params, budget, metrics, status) 在每次评估后回调，status ∈ {promoted, pruned, dropped, final, failed}。
+    返回 {"final": [(params, metrics)], "evaluations": 次数, "budget_used": 全历史回测等价次数}
+    """
+    alive = list(candidates)
+    evaluations = 0
+    budget_used = 0.0
+    final: List[Any] = []
+    for rung, frac in enumerate(budgets):
+        is_last = rung == len(budgets) - 1
+        scored: List[Any] = []
+        for params in alive:
+            met = evaluate(params, frac)
+            evaluations += 1
+            budget_used += frac
+            if met is None:
+                if on_result:
+                    on_result(params, frac, None, "failed")
+                continue
+            if not is_last and breaches_floor(met, max_drawdown_pct, min_return_pct):
+                if on_result:
+                    on_result(params, frac, met, "pruned")
+                continue
+            scored.append((params, met))
+        if is_last:
+            final = scored
+            if on_result:
+                for params, met in scored:
+                    on_result(params, frac, met, "final")
+            break
+        scored.sort(key=lambda item: candidate_score(item[1], dd_weight), reverse=True)
+        keep = max(1, int(math.ceil(len(scored) / eta))) if scored else 0
+        if on_result:
+            for idx, (params, met) in enumerate(scored):
+                on_result(params, frac, met, "promoted" if idx < keep else "dropped")
+        alive = [params for params, _ in scored[:keep]]
+        if not alive:
+            break
+    return {"final": final, "evaluations": evaluations, "budget_used": round(budget_used, 4)}
+
+
+def hyperband(
+    sample: Callable[[int, int], List[Dict[str, Any]]],
+    evaluate: Evaluate,
+    min_fraction: float = 1.0 / 9.0,
+    eta: float = 3.0,
+    **kwargs: Any,
+) -> Dict[str, Any]:
+    """
+    Hyperband：多个起始预算不同的逐次减半括号，兼顾"多候选短评估"与"少候选长评估"
+
+    sample(n, bracket_index) 返回 n 个候选；其余参数透传给 successive_halving。
+    """
+    eta = max(1.5, float(eta))
+    s_max = max(0, int(math.floor(math.log(1.0 / min(1.0, max(1e-3, min_fraction))) / math.log(eta) + 1e-9)))
+    final: List[Any] = []
+    evaluations = 0
+    budget_used = 0.0
+    for s in range(s_max, -1, -1):
+        n = int(math.ceil((s_max + 1) / (s + 1) * eta ** s))
+        bracket = successive_halving(
+            sample(n, s_max - s),
+            evaluate,
+            rung_budgets(eta ** -s, eta),
+            eta=eta,
+            **kwargs,
+        )
+        final.extend(bracket["final"])
+        evaluations += bracket["evaluations"]
+        budget_used += bracket["budget_used"]
+    return {"final": final, "evaluations": evaluations, "budget_used": round(budget_used, 4)}
+
+
+__all__ = [
+    "breaches_floor",
+    "candidate_score",
+    "halton",
+    "hyperband",
+    "rung_budgets",
+    "sample_space",
+    "successive_halving",
+]
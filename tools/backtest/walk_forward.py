@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+滚动前推（walk-forward）验证
+
+1. 把历史切成滚动的 训练窗/测试窗 折（fold）
+2. 每折在训练窗上做参数搜索（逐次减半，预算=训练窗前缀比例），再用最优参数回测紧随其后的测试窗
+3. 各折并行执行（多进程）；原始K线只在主进程加载一次，通过进程池初始化传给 worker，
+   指标由磁盘特征缓存共享，折之间不重复下载/计算
+4. 输出：拼接的样本外权益曲线、逐折结果、参数稳定性与样本外统计
+"""
+import json
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import backtest_dca_rotation as bdr
+from param_search import candidate_score, rung_budgets, sample_space, successive_halving
+
+
+def make_folds(
+    start: pd.Timestamp,
+    end: pd.Timestamp,
+    train_days: float,
+    test_days: float,
+    step_days: Optional[float] = None,
+) -> List[Dict[str, pd.Timestamp]]:
+    """生成滚动折 [{train_start, train_end, test_end}]，测试窗 [train_end, test_end)"""
+    train = pd.Timedelta(days=float(train_days))
+    test = pd.Timedelta(days=float(test_days))
+    step = pd.Timedelta(days=float(step_days if step_days else test_days))
+    folds: List[Dict[str, pd.Timestamp]] = []
+    cursor = pd.Timestamp(start)
+    while cursor + train + test <= pd.Timestamp(end) + pd.Timedelta(microseconds=1):
+        folds.append({"train_start": cursor, "train_end": cursor + train, "test_end": cursor + train + test})
+        cursor += step
+    return folds
+
+
+# ----------------------------------------------------------------- worker
+def _init_worker(frames: Dict[Tuple[str, str, int, str], Tuple[Optional[pd.DataFrame], Optional[str]]]) -> None:
+    """进程池初始化：把主进程已加载的原始K线放进 worker 的序列缓存"""
+    bdr._SERIES_CACHE.update(frames)
+
+
+def _run_window(
+    ctx: Dict[str, Any],
+    values: Dict[str, Any],
+    start: pd.Timestamp,
+    end: pd.Timestamp,
+    budget_fraction: float = 1.0,
+) -> "bdr.DCARotationBacktester":
+    params = bdr.DCAParams(**{**ctx["base_params"], **values})
+    backtester = bdr.DCARotationBacktester(
+        symbols=ctx["symbols"],
+        interval=ctx["interval"],
+        days=ctx["days"],
+        initial_capital=ctx["initial_capital"],
+        params=params,
+        fee_pct=ctx["fee_pct"],
+        slippage_pct=ctx["slippage_pct"],
+        data_backend=ctx.get("data_backend"),
+    )
+    backtester.run_backtest(budget_fraction=budget_fraction, start=start, end=end)
+    return backtester
+
+
+def _window_metrics(backtester: "bdr.DCARotationBacktester") -> Dict[str, float]:
+    met = dict(backtester.metrics())
+    if backtester.equity_curve:
+        # 窗口末的权益含未平仓浮动盈亏，比只看已平仓交易更贴近样本外表现
+        met["end_equity"] = float(backtester.equity_curve[-1][1])
+        met["equity_return_pct"] = (met["end_equity"] / backtester.initial_capital - 1.0) * 100.0
+    else:
+        met["end_equity"] = float(backtester.initial_capital)
+        met["equity_return_pct"] = 0.0
+    return met
+
+
+def run_fold(index: int, fold: Dict[str, pd.Timestamp], ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """单折：训练窗参数搜索 + 测试窗回测"""
+    search = ctx["search"]
+    space = ctx["space"]
+    keys = list(space.keys())
+
+    def evaluate(values: Dict[str, Any], frac: float) -> Optional[Dict[str, float]]:
+        try:
+            return _window_metrics(_run_window(ctx, values, fold["train_start"], fold["train_end"], frac))
+        except Exception as e:
+            print(f"[ERROR] fold {index} 训练评估失败: {e}")
+            return None
+
+    candidates = sample_space(space, search["samples"], search["sampler"], seed=search["seed"] + index)
+    outcome = successive_halving(
+        candidates,
+        evaluate,
+        rung_budgets(search["min_budget"], search["eta"]),
+        eta=search["eta"],
+        max_drawdown_pct=search.get("prune_max_dd"),
+        min_return_pct=search.get("prune_min_return"),
+    )
+    result: Dict[str, Any] = {
+        "fold": index,
+        "train_start": str(fold["train_start"]),
+        "train_end": str(fold["train_end"]),
+        "test_end": str(fold["test_end"]),
+        "evaluations": outcome["evaluations"],
+    }
+    if not outcome["final"]:
+        result.update({"params": None, "is_metrics": None, "oos_metrics": None, "equity": []})
+        return result
+
+    best_values, is_met = max(outcome["final"], key=lambda item: candidate_score(item[1]))
+    oos = _run_window(ctx, best_values, fold["train_end"], fold["test_end"])
+    result.update(
+        {
+            "params": {k: best_values[k] for k in keys},
+            "is_metrics": is_met,
+            "oos_metrics": _window_metrics(oos),
+            "equity": [(ts.value, float(eq)) for ts, eq in oos.equity_curve],
+        }
+    )
+    return result
+
+
+# ---------------------------------------------------------------- summary
+def stitch_equity(fold_results: List[Dict[str, Any]], initial_capital: float) -> pd.DataFrame:
+    """把各折样本外权益按复利拼接（每折从上一折期末权益继续）"""
+    rows: List[Tuple[pd.Timestamp, float, int]] = []
+    capital = float(initial_capital)
+    for res in sorted(fold_results, key=lambda r: r["fold"]):
+        curve = res.get("equity") or []
+        if not curve:
+            continue
+        scale = capital / float(initial_capital)
+        for ts_ns, eq in curve:
+            rows.append((pd.Timestamp(ts_ns), eq * scale, res["fold"]))
+        capital = rows[-1][1]
+    return pd.DataFrame(rows, columns=["timestamp", "equity", "fold"])
+
+
+def parameter_stability(fold_results: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """每个参数在各折被选中的取值：取值序列、不同取值数、众数及其占比（越接近 1 越稳定）"""
+    chosen = [r["params"] for r in sorted(fold_results, key=lambda r: r["fold"]) if r.get("params")]
+    out: Dict[str, Dict[str, Any]] = {}
+    if not chosen:
+        return out
+    for key in chosen[0].keys():
+        values = [p[key] for p in chosen]
+        counts: Dict[Any, int] = {}
+        for v in values:
+            counts[v] = counts.get(v, 0) + 1
+        modal = max(counts.items(), key=lambda kv: kv[1])
+        out[key] = {
+            "values": values,
+            "distinct": len(counts),
+            "modal": modal[0],
+            "modal_share": round(modal[1] / len(values), 3),
+        }
+    return out
+
+
+def oos_summary(
+    fold_results: List[Dict[str, Any]],
+    equity: pd.DataFrame,
+    initial_capital: float,
+    train_days: float,
+    test_days: float,
+) -> Dict[str, Any]:
+    done = [r for r in fold_results if r.get("oos_metrics")]
+    oos_returns = [float(r["oos_metrics"]["equity_return_pct"]) for r in done]
+    is_returns = [float(r["is_metrics"]["equity_return_pct"]) for r in done]
+    summary: Dict[str, Any] = {"folds": len(fold_results), "folds_evaluated": len(done)}
+    if not done:
+        return summary
+    mean_oos = sum(oos_returns) / len(oos_returns)
+    var = sum((x - mean_oos) ** 2 for x in oos_returns) / len(oos_returns)
+    mean_is = sum(is_returns) / len(is_returns)
+    final_equity = float(equity["equity"].iloc[-1]) if len(equity) else float(initial_capital)
+    max_dd = 0.0
+    if len(equity):
+        peak = equity["equity"].cummax()
+        max_dd = float(((peak - equity["equity"]) / peak).max() * 100.0)
+    summary.update(
+        {
+            "oos_total_return_pct": round((final_equity / initial_capital - 1.0) * 100.0, 3),
+            "oos_max_drawdown_pct": round(max_dd, 3),
+            "oos_fold_return_mean_pct": round(mean_oos, 3),
+            "oos_fold_return_std_pct": round(math.sqrt(var), 3),
+            "oos_positive_fold_share": round(sum(1 for x in oos_returns if x > 0) / len(oos_returns), 3),
+            "is_fold_return_mean_pct": round(mean_is, 3),
+            # 前推效率：按天折算的样本外收益 / 样本内收益
+            "walk_forward_efficiency": (
+                round((mean_oos / test_days) / (mean_is / train_days), 3) if mean_is > 0 else None
+            ),
+        }
+    )
+    return summary
+
+
+# -------------------------------------------------------------------- run
+def run_walk_forward(
+    symbols: List[str],
+    interval: str,
+    days: int,
+    initial_capital: float,
+    base_params: "bdr.DCAParams",
+    train_days: float,
+    test_days: float,
+    step_days: Optional[float] = None,
+    workers: int = 1,
+    search: Optional[Dict[str, Any]] = None,
+    fee_pct: float = 0.0,
+    slippage_pct: float = 0.0,
+    data_backend: Optional[str] = None,
+    space: Optional[Dict[str, List[Any]]] = None,
+    out_dir: Optional[str] = "logs",
+) -> Dict[str, Any]:
+    search_cfg = {
+        "samples": 27,
+        "sampler": "halton",
+        "seed": 0,
+        "eta": 3.0,
+        "min_budget": 1.0 / 3.0,
+        "prune_max_dd": 20.0,
+        "prune_min_return": -10.0,
+    }
+    search_cfg.update(search or {})
+    ctx = {
+        "symbols": symbols,
+        "interval": interval,
+        "days": days,
+        "initial_capital": initial_capital,
+        "base_params": dict(base_params.__dict__),
+        "fee_pct": fee_pct,
+        "slippage_pct": slippage_pct,
+        "data_backend": data_backend,
+        "search": search_cfg,
+        "space": space or bdr.GRID_SEARCH_SPACE,
+    }
+
+    # 主进程只加载一次原始K线，并据此确定时间范围
+    loader = bdr.DCARotationBacktester(
+        symbols=symbols, interval=interval, days=days, initial_capital=initial_capital,
+        params=base_params, data_backend=data_backend,
+    )
+    loader.load_data()
+    folds = make_folds(loader.data_start, loader.data_end, train_days, test_days, step_days)
+    if not folds:
+        raise RuntimeError(f"数据区间 {loader.data_start} ~ {loader.data_end} 不足以切分 train={train_days}d test={test_days}d")
+    print(f"[WF] 折数: {len(folds)} train={train_days}d test={test_days}d step={step_days or test_days}d workers={workers}")
+
+    frames = dict(bdr._SERIES_CACHE)
+    if workers <= 1:
+        fold_results = [run_fold(i, fold, ctx) for i, fold in enumerate(folds)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(frames,)) as pool:
+            futures = [pool.submit(run_fold, i, fold, ctx) for i, fold in enumerate(folds)]
+            fold_results = [f.result() for f in futures]
+
+    equity = stitch_equity(fold_results, initial_capital)
+    report = {
+        "summary": oos_summary(fold_results, equity, initial_capital, train_days, test_days),
+        "parameter_stability": parameter_stability(fold_results),
+        "folds": [{k: v for k, v in r.items() if k != "equity"} for r in fold_results],
+    }
+    if out_dir:
+        _save_report(out_dir, report, equity)
+    print(f"[WF] 样本外: {json.dumps(report['summary'], ensure_ascii=False)}")
+    return {**report, "equity": equity}
+
+
+def _save_report(out_dir: str, report: Dict[str, Any], equity: pd.DataFrame) -> None:
+    os.makedirs(out_dir, exist_ok=True)
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    equity_file = os.path.join(out_dir, f"walk_forward_equity_{ts}.csv")
+    folds_file = os.path.join(out_dir, f"walk_forward_folds_{ts}.csv")
+    summary_file = os.path.join(out_dir, f"walk_forward_summary_{ts}.json")
+    equity.to_csv(equity_file, index=False)
+    rows = []
+    for f in report["folds"]:
+        row = {k: f[k] for k in ("fold", "train_start", "train_end", "test_end", "evaluations")}
+        for prefix, key in (("is_", "is_metrics"), ("oos_", "oos_metrics")):
+            for mk, mv in (f.get(key) or {}).items():
+                row[prefix + mk] = mv
+        row.update(f.get("params") or {})
+        rows.append(row)
+    pd.DataFrame(rows).to_csv(folds_file, index=False)
+    with open(summary_file, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2, ensure_ascii=False, default=str)
+    print(f"[OK] 样本外权益: {equity_file}")
+    print(f"[OK] 逐折结果: {folds_file}")
+    print(f"[OK] 汇总: {summary_file}")
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--config', type=str, default=os.path.join(PROJECT_ROOT, "config", "trading_config_vps.json"), help='config path')
+    parser.add_argument('--train_days', type=float, default=30.0, help='train window length')
+    parser.add_argument('--test_days', type=float, default=7.0, help='test window length')
+    parser.add_argument('--step_days', type=float, default=None, help='fold step (default = test_days)')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) - 1), help='parallel fold workers')
+    parser.add_argument('--samples', type=int, default=27, help='candidates per fold')
+    parser.add_argument('--sampler', choices=['grid', 'random', 'halton'], default='halton')
+    parser.add_argument('--eta', type=float, default=3.0)
+    parser.add_argument('--min_budget', type=float, default=1.0 / 3.0)
+    parser.add_argument('--fee_pct', type=float, default=0.00075, help='transaction fee fraction')
+    parser.add_argument('--slippage_pct', type=float, default=0.0005, help='slippage fraction')
+    args = parser.parse_args()
+
+    symbols, interval, days, initial_capital, base_params = bdr.load_run_config(args.config)
+    run_walk_forward(
+        symbols, interval, days, initial_capital, base_params,
+        train_days=args.train_days,
+        test_days=args.test_days,
+        step_days=args.step_days,
+        workers=args.workers,
+        search={"samples": args.samples, "sampler": args.sampler, "eta": args.eta, "min_budget": args.min_budget},
+        fee_pct=args.fee_pct,
+        slippage_pct=args.slippage_pct,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+日志事件库 (Event Store)
+
+增量摄取 trade_log.csv / DCA_dashboard_*.csv / runtime.out.*.log，解析一次后写入 SQLite:
+- 每个源文件记录已消费的字节偏移（与 inode、CSV 表头一起校验），下次只读新增的完整行；
+  文件被截断/轮转/表头迁移重写时自动从头重读，依靠去重键保证不重复入库
+- 事件类型: open / open_rejected / close / decision / direction / risk
+- 平仓在入库时即与最早的未匹配开仓配对并记录持仓分钟数，小时报告只需一次 GROUP BY
+- 偏移与事件在同一事务内提交，中途退出不会丢失或重复
+
+示例:
+    python tools/logs_analysis/event_store.py ingest --log-dir logs --watch
+    python tools/logs_analysis/event_store.py query --kind close --symbol BTCUSDT --last 6h
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    origin TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    hour TEXT NOT NULL,
+    symbol TEXT NOT NULL DEFAULT '',
+    side TEXT NOT NULL DEFAULT '',
+    engine TEXT NOT NULL DEFAULT '',
+    reason TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT '',
+    pnl REAL,
+    hold_minutes REAL,
+    cycle INTEGER,
+    matched INTEGER NOT NULL DEFAULT 0,
+    data TEXT,
+    dedupe TEXT NOT NULL UNIQUE
+);
+CREATE INDEX IF NOT EXISTS ix_events_origin_ts ON events(origin, ts);
+CREATE INDEX IF NOT EXISTS ix_events_kind_ts ON events(kind, ts);
+CREATE INDEX IF NOT EXISTS ix_events_symbol_ts ON events(symbol, ts);
+CREATE INDEX IF NOT EXISTS ix_events_open_match ON events(origin, kind, symbol, matched, side, ts);
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    inode INTEGER,
+    offset INTEGER NOT NULL DEFAULT 0,
+    header TEXT,
+    state TEXT,
+    updated_at REAL
+);
+"""
+
+SCORE_CLOSE_KEY = "评分低于阈值"
+ENTRY_ENGINE_RE = re.compile(r"entry_engine=([A-Z_]+)")
+FALLBACK_ENGINE_RE = re.compile(r"(?:^|[^\w])engine=([A-Z_]+)")
+CYCLE_RE = re.compile(r"FUND_FLOW cycle (\d+) @ ([\d-]+ [\d:]+)")
+DECISION_RE = re.compile(r"\[([A-Z0-9]+USDT)\] 决策=(\w+)(?: \| 状态=(\S+))?")
+DIRECTION_RE = re.compile(r"方向判断: dir_lw=(\w+)\(([+-][\d.]+)\) \| dir_ev=(\w+)\(([+-][\d.]+)\)")
+LINE_TS_RE = re.compile(r"(\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2})")
+SYMBOL_RE = re.compile(r"\b([A-Z0-9]{2,}USDT)\b")
+RISK_RE = re.compile(r"(Kill switch|风控|熔断|强平|止损|回撤|drawdown)", re.IGNORECASE)
+
+
+def parse_timestamp(raw: Any) -> Optional[datetime]:
+    text = str(raw or "").strip()
+    if not text:
+        return None
+    try:
+        dt = datetime.fromisoformat(text.replace("Z", ""))
+    except ValueError:
+        return None
+    return dt.replace(tzinfo=None)
+
+
+def to_float(value: Any, default: Optional[float] = 0.0) -> Optional[float]:
+    try:
+        if value is None or str(value).strip() == "":
+            return default
+        return float(value)
+    except (ValueError, TypeError):
+        return default
+
+
+def extract_entry_engine(reason: str) -> str:
+    text = str(reason or "")
+    m = ENTRY_ENGINE_RE.search(text) or FALLBACK_ENGINE_RE.search(text)
+    return m.group(1).upper() if m else "UNKNOWN"
+
+
+def _fmt_ts(ts: datetime) -> str:
+    return ts.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _fmt_hour(ts: datetime) -> str:
+    return ts.strftime("%Y-%m-%d %H:00:00")
+
+
+def _dedupe(*parts: Any) -> str:
+    raw = "\x1f".join("" if p is None else str(p) for p in parts)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=12).hexdigest()
+
+
+class EventStore:
+    """SQLite 事件库 + 增量尾随摄取"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    # ------------------------------------------------------------- tailing
+    def _source(self, path: str) -> Optional[sqlite3.Row]:
+        return self.conn.execute("SELECT * FROM sources WHERE path=?", (path,)).fetchone()
+
+    def _read_new(self, path: Path, kind: str) -> Tuple[int, int, str, Optional[str], Dict[str, Any]]:
+        """
+        读取上次偏移之后的完整行
+
+        返回 (起始偏移, 新偏移, 文本, 表头, 解析状态)；起始偏移为 0 表示从头重读。
+        """
+        st = path.stat()
+        src = self._source(str(path))
+        offset = 0
+        header: Optional[str] = None
+        state: Dict[str, Any] = {}
+        if src is not None and src["inode"] == st.st_ino and st.st_size >= int(src["offset"]):
+            offset = int(src["offset"])
+            header = src["header"]
+            state = json.loads(src["state"] or "{}")
+        with path.open("rb") as f:
+            if offset > 0 and header is not None:
+                # 表头变化说明文件被整体重写（如 trade_log 列迁移），从头重读
+                first = f.readline().decode("utf-8-sig", errors="ignore").rstrip("\r\n")
+                if first != header:
+                    offset, header, state = 0, None, {}
+            f.seek(offset)
+            data = f.read()
+        cut = data.rfind(b"\n") + 1
+        text = data[:cut].decode("utf-8-sig" if offset == 0 else "utf-8", errors="ignore")
+        return offset, offset + cut, text, header, state
+
+    def _save_source(self, path: Path, kind: str, offset: int, header: Optional[str], state: Dict[str, Any]) -> None:
+        self.conn.execute(
+            "INSERT INTO sources(path, kind, inode, offset, header, state, updated_at) VALUES (?,?,?,?,?,?,?) "
+            "ON CONFLICT(path) DO UPDATE SET kind=excluded.kind, inode=excluded.inode, offset=excluded.offset, "
+            "header=excluded.header, state=excluded.state, updated_at=excluded.updated_at",
+            (str(path), kind, path.stat().st_ino, offset, header, json.dumps(state, ensure_ascii=False), time.time()),
+        )
+
+    def _csv_rows(self, text: str, start: int, header: Optional[str]) -> Tuple[Optional[str], List[Dict[str, str]]]:
+        lines = text
+        if start == 0:
+            if not text:
+                return header, []
+            first, _, lines = text.partition("\n")
+            header = first.rstrip("\r")
+        if header is None:
+            return header, []
+        fields = next(csv.reader([header]))
+        rows = [dict(zip(fields, values)) for values in csv.reader(io.StringIO(lines)) if values]
+        return header, rows
+
+    # -------------------------------------------------------------- insert
+    def _insert(self, origin: str, kind: str, ts: datetime, dedupe: str, **fields: Any) -> Optional[int]:
+        """写入事件，去重键已存在时返回 None"""
+        data = fields.pop("data", None)
+        cols = ["origin", "kind", "ts", "hour", "dedupe", "data"] + list(fields.keys())
+        values = [origin, kind, _fmt_ts(ts), _fmt_hour(ts), dedupe, json.dumps(data, ensure_ascii=False) if data else None]
+        values += [fields[k] for k in fields]
+        cur = self.conn.execute(
+            f"INSERT OR IGNORE INTO events({','.join(cols)}) VALUES ({','.join('?' * len(cols))})",
+            values,
+        )
+        return cur.lastrowid if cur.rowcount == 1 else None
+
+    def _match_open(self, origin: str, symbol: str, side: str, ts: datetime) -> Optional[float]:
+        """平仓与最早的未匹配开仓配对（先同方向，再任意方向），返回持仓分钟数"""
+        base = "SELECT id, ts FROM events WHERE origin=? AND kind='open' AND symbol=? AND matched=0"
+        row = None
+        if side:
+            row = self.conn.execute(base + " AND side=? ORDER BY ts, id LIMIT 1", (origin, symbol, side)).fetchone()
+        if row is None:
+            row = self.conn.execute(base + " ORDER BY ts, id LIMIT 1", (origin, symbol)).fetchone()
+        if row is None:
+            return None
+        self.conn.execute("UPDATE events SET matched=1 WHERE id=?", (row["id"],))
+        opened = parse_timestamp(row["ts"])
+        return max(0.0, (ts - opened).total_seconds() / 60.0) if opened else None
+
+    def _add_open(self, origin: str, ts: datetime, symbol: str, side: str, engine: str, reason: str, status: str, dedupe: str) -> bool:
+        kind = "open" if (not status or status in ("success", "ok")) else "open_rejected"
+        return self._insert(origin, kind, ts, dedupe, symbol=symbol, side=side, engine=engine, reason=reason, status=status) is not None
+
+    def _add_close(self, origin: str, ts: datetime, symbol: str, side: str, reason: str, pnl: float, status: str, dedupe: str) -> bool:
+        row_id = self._insert(origin, "close", ts, dedupe, symbol=symbol, side=side, reason=reason, pnl=pnl, status=status)
+        if row_id is None:
+            return False
+        hold = self._match_open(origin, symbol, side, ts)
+        if hold is not None:
+            self.conn.execute("UPDATE events SET hold_minutes=? WHERE id=?", (hold, row_id))
+        return True
+
+    # ------------------------------------------------------------ parsers
+    def ingest_trade_log(self, path: Path) -> int:
+        start, end, text, header, state = self._read_new(path, "trade_log")
+        header, rows = self._csv_rows(text, start, header)
+        count = 0
+        with self.conn:
+            for row in rows:
+                ts = parse_timestamp(row.get("timestamp"))
+                if ts is None:
+                    continue
+                action = str(row.get("action", "")).strip().upper()
+                symbol = str(row.get("symbol", "")).strip().upper()
+                reason = str(row.get("reason", "") or "")
+                status = str(row.get("result", "")).strip().lower()
+                key = _dedupe("trade_log", row.get("timestamp"), symbol, action, status, row.get("pnl"), reason)
+                if action in ("BUY_OPEN", "SELL_OPEN"):
+                    side = "LONG" if action == "BUY_OPEN" else "SHORT"
+                    count += self._add_open("trade_log", ts, symbol, side, extract_entry_engine(reason), reason, status, key)
+                elif action == "CLOSE":
+                    side = str(row.get("position_side", "")).strip().upper()
+                    count += self._add_close("trade_log", ts, symbol, side, reason, to_float(row.get("pnl")), status, key)
+            self._save_source(path, "trade_log", end, header, state)
+        return count
+
+    def ingest_dashboard(self, path: Path) -> int:
+        start, end, text, header, state = self._read_new(path, "dashboard")
+        header, rows = self._csv_rows(text, start, header)
+        count = 0
+        with self.conn:
+            for row in rows:
+                ts = parse_timestamp(row.get("timestamp"))
+                event_type = str(row.get("event_type", "")).strip().upper()
+                if ts is None or not event_type:
+                    continue
+                symbol = str(row.get("event_symbol", "") or row.get("symbol", "")).strip().upper()
+                side = str(row.get("event_side", "")).strip().upper()
+                if not side:
+                    if event_type.endswith("_LONG"):
+                        side = "LONG"
+                    elif event_type.endswith("_SHORT"):
+                        side = "SHORT"
+                reason = str(row.get("event_reason", "") or "")
+                status = str(row.get("event_status", "")).strip().lower()
+                event_pnl = str(row.get("event_pnl", "") or "")
+                # 同一事件会出现在多个小时快照中，按内容去重
+                key = _dedupe(
+                    "dashboard", ts.isoformat(), event_type, symbol, side, status,
+                    str(row.get("event_price", "") or ""), event_pnl, reason,
+                )
+                if event_type in ("OPEN_LONG", "OPEN_SHORT"):
+                    engine = str(row.get("engine", "")).strip().upper() or extract_entry_engine(reason)
+                    side = side or ("LONG" if event_type == "OPEN_LONG" else "SHORT")
+                    count += self._add_open("dashboard", ts, symbol, side, engine, reason, status, key)
+                elif event_type in ("CLOSE", "CLOSE_EXTERNAL"):
+                    count += self._add_close("dashboard", ts, symbol, side, reason, to_float(event_pnl), status, key)
+            self._save_source(path, "dashboard", end, header, state)
+        return count
+
+    def ingest_runtime_log(self, path: Path) -> int:
+        """运行日志：cycle 时间、逐币决策、方向判断与风控事件（上下文状态随偏移一起保存）"""
+        start, end, text, _, state = self._read_new(path, "runtime")
+        count = 0
+        with self.conn:
+            for lineno, line in enumerate(text.splitlines()):
+                m = CYCLE_RE.search(line)
+                if m:
+                    state["cycle"] = int(m.group(1))
+                    state["time"] = m.group(2)
+                    continue
+                line_ts = LINE_TS_RE.search(line)
+                ts = parse_timestamp(line_ts.group(1)) if line_ts else parse_timestamp(state.get("time"))
+                if ts is None:
+                    continue
+                cycle = state.get("cycle")
+                m = DECISION_RE.search(line)
+                if m:
+                    state["symbol"] = m.group(1)
+                    count += self._insert(
+                        "runtime", "decision", ts, _dedupe("decision", ts, cycle, line.strip()),
+                        symbol=m.group(1), status=(m.group(3) or ""), cycle=cycle,
+                        data={"decision": m.group(2)},
+                    ) is not None
+                    continue
+                m = DIRECTION_RE.search(line)
+                if m and state.get("symbol"):
+                    count += self._insert(
+                        "runtime", "direction", ts, _dedupe("direction", ts, cycle, state["symbol"], line.strip()),
+                        symbol=state["symbol"], cycle=cycle,
+                        data={
+                            "lw_dir": m.group(1), "lw_score": float(m.group(2)),
+                            "ev_dir": m.group(3), "ev_score": float(m.group(4)),
+                        },
+                    ) is not None
+                    continue
+                if RISK_RE.search(line):
+                    sym = SYMBOL_RE.search(line)
+                    count += self._insert(
+                        "runtime", "risk", ts, _dedupe("risk", ts, cycle, line.strip()),
+                        symbol=sym.group(1) if sym else "", reason=line.strip()[:500], cycle=cycle,
+                    ) is not None
+            self._save_source(path, "runtime", end, None, state)
+        return count
+
+    def ingest_dir(self, log_dir: str) -> Dict[str, int]:
+        """发现并增量摄取目录下的全部已知日志"""
+        root = Path(log_dir)
+        counts = {"trade_log": 0, "dashboard": 0, "runtime": 0}
+        if root.is_file():
+            counts["trade_log"] += self.ingest_trade_log(root)
+            return counts
+        if not root.exists():
+            return counts
+        for path in sorted(set(root.glob("**/trade_log.csv"))):
+            counts["trade_log"] += self.ingest_trade_log(path)
+        for path in sorted(set(root.glob("**/DCA_dashboard_*.csv"))):
+            counts["dashboard"] += self.ingest_dashboard(path)
+        for path in sorted(set(root.glob("**/runtime.out*.log"))):
+            counts["runtime"] += self.ingest_runtime_log(path)
+        return counts
+
+    # -------------------------------------------------------------- query
+    def query(
+        self,
+        kind: Optional[Iterable[str]] = None,
+        symbol: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        origin: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        where: List[str] = []
+        args: List[Any] = []
+        kinds = [kind] if isinstance(kind, str) else list(kind or [])
+        if kinds:
+            where.append(f"kind IN ({','.join('?' * len(kinds))})")
+            args.extend(kinds)
+        if symbol:
+            where.append("symbol=?")
+            args.append(symbol.upper())
+        if origin:
+            where.append("origin=?")
+            args.append(origin)
+        if since is not None:
+            where.append("ts>=?")
+            args.append(_fmt_ts(since))
+        if until is not None:
+            where.append("ts<?")
+            args.append(_fmt_ts(until))
+        sql = "SELECT * FROM events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts, id"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        out: List[Dict[str, Any]] = []
+        for row in self.conn.execute(sql, args):
+            item = dict(row)
+            item["data"] = json.loads(item["data"]) if item.get("data") else {}
+            out.append(item)
+        return out
+
+    def hourly_stats(self, origin: str, since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """按小时聚合开平仓（origin 对应单一数据源，避免 trade_log 与 dashboard 重复计数）"""
+        sql = (
+            "SELECT hour,"
+            " SUM(kind='open') AS open_count,"
+            " SUM(kind='open' AND engine='TREND') AS trend_open_count,"
+            " SUM(kind='close') AS close_count,"
+            " SUM(kind='close' AND instr(reason, ?) > 0) AS score_close_count,"
+            " COALESCE(SUM(CASE WHEN kind='close' THEN pnl END), 0.0) AS net_pnl,"
+            " COALESCE(SUM(CASE WHEN kind='close' THEN hold_minutes END), 0.0) AS hold_minutes_sum,"
+            " COUNT(CASE WHEN kind='close' THEN hold_minutes END) AS hold_count"
+            " FROM events WHERE origin=? AND kind IN ('open', 'close')"
+        )
+        args: List[Any] = [SCORE_CLOSE_KEY, origin]
+        if since is not None:
+            sql += " AND hour>=?"
+            args.append(_fmt_hour(since))
+        sql += " GROUP BY hour ORDER BY hour"
+        return [dict(row) for row in self.conn.execute(sql, args)]
+
+
+# ------------------------------------------------------------------- CLI
+_DURATION_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([smhd])\s*$", re.IGNORECASE)
+_UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(text: str) -> timedelta:
+    match = _DURATION_RE.match(str(text))
+    if not match:
+        raise argparse.ArgumentTypeError(f"无法解析时长: {text}（示例: 30m / 6h / 2d）")
+    return timedelta(seconds=float(match.group(1)) * _UNIT_SECONDS[match.group(2).lower()])
+
+
+def default_db_path(log_dir: str) -> str:
+    root = Path(log_dir)
+    base = root.parent if root.is_file() else root
+    return str(base / "events.db")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="日志事件库：增量摄取与查询")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_ing = sub.add_parser("ingest", help="增量摄取日志目录")
+    p_ing.add_argument("--log-dir", default="logs")
+    p_ing.add_argument("--db", default=None, help="事件库路径（默认 <log-dir>/events.db）")
+    p_ing.add_argument("--watch", action="store_true", help="常驻运行，按间隔尾随新增内容")
+    p_ing.add_argument("--interval", type=float, default=30.0, help="watch 间隔秒数")
+    p_q = sub.add_parser("query", help="查询事件")
+    p_q.add_argument("--log-dir", default="logs")
+    p_q.add_argument("--db", default=None)
+    p_q.add_argument("--kind", action="append", help="open/close/decision/direction/risk，可重复")
+    p_q.add_argument("--symbol")
+    p_q.add_argument("--origin", choices=["trade_log", "dashboard", "runtime"])
+    p_q.add_argument("--last", type=parse_duration, help="最近时长，例如 6h")
+    p_q.add_argument("--limit", type=int, default=200)
+    args = parser.parse_args()
+
+    store = EventStore(args.db or default_db_path(args.log_dir))
+    try:
+        if args.cmd == "ingest":
+            while True:
+                started = time.perf_counter()
+                counts = store.ingest_dir(args.log_dir)
+                print(f"ingest> {counts} ({(time.perf_counter() - started) * 1000:.0f}ms)")
+                if not args.watch:
+                    break
+                time.sleep(max(1.0, args.interval))
+        else:
+            since = datetime.now() - args.last if args.last else None
+            for ev in store.query(args.kind, args.symbol, since=since, origin=args.origin, limit=args.limit):
+                print(json.dumps(ev, ensure_ascii=False))
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+归因日志查询（基于侧车 .idx 索引，不做全文扫描）
+
+示例:
+    python tools/logs_analysis/query_attribution.py --symbol BTCUSDT --event score_fusion --last 6h
+    python tools/logs_analysis/query_attribution.py --root logs --event decision --since 2026-01-01T00:00:00Z --limit 50
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from src.fund_flow.attribution_index import query_attribution  # noqa: E402
+
+_DURATION_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([smhd])\s*$", re.IGNORECASE)
+_UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(text: str) -> timedelta:
+    match = _DURATION_RE.match(str(text))
+    if not match:
+        raise argparse.ArgumentTypeError(f"无法解析时长: {text}（示例: 30m / 6h / 2d）")
+    return timedelta(seconds=float(match.group(1)) * _UNIT_SECONDS[match.group(2).lower()])
+
+
+def parse_time(text: str) -> datetime:
+    try:
+        dt = datetime.fromisoformat(str(text).strip().replace("Z", "+00:00"))
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"无法解析时间: {text}") from e
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="按交易对/事件/时间段查询 fund_flow 归因日志")
+    parser.add_argument("--root", default=os.path.join(ROOT, "logs"), help="日志根目录（含 YYYY-MM/YYYY-MM-DD 分桶）")
+    parser.add_argument("--file-name", default="fund_flow_attribution.jsonl")
+    parser.add_argument("--symbol", help="交易对，例如 BTCUSDT")
+    parser.add_argument("--event", action="append", help="事件类型，可重复: decision/execution/weight_snapshot/score_fusion/factor_contribution")
+    parser.add_argument("--last", type=parse_duration, help="最近时长，例如 6h")
+    parser.add_argument("--since", type=parse_time, help="起始时间 (ISO8601)")
+    parser.add_argument("--until", type=parse_time, help="结束时间 (ISO8601)")
+    parser.add_argument("--limit", type=int, help="最多输出条数")
+    parser.add_argument("--pretty", action="store_true", help="缩进输出")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    since = args.since
+    if args.last is not None:
+        since = datetime.now(timezone.utc) - args.last
+    count = 0
+    for payload in query_attribution(
+        args.root,
+        file_name=args.file_name,
+        symbol=args.symbol,
+        events=args.event,
+        since=since,
+        until=args.until,
+        limit=args.limit,
+    ):
+        print(json.dumps(payload, ensure_ascii=False, indent=2 if args.pretty else None))
+        count += 1
+    print(f"# matched={count}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
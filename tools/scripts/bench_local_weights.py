@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.fund_flow.ai_weight_service import DeepSeekAIService
+from src.fund_flow.local_weight_provider import WEIGHT_RESPONSE_SCHEMA
+
+WEIGHT_KEYS = list(WEIGHT_RESPONSE_SCHEMA["properties"]["weights"]["properties"])
+
+
+def make_handler(latency_ms: float, fail_rate: float, rng: random.Random):
+    class StubModel(BaseHTTPRequestHandler):
+        """桩模型服务：固定延迟 + 按比例失败，返回合法的权重 JSON"""
+
+        def do_POST(self):  # noqa: N802
+            length = int(self.headers.get("Content-Length", 0))
+            self.rfile.read(length)
+            time.sleep(latency_ms / 1000.0)
+            if rng.random() < fail_rate:
+                self.send_response(500)
+                self.end_headers()
+                return
+            raw = [rng.random() + 0.05 for _ in WEIGHT_KEYS]
+            total = sum(raw)
+            content = {"weights": {k: v / total for k, v in zip(WEIGHT_KEYS, raw)}, "confidence": 0.6, "fallback_used": False}
+            body = json.dumps({"choices": [{"message": {"content": json.dumps(content)}}]}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):  # noqa: A002
+            return
+
+    return StubModel
+
+
+def build_context(rng: random.Random) -> dict:
+    history = [
+        {k: rng.uniform(-1, 1) for k in ("cvd", "cvd_momentum", "oi_delta", "funding", "depth_ratio", "imbalance", "liquidity_delta", "micro_delta")}
+        for _ in range(24)
+    ]
+    return {
+        "cvd_ratio": rng.uniform(-1, 1),
+        "oi_delta_ratio": rng.uniform(-1, 1),
+        "timeframes": {
+            "15m": {"history": history, "ret_period": rng.uniform(-0.01, 0.01), "adx": rng.uniform(10, 40)},
+            "5m": {},
+            "3m": {},
+        },
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="offline load test for the local weight provider")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--fail-rate", type=float, default=0.05)
+    parser.add_argument("--timeout", type=float, default=3.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.latency_ms, args.fail_rate, rng))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    service = DeepSeekAIService(
+        {
+            "deepseek_ai": {
+                "enabled": True,
+                "provider": "local",
+                "cache_ttl": 1,
+                "stale_fallback_ttl": 600,
+                "local": {"base_url": base_url, "model": "stub", "timeout": args.timeout},
+            }
+        }
+    )
+    contexts = [build_context(rng) for _ in range(32)]
+    latencies = []
+    for i in range(args.requests):
+        # 每次换 symbol，绕开结构化缓存，测的是实际推理路径
+        started = time.perf_counter()
+        service.get_weights(f"SYM{i}USDT", rng.choice(["TREND", "RANGE"]), contexts[i % len(contexts)])
+        latencies.append((time.perf_counter() - started) * 1000.0)
+    server.shutdown()
+
+    latencies.sort()
+    n = len(latencies)
+    stats = service.get_stats()
+    print(f"requests={n} p50={latencies[n // 2]:.1f}ms p95={latencies[min(n - 1, int(n * 0.95))]:.1f}ms max={latencies[-1]:.1f}ms")
+    print(f"api_calls={stats['api_calls']} errors={stats['errors']} fallbacks={stats['fallbacks']} stale_served={stats['stale_served']}")
+    print(f"local={json.dumps(stats['local'], ensure_ascii=False)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.fund_flow.trigger_engine import TriggerEngine
+
+METRICS = ["cvd", "oi_delta", "depth", "liq_norm", "imbalance", "funding", "long_score", "short_score"]
+OPERATORS = [">", ">=", "<", "<=", "!=", "between"]
+
+
+class _Decision:
+    def __init__(self, operation: str, long_score: float, short_score: float):
+        self.operation = operation
+        self.metadata = {"long_score": long_score, "short_score": short_score}
+
+
+def build_pool(rule_count: int, rng: random.Random) -> dict:
+    rules = []
+    for i in range(rule_count):
+        metric = rng.choice(METRICS)
+        if i % 3 == 0 and "score" not in metric:
+            metric = f"tf:{rng.choice(['5m', '15m', '1h'])}:{metric}"
+        rules.append(
+            {
+                "name": f"rule_{i}",
+                "side": rng.choice(["LONG", "SHORT", "BOTH"]),
+                "metric": metric,
+                "operator": rng.choice(OPERATORS),
+                "threshold": [rng.uniform(-1, 0), rng.uniform(0, 1)] if i % 5 == 0 else rng.uniform(-1, 1),
+            }
+        )
+    return {"enabled": True, "pool_id": "bench", "logic": "OR", "edge_trigger_enabled": True, "rules": rules}
+
+
+def build_context(rng: random.Random) -> dict:
+    base = {k: rng.uniform(-1, 1) for k in ("cvd_ratio", "oi_delta_ratio", "depth_ratio", "liquidity_delta_norm", "imbalance", "funding")}
+    base["timeframes"] = {tf: {k: rng.uniform(-1, 1) for k in base} for tf in ("5m", "15m", "1h")}
+    return base
+
+
+def legacy_evaluate_signal_pool(
+    engine: TriggerEngine,
+    *,
+    symbol: str,
+    trigger_type: str,
+    market_flow_context: Dict[str, Any],
+    decision: Any,
+    has_position: bool,
+    signal_pool_config: Dict[str, Any],
+) -> Dict[str, Any]:
+    """编译前的 evaluate_signal_pool：每次评估解析配置，逐条走 _resolve_metric_value / _compare"""
+    cfg = signal_pool_config if isinstance(signal_pool_config, dict) else {}
+    if not cfg or not engine._to_bool(cfg.get("enabled", False), False):
+        return {"passed": True, "reason": "signal_pool_disabled"}
+
+    if str(trigger_type).lower() == "scheduled" and engine._to_bool(cfg.get("scheduled_trigger_bypass", True), True):
+        return {"passed": True, "reason": "scheduled_bypass"}
+
+    scoped_symbols = cfg.get("symbols")
+    if isinstance(scoped_symbols, list) and scoped_symbols:
+        symbol_set = {str(s).upper() for s in scoped_symbols if str(s).strip()}
+        if symbol_set and symbol.upper() not in symbol_set:
+            return {"passed": False, "reason": "symbol_not_in_pool_scope"}
+
+    operation = engine._normalize_side(getattr(decision, "operation", ""))
+    apply_when_position_exists = engine._to_bool(cfg.get("apply_when_position_exists", False), False)
+    if operation not in ("LONG", "SHORT") or (has_position and not apply_when_position_exists):
+        # 基准只覆盖开仓路径；边沿同步分支两种实现相同
+        raise ValueError("benchmark only covers entry decisions without position")
+
+    scores = engine._extract_scores(decision)
+    side_score = scores["long_score"] if operation == "LONG" else scores["short_score"]
+    min_score_key = "min_long_score" if operation == "LONG" else "min_short_score"
+    min_score_required = engine._to_float(cfg.get(min_score_key), 0.0)
+    if side_score < min_score_required:
+        return {
+            "passed": False,
+            "reason": f"{min_score_key}_not_met",
+            "score": side_score,
+            "required": min_score_required,
+        }
+
+    raw_rules = cfg.get("rules")
+    rules = raw_rules if isinstance(raw_rules, list) else []
+    active_rules: List[Dict[str, Any]] = []
+    for item in rules:
+        if not isinstance(item, dict):
+            continue
+        rule_side = engine._normalize_side(item.get("side", "BOTH"))
+        if rule_side in ("", "BOTH", operation):
+            active_rules.append(item)
+
+    if not active_rules:
+        return {
+            "passed": True,
+            "reason": "score_gate_only",
+            "score": side_score,
+            "required": min_score_required,
+        }
+
+    evaluations: List[Dict[str, Any]] = []
+    pass_count = 0
+    for idx, rule in enumerate(active_rules, start=1):
+        metric = str(rule.get("metric", "")).strip()
+        if not metric:
+            continue
+        timeframe = str(rule.get("timeframe", "")).strip()
+        value = engine._resolve_metric_value(
+            metric,
+            market_flow_context or {},
+            decision,
+            timeframe=timeframe or None,
+        )
+        operator = str(rule.get("operator", ">=")).strip()
+        threshold = engine._to_float(rule.get("threshold"), 0.0)
+        threshold_max = rule.get("threshold_max")
+        if isinstance(rule.get("threshold"), list):
+            threshold_list = rule.get("threshold") or []
+            if len(threshold_list) >= 2:
+                threshold = engine._to_float(threshold_list[0], threshold)
+                threshold_max = engine._to_float(threshold_list[1], threshold)
+        th_max_val = engine._to_float(threshold_max, threshold) if threshold_max is not None else None
+        passed = engine._compare(value, operator, threshold, th_max_val)
+        if passed:
+            pass_count += 1
+        evaluations.append(
+            {
+                "index": idx,
+                "name": str(rule.get("name", f"rule_{idx}")),
+                "metric": metric,
+                "operator": operator,
+                "threshold": threshold,
+                "threshold_max": th_max_val,
+                "value": value,
+                "passed": passed,
+            }
+        )
+
+    total_rules = len(evaluations)
+    if total_rules <= 0:
+        return {"passed": True, "reason": "empty_rules_after_filter", "score": side_score}
+
+    min_pass_count = int(engine._to_float(cfg.get("min_pass_count"), 0))
+    logic = str(cfg.get("logic", "AND")).strip().upper()
+    if min_pass_count > 0:
+        required = min(total_rules, min_pass_count)
+        passed = pass_count >= required
+        reason = f"min_pass_count({pass_count}/{required})"
+    elif logic == "OR":
+        passed = pass_count > 0
+        reason = f"logic_or({pass_count}/{total_rules})"
+    else:
+        passed = pass_count == total_rules
+        reason = f"logic_and({pass_count}/{total_rules})"
+
+    edge_enabled = engine._to_bool(cfg.get("edge_trigger_enabled", True), True)
+    edge_cd = max(0, int(engine._to_float(cfg.get("edge_cooldown_seconds", 0), 0.0)))
+    edge_info: Dict[str, Any] = {"triggered": passed, "reason": "edge_disabled", "active": bool(passed)}
+    final_passed = passed
+    if edge_enabled:
+        pool_id = str(cfg.get("pool_id", cfg.get("id", "default")) or "default")
+        edge_key = f"{symbol.upper()}:{pool_id}:{operation}"
+        edge_info = engine._edge_trigger(
+            key=edge_key,
+            condition_met=passed,
+            cooldown_seconds=edge_cd,
+        )
+        final_passed = bool(edge_info.get("triggered", False))
+
+    return {
+        "passed": final_passed,
+        "reason": reason,
+        "score": side_score,
+        "evaluations": evaluations,
+        "pass_count": pass_count,
+        "total_rules": total_rules,
+        "side": operation,
+        "edge": edge_info,
+        "condition_met": bool(passed),
+    }
+
+
+def run(engine: TriggerEngine, pool: dict, symbols: list, contexts: list, decisions: list, legacy: bool) -> float:
+    evaluate = engine.evaluate_signal_pool
+    if legacy:
+        evaluate = lambda **kwargs: legacy_evaluate_signal_pool(engine, **kwargs)  # noqa: E731
+    start = time.perf_counter()
+    for i, symbol in enumerate(symbols):
+        evaluate(
+            symbol=symbol,
+            trigger_type="signal",
+            market_flow_context=contexts[i % len(contexts)],
+            decision=decisions[i % len(decisions)],
+            has_position=False,
+            signal_pool_config=pool,
+        )
+    return time.perf_counter() - start
+
+
+def check_parity(pool: dict, symbols: list, contexts: list, decisions: list, samples: int = 500) -> None:
+    """两种实现在同一评估序列上输出一致（各自独立的边沿状态）"""
+    compiled_engine, legacy_engine = TriggerEngine(), TriggerEngine()
+    for i, symbol in enumerate(symbols[:samples]):
+        kwargs = dict(
+            symbol=symbol,
+            trigger_type="signal",
+            market_flow_context=contexts[i % len(contexts)],
+            decision=decisions[i % len(decisions)],
+            has_position=False,
+            signal_pool_config=pool,
+        )
+        expected = legacy_evaluate_signal_pool(legacy_engine, **kwargs)
+        actual = compiled_engine.evaluate_signal_pool(**kwargs)
+        if expected != actual:
+            raise SystemExit(f"parity mismatch at evaluation {i}: {expected} != {actual}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="benchmark signal_pool per-symbol filter cost")
+    parser.add_argument("--rules", type=int, nargs="+", default=[8, 24, 48, 96])
+    parser.add_argument("--evaluations", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    symbols = [f"SYM{i % 200}USDT" for i in range(args.evaluations)]
+    contexts = [build_context(rng) for _ in range(64)]
+    decisions = [_Decision(rng.choice(["BUY", "SELL"]), rng.random(), rng.random()) for _ in range(64)]
+
+    print(f"{'rules':>6} {'compiled_us':>12} {'legacy_us':>10} {'speedup':>8}")
+    for rule_count in args.rules:
+        pool = build_pool(rule_count, rng)
+        check_parity(pool, symbols, contexts, decisions)
+        compiled = run(TriggerEngine(), pool, symbols, contexts, decisions, legacy=False)
+        legacy = run(TriggerEngine(), pool, symbols, contexts, decisions, legacy=True)
+        per_compiled = compiled / len(symbols) * 1e6
+        per_legacy = legacy / len(symbols) * 1e6
+        print(f"{rule_count:>6} {per_compiled:>12.2f} {per_legacy:>10.2f} {per_legacy / per_compiled:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
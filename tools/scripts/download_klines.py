@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.data.bulk_klines import bulk_download
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="bulk download public klines into data/klines (resumable)")
+    parser.add_argument("symbols", nargs="+", help="symbols, e.g. BTCUSDT ETHUSDT")
+    parser.add_argument("--interval", default="5m")
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--data_dir", default=str(ROOT / "data"))
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--weight_per_minute", type=float, default=None, help="shared request-weight budget")
+    args = parser.parse_args()
+
+    report = bulk_download(
+        [s.upper() for s in args.symbols],
+        args.interval,
+        args.days,
+        data_dir=args.data_dir,
+        max_workers=args.workers,
+        weight_per_minute=args.weight_per_minute,
+    )
+    print(json.dumps({k: v for k, v in report.items() if k != "rows_by_symbol"}, ensure_ascii=False, indent=2))
+    return 1 if report["failed_pages"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())